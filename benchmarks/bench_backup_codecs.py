@@ -0,0 +1,108 @@
+"""备份压缩方式基准
+
+生成指定大小的合成业务数据库 (客户/财务/业务记录，文本与数值混合)，
+依次用各压缩方式和级别创建备份，输出备份大小、压缩率和耗时，并按清单校验 SHA-256。
+
+用法:
+    python benchmarks/bench_backup_codecs.py [--size-mb 1024] [--codecs deflate:1,deflate:6,deflate:9,bzip2:9,lzma]
+"""
+import os
+import sys
+import time
+import random
+import hashlib
+import zipfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+BATCH = 5000
+WORDS = ['科技', '贸易', '咨询', '实业', '发展', '网络', '信息', '建设', '工程', '服务', '商贸', '文化']
+CITIES = ['北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '南京', '西安', '重庆']
+
+
+def company_name(i):
+    return f"{random.choice(CITIES)}{random.choice(WORDS)}{random.choice(WORDS)}有限公司{i}"
+
+
+def populate(db, size_mb):
+    """按批写入合成数据直到数据库文件达到 size_mb"""
+    target = size_mb * 1024 * 1024
+    conn = db.conn
+    i = 0
+    while os.path.getsize(db.db_path) < target:
+        customers, finance = [], []
+        for _ in range(BATCH):
+            i += 1
+            name = company_name(i)
+            customers.append((name, f"联系人{i % 997}", f"138{i % 100000000:08d}", random.choice(['潜在', '成交', '流失']),
+                              ''.join(random.choice(WORDS) for _ in range(random.randint(5, 40)))))
+            amount = round(random.uniform(100, 50000), 2)
+            cost = round(amount * random.uniform(0.1, 0.9), 2)
+            finance.append((name, amount, cost, amount - cost,
+                            f"20{random.randint(15, 26)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+                            '备注' * random.randint(0, 20)))
+        with conn:
+            conn.executemany(
+                "INSERT INTO customers (company_name, contact_person, phone, status, notes) VALUES (?, ?, ?, ?, ?)",
+                customers
+            )
+            conn.executemany(
+                "INSERT INTO finance (company_name, amount, cost, profit, due_date, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                finance
+            )
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return i
+
+
+def verify(backup_path, manifest):
+    """按清单校验备份包内每个数据库的大小和 SHA-256"""
+    with zipfile.ZipFile(backup_path) as zipf:
+        for entry in manifest['files']:
+            digest = hashlib.sha256()
+            size = 0
+            with zipf.open(entry['name']) as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+                    size += len(chunk)
+            if size != entry['size'] or digest.hexdigest() != entry['sha256']:
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="备份压缩方式基准")
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--codecs", default="stored,deflate:1,deflate:6,deflate:9,bzip2:1,bzip2:9,lzma")
+    parser.add_argument("--vacuum", action="store_true", help="使用 VACUUM INTO 生成快照")
+    args = parser.parse_args()
+
+    from core.database import DatabaseManager
+    from core.backup import BackupManager
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "app_data.db"))
+        start = time.perf_counter()
+        rows = populate(db, args.size_mb)
+        db_size = os.path.getsize(db.db_path)
+        print(f"生成数据库 {db_size / 1024 / 1024:.0f} MB ({rows} 组记录)，耗时 {time.perf_counter() - start:.1f}s")
+
+        manager = BackupManager(db.db_path, backup_dir=os.path.join(tmp, "backups"))
+        print(f"{'压缩方式':<12}{'大小(MB)':>10}{'压缩率':>8}{'耗时(s)':>9}{'MB/s':>8}  校验")
+        for item in args.codecs.split(','):
+            codec, _, level = item.partition(':')
+            start = time.perf_counter()
+            path = manager.create_backup(codec=codec, level=int(level) if level else None, vacuum=args.vacuum)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+            ok = verify(path, manager.read_manifest(path))
+            print(f"{item:<14}{size / 1024 / 1024:>10.1f}{size / db_size:>8.1%}{elapsed:>9.1f}"
+                  f"{db_size / 1024 / 1024 / elapsed:>8.1f}  {'通过' if ok else '失败'}")
+            os.remove(path)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""图表刷新耗时基准
+
+在临时数据库中生成多年财务数据，分别测量财务统计柱状图和首页趋势图的：
+首次绘制、数据未变化时的刷新、数据变化后的刷新耗时。
+
+用法:
+    python benchmarks/bench_chart_refresh.py [--years 10] [--rows-per-month 200] [--rounds 20]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QDate
+from PyQt5.QtWidgets import QApplication
+
+
+def populate(db, years, rows_per_month):
+    """生成 years 年的财务记录(截止到当前月)"""
+    today = QDate.currentDate()
+    rows = []
+    for offset in range(years * 12):
+        month = today.addMonths(-offset)
+        for _ in range(rows_per_month):
+            day = random.randint(1, month.daysInMonth())
+            amount = round(random.uniform(100, 20000), 2)
+            cost = round(amount * random.uniform(0.2, 0.9), 2)
+            rows.append((f"公司{random.randint(1, 300)}", amount, cost, amount - cost,
+                         f"{month.year():04d}-{month.month():02d}-{day:02d}"))
+    with db.conn:
+        db.conn.executemany(
+            "INSERT INTO finance (company_name, amount, cost, profit, due_date) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+    return len(rows)
+
+
+def timed(func, rounds=1):
+    app = QApplication.instance()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+        app.processEvents()
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def bump_latest(db):
+    """修改当月的一条记录，使下一次刷新的数据指纹变化
+
+    populate 从当月往前生成，id 最大的记录在最早的月份，不在首页显示的年份内，
+    因此按日期选取当月的记录。
+    """
+    with db.conn:
+        cursor = db.conn.execute(
+            "UPDATE finance SET amount = amount + 1, profit = profit + 1 "
+            "WHERE id = (SELECT MAX(id) FROM finance "
+            "WHERE strftime('%Y-%m', due_date) = strftime('%Y-%m', 'now', 'localtime'))"
+        )
+    assert cursor.rowcount == 1, "当月没有财务记录"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图表刷新耗时基准")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--rows-per-month", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    from core.database import DatabaseManager
+    from modules.finance import FinanceStatsWindow
+    from modules.dashboard import DashboardWindow
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        count = populate(db, args.years, args.rows_per_month)
+        print(f"生成财务记录 {count} 条 ({args.years} 年)")
+
+        # 财务统计：全部数据 (每月三根柱子)
+        start = time.perf_counter()
+        stats = FinanceStatsWindow(db)
+        stats.resize(1000, 700)
+        stats.show()
+        app.processEvents()
+        print(f"[财务统计] 首次绘制: {(time.perf_counter() - start) * 1000:.1f} ms")
+        stats.start_date.setDate(QDate.currentDate().addYears(-args.years))
+        app.processEvents()
+
+        def refresh_changed():
+            bump_latest(db)
+            stats._update_chart()
+
+        print(f"[财务统计] 未变化刷新: {timed(stats._update_chart, args.rounds):.2f} ms/次")
+        print(f"[财务统计] 变化后刷新: {timed(refresh_changed, args.rounds):.2f} ms/次")
+        stats.close()
+
+        # 首页趋势图
+        main_window = SimpleNamespace(app=SimpleNamespace(db_manager=db))
+        start = time.perf_counter()
+        dashboard = DashboardWindow(main_window)
+        dashboard.resize(1200, 800)
+        dashboard.show()
+        app.processEvents()
+        print(f"[首页趋势] 首次绘制: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        def refresh_dashboard_changed():
+            bump_latest(db)
+            dashboard.update_chart()
+
+        print(f"[首页趋势] 未变化刷新: {timed(dashboard.update_chart, args.rounds):.2f} ms/次")
+        print(f"[首页趋势] 变化后刷新: {timed(refresh_dashboard_changed, args.rounds):.2f} ms/次")
+        dashboard.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
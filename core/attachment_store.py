@@ -0,0 +1,151 @@
+"""按内容寻址的附件存储
+
+上传的附件按 SHA-256 保存为 <根目录>/<前两位>/<完整哈希>，内容相同的文件只存一份。
+数据库 attachment_blobs 表记录每个文件被多少条附件引用：contract_attachments 的
+插入/删除触发器维护引用计数 (永久删除合同时级联删除的附件同样计数)，
+计数归零的文件由 gc() 删除。
+
+导入在线程池中执行：能用写时复制 (reflink) 时直接克隆，否则边复制边计算哈希，
+源文件只读一遍；内容已存在时丢弃临时文件。打开附件时用硬链接 (os.link) 以原文件名
+放到临时目录，不复制文件内容。存储中的文件设为只读，避免被外部程序改写。
+"""
+import os
+import sys
+import stat
+import shutil
+import hashlib
+import tempfile
+from core.logger import logger
+
+CHUNK_SIZE = 1024 * 1024
+# Linux FICLONE ioctl (btrfs/xfs 等支持写时复制的文件系统)
+FICLONE = 0x40049409
+
+
+class IngestCancelled(Exception):
+    """导入被用户取消"""
+
+
+def _reflink(src, dst):
+    """尝试写时复制克隆文件，不支持时返回 False"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except (OSError, ImportError):
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+        return False
+
+
+class AttachmentStore:
+    """附件存储 (文件操作线程安全；数据库操作由调用方在自己的连接上执行)
+
+    Args:
+        root: 存储根目录
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def ingest(self, source, progress_callback=None, is_cancelled=None):
+        """把文件导入存储，返回 (sha256, 大小, 存储路径, 是否新写入)
+
+        在线程池中调用；progress_callback(百分比) 报告进度，is_cancelled() 返回 True 时中止。
+        """
+        total = os.path.getsize(source)
+        temp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        os.close(fd)
+        try:
+            digest = hashlib.sha256()
+            done = 0
+            reflinked = _reflink(source, temp_path)
+            # 克隆成功时只需读一遍算哈希，否则边读边写
+            with open(temp_path if reflinked else source, 'rb') as fsrc, \
+                    (open(os.devnull, 'wb') if reflinked else open(temp_path, 'wb')) as fdst:
+                for chunk in iter(lambda: fsrc.read(CHUNK_SIZE), b''):
+                    if is_cancelled and is_cancelled():
+                        raise IngestCancelled("已取消")
+                    digest.update(chunk)
+                    if not reflinked:
+                        fdst.write(chunk)
+                    done += len(chunk)
+                    if progress_callback and total:
+                        progress_callback(min(99, int(done * 100 / total)))
+            sha256 = digest.hexdigest()
+            blob = self.blob_path(sha256)
+            if os.path.exists(blob):
+                logger.info(f"[附件] 内容已存在，复用 {sha256[:12]} ({os.path.basename(source)})")
+                return sha256, done, blob, False
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            shutil.copystat(source, temp_path)
+            os.chmod(temp_path, stat.S_IREAD)
+            try:
+                os.replace(temp_path, blob)
+            except OSError:
+                # 同一内容同时在另一个线程导入完成 (Windows 上不能覆盖只读文件)
+                if not os.path.exists(blob):
+                    raise
+                return sha256, done, blob, False
+            logger.info(f"[附件] 已保存 {sha256[:12]} ({os.path.basename(source)}, {done} 字节, "
+                        f"{'reflink' if reflinked else '复制'})")
+            return sha256, done, blob, True
+        finally:
+            if os.path.exists(temp_path):
+                os.chmod(temp_path, stat.S_IREAD | stat.S_IWRITE)
+                os.remove(temp_path)
+            if progress_callback:
+                progress_callback(100)
+
+    def open_path(self, sha256, file_name):
+        """以原文件名打开附件用的路径：硬链接到临时目录 (不支持时复制)"""
+        blob = self.blob_path(sha256)
+        target_dir = os.path.join(self.root, 'open', sha256[:16])
+        target = os.path.join(target_dir, os.path.basename(file_name) or sha256)
+        if not os.path.exists(target):
+            os.makedirs(target_dir, exist_ok=True)
+            try:
+                os.link(blob, target)
+            except OSError:
+                shutil.copy2(blob, target)
+        return target
+
+    def gc(self, conn):
+        """删除引用计数归零的文件，返回删除的个数
+
+        与添加附件一样在 GUI 线程用主连接调用，两者不会交错。
+        文件删除失败 (如 Windows 上正被打开) 时保留记录，下次清理时重试。
+        """
+        rows = conn.execute("SELECT sha256 FROM attachment_blobs WHERE ref_count <= 0").fetchall()
+        removed = []
+        for (sha256,) in rows:
+            if self._remove_blob(sha256):
+                removed.append((sha256,))
+        if removed:
+            with conn:
+                conn.executemany("DELETE FROM attachment_blobs WHERE sha256 = ? AND ref_count <= 0", removed)
+            logger.info(f"[附件] 已清理 {len(removed)} 个不再引用的文件")
+        return len(removed)
+
+    def _remove_blob(self, sha256):
+        shutil.rmtree(os.path.join(self.root, 'open', sha256[:16]), ignore_errors=True)
+        blob = self.blob_path(sha256)
+        try:
+            os.chmod(blob, stat.S_IREAD | stat.S_IWRITE)
+            os.remove(blob)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"[附件] 删除文件失败 {blob}: {e}")
+            return False
+        return True
@@ -3,13 +3,29 @@ import sqlite3
 import hashlib
 import binascii
 import time
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from PyQt5.QtCore import QSettings
+from typing import NamedTuple
+from PyQt5.QtCore import QSettings, QThreadPool
 from utils.paths import get_app_path, get_resource_path
+from core.async_utils import Worker
 from core.logger import logger
 
+
+class AuthResult(NamedTuple):
+    """登录验证结果；locked_seconds 为账户锁定的剩余秒数 (未锁定为 0)"""
+    success: bool
+    message: str
+    locked_seconds: int = 0
+
+
 class AuthManager:
-    def __init__(self, db_path=None):
+    # 连续失败多少次后锁定，以及锁定时长
+    MAX_FAILED_ATTEMPTS = 3
+    LOCK_SECONDS = 30
+
+    def __init__(self, db_path=None, lazy_init=False):
         self.db_path = db_path if db_path else get_app_path('auth.db')
         self.notes_path = get_app_path('notes.json')
         self.todo_path = get_app_path('todo_list.json')
@@ -18,11 +34,44 @@ class AuthManager:
             self.icon_path = get_resource_path(os.path.join('assets', 'icons', '32x32.ico'))
         logger.info(f"数据文件路径: {self.db_path}")
         self.settings = QSettings('MyCompany', 'CustomerSystem')
-        self._init_db()
+        self._db_ready = False
+        # 整个进程共用一个认证数据库连接，登录验证在线程池中执行，访问需持有锁
+        self._conn = None
+        self._lock = threading.RLock()
+        # lazy_init=True 时建表推迟到首次访问数据库(或显式调用 ensure_db)
+        if not lazy_init:
+            self.ensure_db()
+            
+    def ensure_db(self):
+        """确保认证数据库已初始化(幂等)"""
+        with self._lock:
+            if not self._db_ready:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._init_db(self._conn)
+                self._db_ready = True
+            
+    @contextmanager
+    def _connect(self):
+        """使用共享的认证数据库连接 (持有锁，正常结束时提交，异常时回滚)"""
+        self.ensure_db()
+        with self._lock:
+            try:
+                yield self._conn
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def close(self):
+        """关闭认证数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._db_ready = False
         
-    def _init_db(self):
+    def _init_db(self, conn):
         """初始化认证数据库"""
-        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         # 创建用户表
@@ -68,7 +117,6 @@ class AuthManager:
             cursor.execute('INSERT INTO system_flags (flag_name, flag_value) VALUES ("initialized", "1")')
         
         conn.commit()
-        conn.close()
         
     def _create_user(self, username, password):
         """创建新用户"""
@@ -77,23 +125,16 @@ class AuthManager:
                                      salt, 100000)
         pwdhash = binascii.hexlify(pwdhash)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO users (username, password_hash, salt) VALUES (?, ?, ?)',
-            (username, pwdhash.decode('ascii'), salt.decode('ascii'))
-        )
-        conn.commit()
-        conn.close()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO users (username, password_hash, salt) VALUES (?, ?, ?)',
+                (username, pwdhash.decode('ascii'), salt.decode('ascii'))
+            )
         
     def _user_exists(self, username):
         """检查用户是否存在"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT 1 FROM users WHERE username = ?', (username,))
-        exists = cursor.fetchone() is not None
-        conn.close()
-        return exists
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM users WHERE username = ?', (username,)).fetchone() is not None
         
     def update_password(self, username, new_password):
         """更新用户密码"""
@@ -103,160 +144,143 @@ class AuthManager:
         pwdhash = binascii.hexlify(pwdhash).decode('ascii')
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                'UPDATE users SET password_hash = ?, salt = ? WHERE username = ?',
-                (pwdhash, salt.decode('ascii'), username)
-            )
-            conn.commit()
-            conn.close()
+            with self._connect() as conn:
+                conn.execute(
+                    'UPDATE users SET password_hash = ?, salt = ? WHERE username = ?',
+                    (pwdhash, salt.decode('ascii'), username)
+                )
             return True, "密码已更新"
         except Exception as e:
             return False, str(e)
 
-    def authenticate(self, username, password, remember_username=False, remember_password=False):
-        """验证用户登录"""
+    def _user_state(self, username):
+        """一次查询读取用户的密码哈希、盐值、失败次数和锁定时间，用户不存在返回 None"""
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT password_hash, salt, failed_attempts, locked_until FROM users WHERE username = ?',
+                (username,)
+            ).fetchone()
+
+    @staticmethod
+    def _lock_remaining(locked_until):
+        """剩余锁定秒数"""
+        if not locked_until:
+            return 0
+        remaining = (datetime.fromisoformat(locked_until) - datetime.now()).total_seconds()
+        return max(0, int(remaining))
+
+    def verify(self, username, password):
+        """验证用户名和密码并更新失败计数，返回 AuthResult (线程安全，可在线程池中执行)
+
+        读取用户状态和更新计数各只需一条语句；耗时的密码哈希计算不持有连接锁。
+        """
         logger.debug(f"正在验证用户: {username}")
-        
-        # 检查账户是否被锁定
-        if self.is_locked(username):
-            remaining = self.get_lock_time(username)
-            logger.debug(f"账户被锁定，剩余时间: {remaining}秒")
-            logger.warning(f"账户已锁定，请{remaining}秒后再试")
-            return False, f"账户已锁定，请{remaining}秒后再试"
-            
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT password_hash, salt FROM users WHERE username = ?', 
-            (username,)
-        )
-        user = cursor.fetchone()
-        conn.close()
-        
-        if not user:
-            logger.debug(f"用户不存在: {username}")
+        state = self._user_state(username)
+        if not state:
             logger.warning("用户名或密码错误")
-            return False, "用户名或密码错误"
+            return AuthResult(False, "用户名或密码错误")
             
-        stored_hash, salt = user
-        logger.debug(f"存储的哈希: {stored_hash}, 盐值: {salt}")
+        stored_hash, salt, failed_attempts, locked_until = state
+        if self._lock_remaining(locked_until) > 0:
+            remaining = self._lock_remaining(locked_until)
+            logger.warning(f"账户已锁定，请{remaining}秒后再试")
+            return AuthResult(False, f"账户已锁定，请{remaining}秒后再试", remaining)
         
         pwdhash = hashlib.pbkdf2_hmac('sha512', password.encode('utf-8'),
                                      salt.encode('ascii'), 100000)
         pwdhash = binascii.hexlify(pwdhash).decode('ascii')
-        logger.debug(f"计算的哈希: {pwdhash}")
         
         if pwdhash == stored_hash:
-            logger.debug("登录成功")
             logger.info("登录成功，重置失败计数")
-            self._reset_failed_attempts(username)
+            if failed_attempts or locked_until:
+                self._reset_failed_attempts(username)
+            return AuthResult(True, "登录成功")
             
-            # 记住用户名/密码
-            if remember_username:
-                self.settings.setValue('remember_username', username)
-            else:
-                self.settings.remove('remember_username')
-                
-            if remember_password:
-                # 注意：实际应用中不应明文存储密码
-                self.settings.setValue('remember_password', password)
-            else:
-                self.settings.remove('remember_password')
-                
-            return True, "登录成功"
+        # 登录失败：一条语句增加失败计数，达到上限时同时写入锁定时间
+        self._record_failed_attempt(username)
+        remaining_attempts = self.MAX_FAILED_ATTEMPTS - ((failed_attempts or 0) + 1)
+        if remaining_attempts <= 0:
+            return AuthResult(False, f"账户已锁定{self.LOCK_SECONDS}秒", self.LOCK_SECONDS)
+        return AuthResult(False, f"用户名或密码错误，剩余尝试次数: {remaining_attempts}")
+
+    def remember_credentials(self, username, password, remember_username=False, remember_password=False):
+        """登录成功后保存/清除记住的用户名和密码"""
+        if remember_username:
+            self.settings.setValue('remember_username', username)
         else:
-            # 登录失败，记录失败尝试
-            self._record_failed_attempt(username)
-            remaining_attempts = 3 - self.get_failed_attempts(username)
+            self.settings.remove('remember_username')
             
-            if remaining_attempts <= 0:
-                self._lock_account(username)
-                return False, "账户已锁定30秒"
-                
-            return False, f"用户名或密码错误，剩余尝试次数: {remaining_attempts}"
+        if remember_password:
+            # 注意：实际应用中不应明文存储密码
+            self.settings.setValue('remember_password', password)
+        else:
+            self.settings.remove('remember_password')
+
+    def authenticate(self, username, password, remember_username=False, remember_password=False):
+        """验证用户登录 (同步)，返回 (是否成功, 提示信息)"""
+        result = self.verify(username, password)
+        if result.success:
+            self.remember_credentials(username, password, remember_username, remember_password)
+        return result.success, result.message
+
+    def authenticate_async(self, username, password, callback, remember_username=False, remember_password=False):
+        """在线程池中验证用户登录，完成后在 GUI 线程调用 callback(AuthResult)"""
+        def on_result(result):
+            if result.success:
+                self.remember_credentials(username, password, remember_username, remember_password)
+            callback(result)
+
+        def on_error(error):
+            logger.error(f"登录验证失败: {error[2]}")
+            callback(AuthResult(False, f"登录过程发生异常: {error[1]}"))
+
+        worker = Worker(self.verify, username, password)
+        worker.signals.result.connect(on_result)
+        worker.signals.error.connect(on_error)
+        QThreadPool.globalInstance().start(worker)
+        return worker
     
     def _record_failed_attempt(self, username):
-        """记录登录失败尝试"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'UPDATE users SET failed_attempts = failed_attempts + 1 WHERE username = ?',
-            (username,)
-        )
-        conn.commit()
-        conn.close()
+        """记录登录失败尝试，达到次数上限时锁定账户"""
+        locked_until = (datetime.now() + timedelta(seconds=self.LOCK_SECONDS)).isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE users SET failed_attempts = failed_attempts + 1, '
+                'locked_until = CASE WHEN failed_attempts + 1 >= ? THEN ? ELSE locked_until END '
+                'WHERE username = ?',
+                (self.MAX_FAILED_ATTEMPTS, locked_until, username)
+            )
         
     def _reset_failed_attempts(self, username):
         """重置登录失败计数"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'UPDATE users SET failed_attempts = 0, locked_until = NULL WHERE username = ?',
-            (username,)
-        )
-        conn.commit()
-        conn.close()
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE users SET failed_attempts = 0, locked_until = NULL WHERE username = ?',
+                (username,)
+            )
         
     def _lock_account(self, username):
-        """锁定账户30秒"""
-        locked_until = datetime.now() + timedelta(seconds=30)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'UPDATE users SET locked_until = ? WHERE username = ?',
-            (locked_until.isoformat(), username)
-        )
-        conn.commit()
-        conn.close()
+        """锁定账户"""
+        locked_until = datetime.now() + timedelta(seconds=self.LOCK_SECONDS)
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE users SET locked_until = ? WHERE username = ?',
+                (locked_until.isoformat(), username)
+            )
         
     def is_locked(self, username):
         """检查账户是否被锁定"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT locked_until FROM users WHERE username = ?',
-            (username,)
-        )
-        result = cursor.fetchone()
-        conn.close()
-        
-        if not result or not result[0]:
-            return False
-            
-        locked_until = datetime.fromisoformat(result[0])
-        return datetime.now() < locked_until
+        return self.get_lock_time(username) > 0
         
     def get_lock_time(self, username):
         """获取剩余锁定时间(秒)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT locked_until FROM users WHERE username = ?',
-            (username,)
-        )
-        result = cursor.fetchone()
-        conn.close()
-        
-        if not result or not result[0]:
-            return 0
-            
-        locked_until = datetime.fromisoformat(result[0])
-        remaining = (locked_until - datetime.now()).total_seconds()
-        return max(0, int(remaining))
+        state = self._user_state(username)
+        return self._lock_remaining(state[3]) if state else 0
         
     def get_failed_attempts(self, username):
         """获取登录失败次数"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT failed_attempts FROM users WHERE username = ?',
-            (username,)
-        )
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else 0
+        state = self._user_state(username)
+        return state[2] if state else 0
         
     def get_remembered_credentials(self):
         """获取记住的用户名和密码"""
@@ -278,32 +302,24 @@ class AuthManager:
         pwdhash = binascii.hexlify(pwdhash).decode('ascii')
         
         # 更新数据库
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         try:
-            cursor.execute(
-                'UPDATE users SET password_hash = ?, salt = ? WHERE username = ?',
-                (pwdhash, salt.decode('ascii'), username)
-            )
-            
-            # 如果修改的是默认账户密码，删除默认账户
-            if username == 'qjx' and old_password == '654321a':
-                cursor.execute('DELETE FROM users WHERE username = ?', ('qjx',))
-            
-            conn.commit()
-            
-            # 如果当前记住了密码，更新记住的密码
-            if self.settings.value('remember_password'):
-                self.settings.setValue('remember_password', new_password)
+            with self._connect() as conn:
+                conn.execute(
+                    'UPDATE users SET password_hash = ?, salt = ? WHERE username = ?',
+                    (pwdhash, salt.decode('ascii'), username)
+                )
                 
-            return True, "密码修改成功"
-            
+                # 如果修改的是默认账户密码，删除默认账户
+                if username == 'qjx' and old_password == '654321a':
+                    conn.execute('DELETE FROM users WHERE username = ?', ('qjx',))
         except sqlite3.Error as e:
-            conn.rollback()
             return False, f"数据库错误: {str(e)}"
             
-        finally:
-            conn.close()
+        # 如果当前记住了密码，更新记住的密码
+        if self.settings.value('remember_password'):
+            self.settings.setValue('remember_password', new_password)
+            
+        return True, "密码修改成功"
 
     def change_username(self, old_username, password, new_username):
         """修改用户名"""
@@ -321,34 +337,26 @@ class AuthManager:
             return False, "用户名至少需要3个字符"
             
         # 更新数据库
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            # 更新用户名
-            cursor.execute(
-                'UPDATE users SET username = ? WHERE username = ?',
-                (new_username, old_username)
-            )
-            
-            # 如果修改的是默认账户或旧账户，删除可能残留的旧记录（这里主要处理可能存在的特殊情况）
-            # 实际上UPDATE已经处理了，这里只是为了兼容旧代码逻辑
-            if old_username == 'qjx' and self._user_exists('qjx'):
-                 cursor.execute('DELETE FROM users WHERE username = ?', ('qjx',))
-            
-            # 更新记住的用户名
-            if self.settings.value('remember_username') == old_username:
-                self.settings.setValue('remember_username', new_username)
+            with self._connect() as conn:
+                # 更新用户名
+                conn.execute(
+                    'UPDATE users SET username = ? WHERE username = ?',
+                    (new_username, old_username)
+                )
                 
-            conn.commit()
-            return True, "用户名修改成功"
-            
+                # 如果修改的是默认账户或旧账户，删除可能残留的旧记录（这里主要处理可能存在的特殊情况）
+                # 实际上UPDATE已经处理了，这里只是为了兼容旧代码逻辑
+                if old_username == 'qjx':
+                    conn.execute('DELETE FROM users WHERE username = ?', ('qjx',))
         except sqlite3.Error as e:
-            conn.rollback()
             return False, f"数据库错误: {str(e)}"
             
-        finally:
-            conn.close()
+        # 更新记住的用户名
+        if self.settings.value('remember_username') == old_username:
+            self.settings.setValue('remember_username', new_username)
+            
+        return True, "用户名修改成功"
 
 if __name__ == '__main__':
     auth = AuthManager()
@@ -1,55 +1,303 @@
 import os
+import json
 import zipfile
 import sqlite3
 import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import threading
 import time
-from PyQt5.QtWidgets import QMessageBox
+import zlib
 from core.logger import logger
 
+# 备份压缩方式 -> zipfile 压缩常量 (均为标准库支持)
+COMPRESSION_CODECS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflate': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA,
+}
+
+# 可调压缩级别的方式及默认级别 (LZMA 在 zip 中使用固定预设，不支持级别)
+COMPRESSION_LEVELS = {'deflate': 6, 'bzip2': 9}
+
+# 备份包内的清单文件：记录每个数据库的大小和 SHA-256
+MANIFEST_NAME = 'manifest.json'
+
+# 流式压缩的读块大小
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# 增量备份的数据块大小：页大小的整数倍。在线备份得到的快照与源库页布局一致，
+# 未修改的页落在内容相同的块中，只有变化的块需要写入
+INCREMENTAL_CHUNK_SIZE = 256 * 1024
+
+# 增量备份目录 (位于备份目录下)：快照清单和内容寻址的数据块
+SNAPSHOT_DIR = 'snapshots'
+CHUNK_DIR = 'chunks'
+
+# 恢复时先写入目标目录下的临时文件 (与数据库同一文件系统，os.replace 为原子替换)
+RESTORE_SUFFIX = '.restore-tmp'
+# 替换期间当前数据库移到旁边的后缀，全部替换成功后删除，失败时移回
+PRE_RESTORE_SUFFIX = '.pre-restore'
+# 恢复前校验数据库中必须存在的表
+REQUIRED_TABLES = {'app_data.db': ('customers', 'business', 'finance', 'contracts')}
+
+
+class RateLimiter:
+    """简单的读写限速：累计字节数超出速率时休眠 (bytes_per_second 为 None 时不限速)"""
+
+    def __init__(self, bytes_per_second=None):
+        self.rate = bytes_per_second
+        self.start = time.perf_counter()
+        self.consumed = 0
+
+    @classmethod
+    def from_mb(cls, mb_per_second):
+        return cls(mb_per_second * 1024 * 1024 if mb_per_second else None)
+
+    def consume(self, size):
+        if not self.rate:
+            return
+        self.consumed += size
+        delay = self.consumed / self.rate - (time.perf_counter() - self.start)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ChunkStore:
+    """内容寻址的数据块仓库
+
+    每个块按 SHA-256 存放在 <root>/<哈希前两位>/<哈希>，zlib 压缩，相同内容只保存一份。
+    """
+
+    # 垃圾回收跳过最近写入的块 (可能属于尚未写出清单的快照)
+    GC_GRACE_SECONDS = 3600
+
+    def __init__(self, root):
+        self.root = root
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data):
+        """保存数据块，返回 (哈希, 新写入的字节数)；已存在时不重复写入"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = zlib.compress(data, 6)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+        return digest, len(payload)
+
+    def get(self, digest):
+        with open(self.path_for(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"数据块校验失败: {digest}")
+        return data
+
+    def collect_garbage(self, referenced):
+        """删除不被任何快照引用的数据块，返回 (删除数量, 释放字节数)"""
+        removed = freed = 0
+        if not os.path.isdir(self.root):
+            return removed, freed
+        cutoff = time.time() - self.GC_GRACE_SECONDS
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if name in referenced:
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    if os.path.getmtime(path) > cutoff:
+                        continue
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+                    freed += size
+                except OSError as e:
+                    logger.warning(f"[清理] 删除数据块失败 {name}: {e}")
+            if not os.listdir(folder):
+                os.rmdir(folder)
+        return removed, freed
+
+
 class BackupManager:
+    """数据库备份管理
+
+    备份通过 SQLite 在线备份 API 生成一致的快照 (sqlite3.Connection.backup)，
+    按页分批复制，批次之间短暂休眠，不会长时间占用数据库；也可用 VACUUM INTO
+    生成压缩整理后的快照。快照为不依赖 -wal/-shm 的单个文件，在后台线程中分块
+    压缩为 zip (deflate/bzip2/lzma 可选)，并附带记录大小和 SHA-256 的 manifest.json。
+    增量模式下快照按块存入内容寻址的数据块仓库，每次只写入变化的块和一个快照清单。
+    """
+
+    # 每批复制的页数与批次间休眠(秒)：单批只持有读锁约几毫秒
+    STEP_PAGES = 256
+    STEP_SLEEP = 0.005
+
     def __init__(self, db_path, backup_dir='backups'):
         self.db_path = db_path
         self.backup_dir = backup_dir
         self._ensure_backup_dir()
-        self.timer = None
+        # 增量备份写入数据块与垃圾回收互斥
+        self._store_lock = threading.Lock()
         
     def _ensure_backup_dir(self):
         """确保备份目录存在"""
         if not os.path.exists(self.backup_dir):
             os.makedirs(self.backup_dir)
+
+    def _database_files(self):
+        """需要备份的数据库文件 (存在的)"""
+        base_dir = os.path.dirname(self.db_path)
+        db_files = [os.path.join(base_dir, 'app_data.db'), self.db_path]
+        return [f for f in dict.fromkeys(db_files) if os.path.exists(f)]
+
+    def snapshot_database(self, src_path, dst_path, vacuum=False, progress_callback=None, limiter=None):
+        """生成数据库的一致性快照
+
+        Args:
+            src_path: 源数据库 (可以正在被程序读写)
+            dst_path: 快照文件路径 (不能已存在)
+            vacuum: True 时使用 VACUUM INTO 生成整理压缩后的快照 (单条语句，只持有读事务)
+            progress_callback: 接收 0-100 的进度回调
+            limiter: RateLimiter，按复制的页数限速 (VACUUM INTO 为单条语句，不受限速)
+        """
+        src = sqlite3.connect(src_path, timeout=30)
+        try:
+            if vacuum:
+                src.execute("VACUUM INTO ?", (dst_path,))
+                if progress_callback:
+                    progress_callback(100)
+                return
+
+            def on_step(status, remaining, total):
+                if progress_callback and total:
+                    progress_callback(int((total - remaining) * 100 / total))
+                # 批次之间让出数据库，界面的读写不必等待整个备份完成
+                time.sleep(self.STEP_SLEEP)
+                if limiter:
+                    limiter.consume(self.STEP_PAGES * page_size)
+
+            dst = sqlite3.connect(dst_path)
+            try:
+                # 在源连接上保持一个读事务：WAL 模式下快照固定在开始时刻，其他连接照常写入，
+                # 备份也不会因为这些写入而不断从头重新复制
+                src.execute("BEGIN")
+                src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                page_size = src.execute("PRAGMA page_size").fetchone()[0]
+                src.backup(dst, pages=self.STEP_PAGES, progress=on_step)
+                src.rollback()
+                # 快照继承了源库的 WAL 标记，改为回滚日志模式使其成为独立的单个文件
+                dst.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                dst.close()
+        finally:
+            src.close()
+            
+    def _compress_file(self, zipf, path, progress_callback=None, limiter=None):
+        """分块读取文件写入 zip 条目，同时计算校验和，返回清单条目"""
+        name = os.path.basename(path)
+        total = os.path.getsize(path)
+        digest = hashlib.sha256()
+        done = 0
+        with open(path, 'rb') as src, zipf.open(name, 'w', force_zip64=True) as dst:
+            while True:
+                chunk = src.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+                done += len(chunk)
+                if limiter:
+                    limiter.consume(len(chunk))
+                if progress_callback and total:
+                    progress_callback(done * 100 // total)
+        info = zipf.getinfo(name)
+        return {
+            'name': name,
+            'size': total,
+            'compressed_size': info.compress_size,
+            'sha256': digest.hexdigest(),
+        }
+
+    @staticmethod
+    def read_manifest(backup_path):
+        """读取备份包清单，旧版备份没有清单时返回 None"""
+        with zipfile.ZipFile(backup_path, 'r') as zipf:
+            if MANIFEST_NAME not in zipf.namelist():
+                return None
+            return json.loads(zipf.read(MANIFEST_NAME).decode('utf-8'))
+
+    @staticmethod
+    def _compression_settings(codec, level):
+        """未指定时从设置读取 backup_codec / backup_level"""
+        if codec is None or level is None:
+            from PyQt5.QtCore import QSettings
+            settings = QSettings("CustomerManagement", "Settings")
+            if codec is None:
+                codec = settings.value("backup_codec", "deflate", type=str)
+            if level is None:
+                level = settings.value("backup_level", 0, type=int) or None
+        if codec not in COMPRESSION_CODECS:
+            logger.warning(f"[备份] 未知压缩方式 {codec}，改用 deflate")
+            codec = 'deflate'
+        if codec in COMPRESSION_LEVELS:
+            level = level or COMPRESSION_LEVELS[codec]
+        else:
+            level = None
+        return codec, level
             
-    def create_backup(self, backup_dir=None, files=None):
+    def create_backup(self, backup_dir=None, files=None, vacuum=None, progress_callback=None,
+                      codec=None, level=None, incremental=None, io_limit_mb=None):
         """创建数据库备份
         Args:
             backup_dir: 备份目录路径，默认为self.backup_dir
-            files: 要备份的文件列表，默认为None(备份所有关键文件)
+            files: 要备份的数据库文件列表，默认为None(备份所有数据库)；-wal/-shm 文件会被忽略，
+                   其内容已包含在快照中
+            vacuum: 是否使用 VACUUM INTO 生成整理后的快照，None 时读取设置 backup_vacuum_into
+            progress_callback: 接收 0-100 的进度回调 (可能从压缩线程调用)
+            codec: 压缩方式 (见 COMPRESSION_CODECS)，None 时读取设置 backup_codec
+            level: 压缩级别 (deflate 0-9，bzip2 1-9)，None 时读取设置 backup_level
+            incremental: 是否使用增量备份 (见 create_incremental_backup)，None 时读取设置 backup_incremental
+            io_limit_mb: 读写限速 (MB/s)，None 表示不限速 (定时备份使用，减少对前台操作的影响)
         Returns:
-            成功返回备份路径，失败返回None
+            成功返回备份路径 (增量备份返回快照清单路径)，失败返回None
         """
+        if incremental is None:
+            from PyQt5.QtCore import QSettings
+            incremental = QSettings("CustomerManagement", "Settings").value("backup_incremental", False, type=bool)
+        if incremental:
+            return self.create_incremental_backup(backup_dir, files=files, progress_callback=progress_callback,
+                                                  io_limit_mb=io_limit_mb)
+
+        temp_dir = None
+        part_path = None
         try:
             # 确定备份目录
             backup_dir = backup_dir or self.backup_dir
             
-            # 确定要备份的文件列表
+            # 确定要备份的数据库文件
             if files is None:
-                base_dir = os.path.dirname(self.db_path)
-                # 定义要备份的数据库文件
-                db_files = [
-                    os.path.join(base_dir, 'app_data.db'),
-                    self.db_path
-                ]
-                
-                # 动态添加相关的 .wal 和 .shm 文件
-                files = []
-                for db_file in db_files:
-                    files.append(db_file)
-                    files.append(db_file + '-wal')
-                    files.append(db_file + '-shm')
-                
-                # 去重并确保文件存在
-                files = [f for f in dict.fromkeys(files) if os.path.exists(f)]
+                files = self._database_files()
+            else:
+                files = [f for f in files if not f.endswith(('-wal', '-shm')) and os.path.exists(f)]
+            if not files:
+                raise FileNotFoundError(f"未找到数据库文件: {self.db_path}")
+
+            if vacuum is None:
+                from PyQt5.QtCore import QSettings
+                vacuum = QSettings("CustomerManagement", "Settings").value("backup_vacuum_into", False, type=bool)
+            codec, level = self._compression_settings(codec, level)
                 
             # 确保备份目录存在并可写
             os.makedirs(backup_dir, exist_ok=True)
@@ -60,23 +308,65 @@ class BackupManager:
             backup_path = os.path.join(backup_dir, f'backup_{timestamp}.zip')
             
             logger.info(f"[备份] 开始创建备份到: {backup_path}")
-            logger.debug(f"[备份] 包含文件: {files}")
+            logger.debug(f"[备份] 包含文件: {files} (VACUUM INTO: {vacuum}, 压缩: {codec} {level or ''})")
+
+            # 进度: 快照和压缩各占一半；两者在不同线程中交叠进行，只报告递增的进度
+            # 快照与压缩分别限速 (两者在不同线程中进行)
+            snapshot_limiter = RateLimiter.from_mb(io_limit_mb)
+            compress_limiter = RateLimiter.from_mb(io_limit_mb)
+            progress_lock = threading.Lock()
+            reported = [0]
+
+            def report(stage, index, percent):
+                if not progress_callback:
+                    return
+                value = int((stage + (index + percent / 100) / len(files)) * 50)
+                with progress_lock:
+                    if value <= reported[0]:
+                        return
+                    reported[0] = value
+                progress_callback(value)
             
-            # 创建zip备份文件
-            with zipfile.ZipFile(backup_path, 'w') as zipf:
-                for file in files:
-                    if os.path.exists(file):
-                        zipf.write(file, os.path.basename(file))
-                        logger.debug(f"[备份] 已添加文件: {os.path.basename(file)}")
-                    else:
-                        logger.warning(f"[备份] 警告: 文件不存在: {file}")
-                
-            # 验证备份文件
-            if not os.path.exists(backup_path):
-                raise RuntimeError("备份文件创建失败")
+            # 快照在当前线程逐个生成，压缩在后台线程中进行：
+            # 后一个数据库生成快照时，前一个快照已经在压缩，写入临时文件后再改名，避免留下不完整的备份
+            temp_dir = tempfile.mkdtemp(prefix='snapshot_', dir=backup_dir)
+            part_path = backup_path + '.part'
+            started = time.perf_counter()
+            with zipfile.ZipFile(part_path, 'w', compression=COMPRESSION_CODECS[codec],
+                                 compresslevel=level, allowZip64=True) as zipf:
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    futures = []
+                    for index, file in enumerate(files):
+                        snapshot = os.path.join(temp_dir, os.path.basename(file))
+                        start = time.perf_counter()
+                        self.snapshot_database(file, snapshot, vacuum=vacuum,
+                                               progress_callback=lambda p, i=index: report(0, i, p),
+                                               limiter=snapshot_limiter)
+                        logger.debug(f"[备份] 已生成快照: {os.path.basename(file)} "
+                                     f"({(time.perf_counter() - start) * 1000:.0f}ms)")
+                        futures.append(executor.submit(
+                            self._compress_file, zipf, snapshot, lambda p, i=index: report(1, i, p),
+                            compress_limiter
+                        ))
+                    entries = [future.result() for future in futures]
+
+                manifest = {
+                    'version': 1,
+                    'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'codec': codec,
+                    'level': level,
+                    'vacuum': bool(vacuum),
+                    'files': entries,
+                }
+                zipf.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+            os.replace(part_path, backup_path)
+            if progress_callback:
+                progress_callback(100)
                 
             size_mb = os.path.getsize(backup_path) / (1024 * 1024)
-            logger.info(f"[备份] 备份成功创建: {backup_path} (大小: {size_mb:.2f} MB)")
+            raw_mb = sum(entry['size'] for entry in entries) / (1024 * 1024)
+            logger.info(f"[备份] 备份成功创建: {backup_path} (大小: {size_mb:.2f} MB / 原始 {raw_mb:.2f} MB, "
+                        f"{codec}, 耗时 {time.perf_counter() - started:.1f}s)")
             
             # 自动清理旧备份
             self.clean_old_backups(days=7, backup_dir=backup_dir)
@@ -89,9 +379,182 @@ class BackupManager:
             logger.error(f"[备份] 数据库路径: {self.db_path}")
             logger.error(f"[备份] 备份目录: {self.backup_dir}")
             raise Exception(error_msg)
+        finally:
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            if part_path and os.path.exists(part_path):
+                os.remove(part_path)
+
+    def create_incremental_backup(self, backup_dir=None, files=None, progress_callback=None, io_limit_mb=None):
+        """增量备份
+
+        生成快照后按固定大小切块，块按内容哈希存入 <备份目录>/chunks，已存在的块不再写入；
+        每次备份只在 <备份目录>/snapshots 写一个记录块列表的清单。
+        任意一个快照都可以由清单和数据块完整还原 (见 reassemble_snapshot)。
+        Returns:
+            快照清单路径
+        """
+        temp_dir = None
+        try:
+            backup_dir = backup_dir or self.backup_dir
+            if files is None:
+                files = self._database_files()
+            else:
+                files = [f for f in files if not f.endswith(('-wal', '-shm')) and os.path.exists(f)]
+            if not files:
+                raise FileNotFoundError(f"未找到数据库文件: {self.db_path}")
+
+            snapshot_dir = os.path.join(backup_dir, SNAPSHOT_DIR)
+            os.makedirs(snapshot_dir, exist_ok=True)
+            store = ChunkStore(os.path.join(backup_dir, CHUNK_DIR))
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            manifest_path = os.path.join(snapshot_dir, f'snapshot_{timestamp}.json')
+            suffix = 1
+            while os.path.exists(manifest_path):
+                manifest_path = os.path.join(snapshot_dir, f'snapshot_{timestamp}_{suffix}.json')
+                suffix += 1
+
+            logger.info(f"[备份] 开始增量备份: {manifest_path}")
+            started = time.perf_counter()
+            entries = []
+            new_chunks = new_bytes = 0
+            temp_dir = tempfile.mkdtemp(prefix='snapshot_', dir=backup_dir)
+            limiter = RateLimiter.from_mb(io_limit_mb)
+            with self._store_lock:
+                for index, file in enumerate(files):
+                    def report(stage, percent, index=index):
+                        if progress_callback:
+                            progress_callback(int((index + (stage + percent / 100) / 2) * 100 / len(files)))
+
+                    # 增量模式不使用 VACUUM INTO：整理会移动页，导致几乎所有块都发生变化
+                    snapshot = os.path.join(temp_dir, os.path.basename(file))
+                    self.snapshot_database(file, snapshot, progress_callback=lambda p: report(0, p), limiter=limiter)
+
+                    total = os.path.getsize(snapshot)
+                    digest = hashlib.sha256()
+                    chunks = []
+                    with open(snapshot, 'rb') as f:
+                        while True:
+                            data = f.read(INCREMENTAL_CHUNK_SIZE)
+                            if not data:
+                                break
+                            digest.update(data)
+                            limiter.consume(len(data))
+                            chunk, written = store.put(data)
+                            chunks.append(chunk)
+                            if written:
+                                new_chunks += 1
+                                new_bytes += written
+                            if total:
+                                report(1, len(chunks) * INCREMENTAL_CHUNK_SIZE * 100 // total)
+                    entries.append({
+                        'name': os.path.basename(file),
+                        'size': total,
+                        'sha256': digest.hexdigest(),
+                        'chunks': chunks,
+                    })
+
+                manifest = {
+                    'version': 1,
+                    'type': 'incremental',
+                    'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'chunk_size': INCREMENTAL_CHUNK_SIZE,
+                    'chunk_dir': CHUNK_DIR,
+                    'files': entries,
+                }
+                temp_manifest = manifest_path + '.part'
+                with open(temp_manifest, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, ensure_ascii=False)
+                os.replace(temp_manifest, manifest_path)
+
+            if progress_callback:
+                progress_callback(100)
+            total_chunks = sum(len(entry['chunks']) for entry in entries)
+            logger.info(f"[备份] 增量备份完成: {manifest_path} (新增数据块 {new_chunks}/{total_chunks}, "
+                        f"{new_bytes / 1024 / 1024:.2f} MB, 耗时 {time.perf_counter() - started:.1f}s)")
+
+            self.clean_old_backups(days=7, backup_dir=backup_dir)
+            return manifest_path
+
+        except Exception as e:
+            error_msg = f"增量备份失败: {type(e).__name__} - {str(e)}"
+            logger.error(f"[备份] {error_msg}")
+            raise Exception(error_msg)
+        finally:
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _load_snapshot(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def list_snapshots(self, backup_dir=None):
+        """按时间顺序返回增量快照清单路径"""
+        snapshot_dir = os.path.join(backup_dir or self.backup_dir, SNAPSHOT_DIR)
+        if not os.path.isdir(snapshot_dir):
+            return []
+        return sorted(
+            os.path.join(snapshot_dir, name) for name in os.listdir(snapshot_dir)
+            if name.startswith('snapshot_') and name.endswith('.json')
+        )
+
+    def reassemble_snapshot(self, manifest_path, target_dir, suffix=''):
+        """按清单把快照中的数据库还原到 target_dir，逐块并整体校验 SHA-256，返回还原的文件列表
+
+        suffix 附加在还原的文件名后 (恢复时写入临时文件)。
+        """
+        manifest = self._load_snapshot(manifest_path)
+        backup_dir = os.path.dirname(os.path.dirname(os.path.abspath(manifest_path)))
+        store = ChunkStore(os.path.join(backup_dir, manifest.get('chunk_dir', CHUNK_DIR)))
+        restored = []
+        for entry in manifest['files']:
+            path = os.path.join(target_dir, entry['name'] + suffix)
+            restored.append(path)
+            digest = hashlib.sha256()
+            with open(path, 'wb') as f:
+                for chunk in entry['chunks']:
+                    data = store.get(chunk)
+                    digest.update(data)
+                    f.write(data)
+            if os.path.getsize(path) != entry['size'] or digest.hexdigest() != entry['sha256']:
+                raise ValueError(f"快照还原校验失败: {entry['name']}")
+        return restored
+
+    def _clean_old_snapshots(self, target_dir, days):
+        """删除过期的增量快照清单 (始终保留最新一个)，再回收不再被引用的数据块"""
+        snapshots = self.list_snapshots(target_dir)
+        if not snapshots:
+            return
+        now = datetime.now()
+        with self._store_lock:
+            kept = []
+            for path in snapshots[:-1]:
+                try:
+                    if (now - datetime.fromtimestamp(os.path.getmtime(path))).days > days:
+                        os.remove(path)
+                        logger.info(f"[清理] 已删除过期快照: {os.path.basename(path)} (超过 {days} 天)")
+                        continue
+                except OSError as e:
+                    logger.warning(f"[清理] 处理快照失败 {path}: {e}")
+                kept.append(path)
+            kept.append(snapshots[-1])
+
+            referenced = set()
+            for path in kept:
+                try:
+                    for entry in self._load_snapshot(path)['files']:
+                        referenced.update(entry['chunks'])
+                except (OSError, ValueError, KeyError) as e:
+                    # 无法读取的清单无法确定引用关系，本次不回收以免误删
+                    logger.warning(f"[清理] 读取快照清单失败 {path}: {e}，跳过数据块回收")
+                    return
+            removed, freed = ChunkStore(os.path.join(target_dir, CHUNK_DIR)).collect_garbage(referenced)
+            if removed:
+                logger.info(f"[清理] 回收未引用的数据块 {removed} 个，释放 {freed / 1024 / 1024:.2f} MB")
 
     def clean_old_backups(self, days=7, backup_dir=None):
-        """清理超过指定天数的旧备份文件
+        """清理超过指定天数的旧备份文件，同时清理过期的增量快照并回收未引用的数据块
         Args:
             days: 保留天数
             backup_dir: 备份目录，默认为self.backup_dir
@@ -122,126 +585,160 @@ class BackupManager:
             
             if count > 0:
                 logger.info(f"[清理] 共清理了 {count} 个过期备份文件")
+            
+            # 增量快照与数据块
+            self._clean_old_snapshots(target_dir, days)
                 
         except Exception as e:
             logger.error(f"[清理] 清理旧备份失败: {str(e)}")
 
-            
-    def restore_backup(self, backup_path, target_dir=None, clean_temp=True):
-        """从备份恢复数据库
-        Args:
-            backup_path: 备份文件路径
-            target_dir: 恢复目标目录，默认为self.db_path所在目录
-            clean_temp: 是否清理临时文件，默认为True
+    def _extract_for_restore(self, backup_path, target_dir, prepared, progress_callback=None):
+        """把 zip 中的数据库流式解压为目标目录下的临时文件，有清单时校验 SHA-256"""
+        with zipfile.ZipFile(backup_path, 'r') as zipf:
+            names = set(zipf.namelist())
+            manifest = {}
+            if MANIFEST_NAME in names:
+                manifest = {entry['name']: entry for entry in json.loads(zipf.read(MANIFEST_NAME))['files']}
+            db_names = [name for name in zipf.namelist() if name.endswith('.db') and '/' not in name]
+            total = sum(zipf.getinfo(name).file_size for name in db_names) or 1
+            done = 0
+            for name in db_names:
+                temp_path = os.path.join(target_dir, name + RESTORE_SUFFIX)
+                prepared.append((temp_path, os.path.join(target_dir, name)))
+                digest = hashlib.sha256()
+                with zipf.open(name) as src, open(temp_path, 'wb') as dst:
+                    for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                        dst.write(chunk)
+                        done += len(chunk)
+                        if progress_callback:
+                            progress_callback(int(done * 100 / total))
+                entry = manifest.get(name)
+                if entry and digest.hexdigest() != entry['sha256']:
+                    raise ValueError(f"备份文件校验失败: {name}")
+                # 旧版备份直接打包了 -wal，放在临时文件旁，校验时合并进数据库
+                if name + '-wal' in names:
+                    with zipf.open(name + '-wal') as src, open(temp_path + '-wal', 'wb') as dst:
+                        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+    @staticmethod
+    def _verify_restored(temp_path, name):
+        """检查待恢复的数据库: quick_check、结构版本和必需的表，并转为不依赖 -wal 的单文件"""
+        from core.migrations import MigrationManager
+        conn = sqlite3.connect(temp_path)
+        try:
+            result = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if result != 'ok':
+                raise ValueError(f"{name} 数据库损坏: {result}")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > MigrationManager.SCHEMA_VERSION:
+                raise ValueError(
+                    f"{name} 来自更新版本的程序 (结构版本 {version} > {MigrationManager.SCHEMA_VERSION})，"
+                    "请升级后再恢复"
+                )
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            missing = [t for t in REQUIRED_TABLES.get(name, ()) if t not in tables]
+            if missing:
+                raise ValueError(f"{name} 缺少数据表: {', '.join(missing)}")
+            # 合并可能存在的 -wal，替换后由 DatabaseManager 重新切换为 WAL 模式
+            conn.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            conn.close()
+
+    def prepare_restore(self, backup_path, target_dir=None, progress_callback=None):
+        """准备恢复：解压并校验到临时文件，不影响正在使用的数据库 (可在后台线程中执行)
+
         Returns:
-            成功返回True，失败抛出异常
+            [(临时文件, 目标文件), ...]，交给 commit_restore 替换；失败时清理临时文件并抛出异常
         """
-        # 确定目标目录
         if target_dir is None:
             target_dir = os.path.dirname(self.db_path)
-            
-        logger.info(f"[恢复] 开始从备份恢复: {backup_path} -> {target_dir}")
-        
-        # 关闭内部连接（如果有）
-        if hasattr(self, 'db_connection'):
-            try:
-                self.db_connection.close()
-            except:
-                pass
-        
-        # 强制垃圾回收，确保所有文件句柄释放
-        import gc
-        gc.collect()
+        logger.info(f"[恢复] 准备从备份恢复: {backup_path} -> {target_dir}")
+        prepared = []
+        try:
+            if backup_path.endswith('.json'):
+                for path in self.reassemble_snapshot(backup_path, target_dir, suffix=RESTORE_SUFFIX):
+                    prepared.append((path, path[:-len(RESTORE_SUFFIX)]))
+            else:
+                self._extract_for_restore(backup_path, target_dir, prepared, progress_callback)
+            if not prepared:
+                raise ValueError("备份文件中未找到有效的数据库文件")
+            for temp_path, final_path in prepared:
+                self._verify_restored(temp_path, os.path.basename(final_path))
+            logger.info(f"[恢复] 已解压并校验 {len(prepared)} 个数据库")
+            return prepared
+        except Exception as e:
+            logger.error(f"[恢复] 准备失败: {e}")
+            self.discard_restore(prepared)
+            raise
 
-        # 创建临时目录
-        temp_dir = os.path.join(target_dir, f'restore_temp_{int(time.time())}')
-        
+    @staticmethod
+    def commit_restore(prepared):
+        """用准备好的临时文件替换数据库 (调用前须关闭所有数据库连接)
+
+        先把当前的各数据库及其 -wal/-shm 移到 *.pre-restore (-wal/-shm 不能留下，否则会被回放到
+        恢复后的数据库)，再逐个替换；任何一步失败都把已替换的文件移回临时文件、把原文件移回原处，
+        使多个数据库要么全部恢复、要么保持原样。全部成功后才删除移开的原文件。
+        """
+        moved = []  # (移开后的路径, 原路径)
+        replaced = []  # (临时文件, 目标文件)
         try:
-            # 1. 快速解压
-            os.makedirs(temp_dir, exist_ok=True)
-            with zipfile.ZipFile(backup_path, 'r') as zipf:
-                zipf.extractall(temp_dir)
-            logger.info(f"[恢复] 已解压到临时目录: {temp_dir}")
-            
-            # 2. 识别并移动文件
-            restored_count = 0
-            for filename in os.listdir(temp_dir):
-                # 只恢复数据库相关文件
-                if filename.endswith(('.db', '.db-wal', '.db-shm')):
-                    src = os.path.join(temp_dir, filename)
-                    dst = os.path.join(target_dir, filename)
-                    
-                    # 尝试移动/覆盖
-                    max_retries = 20
-                    for attempt in range(max_retries):
-                        try:
-                            # 如果目标文件存在，先尝试重命名备份（比直接删除更安全，且能检测占用）
-                            if os.path.exists(dst):
-                                try:
-                                    os.remove(dst)
-                                except PermissionError:
-                                    # 如果无法删除，说明被占用
-                                    raise PermissionError(f"文件被占用: {filename}")
-                            
-                            shutil.move(src, dst)
-                            logger.info(f"[恢复] 已恢复: {filename}")
-                            restored_count += 1
-                            break
-                        except PermissionError:
-                            if attempt < max_retries - 1:
-                                time.sleep(0.5) # 延长重试间隔
-                                logger.warning(f"[恢复] 文件 {filename} 被占用，重试 {attempt+1}/{max_retries}...")
-                                continue
-                            else:
-                                raise Exception(f"无法写入文件 {filename}，请确保程序已完全关闭。")
-                        except Exception as e:
-                            raise Exception(f"恢复文件 {filename} 失败: {str(e)}")
-
-            if restored_count == 0:
-                raise Exception("备份文件中未找到有效的数据库文件")
-                
-            return True
-            
+            for _, final_path in prepared:
+                for path in (final_path, final_path + '-wal', final_path + '-shm'):
+                    if os.path.exists(path):
+                        os.replace(path, path + PRE_RESTORE_SUFFIX)
+                        moved.append((path + PRE_RESTORE_SUFFIX, path))
+            for temp_path, final_path in prepared:
+                os.replace(temp_path, final_path)
+                replaced.append((temp_path, final_path))
         except Exception as e:
-            logger.error(f"[恢复] 失败: {str(e)}")
+            logger.error(f"[恢复] 替换数据库失败，正在还原: {e}")
+            for src, dst in reversed(replaced):
+                BackupManager._move_back(dst, src)
+            for src, dst in reversed(moved):
+                BackupManager._move_back(src, dst)
             raise
-        finally:
-            # 清理临时目录
-            if os.path.exists(temp_dir):
-                try:
-                    shutil.rmtree(temp_dir)
-                except Exception as e:
-                    logger.warning(f"[恢复] 清理临时目录失败: {str(e)}")
-            
-    def schedule_daily_backup(self, window=None, interval_hours=24):
-        """安排每日自动备份"""
-        def backup_task():
+
+        for path, _ in moved:
             try:
-                backup_path = self.create_backup()
-                if window:
-                    QMessageBox.information(
-                        window, 
-                        '自动备份完成', 
-                        f'数据库已自动备份到:\n{backup_path}'
-                    )
-            except Exception as e:
-                if window:
-                    QMessageBox.warning(
-                        window,
-                        '自动备份失败',
-                        f'自动备份失败:\n{str(e)}'
-                    )
-            finally:
-                # 重新安排下一次备份
-                self.timer = threading.Timer(interval_hours * 3600, backup_task)
-                self.timer.start()
-        
-        # 启动第一次备份任务
-        self.timer = threading.Timer(interval_hours * 3600, backup_task)
-        self.timer.start()
-        
-    def stop_scheduled_backup(self):
-        """停止定时备份"""
-        if self.timer:
-            self.timer.cancel()
-            self.timer = None
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"[恢复] 删除原数据库文件失败 {path}: {e}")
+        for _, final_path in prepared:
+            logger.info(f"[恢复] 已恢复: {os.path.basename(final_path)}")
+
+    @staticmethod
+    def _move_back(src, dst):
+        """还原时移回文件；失败只记录日志，继续还原其它文件"""
+        try:
+            os.replace(src, dst)
+        except OSError as e:
+            logger.error(f"[恢复] 还原失败，请手动将 {src} 改名为 {dst}: {e}")
+
+    @staticmethod
+    def discard_restore(prepared):
+        """删除准备恢复时生成的临时文件"""
+        for temp_path, _ in prepared:
+            for path in (temp_path, temp_path + '-wal', temp_path + '-shm', temp_path + '-journal'):
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logger.warning(f"[恢复] 清理临时文件失败 {path}: {e}")
+
+    def restore_backup(self, backup_path, target_dir=None, progress_callback=None):
+        """从备份恢复数据库 (程序未打开数据库时使用；运行中请先 prepare_restore，关闭连接后再 commit_restore)
+        Args:
+            backup_path: 备份文件路径
+            target_dir: 恢复目标目录，默认为self.db_path所在目录
+            progress_callback: 解压进度回调(百分比)
+        Returns:
+            成功返回True，失败抛出异常
+        """
+        prepared = self.prepare_restore(backup_path, target_dir, progress_callback)
+        try:
+            self.commit_restore(prepared)
+        except Exception:
+            self.discard_restore(prepared)
+            raise
+        return True
@@ -0,0 +1,188 @@
+from datetime import datetime, timedelta
+from PyQt5.QtCore import QObject, QTimer, QSettings, QThreadPool
+from PyQt5.QtWidgets import QSystemTrayIcon
+from core.async_utils import Worker
+from core.logger import logger
+
+
+class CronSchedule:
+    """cron 风格的时间表: "分 时 日 月 周"
+
+    每个字段支持 *、数字、列表 (1,15)、范围 (1-5) 和步长 (*/15, 8-18/2, 5/15 即 5-最大值/15)；
+    周取值 0-6 (0 为周日，7 也视为周日)。与 cron 相同，日和周都被限定时满足其一即可。
+    """
+
+    FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"时间表需要 5 个字段 (分 时 日 月 周): {expression}")
+        self.expression = expression
+        fields = [self._parse(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        self.weekdays = {d % 7 for d in weekdays}
+        self.any_day = parts[2] == '*'
+        self.any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for item in field.split(','):
+            base, _, step = item.partition('/')
+            if base == '*':
+                start, end = low, high
+            elif '-' in base:
+                start, end = (int(x) for x in base.split('-', 1))
+            else:
+                start = end = int(base)
+                if step:
+                    end = high
+            if not (low <= start <= end <= high):
+                raise ValueError(f"取值超出范围 {low}-{high}: {item}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return sorted(values)
+
+    def _day_matches(self, day):
+        in_month = day.day in self.days
+        in_week = (day.isoweekday() % 7) in self.weekdays
+        if self.any_day:
+            return in_week
+        if self.any_weekday:
+            return in_month
+        return in_month or in_week
+
+    def next_after(self, moment):
+        """严格晚于 moment 的下一个执行时间"""
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 8):  # 覆盖 2 月 29 日这类稀疏时间表
+            if day.month in self.months and self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"时间表没有可执行的时间: {self.expression}")
+
+
+class BackupScheduler(QObject):
+    """空闲时执行的定时备份
+
+    每 CHECK_INTERVAL_MS 检查一次：到达时间表中的执行时间后，等程序空闲
+    (见 core/idle.py 的 IdleMonitor) 再在线程池中备份，
+    备份限制读写速度；完成后回到 GUI 线程通过系统托盘通知。
+    上次执行时间保存在设置中，程序未运行期间错过的备份会在下次启动后补做一次。
+
+    配置(QSettings "CustomerManagement/Settings"):
+        backup_schedule_enabled: 是否启用，默认 False
+        backup_schedule: 时间表，默认 "0 12 * * *" (每天 12:00)
+        backup_idle_seconds: 用户无操作多少秒视为空闲，默认 60
+        backup_io_limit_mb: 定时备份的读写限速(MB/s)，默认 20，0 表示不限速
+        backup_schedule/last_run: 上次执行时间
+    """
+
+    CHECK_INTERVAL_MS = 30 * 1000
+    LAST_RUN_KEY = "backup_schedule/last_run"
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    def __init__(self, main_window):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.settings = QSettings("CustomerManagement", "Settings")
+        self.schedule = None
+        self.next_run = None
+        self._running = False
+        self._waiting_logged = False
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.CHECK_INTERVAL_MS)
+        self._timer.timeout.connect(self._check)
+
+    def start(self):
+        """按当前设置启动 (可重复调用，设置变化后用于重新加载)"""
+        self._timer.stop()
+        if not self.settings.value("backup_schedule_enabled", False, type=bool):
+            self.next_run = None
+            return
+        expression = self.settings.value("backup_schedule", "0 12 * * *", type=str)
+        try:
+            self.schedule = CronSchedule(expression)
+        except ValueError as e:
+            logger.error(f"[定时备份] 时间表无效，已停用: {e}")
+            return
+
+        last_run = self._last_run()
+        if last_run is None:
+            # 首次启用：从现在开始计算，不立即补做
+            last_run = datetime.now()
+            self.settings.setValue(self.LAST_RUN_KEY, last_run.strftime(self.TIME_FORMAT))
+        self.next_run = self.schedule.next_after(last_run)
+        if self.next_run <= datetime.now():
+            logger.info(f"[定时备份] 错过了 {self.next_run:%Y-%m-%d %H:%M} 的备份，将在空闲时补做")
+        else:
+            logger.info(f"[定时备份] 已启用 ({expression})，下次执行: {self.next_run:%Y-%m-%d %H:%M}")
+
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _last_run(self):
+        value = self.settings.value(self.LAST_RUN_KEY, "", type=str)
+        try:
+            return datetime.strptime(value, self.TIME_FORMAT) if value else None
+        except ValueError:
+            return None
+
+    def busy_reason(self):
+        """程序正忙时返回原因，空闲时返回 None"""
+        idle_seconds = self.settings.value("backup_idle_seconds", 60, type=int)
+        return self.main_window.idle_monitor.busy_reason(idle_seconds)
+
+    def _check(self):
+        if self._running or self.next_run is None or datetime.now() < self.next_run:
+            return
+        reason = self.busy_reason()
+        if reason:
+            if not self._waiting_logged:
+                logger.info(f"[定时备份] 已到执行时间，等待空闲 ({reason})")
+                self._waiting_logged = True
+            return
+        self._run()
+
+    def _run(self):
+        backup_manager = getattr(self.main_window.app, 'backup_manager', None)
+        if backup_manager is None:
+            return
+        self._running = True
+        self._waiting_logged = False
+        backup_dir = self.settings.value("backup_path", "", type=str) or None
+        io_limit = self.settings.value("backup_io_limit_mb", 20, type=int) or None
+        logger.info("[定时备份] 开始执行")
+        worker = Worker(backup_manager.create_backup, backup_dir=backup_dir, io_limit_mb=io_limit)
+        worker.signals.result.connect(self._on_success)
+        worker.signals.error.connect(self._on_error)
+        QThreadPool.globalInstance().start(worker)
+
+    def _finish(self):
+        now = datetime.now()
+        self._running = False
+        self.settings.setValue(self.LAST_RUN_KEY, now.strftime(self.TIME_FORMAT))
+        self.next_run = self.schedule.next_after(now)
+        logger.info(f"[定时备份] 下次执行: {self.next_run:%Y-%m-%d %H:%M}")
+
+    def _notify(self, title, message, icon):
+        tray_icon = getattr(self.main_window, 'tray_icon', None)
+        if tray_icon and tray_icon.isVisible():
+            tray_icon.showMessage(title, message, icon, 5000)
+
+    def _on_success(self, backup_path):
+        self._finish()
+        self._notify('自动备份完成', f'数据库已自动备份到:\n{backup_path}', QSystemTrayIcon.Information)
+
+    def _on_error(self, error):
+        # 失败也推进到下一个执行时间，避免空闲时反复重试
+        self._finish()
+        logger.error(f"[定时备份] 失败: {error[1]}")
+        self._notify('自动备份失败', f'自动备份失败:\n{error[1]}', QSystemTrayIcon.Warning)
@@ -61,3 +61,6 @@ FINANCE_TAG_COLORS = {
         'danger': ['未开票']
     }
 }
+
+# Charts: disable series animations once a chart holds more points/bars than this
+CHART_ANIMATION_POINT_LIMIT = 120
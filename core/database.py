@@ -1,11 +1,19 @@
 import sqlite3
 import os
+import time
+import threading
 from pathlib import Path
 from core.logger import logger
-from core.utils import get_app_path
 from core.migrations import MigrationManager
+from core.timeline import startup_timeline
+from core.field_crypto import FieldCipher, KEY_FILE, has_ciphertext
 
 class DatabaseManager:
+    # 退出时检查点的时间上限(毫秒)
+    CLOSE_DEADLINE_MS = 2000
+    # WAL 合并完重新开始时截断到此大小，大批量写入后不会一直占用磁盘
+    JOURNAL_SIZE_LIMIT = 64 * 1024 * 1024
+
     def __init__(self, db_name):
         # 使用专用数据库文件
         self.db_name = db_name
@@ -13,19 +21,45 @@ class DatabaseManager:
         logger.info(f"Using dedicated database file: {self.db_name}")
         self.conn = None
         self.cursor = None
+        self._shutdown_hooks = []
+        self._suspended = False
+        self._todo_store = None
+        self._attachment_store = None
+        # 敏感字段加密，主密钥与数据库放在同一目录 (密钥在首次使用时才读取/派生)
+        self.field_cipher = FieldCipher(os.path.join(os.path.dirname(os.path.abspath(db_name)), KEY_FILE),
+                                        has_ciphertext=self._has_field_ciphertext)
         self._ensure_db_file()
+        self._open()
+        if self.field_cipher.key_missing:
+            logger.error(f"字段加密密钥 {self.field_cipher.key_path} 不存在，已加密的字段暂时无法解密")
+
+    def _has_field_ciphertext(self):
+        """数据库中是否已有密文 (密钥缺失时判断能否生成新密钥，用独立连接，可在任意线程调用)"""
+        conn = sqlite3.connect(self.db_name)
+        try:
+            return has_ciphertext(conn)
+        finally:
+            conn.close()
+
+    def _open(self):
+        """打开主连接，建表并执行迁移"""
         try:
             self.conn = self._connect_to_db()
             if self.conn:
                 self.cursor = self.conn.cursor()
+                # 新建的数据库直接启用增量回收空间 (已有数据库由后台维护任务转换)
+                self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
                 self._create_tables()
+                # journal_mode 不能在事务中切换，先提交建表时的默认数据
+                self.conn.commit()
                 # 确保启用外键约束
                 self.conn.execute("PRAGMA foreign_keys = ON")
                 self.conn.execute("PRAGMA journal_mode = WAL")  # 使用WAL日志模式提高性能
                 
                 # Run migrations
                 self.migration_manager = MigrationManager(self)
-                self.migration_manager.run_migrations()
+                with startup_timeline.phase("数据库迁移"):
+                    self.migration_manager.run_migrations()
                 
                 self.conn.commit()
             else:
@@ -35,12 +69,62 @@ class DatabaseManager:
             if self.conn:
                 self.conn.close()
             raise
-            
-    def create_new_connection(self):
-        """Create a new connection for thread safety"""
-        conn = sqlite3.connect(self.db_name)
+
+    def add_shutdown_hook(self, hook):
+        """注册协调关闭时调用的钩子 (停止后台任务并等待其释放数据库连接)"""
+        self._shutdown_hooks.append(hook)
+
+    def shutdown(self):
+        """协调关闭所有连接，用于替换数据库文件前
+
+        先拒绝新的后台连接，再依次调用关闭钩子等待后台任务结束 (后台连接由各任务自行关闭)，
+        最后把 WAL 合并回主文件并关闭主连接。之后需调用 reopen() 恢复。
+
+        Returns:
+            钩子返回 False (后台任务未在时限内结束) 或出错时返回 False，此时不应替换数据库文件
+        """
+        self._suspended = True
+        stopped = True
+        for hook in list(self._shutdown_hooks):
+            try:
+                if hook() is False:
+                    stopped = False
+            except Exception as e:
+                logger.error(f"Database shutdown hook failed: {e}")
+                stopped = False
+        if self.conn:
+            try:
+                self.conn.rollback()
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                logger.error(f"Checkpoint before shutdown failed: {e}")
+            self.conn.close()
+            self.conn = None
+            self.cursor = None
+        logger.info("Database connections shut down")
+        return stopped
+
+    def reopen(self):
+        """shutdown() 之后重新打开数据库 (如恢复备份后)"""
+        self._ensure_db_file()
+        self._open()
+        self._suspended = False
+        if self._todo_store is not None:
+            self._todo_store.invalidate()
+        logger.info(f"Database reopened: {self.db_name}")
+
+    def create_new_connection(self, check_same_thread=True):
+        """Create a new connection for thread safety
+        
+        check_same_thread=False 时连接可以在线程池的不同线程间传递 (调用方需保证同一时刻只有一个线程使用)
+        """
+        if self._suspended:
+            raise sqlite3.OperationalError("数据库正在恢复，暂时无法连接")
+        conn = sqlite3.connect(self.db_name, check_same_thread=check_same_thread)
         conn.execute("PRAGMA foreign_keys = ON")
         conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA journal_size_limit = {self.JOURNAL_SIZE_LIMIT}")
+        self.field_cipher.register(conn)
         return conn
 
     def fetch_all_safe(self, query, params=()):
@@ -337,6 +421,16 @@ class DatabaseManager:
                 )
             """)
 
+            # 附件存储中的文件及引用计数 (见 core/attachment_store.py，计数由触发器维护)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS attachment_blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    size INTEGER,
+                    ref_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
             # 创建payment_schedules表
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS payment_schedules (
@@ -352,6 +446,30 @@ class DatabaseManager:
                     FOREIGN KEY(contract_id) REFERENCES contracts(id) ON DELETE CASCADE
                 )
             """)
+
+            # 待办事项 (status: open/done；position 为手动排序位置；due 为可选截止日期 yyyy-MM-dd)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS todos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    text TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'open',
+                    position INTEGER NOT NULL DEFAULT 0,
+                    due TEXT,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    completed_at TEXT
+                )
+            """)
+
+            # 便签
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS notes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    content TEXT NOT NULL DEFAULT '',
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
             
             # 不再自动添加测试数据
                 
@@ -364,36 +482,57 @@ class DatabaseManager:
             conn = sqlite3.connect(self.db_name)
             conn.execute("PRAGMA foreign_keys = ON")  # 启用外键约束
             conn.execute("PRAGMA synchronous = FULL")  # 确保数据安全写入
+            conn.execute(f"PRAGMA journal_size_limit = {self.JOURNAL_SIZE_LIMIT}")
+            self.field_cipher.register(conn)
             return conn
         except sqlite3.Error as e:
             logger.error(f"Database connection error: {e}")
             return None
             
     def encrypt_data(self, data):
-        """数据加密方法"""
-        # 这里实现实际的加密逻辑
-        return data
+        """加密敏感字段 (见 core/field_crypto.py)"""
+        return self.field_cipher.encrypt(data)
         
     def decrypt_data(self, data):
-        """数据解密方法"""
-        # 这里实现实际的解密逻辑
-        return data
+        """解密敏感字段，明文 (未迁移的旧数据) 原样返回"""
+        return self.field_cipher.decrypt(data)
+
+    def decrypt_many(self, values):
+        """批量解密 (导出用)"""
+        return self.field_cipher.decrypt_many(values)
         
-    def close(self):
-        """关闭数据库连接并确保数据持久化"""
-        if self.conn:
+    def close(self, deadline_ms=None):
+        """关闭数据库连接
+
+        完整性检查在空闲时由后台维护任务执行 (core/maintenance.py)，这里只做有时间上限的检查点：
+        先 PASSIVE 合并不需要等待的部分，再 TRUNCATE 清空 WAL。超过 deadline_ms 时中止检查点，
+        已提交的数据都在 WAL 中，下次打开数据库时继续合并，不会丢失。
+        """
+        if not self.conn:
+            return
+        if deadline_ms is None:
+            deadline_ms = self.CLOSE_DEADLINE_MS
+        start = time.perf_counter()
+        timer = threading.Timer(deadline_ms / 1000, self.conn.interrupt)
+        timer.start()
+        try:
+            self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            remaining = max(0, int(deadline_ms - (time.perf_counter() - start) * 1000))
+            self.conn.execute(f"PRAGMA busy_timeout = {remaining}")
+            busy = self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+            if busy:
+                logger.warning("WAL is in use, checkpoint left for next start")
+        except sqlite3.Error as e:
+            logger.warning(f"Checkpoint on close not finished ({e}), WAL will be merged on next start")
+        finally:
+            timer.cancel()
             try:
-                # 执行完整性检查
-                self.conn.execute("PRAGMA integrity_check")
-                # 确保所有更改写入磁盘
-                self.conn.execute("PRAGMA wal_checkpoint(FULL)")
-                # 关闭连接
                 self.conn.close()
-                logger.info("Database connection safely closed")
-            except Exception as e:
+            except sqlite3.Error as e:
                 logger.error(f"Error closing database connection: {e}")
-                if self.conn:
-                    self.conn.close()
+            self.conn = None
+            self.cursor = None
+        logger.info(f"Database connection closed in {(time.perf_counter() - start) * 1000:.0f}ms")
             
     def __enter__(self):
         return self
@@ -434,86 +573,37 @@ class DatabaseManager:
         
         return stats
 
+    @property
+    def todo_store(self):
+        """首页和待办/便签页面共用的缓存存储 (见 core/todo_store.py)"""
+        if self._todo_store is None:
+            from core.todo_store import TodoStore
+            self._todo_store = TodoStore(self)
+        return self._todo_store
+
     def get_todos(self):
         """获取待办事项列表"""
-        import json
-        
-        todo_file = get_app_path('todo_list.json')
-        if not os.path.exists(todo_file):
-            return []
-            
-        try:
-            with open(todo_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Failed to read todos: {e}")
-            return []
+        return self.todo_store.todos()
 
-    def add_todo(self, text):
+    def add_todo(self, text, due=None):
         """添加待办事项"""
-        todos = self.get_todos()
-        new_id = max([t['id'] for t in todos], default=0) + 1
-        todos.append({
-            'id': new_id,
-            'text': text,
-            'completed': False
-        })
-        self._save_todos(todos)
+        return self.todo_store.add(text, due)
 
     def update_todo_status(self, todo_id, completed):
         """更新待办事项状态"""
-        todos = self.get_todos()
-        for todo in todos:
-            if todo['id'] == todo_id:
-                todo['completed'] = completed
-                break
-        self._save_todos(todos)
+        self.todo_store.set_completed(todo_id, completed)
 
     def delete_todo(self, todo_id):
         """删除指定ID的待办事项"""
-        todos = self.get_todos()
-        # 保留不匹配ID的待办事项
-        updated_todos = [todo for todo in todos if todo['id'] != todo_id]
-        if len(updated_todos) != len(todos):
-            self._save_todos(updated_todos)
-            return True
-        return False
-
-    def _save_todos(self, todos):
-        """保存待办事项到文件"""
-        import json
-        
-        todo_file = get_app_path('todo_list.json')
-        try:
-            with open(todo_file, 'w', encoding='utf-8') as f:
-                json.dump(todos, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save todos: {e}")
+        return self.todo_store.delete([todo_id]) > 0
 
     def get_notes(self):
         """获取便签内容"""
-        import json
-        
-        notes_file = get_app_path('notes.json')
-        if not os.path.exists(notes_file):
-            return ""
-            
-        try:
-            with open(notes_file, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            logger.error(f"Failed to read notes: {e}")
-            return ""
+        return self.todo_store.notes()
 
     def save_notes(self, notes):
         """保存便签内容"""
-        
-        notes_file = get_app_path('notes.json')
-        try:
-            with open(notes_file, 'w', encoding='utf-8') as f:
-                f.write(notes)
-        except Exception as e:
-            logger.error(f"Failed to save notes: {e}")
+        self.todo_store.save_notes(notes)
         
     def execute_query(self, query, params=None, fetch=True):
         """执行SQL查询的通用方法
@@ -582,6 +672,9 @@ class DatabaseManager:
             query = f"DELETE FROM {table} WHERE id = ?"
             self.execute_query(query, (record_id,), fetch=False)
             self.conn.commit()
+            if table == 'contracts':
+                # 级联删除的附件已由触发器减少引用计数
+                self.collect_attachment_blobs()
             return True
         except Exception as e:
             logger.error(f"Permanent delete failed ({table}, {record_id}): {e}")
@@ -682,6 +775,23 @@ class DatabaseManager:
             logger.error(f"Failed to add contract: {e}")
             return False
 
+    @property
+    def attachment_store(self):
+        """按内容寻址的附件存储，位于数据库所在目录的 attachments 下"""
+        if self._attachment_store is None:
+            from core.attachment_store import AttachmentStore
+            self._attachment_store = AttachmentStore(
+                os.path.join(os.path.dirname(os.path.abspath(self.db_name)), 'attachments'))
+        return self._attachment_store
+
+    def collect_attachment_blobs(self):
+        """删除不再被任何附件引用的存储文件"""
+        try:
+            return self.attachment_store.gc(self.conn)
+        except Exception as e:
+            logger.error(f"Failed to collect attachment blobs: {e}")
+            return 0
+
     def get_contract_attachments(self, contract_id):
         """获取合同附件"""
         try:
@@ -710,6 +820,7 @@ class DatabaseManager:
             query = "DELETE FROM contract_attachments WHERE id = ?"
             self.execute_query(query, (attachment_id,), fetch=False)
             self.conn.commit()
+            self.collect_attachment_blobs()
             return True
         except Exception as e:
             logger.error(f"Failed to delete contract attachment: {e}")
@@ -1015,6 +1126,32 @@ class DatabaseManager:
             logger.error(f"Error getting contract expiration reminders: {e}")
             return []
 
+    def get_pending_receivables(self, until_date):
+        """获取截至指定日期的待收款 (包含已逾期)
+        参数:
+            until_date: 截止日期字符串(格式:YYYY-MM-DD)
+        返回:
+            待收款列表 (id, company_name, pending_amount, pending_date)，按日期升序
+        """
+        try:
+            if not hasattr(self, 'cursor'):
+                self.cursor = self.conn.cursor()
+                
+            query = """
+                SELECT id, company_name, pending_amount, pending_date
+                FROM finance
+                WHERE pending_amount > 0
+                AND pending_date IS NOT NULL
+                AND pending_date != ''
+                AND pending_date <= ?
+                ORDER BY pending_date ASC
+            """
+            self.cursor.execute(query, (until_date,))
+            return self.cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error getting pending receivables: {e}")
+            return []
+
     def get_business_distribution(self):
         """获取业务分布数据 (用于饼图)
         返回:
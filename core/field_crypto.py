@@ -0,0 +1,223 @@
+"""字段级加密 (AES-256-GCM)
+
+敏感字段 (如 business.company_password) 在数据库中保存为 "enc1:" + base64(nonce | tag | 密文)。
+主密钥是数据目录下随机生成的 field.key，会话密钥在首次使用时由 HKDF-SHA256 派生一次并缓存。
+数据库文件或备份包单独泄露时无法读出明文；迁移到其它电脑时需要同时复制 field.key。
+
+列表只读取密文，显示详情或导出时才解密；解密结果按密文缓存在有上限的 LRU 中。
+没有前缀的旧数据按明文处理，由后台维护任务 (encrypt_pending) 分块加密。
+
+密钥文件丢失而数据库中已有密文时不会生成新密钥 (否则旧数据永远无法解密)：
+加密抛出 MissingKeyError，解密原样返回密文，直到从设置页导入原来的密钥 (import_key)。
+"""
+import os
+import base64
+import threading
+from collections import OrderedDict
+from Crypto.Cipher import AES
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+from core.logger import logger
+
+PREFIX = 'enc1:'
+KEY_FILE = 'field.key'
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# 需要加密的字段: 表 -> 列
+ENCRYPTED_FIELDS = {'business': ('company_password',)}
+
+
+class MissingKeyError(ValueError):
+    """密钥文件不存在，但数据库中已有加密数据"""
+
+
+def has_ciphertext(conn):
+    """数据库中是否已有加密的字段"""
+    for table, columns in ENCRYPTED_FIELDS.items():
+        for column in columns:
+            if conn.execute(f"SELECT 1 FROM {table} WHERE substr({column}, 1, {len(PREFIX)}) = ? LIMIT 1",
+                            (PREFIX,)).fetchone():
+                return True
+    return False
+
+
+class FieldCipher:
+    """字段加解密 (线程安全)
+
+    Args:
+        key_path: 主密钥文件，不存在时首次加密前自动生成
+        cache_size: 明文缓存的条数上限
+        has_ciphertext: 无参数函数，返回数据库中是否已有密文；密钥文件不存在且返回 True 时
+            不生成新密钥，而是抛出 MissingKeyError
+    """
+
+    def __init__(self, key_path, cache_size=512, has_ciphertext=None):
+        self.key_path = key_path
+        self.cache_size = cache_size
+        self.has_ciphertext = has_ciphertext
+        self._key = None
+        self._key_error = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    @property
+    def key(self):
+        """会话密钥 (每个会话只派生一次；密钥缺失的结果同样记住，导入密钥后重置)"""
+        if self._key is None:
+            with self._lock:
+                if self._key_error is not None:
+                    raise self._key_error
+                if self._key is None:
+                    try:
+                        master = self._master_key()
+                    except MissingKeyError as e:
+                        logger.error(str(e))
+                        self._key_error = e
+                        raise
+                    self._key = HKDF(master, 32, b'CustomerManagement/field', SHA256,
+                                     context=b'aes-256-gcm v1')
+        return self._key
+
+    @property
+    def key_missing(self):
+        """密钥文件不存在且数据库中已有密文"""
+        return not os.path.exists(self.key_path) and bool(self.has_ciphertext and self.has_ciphertext())
+
+    def _master_key(self):
+        if os.path.exists(self.key_path):
+            return self._read_key(self.key_path)
+        if self.has_ciphertext and self.has_ciphertext():
+            raise MissingKeyError(f"找不到字段加密密钥 {self.key_path}，但数据库中已有加密数据；"
+                                  f"请在设置页导入原来的 field.key")
+        master = os.urandom(32)
+        self._write_key(master)
+        logger.info(f"已生成字段加密密钥: {self.key_path}")
+        return master
+
+    @staticmethod
+    def _read_key(path):
+        with open(path, 'rb') as f:
+            master = f.read()
+        if len(master) != 32:
+            raise ValueError(f"密钥文件无效: {path}")
+        return master
+
+    def _write_key(self, master):
+        os.makedirs(os.path.dirname(self.key_path) or '.', exist_ok=True)
+        temp_path = self.key_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(master)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.key_path)
+
+    def export_key(self, path):
+        """把主密钥复制到 path (没有密钥时先生成)"""
+        self.key  # 确保密钥文件存在
+        with open(self.key_path, 'rb') as f:
+            master = f.read()
+        with open(path, 'wb') as f:
+            f.write(master)
+        logger.info(f"已导出字段加密密钥: {path}")
+
+    def import_key(self, path):
+        """用 path 中的密钥替换当前密钥，并丢弃已派生的会话密钥和明文缓存"""
+        master = self._read_key(path)
+        with self._lock:
+            self._write_key(master)
+            self._key = None
+            self._key_error = None
+            self._cache.clear()
+        logger.info(f"已导入字段加密密钥: {path}")
+
+    @staticmethod
+    def is_encrypted(value):
+        return isinstance(value, str) and value.startswith(PREFIX)
+
+    def encrypt(self, value):
+        """加密；空值和已加密的值原样返回"""
+        if value is None or value == '' or self.is_encrypted(value):
+            return value
+        nonce = os.urandom(NONCE_SIZE)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        data, tag = cipher.encrypt_and_digest(str(value).encode('utf-8'))
+        return PREFIX + base64.b64encode(nonce + tag + data).decode('ascii')
+
+    def _decrypt(self, value):
+        """解密单个值；失败时记录日志并返回原密文 (再次保存时原样写回，不会丢失数据)"""
+        try:
+            raw = base64.b64decode(value[len(PREFIX):], validate=True)
+            cipher = AES.new(self.key, AES.MODE_GCM, nonce=raw[:NONCE_SIZE])
+            data = cipher.decrypt_and_verify(raw[NONCE_SIZE + TAG_SIZE:], raw[NONCE_SIZE:NONCE_SIZE + TAG_SIZE])
+            return data.decode('utf-8')
+        except MissingKeyError:
+            return value
+        except ValueError as e:
+            logger.warning(f"字段解密失败，密钥不匹配或数据已损坏: {e}")
+            return value
+
+    def decrypt(self, value):
+        """解密；明文 (旧数据) 原样返回，结果按密文缓存"""
+        if not self.is_encrypted(value):
+            return value
+        with self._lock:
+            plain = self._cache.get(value)
+            if plain is not None:
+                self._cache.move_to_end(value)
+                return plain
+        plain = self._decrypt(value)
+        if plain is value:
+            return plain
+        with self._lock:
+            self._cache[value] = plain
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return plain
+
+    def decrypt_many(self, values):
+        """批量解密 (导出用)：不写入缓存，避免挤掉界面正在显示的值"""
+        result = []
+        for value in values:
+            if not self.is_encrypted(value):
+                result.append(value)
+                continue
+            with self._lock:
+                plain = self._cache.get(value)
+            result.append(plain if plain is not None else self._decrypt(value))
+        return result
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def register(self, conn):
+        """在连接上注册 SQL 函数 field_encrypt(x) / field_decrypt(x)，供导入比较和写入使用"""
+        conn.create_function('field_encrypt', 1, self.encrypt)
+        conn.create_function('field_decrypt', 1, self.decrypt, deterministic=True)
+
+
+def encrypt_pending(conn, cipher, chunk_size=500):
+    """把一块尚未加密的敏感字段加密，返回本次处理的行数 (0 表示已全部加密)
+
+    只更新仍为原值的行，与界面上同时进行的编辑不会互相覆盖。
+    """
+    done = 0
+    for table, columns in ENCRYPTED_FIELDS.items():
+        for column in columns:
+            rows = conn.execute(
+                f"SELECT id, {column} FROM {table} "
+                f"WHERE {column} IS NOT NULL AND {column} != '' AND substr({column}, 1, {len(PREFIX)}) != ? "
+                f"LIMIT ?",
+                (PREFIX, chunk_size - done)
+            ).fetchall()
+            if rows:
+                with conn:
+                    conn.executemany(
+                        f"UPDATE {table} SET {column} = ? WHERE id = ? AND {column} = ?",
+                        [(cipher.encrypt(value), row_id, value) for row_id, value in rows]
+                    )
+                done += len(rows)
+            if done >= chunk_size:
+                return done
+    return done
@@ -0,0 +1,53 @@
+from datetime import datetime
+from PyQt5.QtCore import QObject, QThreadPool, QEvent
+from PyQt5.QtWidgets import QApplication
+
+
+class IdleMonitor(QObject):
+    """判断程序是否空闲，供定时备份、数据库维护等后台任务共用
+
+    空闲指: 用户一段时间未操作、没有模态对话框或弹出菜单、没有后台任务和列表加载、
+    主连接上没有未提交的写入。
+    """
+
+    USER_INPUT_EVENTS = (
+        QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.Wheel,
+    )
+    LIST_MODULES = ('customer', 'business', 'finance', 'contract')
+
+    def __init__(self, main_window):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self._last_input = datetime.now()
+        QApplication.instance().installEventFilter(self)
+
+    def stop(self):
+        app = QApplication.instance()
+        if app:
+            app.removeEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        # 记录最后一次用户操作时间 (只读取事件类型，不拦截事件)
+        if event.type() in self.USER_INPUT_EVENTS:
+            self._last_input = datetime.now()
+        return False
+
+    def seconds_since_input(self):
+        return (datetime.now() - self._last_input).total_seconds()
+
+    def busy_reason(self, idle_seconds=60):
+        """程序正忙时返回原因，空闲时返回 None"""
+        if self.seconds_since_input() < idle_seconds:
+            return "用户正在操作"
+        if QApplication.activeModalWidget() or QApplication.activePopupWidget():
+            return "有打开的对话框"
+        if QThreadPool.globalInstance().activeThreadCount() > 0:
+            return "有后台任务在运行"
+        for key in self.LIST_MODULES:
+            pool = getattr(getattr(self.main_window, key, None), 'threadpool', None)
+            if pool is not None and pool.activeThreadCount() > 0:
+                return "有列表在加载"
+        db_manager = getattr(self.main_window.app, 'db_manager', None)
+        if db_manager and db_manager.conn and db_manager.conn.in_transaction:
+            return "有未提交的数据库写入"
+        return None
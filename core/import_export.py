@@ -1,15 +1,29 @@
 import os
-from openpyxl import Workbook, load_workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, Alignment
-from typing import List, Dict, Optional, Set
+import csv
+from itertools import chain, islice
+from typing import List, Dict, Optional, Set, Iterable, Sequence, Callable
 from datetime import datetime
 from core.logger import logger
+from core.lazy_imports import openpyxl, openpyxl_styles
 
 class ImportExportError(Exception):
     """Base exception for import/export operations"""
     pass
 
+# 文本格式扩展名 -> 分隔符
+DELIMITED_EXTENSIONS = {'.csv': ',', '.tsv': '\t'}
+
+# 导入/导出文件对话框的过滤器 (默认 Excel)
+FILE_DIALOG_FILTER = 'Excel文件 (*.xlsx);;CSV文件 (*.csv);;TSV文件 (*.tsv)'
+
+# CSV 使用带 BOM 的 UTF-8，Excel 双击打开时中文不乱码
+CSV_ENCODING = 'utf-8-sig'
+
+
+def delimiter_for(file_path: str) -> Optional[str]:
+    """按扩展名返回分隔符，非 CSV/TSV 返回 None"""
+    return DELIMITED_EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+
 class DuplicateDataHandler:
     """Mixin class for handling duplicate data"""
     
@@ -41,6 +55,10 @@ class BaseImporterExporter(DuplicateDataHandler):
         self._required_columns: List[str] = []
         self._column_mapping: Dict[str, str] = {}
     
+    # 计算列宽时采样的最大行数 (写入模式下列宽必须在写第一行前确定)
+    WIDTH_SAMPLE_ROWS = 200
+    MAX_COLUMN_WIDTH = 80
+    
     def export_to_excel(self, 
                        data: List[Dict[str, str]], 
                        file_path: str, 
@@ -55,84 +73,130 @@ class BaseImporterExporter(DuplicateDataHandler):
             sheet_name: Name of the worksheet
             headers: Optional list of column headers to use
         """
-        logger.info(f"\n=== 开始Excel导出 ===")
-        logger.info(f"目标文件: {file_path}")
-        logger.info(f"数据记录数: {len(data)}")
-        
         if not data:
             raise ImportExportError("No data to export")
             
-        # 打印前3条数据用于调试
-        logger.debug("\n前3条数据内容:")
-        for i, row in enumerate(data[:3], 1):
-            logger.debug(f"记录 {i}: {row}")
-            
-        wb = Workbook()
-        ws = wb.active
-        ws.title = sheet_name
-        
         # Use provided headers or infer from first data row
         headers = headers or list(data[0].keys())
-        logger.debug(f"\n使用的表头: {headers}")
+        self.export_rows_to_excel(
+            (tuple(row.get(header, '') for header in headers) for row in data),
+            file_path,
+            headers,
+            sheet_name=sheet_name
+        )
+    
+    def export_rows_to_excel(self,
+                             rows: Iterable[Sequence],
+                             file_path: str,
+                             headers: List[str],
+                             sheet_name: str = 'Data',
+                             progress_callback: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Stream rows to an Excel file using openpyxl write-only mode
         
-        # Write headers
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center')
+        行数据逐行写入磁盘，内存占用与行数无关，可直接传入数据库游标或生成器。
+        列宽根据表头和前 WIDTH_SAMPLE_ROWS 行估算。
         
-        # Write data with detailed logging
-        logger.debug("\n写入数据过程:")
-        for row_num, row in enumerate(data, 2):
-            if row_num <= 4:  # 打印前3行写入过程
-                logger.debug(f"正在写入行 {row_num}:")
-            for col_num, header in enumerate(headers, 1):
-                value = row.get(header, '')
-                if row_num <= 4:  # 打印前3行每个单元格的值
-                    logger.debug(f"  列 {col_num}({header}): {value}")
-                ws.cell(row=row_num, column=col_num, value=value)
+        Args:
+            rows: Iterable of row tuples, values in the same order as headers
+            file_path: Path to save the Excel file
+            headers: Column headers
+            sheet_name: Name of the worksheet
+            progress_callback: Optional callable receiving the number of rows written
+            
+        Returns:
+            Number of data rows written
+        """
+        logger.info(f"开始Excel导出: {file_path}")
         
-        # Auto-adjust column widths
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[column].width = adjusted_width
+        styles = openpyxl_styles()
+        xl = openpyxl()
+        wb = xl.Workbook(write_only=True)
+        ws = wb.create_sheet(title=sheet_name)
         
-        # Save the workbook
+        # 采样前若干行计算列宽
+        rows = iter(rows)
+        sample = list(islice(rows, self.WIDTH_SAMPLE_ROWS))
+        widths = [len(str(header)) for header in headers]
+        for row in sample:
+            for col, value in enumerate(row[:len(widths)]):
+                length = len(str(value)) if value is not None else 0
+                if length > widths[col]:
+                    widths[col] = length
+        for col, width in enumerate(widths, 1):
+            column = xl.utils.get_column_letter(col)
+            ws.column_dimensions[column].width = min((width + 2) * 1.2, self.MAX_COLUMN_WIDTH)
+        
+        # 表头
+        header_cells = []
+        for header in headers:
+            cell = xl.cell.WriteOnlyCell(ws, value=header)
+            cell.font = styles.Font(bold=True)
+            cell.alignment = styles.Alignment(horizontal='center')
+            header_cells.append(cell)
+        ws.append(header_cells)
+        
+        count = 0
         try:
-            logger.info(f"正在保存文件到: {file_path}")
+            for row in chain(sample, rows):
+                ws.append(['' if value is None else value for value in row])
+                count += 1
+                if progress_callback and count % 1000 == 0:
+                    progress_callback(count)
             
             wb.save(file_path)
-            logger.info("文件保存成功")
-            
-            # 验证文件是否生成
-            if not os.path.exists(file_path):
-                raise ImportExportError("文件保存失败，未找到生成的文件")
-                
-            # 验证文件大小
-            file_size = os.path.getsize(file_path)
-            logger.info(f"文件大小: {file_size} 字节")
-            
-            # 重新打开验证内容
-            verify_wb = load_workbook(file_path)
-            verify_sheet = verify_wb.active
-            logger.info(f"工作表行数: {verify_sheet.max_row}")
-            logger.info(f"工作表列数: {verify_sheet.max_column}")
-            
-            # 验证数据行数
-            if verify_sheet.max_row < 2:  # 只有表头
-                logger.warning("警告: 导出的文件似乎为空(只有表头)")
-                    
         except Exception as e:
             logger.error(f"文件保存失败: {str(e)}")
             raise ImportExportError(f"Failed to save Excel file: {str(e)}")
+        
+        if not os.path.exists(file_path):
+            raise ImportExportError("文件保存失败，未找到生成的文件")
+        if progress_callback:
+            progress_callback(count)
+        logger.info(f"Excel导出完成: {count} 行, {os.path.getsize(file_path)} 字节")
+        return count
+    
+    def export_rows_to_csv(self,
+                           rows: Iterable[Sequence],
+                           file_path: str,
+                           headers: List[str],
+                           progress_callback: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Stream rows to a CSV/TSV file (delimiter chosen by extension, UTF-8 with BOM)
+        
+        Returns:
+            Number of data rows written
+        """
+        logger.info(f"开始CSV导出: {file_path}")
+        count = 0
+        try:
+            with open(file_path, 'w', encoding=CSV_ENCODING, newline='') as f:
+                writer = csv.writer(f, delimiter=delimiter_for(file_path) or ',')
+                writer.writerow(headers)
+                for row in rows:
+                    writer.writerow(['' if value is None else value for value in row])
+                    count += 1
+                    if progress_callback and count % 10000 == 0:
+                        progress_callback(count)
+        except OSError as e:
+            logger.error(f"文件保存失败: {str(e)}")
+            raise ImportExportError(f"Failed to save CSV file: {str(e)}")
+        if progress_callback:
+            progress_callback(count)
+        logger.info(f"CSV导出完成: {count} 行, {os.path.getsize(file_path)} 字节")
+        return count
+    
+    def export_rows(self,
+                    rows: Iterable[Sequence],
+                    file_path: str,
+                    headers: List[str],
+                    sheet_name: str = 'Data',
+                    progress_callback: Optional[Callable[[int], None]] = None) -> int:
+        """按扩展名选择导出格式: .csv/.tsv 写文本文件，其余写 Excel"""
+        if delimiter_for(file_path):
+            return self.export_rows_to_csv(rows, file_path, headers, progress_callback=progress_callback)
+        return self.export_rows_to_excel(rows, file_path, headers, sheet_name=sheet_name,
+                                         progress_callback=progress_callback)
     
     def import_from_excel(self, 
                          file_path: str, 
@@ -155,7 +219,7 @@ class BaseImporterExporter(DuplicateDataHandler):
             raise ImportExportError("File not found")
             
         try:
-            wb = load_workbook(filename=file_path, read_only=True)
+            wb = openpyxl().load_workbook(filename=file_path, read_only=True)
             ws = wb[sheet_name]
         except Exception as e:
             raise ImportExportError(f"Failed to load Excel file: {str(e)}")
@@ -0,0 +1,632 @@
+"""分块流式导入管道
+
+按块读取 Excel/CSV/TSV 行 → 字段映射 → 规范化/校验 → 写入数据库，在后台线程中运行
+(见 dialogs/import_progress.py)。两种模式：
+- ImportJob: 每块一个事务直接写入目标表，支持取消和断点续导：
+  每提交一块就通过 checkpoint_callback 记录下一行的行号，下次可从该行继续。
+- StagingImportJob: 先全部载入 TEMP 暂存表，用索引连接在数据库内区分
+  新记录/重复/冲突，预览统计后再一次性提交 (可选更新冲突记录)。
+"""
+import os
+import csv
+import threading
+from itertools import islice
+from datetime import datetime, date
+from typing import Callable, Dict, List, Optional, Tuple
+from core.logger import logger
+from core.lazy_imports import openpyxl
+from core.import_export import ImportExportError, CSV_ENCODING, delimiter_for
+
+
+class RowError(ValueError):
+    """单行数据校验失败 (记录错误后跳过该行)"""
+    pass
+
+
+def text(value) -> str:
+    """单元格值转为去除首尾空白的字符串"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def date_text(value) -> str:
+    """日期单元格规范为 YYYY-MM-DD"""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    value = text(value)
+    if not value:
+        return ''
+    for fmt in ('%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise RowError(f"日期格式无效: {value}")
+
+
+def number(value, field: str, default: float = 0.0) -> float:
+    """数值单元格转为 float"""
+    if value is None or value == '':
+        return default
+    try:
+        return float(str(value).replace(',', '').replace('¥', '').strip())
+    except ValueError:
+        raise RowError(f"{field}不是有效数字: {value}")
+
+
+def flag(value) -> int:
+    """是/否 单元格转为 1/0"""
+    return 1 if text(value).lower() in ('是', '1', 'true', 'y', 'yes') or value is True else 0
+
+
+class ImportSpec:
+    """一种数据的导入规则
+
+    Args:
+        table: 目标表
+        sheet_name: 工作表名称
+        required_columns: 文件中必须存在的表头
+        column_mapping: 表头 -> 字段名
+        insert_columns: 写入的数据库列 (与 transform 返回的元组顺序一致)
+        key_columns: 去重键 (数据库列名)
+        transform: 行字典 -> 写入元组，校验失败抛出 RowError
+        preserve_columns: 比较冲突和更新已有记录时忽略的列 (如创建时间)
+        encrypted_columns: 加密保存的列 (见 core/field_crypto.py)：写入时用 SQL 函数 field_encrypt
+            加密，比较时用 field_decrypt 解密已有记录 (连接由 DatabaseManager 创建时已注册这两个函数)
+    """
+
+    def __init__(self, table: str, sheet_name: str, required_columns: List[str],
+                 column_mapping: Dict[str, str], insert_columns: List[str],
+                 key_columns: List[str], transform: Callable[[Dict], Tuple],
+                 preserve_columns: Optional[List[str]] = None,
+                 encrypted_columns: Optional[List[str]] = None):
+        self.table = table
+        self.sheet_name = sheet_name
+        self.required_columns = required_columns
+        self.column_mapping = column_mapping
+        self.insert_columns = insert_columns
+        self.key_columns = key_columns
+        self.transform = transform
+        self.preserve_columns = preserve_columns or []
+        self.encrypted_columns = encrypted_columns or []
+
+    @property
+    def compare_columns(self) -> List[str]:
+        """键相同时用于判断是否冲突 (以及更新时写入) 的列"""
+        return [col for col in self.insert_columns
+                if col not in self.key_columns and col not in self.preserve_columns]
+
+    def stored(self, col: str, expr: str) -> str:
+        """把明文表达式转换为写入 col 列的表达式"""
+        return f"field_encrypt({expr})" if col in self.encrypted_columns else expr
+
+    def plain(self, col: str, expr: str) -> str:
+        """把读取 col 列的表达式转换为明文"""
+        return f"field_decrypt({expr})" if col in self.encrypted_columns else expr
+
+    def incoming(self, col: str, staged: str, existing: str) -> str:
+        """更新已有记录时 col 列的明文新值：文件中为空 (或没有这一列) 时保留已有的值"""
+        return f"COALESCE(NULLIF({staged}, ''), {self.plain(col, existing)})"
+
+    def insert_sql(self) -> str:
+        """插入语句：去重键已存在时不插入 (依赖同一事务内可见，文件内重复也会被跳过)"""
+        columns = ', '.join(self.insert_columns)
+        placeholders = ', '.join(self.stored(col, '?') for col in self.insert_columns)
+        key_match = ' AND '.join(f"{col} IS ?" for col in self.key_columns)
+        return (
+            f"INSERT OR IGNORE INTO {self.table} ({columns}) "
+            f"SELECT {placeholders} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {self.table} WHERE {key_match})"
+        )
+
+    def key_of(self, record: Tuple) -> Tuple:
+        return tuple(record[self.insert_columns.index(col)] for col in self.key_columns)
+
+
+class ImportResult:
+    """导入结果统计"""
+
+    MAX_ERRORS = 1000  # 最多保留的行错误明细
+
+    def __init__(self):
+        self.total = 0          # 文件数据行数(估计值)
+        self.processed = 0      # 已处理行数
+        self.inserted = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []        # [(行号, 错误信息)]
+        self.next_row = None    # 下一次续导的起始行号
+        self.cancelled = False
+        # 暂存表模式的预览统计
+        self.new = 0            # 目标表中不存在的记录
+        self.conflicts = 0      # 键已存在但内容不同
+        self.file_duplicates = 0  # 文件内键重复(只保留第一条)
+        self.updated = 0        # 更新的冲突记录数
+
+    def add_error(self, row_no: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append((row_no, message))
+
+    def summary(self) -> str:
+        lines = [
+            f'成功导入 {self.inserted} 条记录',
+            f'跳过 {self.duplicates} 条重复记录',
+            f'{self.error_count} 条记录有错误',
+            f'共处理 {self.processed} 条记录',
+        ]
+        if self.updated:
+            lines.insert(1, f'更新 {self.updated} 条已有记录')
+        if self.cancelled:
+            lines.insert(0, '导入已取消 (已提交的数据已保存，可稍后继续)')
+        return '\n'.join(lines)
+
+    def dry_run_summary(self) -> str:
+        """暂存表模式：提交前的分类统计"""
+        return '\n'.join([
+            f'共读取 {self.processed} 行',
+            f'新记录: {self.new} 条',
+            f'与已有记录完全相同: {self.duplicates} 条',
+            f'与已有记录冲突(内容不同): {self.conflicts} 条',
+            f'文件内重复: {self.file_duplicates} 条',
+            f'数据错误: {self.error_count} 条',
+        ])
+
+
+class ImportJob:
+    """分块导入任务，run() 在工作线程中执行
+
+    Args:
+        db_manager: DatabaseManager，工作线程中通过 create_new_connection 获取连接
+        spec: ImportSpec
+        file_path: Excel/CSV/TSV 文件路径
+        start_row: 起始数据行号(表头为第 1 行，默认从第 2 行开始)，用于断点续导
+        chunk_size: 每个事务写入的行数
+    """
+
+    def __init__(self, db_manager, spec: ImportSpec, file_path: str,
+                 start_row: int = 2, chunk_size: int = 1000):
+        self.db_manager = db_manager
+        self.spec = spec
+        self.file_path = file_path
+        self.start_row = max(2, start_row)
+        self.chunk_size = max(1, chunk_size)
+        self.result = ImportResult()
+        self.progress_callback: Optional[Callable[[int], None]] = None
+        self.checkpoint_callback: Optional[Callable[[int], None]] = None
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求取消 (当前块提交后停止)"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def file_signature(self) -> str:
+        """文件标识 (路径+大小+修改时间)，用于判断能否续导"""
+        stat = os.stat(self.file_path)
+        return f"{os.path.abspath(self.file_path)}|{stat.st_size}|{int(stat.st_mtime)}"
+
+    def iter_rows(self):
+        """逐行读取 (行号, 映射后的行字典)，按扩展名选择 Excel 或 CSV/TSV"""
+        if not os.path.exists(self.file_path):
+            raise ImportExportError("File not found")
+        delimiter = delimiter_for(self.file_path)
+        if delimiter:
+            rows = self._read_delimited(delimiter)
+        else:
+            rows = self._read_excel()
+        try:
+            headers = [text(h) for h in next(rows, ())]
+            missing = [col for col in self.spec.required_columns if col not in headers]
+            if missing:
+                raise ImportExportError(f"Missing required columns: {', '.join(missing)}")
+
+            fields = [self.spec.column_mapping.get(h) for h in headers]
+            # 读取器已跳到 start_row
+            for row_no, row in enumerate(rows, self.start_row):
+                yield row_no, {field: value for field, value in zip(fields, row) if field}
+        finally:
+            rows.close()
+
+    def _read_excel(self):
+        """Excel 行迭代器 (第一行为表头)"""
+        try:
+            wb = openpyxl().load_workbook(filename=self.file_path, read_only=True, data_only=True)
+            ws = wb[self.spec.sheet_name]
+        except Exception as e:
+            raise ImportExportError(f"Failed to load Excel file: {str(e)}")
+        try:
+            self.result.total = max(0, (ws.max_row or 0) - 1)
+            rows = ws.iter_rows(values_only=True)
+            yield next(rows, ())
+            # 续导时直接跳到起始行，不逐行读取前面的数据
+            yield from ws.iter_rows(min_row=self.start_row, values_only=True)
+        finally:
+            wb.close()
+
+    def _read_delimited(self, delimiter):
+        """CSV/TSV 行迭代器 (第一行为表头)，优先 UTF-8(BOM)，否则按 GB18030 读取"""
+        with open(self.file_path, 'rb') as f:
+            sample = f.read(65536)
+            line_count = sample.count(b'\n')
+            for block in iter(lambda: f.read(1 << 20), b''):
+                line_count += block.count(b'\n')
+        self.result.total = max(0, line_count - 1)
+        try:
+            sample.decode(CSV_ENCODING)
+            encoding = CSV_ENCODING
+        except UnicodeDecodeError as e:
+            # 采样可能截断在多字节字符中间
+            encoding = CSV_ENCODING if e.start >= len(sample) - 4 else 'gb18030'
+
+        with open(self.file_path, 'r', encoding=encoding, newline='') as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            yield next(reader, [])
+            # 续导时跳过已处理的行 (文本格式只能顺序读取)
+            for _ in islice(reader, self.start_row - 2):
+                pass
+            yield from reader
+
+    def run(self) -> ImportResult:
+        result = self.result
+        conn = self.db_manager.create_new_connection()
+        sql = self.spec.insert_sql()
+        chunk = []
+        try:
+            for row_no, row in self.iter_rows():
+                if self.cancelled:
+                    # 提交已处理的部分，下次从当前行继续
+                    self._commit_chunk(conn, sql, chunk, row_no)
+                    result.cancelled = True
+                    break
+                result.processed += 1
+                if not any(v not in (None, '') for v in row.values()):
+                    continue  # 空行
+                try:
+                    record = self.spec.transform(row)
+                except RowError as e:
+                    result.add_error(row_no, str(e))
+                    continue
+                chunk.append(record + self.spec.key_of(record))
+
+                if len(chunk) >= self.chunk_size:
+                    self._commit_chunk(conn, sql, chunk, row_no + 1)
+                    chunk = []
+            else:
+                self._commit_chunk(conn, sql, chunk, None)
+        finally:
+            conn.close()
+
+        if result.errors:
+            logger.warning(f"导入 {self.spec.table} 有 {result.error_count} 行错误，例如: {result.errors[:5]}")
+        logger.info(f"导入 {self.spec.table} 结束: 插入 {result.inserted}, 重复 {result.duplicates}, "
+                    f"错误 {result.error_count}, 处理 {result.processed}, 取消={result.cancelled}")
+        return result
+
+    def _commit_chunk(self, conn, sql, chunk, next_row):
+        """在独立事务中写入一块数据并记录续导位置 (next_row 为 None 表示已全部完成)"""
+        if chunk:
+            with conn:
+                cursor = conn.executemany(sql, chunk)
+                inserted = cursor.rowcount
+            self.result.inserted += inserted
+            self.result.duplicates += len(chunk) - inserted
+        self.result.next_row = next_row
+        if self.checkpoint_callback:
+            self.checkpoint_callback(next_row)
+        if self.progress_callback and self.result.total:
+            done_rows = (next_row - 2) if next_row else self.result.total
+            self.progress_callback(min(100, int(done_rows * 100 / self.result.total)))
+
+
+class StagingImportJob(ImportJob):
+    """暂存表导入
+
+    run() 把全部有效行分块载入 TEMP 表并分类统计 (预览，不修改目标表)；
+    之后调用 apply() 提交，或 discard() 放弃。run() 和 apply() 可以在线程池的
+    不同线程中执行，但不能同时执行。
+    """
+
+    STAGING_TABLE = "import_staging"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._conn = None
+
+    def _key_match(self, left: str, right: str) -> str:
+        return ' AND '.join(f"{left}.{col} IS {right}.{col}" for col in self.spec.key_columns)
+
+    def run(self) -> ImportResult:
+        spec = self.spec
+        result = self.result
+        staging = f"temp.{self.STAGING_TABLE}"
+        columns = ', '.join(spec.insert_columns)
+        keys = ', '.join(spec.key_columns)
+
+        self._conn = self.db_manager.create_new_connection(check_same_thread=False)
+        conn = self._conn
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {staging}")
+            conn.execute(f"CREATE TEMP TABLE {self.STAGING_TABLE} (row_no INTEGER PRIMARY KEY, {columns})")
+            insert_sql = (f"INSERT INTO {staging} (row_no, {columns}) "
+                          f"VALUES (?, {', '.join('?' for _ in spec.insert_columns)})")
+
+            # 1. 分块载入暂存表
+            chunk = []
+            for row_no, row in self.iter_rows():
+                if self.cancelled:
+                    result.cancelled = True
+                    break
+                result.processed += 1
+                if not any(v not in (None, '') for v in row.values()):
+                    continue  # 空行
+                try:
+                    chunk.append((row_no,) + spec.transform(row))
+                except RowError as e:
+                    result.add_error(row_no, str(e))
+                    continue
+                if len(chunk) >= self.chunk_size:
+                    self._load_chunk(insert_sql, chunk, row_no)
+                    chunk = []
+            if result.cancelled:
+                self.discard()
+                return result
+            self._load_chunk(insert_sql, chunk, None)
+
+            # 2. 文件内重复只保留第一条
+            with conn:
+                cursor = conn.execute(
+                    f"DELETE FROM {staging} WHERE row_no NOT IN "
+                    f"(SELECT MIN(row_no) FROM {staging} GROUP BY {keys})"
+                )
+                result.file_duplicates = cursor.rowcount
+            conn.execute(
+                f"CREATE UNIQUE INDEX temp.idx_{self.STAGING_TABLE}_key ON {self.STAGING_TABLE} ({keys})"
+            )
+
+            # 3. 用索引连接分类
+            key_match = self._key_match('t', 's')
+            same_content = ' AND '.join(
+                [key_match] + [f"{spec.plain(col, f't.{col}')} IS {spec.incoming(col, f's.{col}', f't.{col}')}"
+                               for col in spec.compare_columns]
+            )
+            staged, existing, identical = conn.execute(f"""
+                SELECT COUNT(*),
+                       SUM(EXISTS (SELECT 1 FROM {spec.table} t WHERE {key_match})),
+                       SUM(EXISTS (SELECT 1 FROM {spec.table} t WHERE {same_content}))
+                FROM {staging} s
+            """).fetchone()
+            result.new = staged - (existing or 0)
+            result.duplicates = identical or 0
+            result.conflicts = (existing or 0) - result.duplicates
+            logger.info(f"导入预览 {spec.table}: 新 {result.new}, 相同 {result.duplicates}, "
+                        f"冲突 {result.conflicts}, 文件内重复 {result.file_duplicates}, 错误 {result.error_count}")
+        except Exception:
+            self.discard()
+            raise
+        return result
+
+    def _load_chunk(self, insert_sql, chunk, row_no):
+        if chunk:
+            with self._conn:
+                self._conn.executemany(insert_sql, chunk)
+        if self.progress_callback and self.result.total and row_no:
+            self.progress_callback(min(99, int((row_no - 1) * 100 / self.result.total)))
+
+    def apply(self, upsert: bool = False) -> ImportResult:
+        """提交暂存表：插入新记录，upsert=True 时同时用文件内容更新冲突记录 (文件中为空的列不覆盖)"""
+        if self._conn is None:
+            raise ImportExportError("导入数据尚未准备好")
+        spec = self.spec
+        result = self.result
+        staging = f"temp.{self.STAGING_TABLE}"
+        columns = ', '.join(spec.insert_columns)
+        key_match = self._key_match(spec.table, 's')
+        try:
+            with self._conn:
+                compare = spec.compare_columns
+                if upsert and compare:
+                    target = {col: f'{spec.table}.{col}' for col in compare}
+                    changed = ' OR '.join(
+                        f"NOT ({spec.incoming(col, f's.{col}', target[col])} IS {spec.plain(col, target[col])})"
+                        for col in compare
+                    )
+                    cursor = self._conn.execute(f"""
+                        UPDATE {spec.table}
+                        SET ({', '.join(compare)}) = (
+                            SELECT {', '.join(spec.stored(col, spec.incoming(col, f's.{col}', target[col]))
+                                              for col in compare)}
+                            FROM {staging} s WHERE {key_match}
+                        )
+                        WHERE EXISTS (SELECT 1 FROM {staging} s WHERE {key_match} AND ({changed}))
+                    """)
+                    result.updated = cursor.rowcount
+
+                cursor = self._conn.execute(f"""
+                    INSERT OR IGNORE INTO {spec.table} ({columns})
+                    SELECT {', '.join(spec.stored(col, f's.{col}') for col in spec.insert_columns)} FROM {staging} s
+                    WHERE NOT EXISTS (SELECT 1 FROM {spec.table} WHERE {key_match})
+                    ORDER BY s.row_no
+                """)
+                result.inserted = cursor.rowcount
+            result.duplicates += result.file_duplicates + (0 if upsert else result.conflicts)
+            if self.progress_callback:
+                self.progress_callback(100)
+            logger.info(f"导入提交 {spec.table}: 插入 {result.inserted}, 更新 {result.updated}")
+        finally:
+            self.discard()
+        return result
+
+    def discard(self):
+        """放弃暂存数据并关闭连接"""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None
+
+
+# ---------------------------------------------------------------------------
+# 各模块的导入规则
+# ---------------------------------------------------------------------------
+
+def _now() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _customer_row(row: Dict) -> Tuple:
+    company_name = text(row.get('company_name'))
+    if not company_name:
+        raise RowError("公司名称不能为空")
+    return (
+        company_name,
+        text(row.get('contact_person')),
+        text(row.get('phone')),
+        text(row.get('status')) or 'active',
+        text(row.get('notes')),
+        _now()
+    )
+
+
+def _business_row(row: Dict) -> Tuple:
+    company_name = text(row.get('company_name'))
+    business_name = text(row.get('business_name'))
+    if not company_name or not business_name:
+        raise RowError("公司名称和业务名称不能为空")
+
+    # 处理代理记账时间段
+    proxy_period = text(row.get('proxy_period'))
+    start_date, end_date = '', ''
+    if proxy_period:
+        if '至' in proxy_period:
+            parts = proxy_period.split('至')
+            start_date = parts[0].strip()
+            end_date = parts[1].strip() if len(parts) > 1 else ''
+        else:
+            start_date = proxy_period.strip()
+    start_date = date_text(start_date)
+    end_date = date_text(end_date)
+
+    proxy_accounting = flag(row.get('proxy_accounting'))
+    business_agent = flag(row.get('business_agent'))
+
+    # 处理业务类型
+    b_type = text(row.get('business_type'))
+    if not b_type:
+        if proxy_accounting:
+            b_type = '代理记账'
+        elif business_agent:
+            b_type = '工商代办'
+
+    return (
+        company_name,
+        business_name,
+        b_type,
+        text(row.get('secondary_business')),
+        text(row.get('company_password')),
+        text(row.get('public_info')),
+        text(row.get('remarks')),
+        proxy_accounting,
+        business_agent,
+        start_date,
+        end_date,
+        _now(),
+        'active'
+    )
+
+
+def _finance_row(row: Dict) -> Tuple:
+    company_name = text(row.get('company_name'))
+    if not company_name:
+        raise RowError("项目名称不能为空")
+    if row.get('amount') in (None, ''):
+        raise RowError("金额不能为空")
+    amount = number(row.get('amount'), '金额')
+    cost = number(row.get('cost'), '成本')
+    return (
+        company_name,
+        amount,
+        cost,
+        amount - cost,  # 利润
+        date_text(row.get('due_date')),
+        text(row.get('notes')),
+        number(row.get('pending_amount'), '待收金额'),
+        date_text(row.get('pending_date'))
+    )
+
+
+CUSTOMER_IMPORT = ImportSpec(
+    table='customers',
+    sheet_name='客户数据',
+    required_columns=['公司名称'],
+    column_mapping={
+        '公司名称': 'company_name',
+        '联系人': 'contact_person',
+        '电话': 'phone',
+        '状态': 'status',
+        '备注': 'notes'
+    },
+    insert_columns=['company_name', 'contact_person', 'phone', 'status', 'notes', 'created_at'],
+    key_columns=['company_name'],
+    transform=_customer_row,
+    preserve_columns=['created_at', 'status']
+)
+
+BUSINESS_IMPORT = ImportSpec(
+    table='business',
+    sheet_name='业务数据',
+    required_columns=['公司名称', '业务名称'],
+    column_mapping={
+        '公司名称': 'company_name',
+        '业务名称': 'business_name',
+        '业务类型': 'business_type',
+        '二级业务': 'secondary_business',
+        '公司密码': 'company_password',
+        '公开信息': 'public_info',
+        '备注': 'remarks',
+        '代理记账': 'proxy_accounting',
+        '工商代办': 'business_agent',
+        '代理记账时间段': 'proxy_period',
+        '记账周期': 'proxy_period'
+    },
+    insert_columns=[
+        'company_name', 'business_name', 'business_type', 'secondary_business',
+        'company_password', 'public_info', 'remarks',
+        'proxy_accounting', 'business_agent',
+        'proxy_start_date', 'proxy_end_date',
+        'create_time', 'status'
+    ],
+    key_columns=['company_name', 'business_name'],
+    transform=_business_row,
+    preserve_columns=['create_time', 'status'],
+    encrypted_columns=['company_password']
+)
+
+FINANCE_IMPORT = ImportSpec(
+    table='finance',
+    sheet_name='财务数据',
+    required_columns=['项目名称', '金额'],
+    column_mapping={
+        '项目名称': 'company_name',
+        '金额': 'amount',
+        '成本': 'cost',
+        '项目日期': 'due_date',
+        '备注': 'notes',
+        '待收金额': 'pending_amount',
+        '待收日期': 'pending_date'
+    },
+    insert_columns=[
+        'company_name', 'amount', 'cost', 'profit',
+        'due_date', 'notes', 'pending_amount', 'pending_date'
+    ],
+    key_columns=['company_name', 'due_date'],
+    transform=_finance_row
+)
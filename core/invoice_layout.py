@@ -0,0 +1,264 @@
+"""发票拼版引擎 (不依赖 Qt)
+
+发票系统窗口和命令行批处理 (invoice_batch.py) 共用：纸张尺寸、布局 (每页几张)、边距、
+裁剪线的计算，以及合并导出 PDF。布局参数用 LayoutSpec 描述，可以直接由发票窗口保存的
+invoice_config.json 生成 (spec_from_config)，可在进程间传递。
+
+导出时内容相同的源文件 (按文件内容哈希) 只打开一次，在同一个输出文件中只嵌入一次：
+PDF 页面通过 show_pdf_page 对同一源文档自动复用已生成的 XObject，图片复用第一次插入的 xref；
+源文档在最后一次使用后关闭。保存时清理无用对象、压缩 xref 表并压缩数据流
+(garbage=2, deflate；重复对象已由 xref 复用消除，不再用更慢的 garbage=3 合并)。
+
+日志直接写入应用的 "CustomerManager" 记录器，不导入 core.logger (它依赖 PyQt5)，
+因此可以在没有 Qt 的子进程中运行。
+"""
+import os
+import math
+import hashlib
+import logging
+from contextlib import nullcontext
+from typing import NamedTuple, Tuple
+
+logger = logging.getLogger('CustomerManager')
+
+# 毫米 -> PDF 点
+MM_TO_PT = 2.83465
+# 单元格内边距(点)
+CELL_PADDING = 5
+
+# 纸张尺寸 (宽, 高)，单位毫米，纵向
+PAPER_SIZES = {
+    'A4': (210, 297),
+    'A5': (148, 210),
+    'Letter': (216, 279),
+}
+
+# 布局预设 -> (行, 列)
+LAYOUTS = {
+    '2_per_page': (2, 1),
+    '3_per_page': (3, 1),
+    '4_per_page': (2, 2),
+    '6_per_page': (3, 2),
+    'hsr': (2, 2),  # 高铁票
+}
+
+# 支持的输入文件
+INPUT_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.bmp')
+
+
+class ExportCancelled(Exception):
+    """导出被用户取消"""
+
+
+class LayoutSpec(NamedTuple):
+    """拼版参数
+
+    paper 为 PAPER_SIZES 中的名称，其它值表示自定义尺寸 (width_mm x height_mm)；
+    margins_mm 依次为左、上、右、下；merge 为 False 时每页一张。
+    """
+    paper: str = 'A4'
+    width_mm: float = 210
+    height_mm: float = 297
+    landscape: bool = False
+    margins_mm: Tuple[float, float, float, float] = (12, 12, 12, 12)
+    layout: str = 'hsr'
+    merge: bool = True
+    cut_lines: bool = True
+    split_pages: int = 0  # 每个文件的页数，0 表示不拆分
+
+    def page_size_mm(self):
+        """纸张尺寸 (宽, 高)，已按方向调整"""
+        width_mm, height_mm = PAPER_SIZES.get(self.paper, (self.width_mm, self.height_mm))
+        if self.landscape:
+            width_mm, height_mm = height_mm, width_mm
+        return width_mm, height_mm
+
+    def page_size_pt(self):
+        width_mm, height_mm = self.page_size_mm()
+        return width_mm * MM_TO_PT, height_mm * MM_TO_PT
+
+    def grid(self):
+        """(行, 列)"""
+        if not self.merge:
+            return 1, 1
+        return LAYOUTS.get(self.layout, LAYOUTS['hsr'])
+
+    def items_per_page(self):
+        rows, cols = self.grid()
+        return rows * cols
+
+    def page_count(self, file_count):
+        return math.ceil(file_count / self.items_per_page())
+
+    def cells(self):
+        """一页中各单元格的 (x0, y0, x1, y1)，单位点，按行优先排列"""
+        page_width, page_height = self.page_size_pt()
+        m_left, m_top, m_right, m_bottom = (m * MM_TO_PT for m in self.margins_mm)
+        rows, cols = self.grid()
+        cell_width = (page_width - m_left - m_right) / cols
+        cell_height = (page_height - m_top - m_bottom) / rows
+        return [
+            (m_left + col * cell_width, m_top + row * cell_height,
+             m_left + (col + 1) * cell_width, m_top + (row + 1) * cell_height)
+            for row in range(rows) for col in range(cols)
+        ]
+
+
+def spec_from_config(config):
+    """由发票窗口保存的配置 (invoice_config.json 的内容) 生成 LayoutSpec"""
+    layout = next((key for key in LAYOUTS if config.get('layout', {}).get(key)), 'hsr')
+    paper = config.get('paper', {})
+    options = config.get('options', {})
+    names = list(PAPER_SIZES)
+    size_idx = paper.get('size_idx', 0)
+    return LayoutSpec(
+        paper=names[size_idx] if 0 <= size_idx < len(names) else 'custom',
+        width_mm=paper.get('width', 210),
+        height_mm=paper.get('height', 297),
+        landscape=paper.get('orient_idx', 0) == 1,
+        margins_mm=(paper.get('margin_left', 12), paper.get('margin_top', 12),
+                    paper.get('margin_right', 12), paper.get('margin_bottom', 12)),
+        layout=layout,
+        merge=options.get('merge', True),
+        cut_lines=options.get('cut', True),
+        split_pages=options.get('split_pages', 0),
+    )
+
+
+def content_hash(file_path):
+    hasher = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def export_part_paths(output_path, part_count):
+    """拆分导出时各文件的路径: output_001.pdf, output_002.pdf ..."""
+    if part_count <= 1:
+        return [output_path]
+    base, ext = os.path.splitext(output_path)
+    return [f"{base}_{n:03d}{ext or '.pdf'}" for n in range(1, part_count + 1)]
+
+
+def export_pdf(spec, files, output_path, progress_callback=None, is_cancelled=None, lock=None):
+    """合并导出 PDF，返回报告 dict: outputs, files, pages, distinct, errors
+
+    progress_callback(百分比) 报告进度，is_cancelled() 返回 True 时中止并抛出 ExportCancelled；
+    lock 为 PyMuPDF 的全局锁 (在有其它线程使用 PyMuPDF 的进程中传入)：按页绘制、保存、
+    打开和关闭文档都在锁内进行，两次获取之间其它线程可以渲染。
+    无法读取或插入的文件记录在 errors 中，对应单元格留空。
+    取消或失败时删除本次已写入的文件。
+    """
+    import fitz as pymupdf
+    cancelled = is_cancelled or (lambda: False)
+    lock = lock or nullcontext()
+    errors = []
+
+    def report(value):
+        if progress_callback:
+            progress_callback(value)
+
+    # 1. 按内容分组，记录每个源文件还要使用几次
+    keys = []
+    remaining = {}
+    for file_path in files:
+        if cancelled():
+            raise ExportCancelled("已取消")
+        try:
+            key = content_hash(file_path)
+            remaining[key] = remaining.get(key, 0) + 1
+        except OSError as e:
+            logger.error(f"Error reading {file_path}: {e}")
+            errors.append({'file': file_path, 'error': str(e)})
+            key = None
+        keys.append(key)
+    report(5)
+
+    page_width, page_height = spec.page_size_pt()
+    cells = spec.cells()
+    items_per_page = len(cells)
+    total_pages = spec.page_count(len(files))
+    pages_per_part = spec.split_pages or total_pages
+    outputs = export_part_paths(output_path, math.ceil(total_pages / pages_per_part)) if total_pages else []
+
+    sources = {}  # 内容哈希 -> 打开的源 PDF
+    images = {}  # 内容哈希 -> 当前输出文件中图片的 xref
+    written = []
+    doc = None
+
+    def save_part():
+        path = outputs[len(written)]
+        temp_path = path + '.tmp'
+        with lock:
+            doc.save(temp_path, garbage=2, deflate=True)
+        os.replace(temp_path, path)
+        written.append(path)
+
+    try:
+        for p in range(total_pages):
+            if cancelled():
+                raise ExportCancelled("已取消")
+            if p % pages_per_part == 0:
+                if doc is not None:
+                    save_part()
+                with lock:
+                    if doc is not None:
+                        doc.close()
+                    doc = pymupdf.open()
+                images = {}
+
+            with lock:
+                page = doc.new_page(width=page_width, height=page_height)
+                for i in range(p * items_per_page, min((p + 1) * items_per_page, len(files))):
+                    file_path, key = files[i], keys[i]
+                    x0, y0, x1, y1 = cells[i % items_per_page]
+                    target_rect = pymupdf.Rect(x0 + CELL_PADDING, y0 + CELL_PADDING,
+                                               x1 - CELL_PADDING, y1 - CELL_PADDING)
+                    if key is not None:
+                        try:
+                            if file_path.lower().endswith('.pdf'):
+                                src_doc = sources.get(key)
+                                if src_doc is None:
+                                    src_doc = sources[key] = pymupdf.open(file_path)
+                                if len(src_doc) > 0:
+                                    # show_pdf_page 保留矢量内容
+                                    page.show_pdf_page(target_rect, src_doc, 0)
+                            elif key in images:
+                                page.insert_image(target_rect, xref=images[key], keep_proportion=True)
+                            else:
+                                images[key] = page.insert_image(target_rect, filename=file_path, keep_proportion=True)
+                        except Exception as e:
+                            logger.error(f"Error inserting {file_path}: {e}")
+                            errors.append({'file': file_path, 'error': str(e)})
+                        remaining[key] -= 1
+                        if remaining[key] == 0 and key in sources:
+                            sources.pop(key).close()
+
+                    if spec.cut_lines:
+                        shape = page.new_shape()
+                        shape.draw_rect(pymupdf.Rect(x0, y0, x1, y1))
+                        shape.finish(color=(0, 0, 0), dashes=[3])
+                        shape.commit()
+            report(5 + int((p + 1) * 90 / total_pages))
+
+        if doc is not None:
+            save_part()
+        report(100)
+        logger.info(f"[发票导出] {len(files)} 个文件 -> {total_pages} 页，{len(written)} 个 PDF，"
+                    f"不同内容 {len(remaining)} 个")
+        return {'outputs': written, 'files': len(files), 'pages': total_pages,
+                'distinct': len(remaining), 'errors': errors}
+    except BaseException:
+        for path in written + [path + '.tmp' for path in outputs]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise
+    finally:
+        with lock:
+            for src_doc in sources.values():
+                src_doc.close()
+            if doc is not None and not doc.is_closed:
+                doc.close()
@@ -0,0 +1,52 @@
+"""重依赖的延迟导入访问函数
+
+QtChart、openpyxl、docxtpl、PyMuPDF 导入耗时明显，统一通过这里按需加载，
+不要在模块顶层直接 import，以免被启动关键路径带进来。
+注意：打包时需在 build 脚本的 hidden_imports 中列出这些模块。
+"""
+import importlib
+import threading
+from core.logger import logger
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _load(name):
+    module = _cache.get(name)
+    if module is None:
+        with _lock:
+            module = _cache.get(name)
+            if module is None:
+                module = importlib.import_module(name)
+                _cache[name] = module
+                logger.debug(f"延迟加载模块: {name}")
+    return module
+
+
+def qtchart():
+    """PyQt5.QtChart"""
+    return _load('PyQt5.QtChart')
+
+
+def openpyxl():
+    """openpyxl 主模块 (Workbook / load_workbook)"""
+    return _load('openpyxl')
+
+
+def openpyxl_styles():
+    """openpyxl.styles (Font / Alignment)"""
+    return _load('openpyxl.styles')
+
+
+def fitz():
+    """PyMuPDF"""
+    return _load('fitz')
+
+
+def docx_template():
+    """docxtpl.DocxTemplate，未安装时返回 None"""
+    try:
+        return _load('docxtpl').DocxTemplate
+    except ImportError:
+        return None
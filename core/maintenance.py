@@ -0,0 +1,336 @@
+import os
+import time
+import sqlite3
+from datetime import datetime, timedelta
+from PyQt5.QtCore import QObject, QTimer, QSettings, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import QSystemTrayIcon
+from core.async_utils import Worker
+from core.field_crypto import encrypt_pending, MissingKeyError
+from core.logger import logger
+
+
+def wal_size(db_path):
+    """数据库 -wal 文件的大小(字节)，不存在时为 0"""
+    try:
+        return os.path.getsize(db_path + '-wal')
+    except OSError:
+        return 0
+
+
+def list_tables(conn):
+    """需要检查的表 (sqlite_master 在前)"""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name").fetchall()
+    return ['sqlite_master'] + [row[0] for row in rows if row[0] != 'sqlite_sequence']
+
+
+def quick_check(conn, table):
+    """对单个表及其索引执行 quick_check，返回发现的问题 (正常时为空列表)"""
+    name = table.replace('"', '""')
+    rows = conn.execute(f'PRAGMA quick_check("{name}")').fetchall()
+    return [row[0] for row in rows if row[0] != 'ok']
+
+
+def free_pages(conn):
+    """空闲页数和页大小"""
+    return conn.execute("PRAGMA freelist_count").fetchone()[0], conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def checkpoint(conn):
+    """PASSIVE 检查点 (不阻塞读写)；全部合并时再尝试不等待的 TRUNCATE 截断 WAL 文件
+
+    返回 (WAL 中的页数, 已合并的页数)
+    """
+    busy, log_pages, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    if not busy and log_pages == done:
+        conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        except sqlite3.OperationalError:
+            pass  # 有读者时保留文件，下次写入会从头复用
+    return log_pages, done
+
+
+def enable_incremental_vacuum(conn):
+    """把数据库转换为 auto_vacuum=INCREMENTAL (需要 VACUUM 重建整个文件)"""
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+
+def incremental_vacuum(conn, pages):
+    """归还最多 pages 个空闲页给文件系统，返回归还的页数"""
+    before = free_pages(conn)[0]
+    # PRAGMA incremental_vacuum 每执行一步只释放一页，executescript 会执行到结束
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+    return before - free_pages(conn)[0]
+
+
+def optimize(conn):
+    """刷新查询规划器统计信息：从未分析过时执行 ANALYZE，否则 PRAGMA optimize 只分析需要的表"""
+    conn.execute("PRAGMA analysis_limit = 1000")  # 每个索引最多采样约 1000 行，限制耗时
+    analyzed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if analyzed:
+        conn.execute("PRAGMA optimize")
+        return 'PRAGMA optimize'
+    conn.execute("ANALYZE")
+    return 'ANALYZE'
+
+
+class DatabaseMaintenance(QObject):
+    """空闲时的数据库维护
+
+    每 CHECK_INTERVAL_MS 检查一次，每次在线程池中用独立连接执行一项任务，完成后继续下一项，
+    用户开始操作就暂停。各项任务的耗时和效果写入日志。按优先级:
+
+    1. WAL 超过 maintenance_wal_limit_mb 时执行 PASSIVE 检查点 (不阻塞读写，只要求没有后台任务)
+    2. 加密旧版本遗留的明文敏感字段 (见 core/field_crypto.py)，每次 ENCRYPT_STEP_ROWS 行
+    3. 数据库尚未启用 auto_vacuum=INCREMENTAL 时用 VACUUM 转换一次 (只尝试一次)
+    4. 空闲页超过 maintenance_free_mb (如永久删除、清空回收站后) 时 incremental_vacuum 归还空间
+    5. 每 maintenance_optimize_hours 执行 PRAGMA optimize (从未分析过时执行 ANALYZE)
+    6. 完整性检查：退出时不再做，到期后逐表执行 quick_check，一轮完成后记录时间和结果，
+       发现问题时写日志并通过系统托盘提醒
+
+    配置(QSettings "CustomerManagement/Settings"):
+        maintenance_idle_seconds: 用户无操作多少秒后开始维护，默认 60
+        maintenance_wal_limit_mb: WAL 检查点阈值，默认 64
+        maintenance_free_mb: 空闲空间回收阈值，默认 16
+        maintenance_optimize_hours: 统计信息刷新间隔(小时)，默认 24
+        maintenance_check_hours: 两轮完整检查的间隔(小时)，默认 24
+        maintenance/last_optimize: 上次刷新统计信息的时间
+        maintenance/last_check: 上次完成检查的时间
+        maintenance/last_result: 上次检查结果 ("ok" 或问题摘要)
+    """
+
+    CHECK_INTERVAL_MS = 60 * 1000
+    # 空闲维护中两项任务之间的间隔 (手动检查连续执行)
+    STEP_DELAY_MS = 500
+    # 每次归还的空闲页数上限，避免长时间持有写锁
+    VACUUM_STEP_PAGES = 2048
+    # 每次加密的行数上限
+    ENCRYPT_STEP_ROWS = 500
+    LAST_OPTIMIZE_KEY = "maintenance/last_optimize"
+    LAST_CHECK_KEY = "maintenance/last_check"
+    LAST_RESULT_KEY = "maintenance/last_result"
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    # 每完成一项任务时发出，供状态页面刷新
+    status_changed = pyqtSignal()
+
+    def __init__(self, main_window):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.settings = QSettings("CustomerManagement", "Settings")
+        self._pending = []
+        self._total = 0
+        self._problems = []
+        self._running = False
+        self._forced = False
+        self._vacuum_converted = False
+        self._fields_pending = True
+        self._wal_after_checkpoint = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.CHECK_INTERVAL_MS)
+        self._timer.timeout.connect(self._tick)
+
+    @property
+    def db_manager(self):
+        return self.main_window.app.db_manager
+
+    def start(self):
+        # 恢复备份后重新启动时，恢复的数据中可能有未加密的字段
+        self._fields_pending = True
+        self._timer.start()
+
+    def stop(self):
+        """停止维护 (正在执行的任务会执行完，未完成的一轮检查下次从头开始)"""
+        self._timer.stop()
+        self._pending = []
+        self._forced = False
+
+    def check_now(self):
+        """立即开始一轮完整性检查 (不等待空闲)"""
+        if self._running or self._pending:
+            return
+        self._forced = True
+        self._begin_pass()
+        self._tick()
+
+    def _time_setting(self, key):
+        value = self.settings.value(key, "", type=str)
+        try:
+            return datetime.strptime(value, self.TIME_FORMAT) if value else None
+        except ValueError:
+            return None
+
+    def last_check(self):
+        return self._time_setting(self.LAST_CHECK_KEY)
+
+    def _elapsed(self, key, hours_key, default_hours):
+        last = self._time_setting(key)
+        hours = self.settings.value(hours_key, default_hours, type=int)
+        return last is None or datetime.now() - last >= timedelta(hours=hours)
+
+    def _due(self):
+        return self._elapsed(self.LAST_CHECK_KEY, "maintenance_check_hours", 24)
+
+    def status(self):
+        """维护状态: 上次检查时间和结果、当前进度、数据库/WAL 大小和可回收空间"""
+        db_path = self.db_manager.db_path
+        try:
+            db_size = os.path.getsize(db_path)
+        except OSError:
+            db_size = 0
+        pages, page_size = free_pages(self.db_manager.conn)
+        return {
+            'last_check': self.last_check(),
+            'last_result': self.settings.value(self.LAST_RESULT_KEY, "", type=str),
+            'checking': bool(self._pending),
+            'checked': self._total - len(self._pending),
+            'total': self._total,
+            'db_size': db_size,
+            'wal_size': wal_size(db_path),
+            'free_size': pages * page_size,
+            'auto_vacuum': self.db_manager.conn.execute("PRAGMA auto_vacuum").fetchone()[0],
+        }
+
+    # ---------------------------------------------------------------- 调度
+
+    def _tick(self):
+        if self._running or self.db_manager.conn is None:
+            return
+        task = self._next_task()
+        if task:
+            self._run_task(*task)
+
+    def _next_task(self):
+        """选择下一项任务，返回 (名称, 函数, 参数...) 或 None"""
+        if self._forced:
+            return self._integrity_task()
+        idle_monitor = self.main_window.idle_monitor
+        if idle_monitor.busy_reason(0):
+            return None
+
+        conn = self.db_manager.conn
+        wal = wal_size(self.db_manager.db_path)
+        wal_limit = self.settings.value("maintenance_wal_limit_mb", 64, type=int) * 1024 * 1024
+        if wal > wal_limit and wal > self._wal_after_checkpoint:
+            return 'checkpoint', checkpoint
+
+        if idle_monitor.busy_reason(self.settings.value("maintenance_idle_seconds", 60, type=int)):
+            return None
+        if self._fields_pending:
+            return 'encrypt_fields', encrypt_pending, self.db_manager.field_cipher, self.ENCRYPT_STEP_ROWS
+
+        if not self._vacuum_converted and conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self._vacuum_converted = True  # 每次运行只尝试一次
+            return 'auto_vacuum', enable_incremental_vacuum
+
+        pages, page_size = free_pages(conn)
+        free_limit = self.settings.value("maintenance_free_mb", 16, type=int) * 1024 * 1024
+        if pages * page_size > free_limit and conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return 'incremental_vacuum', incremental_vacuum, self.VACUUM_STEP_PAGES
+
+        if self._elapsed(self.LAST_OPTIMIZE_KEY, "maintenance_optimize_hours", 24):
+            return 'optimize', optimize
+
+        if self._pending or self._due():
+            return self._integrity_task()
+        return None
+
+    def _integrity_task(self):
+        if not self._pending:
+            self._begin_pass()
+        if not self._pending:
+            return None
+        return 'quick_check', quick_check, self._pending[0]
+
+    def _run_task(self, name, fn, *args):
+        self._running = True
+        worker = Worker(self._with_connection, fn, *args)
+        worker.signals.result.connect(lambda result: self._on_task_done(name, args, result))
+        worker.signals.error.connect(lambda error: self._on_task_error(name, error))
+        QThreadPool.globalInstance().start(worker)
+
+    def _with_connection(self, fn, *args):
+        """在线程池中用独立连接执行任务，返回 (结果, 耗时秒)"""
+        conn = self.db_manager.create_new_connection()
+        start = time.perf_counter()
+        try:
+            return fn(conn, *args), time.perf_counter() - start
+        finally:
+            conn.close()
+
+    def _on_task_done(self, name, args, result):
+        self._running = False
+        value, elapsed = result
+        mb = 1024 * 1024
+        db_path = self.db_manager.db_path
+        if name == 'checkpoint':
+            log_pages, done = value
+            self._wal_after_checkpoint = wal_size(db_path)
+            logger.info(f"[维护] WAL 检查点: 合并 {done}/{log_pages} 页，"
+                        f"WAL {self._wal_after_checkpoint / mb:.1f} MB，耗时 {elapsed:.2f}s")
+        elif name == 'encrypt_fields':
+            if value < self.ENCRYPT_STEP_ROWS:
+                self._fields_pending = False
+            if value:
+                logger.info(f"[维护] 已加密 {value} 个敏感字段，耗时 {elapsed:.2f}s")
+        elif name == 'auto_vacuum':
+            logger.info(f"[维护] 已转换为 auto_vacuum=INCREMENTAL (模式 {value})，"
+                        f"数据库 {os.path.getsize(db_path) / mb:.1f} MB，耗时 {elapsed:.2f}s")
+        elif name == 'incremental_vacuum':
+            page_size = free_pages(self.db_manager.conn)[1]
+            logger.info(f"[维护] 归还空闲空间 {value * page_size / mb:.1f} MB，"
+                        f"数据库 {os.path.getsize(db_path) / mb:.1f} MB，耗时 {elapsed:.2f}s")
+        elif name == 'optimize':
+            self.settings.setValue(self.LAST_OPTIMIZE_KEY, datetime.now().strftime(self.TIME_FORMAT))
+            logger.info(f"[维护] 统计信息已刷新 ({value})，耗时 {elapsed:.2f}s")
+        elif name == 'quick_check':
+            table = args[0]
+            if self._pending and self._pending[0] == table:
+                self._pending.pop(0)
+            self._problems.extend(f"{table}: {problem}" for problem in value)
+            if not self._pending:
+                self._finish_pass()
+        self.status_changed.emit()
+        # 继续下一项；用户开始操作后暂停，等下一次定时检查继续
+        QTimer.singleShot(0 if self._forced else self.STEP_DELAY_MS, self._tick)
+
+    def _on_task_error(self, name, error):
+        # 连接不可用 (如正在恢复备份) 或数据库忙时放弃本次任务，下次定时检查再试
+        self._running = False
+        if name == 'quick_check':
+            self._pending = []
+            self._forced = False
+        elif name == 'checkpoint':
+            self._wal_after_checkpoint = wal_size(self.db_manager.db_path)
+        elif name == 'encrypt_fields' and error[0] is MissingKeyError:
+            # 密钥缺失时本次运行不再尝试，导入密钥后下次启动维护时继续
+            self._fields_pending = False
+        logger.warning(f"[维护] {name} 未完成: {error[1]}")
+        self.status_changed.emit()
+
+    # ---------------------------------------------------------------- 完整性检查
+
+    def _begin_pass(self):
+        self._pending = list_tables(self.db_manager.conn)
+        self._total = len(self._pending)
+        self._problems = []
+        logger.info(f"[维护] 开始完整性检查，共 {self._total} 个表")
+
+    def _finish_pass(self):
+        self._forced = False
+        result = 'ok' if not self._problems else '; '.join(self._problems[:5])
+        self.settings.setValue(self.LAST_CHECK_KEY, datetime.now().strftime(self.TIME_FORMAT))
+        self.settings.setValue(self.LAST_RESULT_KEY, result)
+        if self._problems:
+            logger.error(f"[维护] 完整性检查发现 {len(self._problems)} 个问题: {self._problems}")
+            tray_icon = getattr(self.main_window, 'tray_icon', None)
+            if tray_icon and tray_icon.isVisible():
+                tray_icon.showMessage(
+                    '数据库检查发现问题',
+                    '数据库完整性检查发现异常，请尽快从备份恢复。详见设置页的数据库维护。',
+                    QSystemTrayIcon.Warning, 5000
+                )
+        else:
+            logger.info("[维护] 完整性检查完成，未发现问题")
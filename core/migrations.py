@@ -1,7 +1,13 @@
+import os
+import json
 import sqlite3
 from core.logger import logger
 
 class MigrationManager:
+    # 数据库结构版本，写入 PRAGMA user_version；新增迁移时加 1。
+    # 恢复备份时据此拒绝由更新版本程序创建的数据库。
+    SCHEMA_VERSION = 3
+
     def __init__(self, db_manager):
         self.db_manager = db_manager
 
@@ -15,7 +21,10 @@ class MigrationManager:
             self._add_customer_fields,
             self._add_business_fields,
             self._add_finance_fields,
-            self._add_contract_fields
+            self._add_contract_fields,
+            self._add_attachment_refcount,
+            self._add_indexes,
+            self._migrate_json_todos_notes
         ]
         
         for migration in migrations:
@@ -24,6 +33,7 @@ class MigrationManager:
             except Exception as e:
                 logger.error(f"Migration failed {migration.__name__}: {e}")
         
+        cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
         conn.commit()
 
     def _add_soft_delete_columns(self, cursor):
@@ -47,6 +57,93 @@ class MigrationManager:
     def _add_contract_fields(self, cursor):
         self._ensure_column(cursor, 'contracts', 'category_ids', 'TEXT')
 
+    def _add_attachment_refcount(self, cursor):
+        # sha256 为空的是旧版本按文件路径保存的附件
+        self._ensure_column(cursor, 'contract_attachments', 'sha256', 'TEXT')
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_attachment_blob_ref
+            AFTER INSERT ON contract_attachments WHEN NEW.sha256 IS NOT NULL
+            BEGIN
+                INSERT INTO attachment_blobs (sha256, size, ref_count) VALUES (NEW.sha256, NEW.file_size, 1)
+                ON CONFLICT(sha256) DO UPDATE SET ref_count = ref_count + 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_attachment_blob_unref
+            AFTER DELETE ON contract_attachments WHEN OLD.sha256 IS NOT NULL
+            BEGIN
+                UPDATE attachment_blobs SET ref_count = ref_count - 1 WHERE sha256 = OLD.sha256;
+            END
+        """)
+
+    def _add_indexes(self, cursor):
+        # 首页近期应收账款按 pending_date 范围查询
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_finance_pending_date "
+            "ON finance(pending_date) WHERE pending_amount > 0"
+        )
+        # 导入去重按这些键查询已有记录
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_business_company_business "
+            "ON business(company_name, business_name)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_finance_company_due "
+            "ON finance(company_name, due_date)"
+        )
+        # 待办列表按状态 + 手动顺序排序，按创建时间/截止日期筛选
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_todos_status ON todos(status, position)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_todos_created_at ON todos(created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_todos_due ON todos(due) WHERE due IS NOT NULL")
+
+    def _migrate_json_todos_notes(self, cursor):
+        """把旧版本保存在 todo_list.json / notes.json 中的待办和便签导入数据库 (只在表为空时执行一次)
+
+        旧版本首页和独立窗口的文件格式不同：待办是 [{id, text, completed}] 或字符串列表，
+        便签是纯文本或 {"content": ...}。导入后文件改名为 *.migrated 保留。
+        旧文件位于程序目录，即数据库所在 data 目录的上一级。
+        """
+        app_dir = os.path.dirname(os.path.dirname(os.path.abspath(self.db_manager.db_path)))
+        todo_file = os.path.join(app_dir, 'todo_list.json')
+        if os.path.exists(todo_file) and not cursor.execute("SELECT 1 FROM todos LIMIT 1").fetchone():
+            try:
+                with open(todo_file, 'r', encoding='utf-8') as f:
+                    items = json.load(f)
+                rows = []
+                for position, item in enumerate(items if isinstance(items, list) else []):
+                    if isinstance(item, dict):
+                        text, done = str(item.get('text', '')).strip(), bool(item.get('completed'))
+                    else:
+                        text, done = str(item).strip(), False
+                    if text:
+                        rows.append((text, 'done' if done else 'open', position))
+                cursor.executemany(
+                    "INSERT INTO todos (text, status, position, created_at, updated_at) "
+                    "VALUES (?, ?, ?, datetime('now', 'localtime'), datetime('now', 'localtime'))",
+                    rows
+                )
+                os.replace(todo_file, todo_file + '.migrated')
+                logger.info(f"已从 {todo_file} 导入 {len(rows)} 条待办事项")
+            except (OSError, ValueError) as e:
+                logger.error(f"导入待办事项文件失败: {e}")
+
+        notes_file = os.path.join(app_dir, 'notes.json')
+        if os.path.exists(notes_file) and not cursor.execute("SELECT 1 FROM notes LIMIT 1").fetchone():
+            try:
+                with open(notes_file, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                try:
+                    parsed = json.loads(content)
+                    if isinstance(parsed, dict):
+                        content = str(parsed.get('content', ''))
+                except ValueError:
+                    pass  # 首页保存的是纯文本
+                cursor.execute("INSERT INTO notes (content) VALUES (?)", (content,))
+                os.replace(notes_file, notes_file + '.migrated')
+                logger.info(f"已从 {notes_file} 导入便签")
+            except OSError as e:
+                logger.error(f"导入便签文件失败: {e}")
+
     def _ensure_column(self, cursor, table, column, definition):
         """Helper to add column if it doesn't exist"""
         try:
@@ -0,0 +1,202 @@
+import time
+import importlib
+from PyQt5.QtCore import QObject, QTimer, QSettings, QThreadPool
+from PyQt5.QtWidgets import QApplication
+from core.async_utils import Worker
+from core.logger import logger
+from core import lazy_imports
+
+# 模块键 -> 模块导入路径 (键与 MainWindow 上的属性名一致)
+PREWARM_MODULES = {
+    'customer': 'modules.customer',
+    'business': 'modules.business',
+    'finance': 'modules.finance',
+    'contract': 'modules.contract',
+    'work_arrangement': 'modules.work_arrangement',
+    'invoice_system': 'modules.invoice_system',
+    'web_nav': 'modules.web_nav',
+    'settings_window': 'modules.settings',
+}
+
+# 没有使用记录时的默认预测顺序
+DEFAULT_ORDER = [
+    'customer', 'finance', 'business', 'contract',
+    'work_arrangement', 'invoice_system', 'web_nav', 'settings_window'
+]
+
+# 模块导入后不会自动加载的重依赖(见 core/lazy_imports.py)
+HEAVY_DEPENDENCIES = {
+    'qtchart': lazy_imports.qtchart,
+    'openpyxl': lazy_imports.openpyxl,
+    'fitz': lazy_imports.fitz,
+    'docxtpl': lazy_imports.docx_template,
+}
+
+# 预热 SQLite 页缓存与列表查询用到的索引
+WARM_QUERIES = [
+    "SELECT COUNT(*) FROM customers WHERE is_deleted = 0",
+    "SELECT COUNT(*) FROM business WHERE is_deleted = 0",
+    "SELECT COUNT(*), SUM(profit), SUM(pending_amount) FROM finance WHERE is_deleted = 0",
+    "SELECT COUNT(*) FROM contracts WHERE is_deleted = 0",
+    "SELECT company_name FROM customers WHERE is_deleted = 0 ORDER BY company_name",
+    "SELECT name FROM business_types",
+    "SELECT name FROM contract_categories",
+]
+
+
+class ModulePrewarmer(QObject):
+    """空闲时预热模块窗口
+
+    首页显示后延迟启动：
+    1. 后台线程导入模块代码和 QtChart/openpyxl/fitz/docxtpl 等重依赖，并预热数据库连接和页缓存；
+    2. 回到 GUI 线程，按预测的使用顺序每个事件循环切片构建一个窗口，避免长时间卡顿。
+
+    配置(QSettings "CustomerManagement/Settings"):
+        prewarm_enabled: 是否启用，默认 True
+        prewarm_delay_ms: 首页显示后的启动延迟，默认 1500
+        prewarm_slice_ms: 两次窗口构建之间的间隔，默认 50
+        prewarm_build_windows: 是否预先构建窗口(否则只导入模块)，默认 True
+    """
+
+    USAGE_SETTINGS = ("CustomerManagement", "MainWindow")
+
+    def __init__(self, main_window):
+        super().__init__(main_window)
+        self.main_window = main_window
+        settings = QSettings("CustomerManagement", "Settings")
+        self.enabled = settings.value("prewarm_enabled", True, type=bool)
+        self.delay_ms = settings.value("prewarm_delay_ms", 1500, type=int)
+        self.slice_ms = settings.value("prewarm_slice_ms", 50, type=int)
+        self.build_windows = settings.value("prewarm_build_windows", True, type=bool)
+
+        self.timings = {}
+        self._queue = []
+        self._started = False
+        self._stopped = False
+        self._start_time = None
+
+    @classmethod
+    def record_usage(cls, key):
+        """记录一次模块访问，用于预测预热顺序"""
+        if key not in PREWARM_MODULES:
+            return
+        settings = QSettings(*cls.USAGE_SETTINGS)
+        count = settings.value(f"module_usage/{key}", 0, type=int)
+        settings.setValue(f"module_usage/{key}", count + 1)
+
+    @classmethod
+    def predicted_order(cls):
+        """按历史访问次数降序排列，次数相同时保持默认顺序"""
+        settings = QSettings(*cls.USAGE_SETTINGS)
+        usage = {key: settings.value(f"module_usage/{key}", 0, type=int) for key in DEFAULT_ORDER}
+        return sorted(DEFAULT_ORDER, key=lambda k: -usage[k])
+
+    def start(self):
+        """安排预热(只会执行一次)"""
+        if self._started or not self.enabled:
+            return
+        self._started = True
+        QTimer.singleShot(self.delay_ms, self._start_background)
+
+    def stop(self):
+        """停止尚未执行的预热步骤"""
+        self._stopped = True
+        self._queue = []
+
+    def get_report(self):
+        """返回各步骤耗时(毫秒)"""
+        return dict(self.timings)
+
+    def _start_background(self):
+        if self._stopped:
+            return
+        self._start_time = time.perf_counter()
+        order = self.predicted_order()
+        logger.info(f"[预热] 开始后台预热，预测顺序: {order}")
+        db_manager = getattr(self.main_window.app, 'db_manager', None)
+        worker = Worker(self._warm_background, order, db_manager)
+        worker.signals.result.connect(self._on_background_done)
+        worker.signals.error.connect(self._on_background_error)
+        QThreadPool.globalInstance().start(worker)
+
+    def _warm_background(self, order, db_manager):
+        """后台线程：导入模块并预热数据库"""
+        timings = {}
+        for key in order:
+            if self._stopped:
+                break
+            t0 = time.perf_counter()
+            try:
+                importlib.import_module(PREWARM_MODULES[key])
+            except Exception as e:
+                logger.warning(f"[预热] 导入模块失败 {key}: {e}")
+            timings[f"import:{key}"] = (time.perf_counter() - t0) * 1000
+
+        for name, loader in HEAVY_DEPENDENCIES.items():
+            if self._stopped:
+                break
+            t0 = time.perf_counter()
+            try:
+                loader()
+            except Exception as e:
+                logger.warning(f"[预热] 加载依赖失败 {name}: {e}")
+            timings[f"import:{name}"] = (time.perf_counter() - t0) * 1000
+
+        if db_manager and not self._stopped:
+            t0 = time.perf_counter()
+            conn = None
+            try:
+                conn = db_manager.create_new_connection()
+                for query in WARM_QUERIES:
+                    try:
+                        conn.execute(query).fetchall()
+                    except Exception as e:
+                        logger.debug(f"[预热] 查询跳过: {query} ({e})")
+            except Exception as e:
+                logger.warning(f"[预热] 数据库预热失败: {e}")
+            finally:
+                if conn:
+                    conn.close()
+            timings["db:warm_queries"] = (time.perf_counter() - t0) * 1000
+        return order, timings
+
+    def _on_background_done(self, result):
+        order, timings = result
+        self.timings.update(timings)
+        if self._stopped or not self.build_windows:
+            self._finish()
+            return
+        self._queue = list(order)
+        QTimer.singleShot(self.slice_ms, self._build_next)
+
+    def _on_background_error(self, error):
+        logger.error(f"[预热] 后台预热失败: {error[1]}")
+
+    def _build_next(self):
+        """每个切片只构建一个窗口，然后把控制权交还事件循环"""
+        if self._stopped:
+            return
+        if not self._queue:
+            self._finish()
+            return
+
+        # 用户正在操作模态对话框或弹出菜单时推迟
+        if QApplication.activeModalWidget() or QApplication.activePopupWidget():
+            QTimer.singleShot(self.slice_ms * 10, self._build_next)
+            return
+
+        key = self._queue.pop(0)
+        if getattr(self.main_window, key, None) is None:
+            t0 = time.perf_counter()
+            try:
+                self.main_window.ensure_module(key)
+            except Exception as e:
+                logger.warning(f"[预热] 构建窗口失败 {key}: {e}")
+            self.timings[f"build:{key}"] = (time.perf_counter() - t0) * 1000
+        QTimer.singleShot(self.slice_ms, self._build_next)
+
+    def _finish(self):
+        total = (time.perf_counter() - self._start_time) * 1000 if self._start_time else 0
+        self.timings["total"] = total
+        detail = ", ".join(f"{k}={v:.0f}ms" for k, v in self.timings.items())
+        logger.info(f"[预热] 完成: {detail}")
@@ -0,0 +1,282 @@
+"""声明式列表筛选/查询构建
+
+列表页把界面上的筛选条件描述为 FilterSpec (可哈希的元组)，compile_spec 把它编译为
+FROM/WHERE/ORDER BY 和参数，结果按 spec 缓存，同一组筛选只编译一次。
+列表分页、COUNT、SUM 统计和"导出当前视图"都从同一个 CompiledQuery 生成 SQL，
+因此筛选结果一致；筛选形状相同的查询 SQL 文本也相同 (值全部走参数，分页用 LIMIT ? OFFSET ?)，
+可以命中 sqlite3 连接内的预编译语句缓存。
+
+用法:
+    spec = FilterSpec.of('finance', search='张三', sort='金额 (高→低)', year='2024', debtors=True)
+    query = compile_spec(spec)
+    total = query.count(conn)
+    rows = query.page(conn, limit, offset)
+"""
+from functools import lru_cache
+from typing import Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+# 筛选函数: 值 -> (SQL 片段, 参数元组)，返回 None 表示不筛选
+FilterFunc = Callable[[object], Optional[Tuple[str, Tuple]]]
+
+
+def like_any(columns: Sequence[str]) -> FilterFunc:
+    """任一列包含关键字"""
+    sql = '(' + ' OR '.join(f"{col} LIKE ?" for col in columns) + ')'
+
+    def build(value):
+        pattern = f"%{value}%"
+        return sql, (pattern,) * len(columns)
+    return build
+
+
+def equals(column: str) -> FilterFunc:
+    return lambda value: (f"{column} = ?", (value,))
+
+
+def compare(column: str, op: str) -> FilterFunc:
+    return lambda value: (f"{column} {op} ?", (value,))
+
+
+def choice(clauses: Dict[object, str]) -> FilterFunc:
+    """按取值选择固定的 SQL 片段 (不在映射中的值不筛选)"""
+    def build(value):
+        sql = clauses.get(value)
+        return (sql, ()) if sql else None
+    return build
+
+
+def flag(sql: str) -> FilterFunc:
+    """值为真时追加固定条件"""
+    return lambda value: (sql, ()) if value else None
+
+
+class QueryDef:
+    """一个列表的查询定义
+
+    Args:
+        table: FROM 子句 (可带别名，如 "contracts c")
+        columns: 列表页查询的列
+        filters: 筛选名 -> 筛选函数 (search 对应搜索框)
+        sorts: 排序选项文字 -> ORDER BY 子句
+        default_sort: 未知排序选项时使用的 ORDER BY
+        base_where: 始终附加的条件 (默认排除回收站中的记录)
+    """
+
+    def __init__(self, table: str, columns: Sequence[str], filters: Dict[str, FilterFunc],
+                 sorts: Dict[str, str], default_sort: str, base_where: str = 'is_deleted = 0'):
+        self.table = table
+        self.columns = tuple(columns)
+        self.filters = filters
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.base_where = base_where
+
+
+QUERY_DEFS: Dict[str, QueryDef] = {}
+
+
+def register(name: str, query_def: QueryDef) -> QueryDef:
+    QUERY_DEFS[name] = query_def
+    return query_def
+
+
+class FilterSpec(NamedTuple):
+    """筛选描述: 查询名、排序选项和按名称排序的 (筛选名, 值) 元组"""
+    query: str
+    sort: str = ''
+    filters: Tuple[Tuple[str, object], ...] = ()
+
+    @classmethod
+    def of(cls, query: str, sort: str = '', **filters) -> 'FilterSpec':
+        """创建筛选描述，忽略空值 (None、空字符串、False)"""
+        items = tuple(sorted((k, v) for k, v in filters.items() if v is not None and v is not False and v != ''))
+        return cls(query, sort or '', items)
+
+    def with_filters(self, **filters) -> 'FilterSpec':
+        """在当前筛选基础上追加/覆盖筛选条件"""
+        merged = dict(self.filters)
+        merged.update(filters)
+        return FilterSpec.of(self.query, self.sort, **merged)
+
+
+class CompiledQuery:
+    """编译后的查询：共享 WHERE 子句，生成列表/计数/统计/导出语句"""
+
+    def __init__(self, query_def: QueryDef, where_sql: str, params: Tuple, order_by: str):
+        self.query_def = query_def
+        self.where_sql = where_sql
+        self.params = params
+        self.order_by = order_by
+        self._sql_cache = {}
+
+    def _sql(self, key, build):
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            sql = self._sql_cache[key] = build()
+        return sql
+
+    @property
+    def count_sql(self) -> str:
+        return self._sql('count', lambda: f"SELECT COUNT(*) FROM {self.query_def.table} WHERE {self.where_sql}")
+
+    def select_sql(self, columns: Optional[Sequence[str]] = None, paged: bool = False) -> str:
+        columns = tuple(columns or self.query_def.columns)
+
+        def build():
+            sql = (f"SELECT {', '.join(columns)} FROM {self.query_def.table} "
+                   f"WHERE {self.where_sql} ORDER BY {self.order_by}")
+            return sql + " LIMIT ? OFFSET ?" if paged else sql
+        return self._sql(('select', columns, paged), build)
+
+    def aggregate_sql(self, expressions: Sequence[str], group_by: Optional[str] = None) -> str:
+        expressions = tuple(expressions)
+
+        def build():
+            sql = f"SELECT {', '.join(expressions)} FROM {self.query_def.table} WHERE {self.where_sql}"
+            return f"{sql} GROUP BY {group_by} ORDER BY {group_by}" if group_by else sql
+        return self._sql(('aggregate', expressions, group_by), build)
+
+    def count(self, conn) -> int:
+        return conn.execute(self.count_sql, self.params).fetchone()[0]
+
+    def aggregate(self, conn, *expressions: str) -> Tuple:
+        """单行聚合，如 aggregate(conn, 'SUM(profit)', 'SUM(pending_amount)')"""
+        return conn.execute(self.aggregate_sql(expressions), self.params).fetchone()
+
+    def grouped(self, conn, group_by: str, *expressions: str):
+        """按 group_by 分组聚合，返回游标 (第一列为分组值)"""
+        return conn.execute(self.aggregate_sql((group_by,) + expressions, group_by), self.params)
+
+    def page(self, conn, limit: int, offset: int, columns: Optional[Sequence[str]] = None):
+        return conn.execute(self.select_sql(columns, paged=True), self.params + (limit, offset)).fetchall()
+
+    def iter_rows(self, conn, columns: Optional[Sequence[str]] = None):
+        """按列表排序返回全部匹配行的游标，用于流式导出"""
+        return conn.execute(self.select_sql(columns), self.params)
+
+
+@lru_cache(maxsize=256)
+def compile_spec(spec: FilterSpec) -> CompiledQuery:
+    """编译筛选描述 (按 spec 缓存)"""
+    query_def = QUERY_DEFS[spec.query]
+    clauses = [query_def.base_where] if query_def.base_where else []
+    params = []
+    for name, value in spec.filters:
+        built = query_def.filters[name](value)
+        if built is None:
+            continue
+        sql, values = built
+        clauses.append(sql)
+        params.extend(values)
+    where_sql = ' AND '.join(clauses) or '1'
+    order_by = query_def.sorts.get(spec.sort, query_def.default_sort)
+    return CompiledQuery(query_def, where_sql, tuple(params), order_by)
+
+
+# ---------------------------------------------------------------- 各列表的查询定义
+
+register('customers', QueryDef(
+    table='customers',
+    columns=['id', 'company_name', 'contact_person', 'phone', 'status', 'notes', 'position', 'mobile', 'email'],
+    filters={
+        'search': like_any(['company_name', 'contact_person', 'phone']),
+        'status': lambda value: None if value == '所有状态' else ("status = ?", (value,)),
+    },
+    sorts={
+        '创建时间 (新→旧)': 'id DESC',
+        '创建时间 (旧→新)': 'id ASC',
+        '公司名称 (A→Z)': 'company_name ASC',
+        '公司名称 (Z→A)': 'company_name DESC',
+        '默认排序': 'company_name ASC',
+    },
+    default_sort='id DESC',
+))
+
+register('business', QueryDef(
+    table='business',
+    columns=['id', 'company_name', 'business_name', 'business_type', 'secondary_business',
+             'company_password', 'public_info', 'remarks',
+             'deal_business', 'proxy_start_date', 'proxy_end_date',
+             'proxy_accounting', 'business_agent', 'other_business'],
+    filters={
+        'search': like_any(['company_name', 'business_name']),
+    },
+    sorts={
+        '创建时间 (新→旧)': 'create_time DESC',
+        '创建时间 (旧→新)': 'create_time ASC',
+        '公司名称 (A→Z)': 'company_name ASC',
+        '公司名称 (Z→A)': 'company_name DESC',
+    },
+    default_sort='create_time DESC',
+))
+
+# 待收/逾期按本地日期判断，写在 SQL 中使缓存的编译结果跨天仍然有效
+_FINANCE_STATUS = {
+    '待收款': "pending_amount > 0 AND (pending_date IS NULL OR pending_date = '' "
+              "OR pending_date >= date('now', 'localtime'))",
+    '已逾期': "pending_amount > 0 AND pending_date < date('now', 'localtime') AND pending_date != ''",
+    '已结清': "pending_amount <= 0",
+}
+
+register('finance', QueryDef(
+    table='finance',
+    columns=['id', 'company_name', 'amount', 'cost', 'profit', 'due_date', 'notes',
+             'pending_amount', 'pending_date', 'payment_method', 'contract_status',
+             'project_status', 'invoice_status'],
+    filters={
+        'search': like_any(['company_name', 'CAST(amount AS TEXT)', 'due_date', 'notes']),
+        'year': equals("strftime('%Y', due_date)"),
+        'month': equals("strftime('%m', due_date)"),
+        'status': choice(_FINANCE_STATUS),
+        'debtors': flag("pending_amount > 0"),
+        # 导出/统计对话框的项目名称和日期范围
+        'company': like_any(['company_name']),
+        'start_date': compare('due_date', '>='),
+        'end_date': compare('due_date', '<='),
+    },
+    sorts={
+        '日期 (新→旧)': 'due_date DESC',
+        '日期 (旧→新)': 'due_date ASC',
+        '金额 (高→低)': 'amount DESC',
+        '金额 (低→高)': 'amount ASC',
+    },
+    default_sort='due_date DESC',
+))
+
+_CONTRACT_STATUS = {
+    "草稿": "draft",
+    "执行中": "active",
+    "已完成": "completed",
+    "已过期": "expired",
+    "已终止": "terminated",
+}
+
+register('contracts', QueryDef(
+    table='contracts c',
+    columns=['c.id', 'c.contract_number', 'c.title', 'c.contract_type',
+             'c.party_a', 'c.party_b', 'c.signing_date', 'c.expiration_date',
+             'c.amount', 'c.status', 'c.remarks', 'c.category_id', 'c.category_ids'],
+    filters={
+        'search': like_any(['c.title', 'c.contract_number', 'c.party_a', 'c.party_b']),
+        'type': choice({
+            "收款合同": "c.contract_type = 'incoming'",
+            "付款合同": "c.contract_type = 'outgoing'",
+        }),
+        # 兼容旧的 category_id 和新的逗号分隔 category_ids (两端补逗号保证精确匹配)
+        'category': lambda value: (
+            "(c.category_id = ? OR (',' || IFNULL(c.category_ids, '') || ',') LIKE ?)",
+            (value, f"%,{value},%")
+        ),
+        'status': lambda value: ("c.status = ?", (_CONTRACT_STATUS[value],)) if value in _CONTRACT_STATUS else None,
+    },
+    sorts={
+        '创建时间 (新→旧)': 'c.created_at DESC',
+        '创建时间 (旧→新)': 'c.created_at ASC',
+        '合同名称 (A→Z)': 'c.title ASC',
+        '合同名称 (Z→A)': 'c.title DESC',
+        '金额 (高→低)': 'c.amount DESC',
+        '金额 (低→高)': 'c.amount ASC',
+    },
+    default_sort='c.created_at DESC',
+    base_where='c.is_deleted = 0',
+))
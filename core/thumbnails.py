@@ -0,0 +1,133 @@
+"""附件缩略图的渲染和磁盘缓存 (不依赖 Qt)
+
+PDF 渲染第一页，图片按原图缩放，统一输出 PNG。磁盘缓存以 (内容哈希, 尺寸) 为键，
+总大小超过上限时按最近使用时间淘汰 (命中时更新文件修改时间)。
+PyMuPDF 不支持多线程同时操作，渲染统一在 RENDER_LOCK 内进行；读取缓存不受影响。
+
+与 core/invoice_layout.py 相同，日志直接写入 "CustomerManager" 记录器，PyMuPDF 在渲染时才导入，
+不经过 core.logger / core.lazy_imports (它们依赖 PyQt5)。
+"""
+import os
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger('CustomerManager')
+
+# 可以生成缩略图的扩展名
+THUMBNAIL_TYPES = ('pdf', 'png', 'jpg', 'jpeg', 'bmp', 'gif', 'tif', 'tiff', 'webp')
+
+RENDER_LOCK = threading.Lock()
+
+
+def file_type(file_name):
+    """按扩展名判断类型，不支持缩略图时返回 None"""
+    ext = os.path.splitext(file_name or '')[1].lower().lstrip('.')
+    return ext if ext in THUMBNAIL_TYPES else None
+
+
+def content_key(path, sha256=None):
+    """缓存键：有内容哈希时直接使用，否则用路径、修改时间和大小生成"""
+    if sha256:
+        return sha256
+    st = os.stat(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}".encode('utf-8')).hexdigest()
+
+
+def render_thumbnail(path, size, filetype=None):
+    """渲染缩略图 (最长边 size 像素)，返回 PNG 数据
+
+    filetype 用于没有扩展名的文件 (如附件存储中的文件)。
+    """
+    import fitz as pymupdf
+    with RENDER_LOCK:
+        doc = pymupdf.open(path, filetype=filetype) if filetype else pymupdf.open(path)
+        try:
+            if doc.page_count == 0:
+                raise ValueError("文件没有可显示的页面")
+            page = doc.load_page(0)
+            scale = size / max(page.rect.width, page.rect.height, 1)
+            pix = page.get_pixmap(matrix=pymupdf.Matrix(scale, scale), alpha=False)
+            return pix.tobytes('png')
+        finally:
+            doc.close()
+
+
+class ThumbnailCache:
+    """磁盘缩略图缓存 (线程安全)
+
+    Args:
+        root: 缓存目录
+        max_bytes: 总大小上限，超过后淘汰到上限的 80%
+    """
+
+    def __init__(self, root, max_bytes=64 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._total = None
+        self._lock = threading.Lock()
+
+    def _path(self, key, size):
+        return os.path.join(self.root, f"{key}_{size}.png")
+
+    def get(self, key, size):
+        path = self._path(key, size)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # 记录最近使用
+            return data
+        except OSError:
+            return None
+
+    def put(self, key, size, data):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key, size)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan_total()
+            else:
+                self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def get_or_render(self, key, size, path, filetype=None):
+        """读取缓存，未命中时渲染并写入缓存"""
+        data = self.get(key, size)
+        if data is None:
+            data = render_thumbnail(path, size, filetype)
+            self.put(key, size, data)
+        return data
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.name.endswith('.png'):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _scan_total(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """按最近使用时间从旧到新删除，直到总大小降到上限的 80%"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.8
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._total = total
+        logger.debug(f"[缩略图] 缓存超过上限，已淘汰 {removed} 个，当前 {total / 1024 / 1024:.1f} MB")
@@ -0,0 +1,69 @@
+import time
+from contextlib import contextmanager
+
+# 注意：本模块需在 main.py 中最先导入以尽早确定时间原点，
+# 因此不在顶层导入 core.logger(它会连带导入 PyQt5.QtWidgets)。
+
+
+def _log(message):
+    from core.logger import logger
+    logger.info(message)
+
+
+class StartupTimeline:
+    """启动时间线记录器
+
+    记录启动各阶段(认证初始化、样式加载、登录窗口显示、数据库打开、迁移、首页首次绘制)
+    相对进程启动的时间点和耗时，可随时通过 dump() 输出。
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []  # (名称, 开始偏移ms, 耗时ms 或 None)
+        self._marked = set()
+
+    def mark(self, name, once=True):
+        """记录一个时间点"""
+        if once and name in self._marked:
+            return
+        self._marked.add(name)
+        offset = (time.perf_counter() - self.origin) * 1000
+        self.events.append((name, offset, None))
+        _log(f"[启动] {name} @ {offset:.0f}ms")
+
+    @contextmanager
+    def phase(self, name):
+        """记录一个阶段的起止"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            offset = (start - self.origin) * 1000
+            duration = (end - start) * 1000
+            self._marked.add(name)
+            self.events.append((name, offset, duration))
+            _log(f"[启动] {name} 耗时 {duration:.0f}ms (@ {offset:.0f}ms)")
+
+    def elapsed(self, name):
+        """返回某事件相对启动的结束时间(ms)，不存在返回 None"""
+        for event_name, offset, duration in self.events:
+            if event_name == name:
+                return offset + (duration or 0)
+        return None
+
+    def dump(self):
+        """生成文本报告并写入日志"""
+        lines = ["启动时间线:"]
+        for name, offset, duration in sorted(self.events, key=lambda e: e[1]):
+            if duration is None:
+                lines.append(f"  {offset:8.0f} ms  {name}")
+            else:
+                lines.append(f"  {offset:8.0f} ms  {name} ({duration:.0f} ms)")
+        report = "\n".join(lines)
+        _log(report)
+        return report
+
+
+# 全局实例，进程启动时创建
+startup_timeline = StartupTimeline()
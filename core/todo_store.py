@@ -0,0 +1,187 @@
+"""待办事项和便签的共享存储
+
+首页和独立的待办/便签页面共用 DatabaseManager.todo_store：数据只在第一次使用时从数据库读取，
+之后每次修改只更新对应的一行并同步修改内存中的列表，再通过 changed 信号通知各界面刷新，
+刷新时直接使用缓存，不再重新读取数据库。
+
+待办排序: 未完成在前，同一状态内按 position (手动调整的顺序)，再按创建先后。
+"""
+from datetime import datetime
+from PyQt5.QtCore import QObject, pyqtSignal
+from core.logger import logger
+
+STATUS_OPEN = 'open'
+STATUS_DONE = 'done'
+
+
+class TodoStore(QObject):
+    """待办/便签存储 (只在 GUI 线程使用主连接)"""
+
+    # 数据变化时发出，参数为 "todos" 或 "notes"
+    changed = pyqtSignal(str)
+
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    def __init__(self, db_manager):
+        super().__init__()
+        self.db_manager = db_manager
+        self._todos = None
+        self._notes = None
+
+    @property
+    def conn(self):
+        return self.db_manager.conn
+
+    def invalidate(self):
+        """丢弃缓存 (如恢复备份后)，下次访问时重新读取"""
+        self._todos = None
+        self._notes = None
+        self.changed.emit('todos')
+        self.changed.emit('notes')
+
+    def _now(self):
+        return datetime.now().strftime(self.TIME_FORMAT)
+
+    # ---------------------------------------------------------------- 待办
+
+    @staticmethod
+    def _sort_key(todo):
+        return (todo['completed'], todo['position'], todo['id'])
+
+    def todos(self):
+        """全部待办 (dict: id, text, completed, position, due, created_at)，按显示顺序排列"""
+        if self._todos is None:
+            rows = self.conn.execute(
+                "SELECT id, text, status, position, due, created_at FROM todos "
+                "ORDER BY status = ?, position, id", (STATUS_DONE,)
+            ).fetchall()
+            self._todos = [
+                {'id': row[0], 'text': row[1], 'completed': row[2] == STATUS_DONE,
+                 'position': row[3], 'due': row[4] or '', 'created_at': row[5]}
+                for row in rows
+            ]
+        return self._todos
+
+    def _find(self, todo_id):
+        for todo in self.todos():
+            if todo['id'] == todo_id:
+                return todo
+        return None
+
+    def add(self, text, due=None):
+        """添加待办 (排在未完成事项末尾)，返回新 id"""
+        text = text.strip()
+        if not text:
+            raise ValueError("待办事项不能为空")
+        todos = self.todos()
+        position = max((t['position'] for t in todos), default=-1) + 1
+        now = self._now()
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO todos (text, status, position, due, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (text, STATUS_OPEN, position, due or None, now, now)
+            )
+        todos.append({'id': cursor.lastrowid, 'text': text, 'completed': False,
+                      'position': position, 'due': due or '', 'created_at': now})
+        todos.sort(key=self._sort_key)
+        self.changed.emit('todos')
+        return cursor.lastrowid
+
+    def update(self, todo_id, **fields):
+        """修改待办的 text / completed / due，只更新变化的列"""
+        todo = self._find(todo_id)
+        if todo is None:
+            return False
+        columns, params = [], []
+        if 'text' in fields and fields['text'].strip() != todo['text']:
+            columns.append("text = ?")
+            params.append(fields['text'].strip())
+        if 'completed' in fields and bool(fields['completed']) != todo['completed']:
+            columns += ["status = ?", "completed_at = ?"]
+            params += [STATUS_DONE, self._now()] if fields['completed'] else [STATUS_OPEN, None]
+        if 'due' in fields and (fields['due'] or '') != todo['due']:
+            columns.append("due = ?")
+            params.append(fields['due'] or None)
+        if not columns:
+            return False
+        with self.conn:
+            self.conn.execute(f"UPDATE todos SET {', '.join(columns)}, updated_at = ? WHERE id = ?",
+                              params + [self._now(), todo_id])
+        if 'text' in fields:
+            todo['text'] = fields['text'].strip()
+        if 'completed' in fields:
+            todo['completed'] = bool(fields['completed'])
+        if 'due' in fields:
+            todo['due'] = fields['due'] or ''
+        self._todos.sort(key=self._sort_key)
+        self.changed.emit('todos')
+        return True
+
+    def set_completed(self, todo_id, completed):
+        return self.update(todo_id, completed=completed)
+
+    def move(self, todo_id, offset):
+        """在同一状态的事项中上移 (offset < 0) 或下移，只交换两行的 position"""
+        todo = self._find(todo_id)
+        if todo is None:
+            return False
+        group = [t for t in self.todos() if t['completed'] == todo['completed']]
+        index = group.index(todo) + offset
+        if not 0 <= index < len(group):
+            return False
+        other = group[index]
+        if other['position'] == todo['position']:
+            # 旧数据的 position 可能相同，先按当前顺序重新编号
+            with self.conn:
+                self.conn.executemany("UPDATE todos SET position = ? WHERE id = ?",
+                                      [(i, t['id']) for i, t in enumerate(group)])
+            for i, t in enumerate(group):
+                t['position'] = i
+        todo['position'], other['position'] = other['position'], todo['position']
+        with self.conn:
+            self.conn.executemany("UPDATE todos SET position = ? WHERE id = ?",
+                                  [(todo['position'], todo['id']), (other['position'], other['id'])])
+        self._todos.sort(key=self._sort_key)
+        self.changed.emit('todos')
+        return True
+
+    def delete(self, todo_ids):
+        """删除指定的待办，返回删除的条数"""
+        todo_ids = set(todo_ids)
+        if not todo_ids:
+            return 0
+        with self.conn:
+            cursor = self.conn.executemany("DELETE FROM todos WHERE id = ?", [(i,) for i in todo_ids])
+        self._todos = [t for t in self.todos() if t['id'] not in todo_ids]
+        self.changed.emit('todos')
+        return cursor.rowcount
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM todos")
+        self._todos = []
+        self.changed.emit('todos')
+
+    # ---------------------------------------------------------------- 便签
+
+    def notes(self):
+        if self._notes is None:
+            row = self.conn.execute("SELECT content FROM notes ORDER BY id LIMIT 1").fetchone()
+            self._notes = row[0] if row else ''
+        return self._notes
+
+    def save_notes(self, content):
+        if content == self.notes():
+            return
+        now = self._now()
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE notes SET content = ?, updated_at = ? WHERE id = (SELECT MIN(id) FROM notes)",
+                (content, now)
+            )
+            if cursor.rowcount == 0:
+                self.conn.execute("INSERT INTO notes (content, created_at, updated_at) VALUES (?, ?, ?)",
+                                  (content, now, now))
+        self._notes = content
+        logger.debug("便签已保存")
+        self.changed.emit('notes')
@@ -2,17 +2,97 @@ import os
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QTabWidget, QWidget, QPushButton,
     QFileDialog, QLabel, QListWidget, QMessageBox, QProgressBar,
-    QLineEdit, QHBoxLayout
+    QLineEdit, QHBoxLayout, QProgressDialog
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QThreadPool, pyqtSignal
 from core.backup import BackupManager
+from core.async_utils import Worker
+from core.logger import logger
+
+
+def run_restore(parent, main_window, backup_path, on_finished=None):
+    """在程序运行中从备份恢复数据库
+
+    解压和校验 (quick_check、结构版本) 在后台线程写入临时文件，期间程序照常使用；
+    校验通过后等待后台任务结束 (定时器轮询，界面不冻结)，协调关闭数据库连接，用 os.replace
+    替换文件，再重新打开数据库并刷新界面。校验失败或后台任务未能及时结束时当前数据库不受影响。on_finished(success) 在结束后调用。
+    """
+    backup_manager = main_window.app.backup_manager
+    db_manager = main_window.app.db_manager
+
+    progress = QProgressDialog('正在解压并校验备份...', None, 0, 100, parent)
+    progress.setWindowTitle('正在恢复')
+    progress.setCancelButton(None)
+    progress.setWindowModality(Qt.ApplicationModal)
+    progress.setMinimumDuration(0)
+    progress.show()
+
+    def finish(success):
+        if on_finished:
+            on_finished(success)
+
+    def abort(message):
+        progress.close()
+        main_window.resume_background_services()
+        QMessageBox.critical(parent, '恢复失败', message)
+        finish(False)
+
+    def on_prepared(prepared):
+        # 不阻塞界面地等待后台任务释放数据库连接
+        progress.setLabelText('正在等待后台任务结束...')
+        main_window.wait_database_users(lambda idle: replace(prepared, idle))
+
+    def replace(prepared, idle):
+        busy_message = '后台任务未能及时结束，已取消恢复，当前数据库未做任何修改。\n请稍后重试。'
+        if not idle:
+            backup_manager.discard_restore(prepared)
+            abort(busy_message)
+            return
+        progress.setLabelText('正在替换数据库...')
+        try:
+            if not db_manager.shutdown():
+                backup_manager.discard_restore(prepared)
+                db_manager.reopen()
+                abort(busy_message)
+                return
+            try:
+                backup_manager.commit_restore(prepared)
+            finally:
+                # 替换失败时重新打开原数据库
+                db_manager.reopen()
+        except Exception as e:
+            backup_manager.discard_restore(prepared)
+            logger.error(f"[恢复] 替换数据库失败: {e}")
+            abort(f'替换数据库时发生错误:\n{e}')
+            return
+        main_window.reload_after_restore()
+        progress.close()
+        QMessageBox.information(parent, '恢复成功', '数据库已从备份恢复，界面数据已重新加载。')
+        finish(True)
+
+    def on_error(error):
+        progress.close()
+        QMessageBox.critical(
+            parent, '恢复失败',
+            f'备份文件无法恢复，当前数据库未做任何修改:\n{error[1]}'
+        )
+        finish(False)
+
+    worker = Worker(backup_manager.prepare_restore, backup_path)
+    worker.kwargs['progress_callback'] = worker.signals.progress.emit
+    worker.signals.progress.connect(progress.setValue)
+    worker.signals.result.connect(on_prepared)
+    worker.signals.error.connect(on_error)
+    QThreadPool.globalInstance().start(worker)
+
 
 class BackupRestoreDialog(QDialog):
     """备份恢复对话框"""
     
-    def __init__(self, backup_manager: BackupManager, parent=None):
+    def __init__(self, backup_manager: BackupManager, parent=None, main_window=None):
         super().__init__(parent)
         self.backup_manager = backup_manager
+        self.main_window = main_window
         self.setWindowTitle("数据备份与恢复")
         self.setMinimumSize(500, 400)
         
@@ -54,15 +134,13 @@ class BackupRestoreDialog(QDialog):
         layout.addWidget(self.browse_backup_btn)
         
         # 文件列表
-        self.file_list_label = QLabel("将备份以下文件:")
+        self.file_list_label = QLabel("将备份以下数据库 (在线快照，已包含 -wal 中尚未写回的内容):")
         layout.addWidget(self.file_list_label)
         
         self.file_list = QListWidget()
         self.file_list.addItems([
             "data/app_data.db",
-            "data/business.db",
-            "data/app_data.db-wal",
-            "data/app_data.db-shm"
+            "data/business.db"
         ])
         layout.addWidget(self.file_list)
         
@@ -91,18 +169,15 @@ class BackupRestoreDialog(QDialog):
             <li><strong>清理策略:</strong> 仅保留最近7天的备份文件，过期自动清理</li>
         </ul>
 
-        <h2>手动恢复步骤:</h2>
-        <ol>
-            <li>完全退出本应用程序</li>
-            <li>打开软件根目录下的 data 目录</li>
-            <li>删除该目录下的所有文件</li>
-            <li>解压备份ZIP文件到 data 目录</li>
-            <li>重新启动应用程序</li>
-        </ol>
+        <h2>恢复说明:</h2>
+        <ul>
+            <li>选择备份ZIP文件或增量快照清单后点击"开始恢复"，无需退出程序</li>
+            <li>备份先解压到临时文件并做完整性和版本校验，校验失败时当前数据不受影响</li>
+            <li>校验通过后替换数据库并自动重新加载数据</li>
+        </ul>
         
         <h3>注意事项:</h3>
         <ul>
-            <li>恢复前请确保应用程序已完全退出</li>
             <li>建议先手动执行一次备份再进行恢复</li>
         </ul>
         """)
@@ -141,7 +216,7 @@ class BackupRestoreDialog(QDialog):
     def select_restore_file(self):
         """选择备份文件"""
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择备份文件", "", "备份文件 (*.zip);;所有文件 (*)"
+            self, "选择备份文件", "", "备份文件 (*.zip);;增量快照 (snapshot_*.json);;所有文件 (*)"
         )
         if file_path:
             self.restore_file_edit.setText(file_path)
@@ -190,18 +265,8 @@ class BackupRestoreDialog(QDialog):
         if reply != QMessageBox.Yes:
             return
             
-        # 创建恢复线程
-        self.restore_thread = RestoreThread(
-            self.backup_manager,
-            backup_path=backup_path
-        )
-        self.restore_thread.progress_updated.connect(
-            self.restore_progress.setValue
-        )
-        self.restore_thread.finished.connect(self.on_restore_finished)
-        self.restore_thread.start()
-        
         self.restore_btn.setEnabled(False)
+        run_restore(self, self.main_window, backup_path, on_finished=self.on_restore_finished)
     
     def on_backup_finished(self, success, message):
         """备份完成处理"""
@@ -213,15 +278,10 @@ class BackupRestoreDialog(QDialog):
         else:
             QMessageBox.critical(self, "错误", message)
     
-    def on_restore_finished(self, success, message):
+    def on_restore_finished(self, success):
         """恢复完成处理"""
         self.restore_btn.setEnabled(True)
         self.restore_progress.setValue(100 if success else 0)
-        
-        if success:
-            QMessageBox.information(self, "完成", message)
-        else:
-            QMessageBox.critical(self, "错误", message)
 
 class BackupThread(QThread):
     """备份线程"""
@@ -235,30 +295,12 @@ class BackupThread(QThread):
     
     def run(self):
         try:
-            backup_path = self.backup_manager.create_backup(self.backup_dir)
+            backup_path = self.backup_manager.create_backup(
+                self.backup_dir, progress_callback=self.progress_updated.emit
+            )
             if backup_path:
                 self.finished.emit(True, f"备份成功创建: {backup_path}")
             else:
                 self.finished.emit(False, "备份创建失败")
         except Exception as e:
             self.finished.emit(False, str(e))
-
-class RestoreThread(QThread):
-    """恢复线程"""
-    progress_updated = pyqtSignal(int)
-    finished = pyqtSignal(bool, str)
-    
-    def __init__(self, backup_manager, backup_path=None):
-        super().__init__()
-        self.backup_manager = backup_manager
-        self.backup_path = backup_path
-    
-    def run(self):
-        try:
-            success = self.backup_manager.restore_backup(self.backup_path)
-            if success:
-                self.finished.emit(True, "数据库恢复成功")
-            else:
-                self.finished.emit(False, "数据库恢复失败")
-        except Exception as e:
-            self.finished.emit(False, str(e))
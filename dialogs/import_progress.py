@@ -0,0 +1,225 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QProgressBar, QPushButton, QMessageBox
+)
+from PyQt5.QtCore import Qt, QTimer, QSettings, QThreadPool
+from core.async_utils import Worker
+from core.import_pipeline import ImportJob, StagingImportJob
+from core.logger import logger
+
+
+class ImportProgressDialog(QDialog):
+    """后台导入进度对话框
+
+    导入在线程池中分块执行，对话框只负责显示进度和取消。
+    每提交一块就记录续导位置，取消或中断后再次导入同一文件时可从该位置继续。
+    task 默认为 job.run，暂存表模式提交阶段传入 job.apply。
+    """
+
+    RESUME_KEY = "import_resume/{table}"
+
+    def __init__(self, job: ImportJob, parent=None, task=None, title=None):
+        super().__init__(parent)
+        self.job = job
+        self.task = task or job.run
+        self.result_data = None
+        self._running = False
+        self._signature = job.file_signature()
+
+        self.setWindowTitle('导入数据')
+        self.setMinimumWidth(420)
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+
+        layout = QVBoxLayout(self)
+        self.title_label = QLabel(title or f'正在导入: {job.file_path}')
+        self.title_label.setWordWrap(True)
+        layout.addWidget(self.title_label)
+
+        # 文件未记录总行数时保持忙碌状态，收到百分比后切换为确定进度
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)
+        layout.addWidget(self.progress_bar)
+
+        self.status_label = QLabel('正在读取文件...')
+        layout.addWidget(self.status_label)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        self.cancel_btn = QPushButton('取消')
+        self.cancel_btn.clicked.connect(self._cancel)
+        btn_layout.addWidget(self.cancel_btn)
+        layout.addLayout(btn_layout)
+
+        # 定时刷新计数 (工作线程只更新整数属性)
+        self._status_timer = QTimer(self)
+        self._status_timer.setInterval(200)
+        self._status_timer.timeout.connect(self._update_status)
+
+    @classmethod
+    def saved_start_row(cls, job: ImportJob) -> int:
+        """同一文件上次未完成时返回续导行号，否则返回 0"""
+        settings = QSettings("CustomerManagement", "Settings")
+        key = cls.RESUME_KEY.format(table=job.spec.table)
+        if settings.value(f"{key}/file", "") != job.file_signature():
+            return 0
+        return settings.value(f"{key}/row", 0, type=int)
+
+    def _save_checkpoint(self, next_row):
+        """工作线程回调：记录下一次续导的起始行"""
+        settings = QSettings("CustomerManagement", "Settings")
+        key = self.RESUME_KEY.format(table=self.job.spec.table)
+        if next_row is None:
+            settings.remove(key)
+        else:
+            settings.setValue(f"{key}/file", self._signature)
+            settings.setValue(f"{key}/row", next_row)
+
+    def start(self):
+        self._running = True
+        self.job.checkpoint_callback = self._save_checkpoint
+        worker = Worker(self.task)
+        self.job.progress_callback = worker.signals.progress.emit
+        worker.signals.progress.connect(self._on_progress)
+        worker.signals.result.connect(self._on_result)
+        worker.signals.error.connect(self._on_error)
+        QThreadPool.globalInstance().start(worker)
+        self._status_timer.start()
+
+    def exec_(self):
+        QTimer.singleShot(0, self.start)
+        return super().exec_()
+
+    def _on_progress(self, percent):
+        if self.progress_bar.maximum() == 0:
+            self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(percent)
+
+    def _update_status(self):
+        result = self.job.result
+        total = f' / {result.total}' if result.total else ''
+        self.status_label.setText(
+            f'已处理 {result.processed}{total} 行，导入 {result.inserted}，'
+            f'重复 {result.duplicates}，错误 {result.error_count}'
+        )
+
+    def _cancel(self):
+        if self._running:
+            self.job.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.cancel_btn.setText('正在取消...')
+
+    def _on_result(self, result):
+        self._running = False
+        self._status_timer.stop()
+        self._update_status()
+        self.result_data = result
+        self.accept()
+
+    def _on_error(self, error):
+        self._running = False
+        self._status_timer.stop()
+        logger.error(f"导入失败: {error[2]}")
+        QMessageBox.critical(
+            self,
+            '导入失败',
+            f'导入过程中发生错误:\n{error[1]}\n'
+            '请检查文件格式是否正确'
+        )
+        self.reject()
+
+    def reject(self):
+        # 导入进行中关闭窗口视为取消，等待当前块提交后再关闭
+        if self._running:
+            self._cancel()
+            return
+        super().reject()
+
+
+def _with_errors(result, message):
+    """在提示信息后附加前几条行错误"""
+    if result.errors:
+        details = '\n'.join(f'第 {row} 行: {msg}' for row, msg in result.errors[:10])
+        more = f'\n... 共 {result.error_count} 条错误，详见日志' if result.error_count > 10 else ''
+        message += f'\n\n错误明细:\n{details}{more}'
+    return message
+
+
+def run_import(parent, db_manager, spec, file_path, chunk_size=None, staging=None):
+    """在后台执行导入并显示结果，返回 ImportResult (失败或取消提交返回 None)
+
+    staging 为 None 时读取设置 import_staging_mode (默认启用暂存表预览模式)。
+    """
+    settings = QSettings("CustomerManagement", "Settings")
+    if chunk_size is None:
+        chunk_size = settings.value("import_chunk_size", 1000, type=int)
+    if staging is None:
+        staging = settings.value("import_staging_mode", True, type=bool)
+    if staging:
+        return _run_staging_import(parent, db_manager, spec, file_path, chunk_size)
+
+    job = ImportJob(db_manager, spec, file_path, chunk_size=chunk_size)
+    start_row = ImportProgressDialog.saved_start_row(job)
+    if start_row > 2:
+        reply = QMessageBox.question(
+            parent,
+            '继续导入',
+            f'该文件上次导入未完成 (已处理到第 {start_row - 1} 行)。\n是否从中断处继续?',
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            job.start_row = start_row
+
+    dialog = ImportProgressDialog(job, parent)
+    dialog.exec_()
+    result = dialog.result_data
+    if result is None:
+        return None
+
+    QMessageBox.information(parent, '导入完成', _with_errors(result, result.summary()))
+    return result
+
+
+def _run_staging_import(parent, db_manager, spec, file_path, chunk_size):
+    """暂存表模式：载入并预览分类统计，确认后再提交"""
+    job = StagingImportJob(db_manager, spec, file_path, chunk_size=chunk_size)
+    dialog = ImportProgressDialog(job, parent)
+    dialog.exec_()
+    result = dialog.result_data
+    if result is None:
+        return None
+    if result.cancelled:
+        QMessageBox.information(parent, '导入已取消', '导入已取消，未修改任何数据')
+        return None
+
+    if not result.new and not result.conflicts:
+        job.discard()
+        QMessageBox.information(
+            parent, '导入预览',
+            _with_errors(result, result.dry_run_summary() + '\n\n没有需要导入的数据')
+        )
+        return None
+
+    box = QMessageBox(parent)
+    box.setWindowTitle('导入预览')
+    box.setIcon(QMessageBox.Question)
+    box.setText(_with_errors(result, result.dry_run_summary()))
+    insert_btn = box.addButton('导入新记录', QMessageBox.AcceptRole)
+    upsert_btn = None
+    if result.conflicts:
+        upsert_btn = box.addButton('导入并更新冲突记录', QMessageBox.AcceptRole)
+    box.addButton('取消', QMessageBox.RejectRole)
+    box.exec_()
+    clicked = box.clickedButton()
+    if clicked not in (insert_btn, upsert_btn) or clicked is None:
+        job.discard()
+        return None
+
+    upsert = clicked is upsert_btn
+    dialog = ImportProgressDialog(job, parent, task=lambda: job.apply(upsert), title='正在提交导入数据...')
+    dialog.cancel_btn.setEnabled(False)  # 提交在单个事务中完成，不支持中途取消
+    dialog.exec_()
+    result = dialog.result_data
+    if result is None:
+        return None
+
+    QMessageBox.information(parent, '导入完成', _with_errors(result, result.summary()))
+    return result
@@ -0,0 +1,158 @@
+"""发票批量拼版 (命令行，无界面)
+
+按发票系统的拼版规则 (core/invoice_layout.py) 把目录或通配符匹配到的发票合并为 PDF，
+按 --pages-per-file 分成多个文件，各文件在进程池中并行生成，最后写出 JSON 报告。
+
+用法:
+    python invoice_batch.py 发票/2024-* scans/*.pdf -o out/invoices.pdf
+    python invoice_batch.py 发票 --recursive --layout 6_per_page --paper A4 --landscape --workers 4
+    python invoice_batch.py 发票 --config invoice_config.json   # 使用发票窗口保存的配置
+
+布局预设: 2_per_page, 3_per_page, 4_per_page, 6_per_page, hsr (高铁票, 每页 4 张)
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import logging
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core.invoice_layout import (
+    LayoutSpec, LAYOUTS, PAPER_SIZES, INPUT_EXTENSIONS, export_pdf, export_part_paths, spec_from_config
+)
+
+logger = logging.getLogger('CustomerManager')
+
+
+def collect_files(inputs, recursive=False):
+    """展开目录、通配符和文件路径；每项内部按文件名排序，重复的文件只保留第一次出现"""
+    files = []
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                matches = [os.path.join(root, name) for root, _, names in os.walk(item) for name in names]
+            else:
+                matches = [os.path.join(item, name) for name in os.listdir(item)]
+        elif any(c in item for c in '*?['):
+            matches = glob.glob(item, recursive=True)
+        elif os.path.isfile(item) and item.lower().endswith(INPUT_EXTENSIONS):
+            matches = [item]
+        else:
+            logger.warning(f"跳过不支持或不存在的文件: {item}")
+            continue
+        for path in sorted(matches):
+            if not path.lower().endswith(INPUT_EXTENSIONS) or not os.path.isfile(path):
+                continue
+            real = os.path.realpath(path)
+            if real not in seen:
+                seen.add(real)
+                files.append(path)
+    return files
+
+
+def build_spec(args):
+    """命令行参数 -> LayoutSpec (--config 作为基础，显式给出的参数覆盖它)"""
+    spec = LayoutSpec()
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            spec = spec_from_config(json.load(f))
+    overrides = {}
+    if args.paper:
+        if args.paper in PAPER_SIZES:
+            overrides['paper'] = args.paper
+        else:
+            width, _, height = args.paper.lower().partition('x')
+            overrides.update(paper='custom', width_mm=float(width), height_mm=float(height))
+    if args.landscape:
+        overrides['landscape'] = True
+    if args.margin is not None:
+        overrides['margins_mm'] = (args.margin,) * 4
+    if args.layout:
+        overrides.update(layout=args.layout, merge=True)
+    if args.no_cut:
+        overrides['cut_lines'] = False
+    # 拆分由本程序按文件分配给子进程，每个子进程只写一个文件
+    overrides['split_pages'] = 0
+    return spec._replace(**overrides)
+
+
+def run_part(spec, files, output_path):
+    """子进程中执行：生成一个 PDF，返回报告 (附带耗时)"""
+    started = time.perf_counter()
+    report = export_pdf(spec, files, output_path)
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="发票批量拼版")
+    parser.add_argument('inputs', nargs='+', help="发票目录、文件或通配符 (支持 **)")
+    parser.add_argument('-o', '--output', default='invoices.pdf', help="输出 PDF，拆分时自动编号 (默认 invoices.pdf)")
+    parser.add_argument('--report', help="JSON 报告路径 (默认与输出同名 .json)")
+    parser.add_argument('--config', help="发票窗口保存的 invoice_config.json")
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), help="布局预设")
+    parser.add_argument('--paper', help="纸张: A4 / A5 / Letter 或 宽x高 (毫米)")
+    parser.add_argument('--landscape', action='store_true', help="横向")
+    parser.add_argument('--margin', type=float, help="四边边距 (毫米)")
+    parser.add_argument('--no-cut', action='store_true', help="不画裁剪线")
+    parser.add_argument('--pages-per-file', type=int, default=200, help="每个输出文件的页数，0 表示不拆分 (默认 200)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="进程数")
+    parser.add_argument('--recursive', action='store_true', help="递归扫描目录")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    spec = build_spec(args)
+    files = collect_files(args.inputs, args.recursive)
+    if not files:
+        logger.error("没有找到发票文件")
+        return 1
+
+    # 按输出文件切分：每个文件的发票数 = 页数 x 每页张数
+    per_part = args.pages_per_file * spec.items_per_page() if args.pages_per_file > 0 else len(files)
+    chunks = [tuple(files[i:i + per_part]) for i in range(0, len(files), per_part)]
+    outputs = export_part_paths(args.output, len(chunks))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+    started = time.perf_counter()
+    parts = [None] * len(chunks)
+    failed = []
+    workers = max(1, min(args.workers, len(chunks)))
+    logger.info(f"{len(files)} 个文件 -> {len(chunks)} 个 PDF，{workers} 个进程")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_part, spec, chunk, output): n
+                   for n, (chunk, output) in enumerate(zip(chunks, outputs))}
+        for future in as_completed(futures):
+            n = futures[future]
+            try:
+                parts[n] = future.result()
+                parts[n]['output'] = outputs[n]
+                logger.info(f"[{n + 1}/{len(chunks)}] {outputs[n]}: {parts[n]['pages']} 页，"
+                            f"{parts[n]['seconds']:.1f} 秒")
+            except Exception as e:
+                logger.error(f"[{n + 1}/{len(chunks)}] {outputs[n]} 生成失败: {e}")
+                failed.append({'output': outputs[n], 'files': list(chunks[n]), 'error': str(e)})
+
+    done = [part for part in parts if part is not None]
+    report = {
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'spec': spec._asdict(),
+        'files': len(files),
+        'pages': sum(part['pages'] for part in done),
+        'seconds': round(time.perf_counter() - started, 3),
+        'outputs': [{key: part[key] for key in ('output', 'files', 'pages', 'distinct', 'seconds')} for part in done],
+        'errors': [error for part in done for error in part['errors']],
+        'failed': failed,
+    }
+    report_path = args.report or os.path.splitext(args.output)[0] + '.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"完成: {report['pages']} 页，{len(report['errors'])} 个文件出错，报告 {report_path}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,6 +8,7 @@ from PyQt5.QtGui import QColor, QPixmap
 import os
 from core.auth import AuthManager
 from core.version import VERSION
+from core.timeline import startup_timeline
 
 class ChangeUsernameDialog(QDialog):
     """修改用户名对话框"""
@@ -302,6 +303,7 @@ class LoginWindow(QWidget):
         """)
         login_btn.clicked.connect(self._handle_login)
         content_layout.addWidget(login_btn)
+        self.login_btn = login_btn
 
         # 进度条
         self.progress_bar = QProgressBar()
@@ -335,6 +337,10 @@ class LoginWindow(QWidget):
         # 窗口拖动支持
         self._drag_pos = None
         
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        startup_timeline.mark("登录窗口显示")
+        
     # 添加鼠标拖动窗口功能
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -395,62 +401,57 @@ class LoginWindow(QWidget):
             QMessageBox.warning(self, '错误', '请输入用户名和密码')
             return
             
-        # 检查账户是否被锁定
-        if self.auth_manager.is_locked(username):
-            remaining = self.auth_manager.get_lock_time(username)
-            QMessageBox.warning(
-                self, 
-                '账户锁定', 
-                f'账户已锁定，请{remaining}秒后再试'
-            )
-            return
+        if not self.login_btn.isEnabled():
+            return  # 正在验证
             
-        # 显示进度条并禁用输入
-        self.progress_bar.setVisible(True)
-        self.username_input.setEnabled(False)
-        self.password_input.setEnabled(False)
-        QApplication.processEvents()
+        # 显示进度条并禁用输入，密码验证在后台线程中执行，界面保持响应
+        self._set_busy(True)
+        self.auth_manager.authenticate_async(
+            username,
+            password,
+            lambda result: self._on_authenticated(username, result),
+            remember_username=remember_username,
+            remember_password=remember_password
+        )
 
-        try:
-            # 尝试认证
-            success, message = self.auth_manager.authenticate(
-                username, 
-                password, 
-                remember_username=remember_username,
-                remember_password=remember_password
-            )
-            
-            if success:
+    def _set_busy(self, busy):
+        self.progress_bar.setVisible(busy)
+        self.username_input.setEnabled(not busy)
+        self.password_input.setEnabled(not busy)
+        self.login_btn.setEnabled(not busy)
+
+    def _on_authenticated(self, username, result):
+        """后台验证完成"""
+        if result.success:
+            try:
                 # 登录成功，显示主窗口
                 self.app.create_main_window()
                 if hasattr(self.app.main_window, 'current_user'):
                     self.app.main_window.current_user = username
                 self.app.main_window.show()
                 self.close()
-            else:
-                # 恢复界面状态
-                self.progress_bar.setVisible(False)
-                self.username_input.setEnabled(True)
-                self.password_input.setEnabled(True)
-                
-                # 登录失败，显示错误信息
-                QMessageBox.warning(self, '登录失败', message)
-                
-                # 更新剩余尝试次数
-                remaining_attempts = 3 - self.auth_manager.get_failed_attempts(username)
-                if remaining_attempts <= 0:
-                    QTimer.singleShot(30000, lambda: 
-                        QMessageBox.information(
-                            self, 
-                            '解锁通知', 
-                            '您的账户已解锁，可以重新尝试登录'
-                        )
-                    )
-        except Exception as e:
-            self.progress_bar.setVisible(False)
-            self.username_input.setEnabled(True)
-            self.password_input.setEnabled(True)
-            QMessageBox.critical(self, '系统错误', f'登录过程发生异常: {str(e)}')
+            except Exception as e:
+                self._set_busy(False)
+                QMessageBox.critical(self, '系统错误', f'登录过程发生异常: {str(e)}')
+            return
+            
+        # 恢复界面状态
+        self._set_busy(False)
+        if result.locked_seconds:
+            QMessageBox.warning(self, '账户锁定', result.message)
+        else:
+            # 登录失败，显示错误信息
+            QMessageBox.warning(self, '登录失败', result.message)
+            
+        # 本次失败导致锁定时，到期后提示
+        if result.locked_seconds == self.auth_manager.LOCK_SECONDS:
+            QTimer.singleShot(result.locked_seconds * 1000, lambda: 
+                QMessageBox.information(
+                    self, 
+                    '解锁通知', 
+                    '您的账户已解锁，可以重新尝试登录'
+                )
+            )
 
 if __name__ == '__main__':
     from PyQt5.QtWidgets import QApplication
@@ -2,17 +2,19 @@ import sys
 import os
 import warnings
 from datetime import datetime
+# 最先导入：启动时间线以此为时间原点
+from core.timeline import startup_timeline
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 from PyQt5.QtWidgets import QApplication, QMainWindow, QStackedWidget, QButtonGroup, QWidget, QVBoxLayout, QLabel, QPushButton, QHBoxLayout, QStyle
-from PyQt5.QtCore import QFile, QTextStream, Qt, QSettings, QSize
+from PyQt5.QtCore import QFile, QTextStream, Qt, QSettings, QSize, QTimer
 from utils.paths import get_app_path, get_resource_path
 from core.auth import AuthManager
-from core.database import DatabaseManager
-from core.backup import BackupManager
 from core.logger import logger, install_exception_hook
 from login import LoginWindow
-from dialogs.search_result import SearchResultDialog
+from core.prewarm import ModulePrewarmer
+# 数据库、备份、搜索等模块在登录后才需要，延迟到 create_main_window 中导入
+startup_timeline.mark("模块导入完成")
 
 class MainApplication(QApplication):
     # 添加DPI感知设置
@@ -50,7 +52,9 @@ class MainApplication(QApplication):
         # 初始化认证模块 (登录界面需要)
         try:
             logger.info("正在初始化认证模块...")
-            self.auth_manager = AuthManager()
+            with startup_timeline.phase("认证模块初始化"):
+                # 认证库建表延迟到登录窗口显示之后
+                self.auth_manager = AuthManager(lazy_init=True)
             logger.info("认证模块初始化成功")
         except Exception as e:
             self._show_critical_error("认证模块初始化失败", f"无法初始化认证模块:\n{str(e)}")
@@ -59,7 +63,8 @@ class MainApplication(QApplication):
         # 加载样式表
         try:
             logger.info("正在加载样式表...")
-            self._load_stylesheet()
+            with startup_timeline.phase("样式表加载"):
+                self._load_stylesheet()
             logger.info("样式表加载成功")
         except Exception as e:
             logger.error(f"样式表加载失败: {str(e)}")
@@ -80,6 +85,8 @@ class MainApplication(QApplication):
                 (screen_geometry.height() - window_geometry.height()) // 2
             )
             logger.info("登录窗口显示成功")
+            # 登录窗口显示后再初始化认证数据库
+            QTimer.singleShot(0, self.auth_manager.ensure_db)
         except Exception as e:
             self._show_critical_error("登录窗口显示失败", f"无法显示登录窗口:\n{str(e)}")
             raise
@@ -91,14 +98,18 @@ class MainApplication(QApplication):
                 # 初始化核心模块（延迟加载）
                 if not hasattr(self, 'db_manager'):
                     logger.info("正在初始化数据库...")
-                    self.db_manager = DatabaseManager(get_app_path('data/app_data.db'))
+                    with startup_timeline.phase("数据库打开"):
+                        from core.database import DatabaseManager
+                        self.db_manager = DatabaseManager(get_app_path('data/app_data.db'))
                     logger.info(f"数据库初始化成功，路径: {self.db_manager.db_path}")
 
                 if not hasattr(self, 'backup_manager'):
+                    from core.backup import BackupManager
                     self.backup_manager = BackupManager(get_app_path('data/business.db'))
 
                 logger.info("正在创建主窗口...")
-                self.main_window = MainWindow(self)
+                with startup_timeline.phase("主窗口创建"):
+                    self.main_window = MainWindow(self)
                 self.main_window.move(50, 50)
                 
                 # 强制设置应用图标
@@ -129,6 +140,8 @@ class MainApplication(QApplication):
             logger.info("正在关闭数据库连接...")
             self.db_manager.close()
             logger.info("数据库连接已关闭")
+        if hasattr(self, 'auth_manager'):
+            self.auth_manager.close()
             
         # 2. 执行自动备份
         try:
@@ -269,6 +282,30 @@ class MainWindow(QMainWindow):
         # 默认显示首页
         self.btn_dashboard.setChecked(True)
         self.switch_to_dashboard()
+        
+        # 首页显示后空闲预热其它模块
+        self.prewarmer = ModulePrewarmer(self)
+        
+        # 空闲判断，供定时备份和数据库维护共用
+        from core.idle import IdleMonitor
+        self.idle_monitor = IdleMonitor(self)
+        
+        # 空闲时执行的定时备份
+        from core.backup_scheduler import BackupScheduler
+        self.backup_scheduler = BackupScheduler(self)
+        self.backup_scheduler.start()
+        
+        # 空闲时的数据库完整性检查
+        from core.maintenance import DatabaseMaintenance
+        self.maintenance = DatabaseMaintenance(self)
+        self.maintenance.start()
+        
+        # 替换数据库文件(恢复备份)前，由数据库管理器调用以停止后台任务
+        self.app.db_manager.add_shutdown_hook(self._stop_database_users)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.prewarmer.start()
 
 
     def _create_sidebar(self):
@@ -352,6 +389,7 @@ class MainWindow(QMainWindow):
         from PyQt5.QtWidgets import QInputDialog
         text, ok = QInputDialog.getText(self, '全局搜索', '请输入搜索关键词:')
         if ok and text:
+            from dialogs.search_result import SearchResultDialog
             dialog = SearchResultDialog(self, text, self.app.db_manager)
             dialog.exec_()
 
@@ -369,65 +407,80 @@ class MainWindow(QMainWindow):
     def switch_to_dashboard(self):
         self.stacked_widget.setCurrentWidget(self.dashboard)
         
-    def switch_to_customer(self):
-        if self.customer is None:
+    def ensure_module(self, key):
+        """确保模块窗口已创建并加入堆叠(不切换页面)，供导航和预热共用"""
+        widget = getattr(self, key, None)
+        if widget is not None:
+            return widget
+            
+        if key == 'customer':
             from modules.customer import CustomerWindow
-            self.customer = CustomerWindow(self.app.db_manager, self)
-            self.stacked_widget.addWidget(self.customer)
-            self.customer._load_customers()
-        self.stacked_widget.setCurrentWidget(self.customer)
+            widget = CustomerWindow(self.app.db_manager, self)
+        elif key == 'business':
+            from modules.business import BusinessWindow
+            widget = BusinessWindow(self.app.db_manager, self)
+        elif key == 'finance':
+            from modules.finance import FinanceWindow
+            widget = FinanceWindow(self.app.db_manager, self)
+        elif key == 'contract':
+            from modules.contract import ContractWindow
+            widget = ContractWindow(self.app.db_manager, self)
+        elif key == 'work_arrangement':
+            from modules.work_arrangement import WorkArrangementWindow
+            widget = WorkArrangementWindow(self.app.db_manager, self)
+        elif key == 'invoice_system':
+            from modules.invoice_system import InvoiceSystemWindow
+            widget = InvoiceSystemWindow(self)
+        elif key == 'web_nav':
+            from modules.web_nav import WebNavWindow
+            widget = WebNavWindow()
+        elif key == 'settings_window':
+            from modules.settings import SettingsWindow
+            widget = SettingsWindow(self)
+        else:
+            raise ValueError(f"未知模块: {key}")
+            
+        setattr(self, key, widget)
+        self.stacked_widget.addWidget(widget)
+        
+        # 列表类模块首次加载数据
+        if key == 'customer':
+            widget._load_customers()
+        elif key == 'business':
+            widget._load_business()
+        elif key == 'finance':
+            widget._load_finance()
+        elif key == 'contract':
+            widget._load_contracts()
+        return widget
+        
+    def _switch_to_module(self, key):
+        ModulePrewarmer.record_usage(key)
+        self.stacked_widget.setCurrentWidget(self.ensure_module(key))
+        
+    def switch_to_customer(self):
+        self._switch_to_module('customer')
         
     def switch_to_business(self):
-        if self.business is None:
-            from modules.business import BusinessWindow
-            self.business = BusinessWindow(self.app.db_manager, self)
-            self.stacked_widget.addWidget(self.business)
-            self.business._load_business()
-        self.stacked_widget.setCurrentWidget(self.business)
+        self._switch_to_module('business')
         
     def switch_to_finance(self):
-        if self.finance is None:
-            from modules.finance import FinanceWindow
-            self.finance = FinanceWindow(self.app.db_manager, self)
-            self.stacked_widget.addWidget(self.finance)
-            self.finance._load_finance()
-        self.stacked_widget.setCurrentWidget(self.finance)
+        self._switch_to_module('finance')
         
     def switch_to_contract(self):
-        if self.contract is None:
-            from modules.contract import ContractWindow
-            self.contract = ContractWindow(self.app.db_manager, self)
-            self.stacked_widget.addWidget(self.contract)
-            self.contract._load_contracts()
-        self.stacked_widget.setCurrentWidget(self.contract)
+        self._switch_to_module('contract')
         
     def switch_to_work_arrangement(self):
-        if self.work_arrangement is None:
-            from modules.work_arrangement import WorkArrangementWindow
-            self.work_arrangement = WorkArrangementWindow(self.app.db_manager, self)
-            self.stacked_widget.addWidget(self.work_arrangement)
-        self.stacked_widget.setCurrentWidget(self.work_arrangement)
+        self._switch_to_module('work_arrangement')
         
     def switch_to_invoice(self):
-        if self.invoice_system is None:
-            from modules.invoice_system import InvoiceSystemWindow
-            self.invoice_system = InvoiceSystemWindow(self)
-            self.stacked_widget.addWidget(self.invoice_system)
-        self.stacked_widget.setCurrentWidget(self.invoice_system)
+        self._switch_to_module('invoice_system')
 
     def switch_to_web_nav(self):
-        if self.web_nav is None:
-            from modules.web_nav import WebNavWindow
-            self.web_nav = WebNavWindow()
-            self.stacked_widget.addWidget(self.web_nav)
-        self.stacked_widget.setCurrentWidget(self.web_nav)
+        self._switch_to_module('web_nav')
         
     def switch_to_settings(self):
-        if self.settings_window is None:
-            from modules.settings import SettingsWindow
-            self.settings_window = SettingsWindow(self)
-            self.stacked_widget.addWidget(self.settings_window)
-        self.stacked_widget.setCurrentWidget(self.settings_window)
+        self._switch_to_module('settings_window')
         
     def switch_to_todo(self):
         """切换到待办事项窗口"""
@@ -445,10 +498,88 @@ class MainWindow(QMainWindow):
             self.stacked_widget.addWidget(self.notes_window)
         self.stacked_widget.setCurrentWidget(self.notes_window)
         
+    # 持有数据库状态的模块，恢复备份后重新创建
+    DATABASE_MODULES = ('customer', 'business', 'finance', 'contract', 'work_arrangement')
+
+    # 等待后台任务结束的时限和轮询间隔 (毫秒)
+    STOP_TIMEOUT_MS = 10000
+    STOP_POLL_MS = 50
+
+    def _database_pools(self):
+        """运行数据库任务的线程池"""
+        from PyQt5.QtCore import QThreadPool
+        pools = [QThreadPool.globalInstance()]
+        for key in self.DATABASE_MODULES:
+            pool = getattr(getattr(self, key, None), 'threadpool', None)
+            if pool is not None:
+                pools.append(pool)
+        return pools
+
+    def _stop_background_services(self):
+        self.prewarmer.stop()
+        self.backup_scheduler.stop()
+        self.maintenance.stop()
+
+    def resume_background_services(self):
+        """恢复备份结束 (成功或放弃) 后重新启动定时备份和数据库维护"""
+        self.backup_scheduler.start()
+        self.maintenance.start()
+
+    def _stop_database_users(self, timeout_ms=STOP_TIMEOUT_MS):
+        """停止预热和定时备份，并等待后台线程结束 (各任务会自行关闭其数据库连接)
+
+        数据库协调关闭的钩子；超时返回 False，调用方应放弃替换数据库文件。
+        """
+        self._stop_background_services()
+        for pool in self._database_pools():
+            if not pool.waitForDone(timeout_ms):
+                logger.warning("等待后台任务结束超时")
+                return False
+        return True
+
+    def wait_database_users(self, callback, timeout_ms=STOP_TIMEOUT_MS):
+        """停止后台服务，用定时器轮询等待后台线程结束，期间界面照常响应
+
+        全部结束后调用 callback(True)，超时调用 callback(False)。
+        """
+        from PyQt5.QtCore import QElapsedTimer
+        self._stop_background_services()
+        pools = self._database_pools()
+        elapsed = QElapsedTimer()
+        elapsed.start()
+        timer = QTimer(self)
+        timer.setInterval(self.STOP_POLL_MS)
+
+        def poll():
+            idle = all(pool.activeThreadCount() == 0 for pool in pools)
+            if not idle and not elapsed.hasExpired(timeout_ms):
+                return
+            timer.stop()
+            timer.deleteLater()
+            if not idle:
+                logger.warning("等待后台任务结束超时")
+            callback(idle)
+
+        timer.timeout.connect(poll)
+        timer.start()
+
+    def reload_after_restore(self):
+        """恢复备份并重新打开数据库后，丢弃已创建的数据模块，刷新首页"""
+        self.switch_to_dashboard()
+        self.btn_dashboard.setChecked(True)
+        for key in self.DATABASE_MODULES:
+            widget = getattr(self, key, None)
+            if widget is not None:
+                self.stacked_widget.removeWidget(widget)
+                widget.deleteLater()
+                setattr(self, key, None)
+        self.dashboard.update_data()
+        self.resume_background_services()
+
     def show_backup_dialog(self):
         """显示备份/恢复对话框"""
         from dialogs.backup_restore import BackupRestoreDialog
-        dialog = BackupRestoreDialog(self.app.backup_manager, self)
+        dialog = BackupRestoreDialog(self.app.backup_manager, self, main_window=self)
         dialog.exec_()
         
     def refresh_stats(self):
@@ -524,6 +655,10 @@ class MainWindow(QMainWindow):
                 2000
             )
         else:
+            self.prewarmer.stop()
+            self.backup_scheduler.stop()
+            self.maintenance.stop()
+            self.idle_monitor.stop()
             self.tray_icon.hide()
             event.accept()
             # Quit application
@@ -583,6 +718,10 @@ class MainWindow(QMainWindow):
 
 if __name__ == '__main__':
     logger.info("=== 应用程序启动 ===")
+    # --startup-timeline: 首页首次绘制后输出启动时间线
+    if '--startup-timeline' in sys.argv:
+        sys.argv.remove('--startup-timeline')
+        os.environ['CRM_DUMP_STARTUP_TIMELINE'] = '1'
     try:
         app = MainApplication(sys.argv)
         logger.info("主应用程序初始化完成")
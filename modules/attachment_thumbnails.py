@@ -0,0 +1,156 @@
+"""附件列表的缩略图：后台加载器和延迟加载的绘制代理
+
+ThumbnailDelegate 只在单元格被绘制 (即滚动到可见区域) 时请求缩略图；
+ThumbnailLoader 在独立线程池中读取磁盘缓存或用 PyMuPDF 渲染 (见 core/thumbnails.py)，
+完成后回到 GUI 线程放入内存缓存并发出 ready 信号，表格据此重绘。GUI 线程从不渲染。
+"""
+import os
+from collections import OrderedDict
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle
+from PyQt5.QtCore import Qt, QObject, QSize, QRect, QThreadPool, QSettings, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage, QPixmap, QColor
+from core.async_utils import Worker
+from core.logger import logger
+from core.thumbnails import ThumbnailCache
+
+# 单元格数据角色：{'key', 'path', 'filetype', 'name'}
+THUMBNAIL_ROLE = Qt.UserRole + 10
+
+_loader = None
+
+
+def thumbnail_loader(db_manager):
+    """全局共用的缩略图加载器 (缓存目录在数据库所在目录的 thumbnails 下)"""
+    global _loader
+    if _loader is None:
+        root = os.path.join(os.path.dirname(os.path.abspath(db_manager.db_path)), 'thumbnails')
+        _loader = ThumbnailLoader(root)
+    return _loader
+
+
+def _load_image(cache, key, size, path, filetype):
+    """线程池中执行：读取缓存或渲染，返回 QImage (QImage 可以在非 GUI 线程创建)"""
+    data = cache.get_or_render(key, size, path, filetype)
+    image = QImage.fromData(data, 'PNG')
+    if image.isNull():
+        raise ValueError("缩略图数据无效")
+    return image
+
+
+class ThumbnailLoader(QObject):
+    """缩略图加载器
+
+    配置(QSettings "CustomerManagement/Settings"):
+        thumbnail_cache_mb: 磁盘缓存上限(MB)，默认 64
+    """
+
+    # 内存中保留的缩略图个数
+    MEMORY_ITEMS = 200
+    # 渲染受 PyMuPDF 全局锁限制，两个线程即可让读缓存和渲染并行
+    MAX_THREADS = 2
+
+    ready = pyqtSignal(str, int)
+
+    def __init__(self, root):
+        super().__init__()
+        settings = QSettings("CustomerManagement", "Settings")
+        max_mb = settings.value("thumbnail_cache_mb", 64, type=int)
+        self.cache = ThumbnailCache(root, max_mb * 1024 * 1024)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(self.MAX_THREADS)
+        self._pixmaps = OrderedDict()
+        self._pending = set()
+        self._failed = set()
+
+    def pixmap(self, key, size):
+        """已加载的缩略图，未加载时返回 None"""
+        pixmap = self._pixmaps.get((key, size))
+        if pixmap is not None:
+            self._pixmaps.move_to_end((key, size))
+        return pixmap
+
+    def failed(self, key, size):
+        return (key, size) in self._failed
+
+    def request(self, key, size, path, filetype):
+        """请求加载 (重复请求和已失败的请求会被忽略)"""
+        item = (key, size)
+        if item in self._pending or item in self._failed or item in self._pixmaps:
+            return
+        self._pending.add(item)
+        worker = Worker(_load_image, self.cache, key, size, path, filetype)
+        worker.signals.result.connect(lambda image, item=item: self._on_loaded(item, image))
+        worker.signals.error.connect(lambda error, item=item: self._on_failed(item, error))
+        self.pool.start(worker)
+
+    def _on_loaded(self, item, image):
+        self._pending.discard(item)
+        self._pixmaps[item] = QPixmap.fromImage(image)
+        while len(self._pixmaps) > self.MEMORY_ITEMS:
+            self._pixmaps.popitem(last=False)
+        self.ready.emit(*item)
+
+    def _on_failed(self, item, error):
+        self._pending.discard(item)
+        self._failed.add(item)
+        logger.warning(f"[缩略图] 生成失败 {item[0][:12]}: {error[1]}")
+        self.ready.emit(*item)
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """缩略图列的绘制代理：可见时才请求加载，未加载时显示文件类型
+
+    parent 为使用它的视图。加载器是全局的，ready 连接到代理自身的槽，
+    视图 (及代理) 销毁时 PyQt 自动断开，不会调用已删除的控件。
+    """
+
+    def __init__(self, loader, size=64, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.size = size
+        self.placeholder = QColor("#909399")
+        self.view = parent
+        if parent is not None:
+            loader.ready.connect(self._on_ready)
+
+    @pyqtSlot(str, int)
+    def _on_ready(self, key, size):
+        """只重绘缩略图已加载完成的单元格"""
+        if size != self.size:
+            return
+        model = self.view.model()
+        for column in range(model.columnCount()):
+            if self.view.itemDelegateForColumn(column) is not self:
+                continue
+            for row in range(model.rowCount()):
+                index = model.index(row, column)
+                info = index.data(THUMBNAIL_ROLE)
+                if info and info.get('key') == key:
+                    self.view.viewport().update(self.view.visualRect(index))
+
+    def sizeHint(self, option, index):
+        return QSize(self.size + 8, self.size + 8)
+
+    def paint(self, painter, option, index):
+        info = index.data(THUMBNAIL_ROLE)
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        rect = QRect(0, 0, self.size, self.size)
+        rect.moveCenter(option.rect.center())
+        pixmap = None
+        if info and info.get('filetype'):
+            pixmap = self.loader.pixmap(info['key'], self.size)
+            if pixmap is None and not self.loader.failed(info['key'], self.size):
+                self.loader.request(info['key'], self.size, info['path'], info['filetype'])
+        painter.save()
+        if pixmap is not None:
+            scaled = pixmap.size().scaled(rect.size(), Qt.KeepAspectRatio)
+            target = QRect(0, 0, scaled.width(), scaled.height())
+            target.moveCenter(rect.center())
+            painter.drawPixmap(target, pixmap)
+        else:
+            painter.setPen(self.placeholder)
+            painter.drawRect(rect.adjusted(0, 0, -1, -1))
+            ext = os.path.splitext((info or {}).get('name', ''))[1].lstrip('.').upper() or '文件'
+            painter.drawText(rect, Qt.AlignCenter, ext[:4])
+        painter.restore()
@@ -1,7 +1,8 @@
 import os
 import json
+from itertools import chain
 from datetime import datetime
-from core.import_export import BaseImporterExporter, ImportExportError
+from core.import_export import BaseImporterExporter, ImportExportError, FILE_DIALOG_FILTER
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QPushButton, QTableWidget, QTableWidgetItem,
@@ -20,6 +21,7 @@ from utils.paths import get_app_path
 from core.logger import logger
 from modules.common_widgets import CustomerSelectionCombo, ModernDateEdit
 from core.async_utils import Worker
+from core.query_builder import FilterSpec, compile_spec
 
 class DynamicSelectionWidget(QWidget):
     """动态选择控件(支持复选和自定义添加)"""
@@ -413,7 +415,7 @@ class BusinessEditDialog(QDialog):
                     # 二级业务/成交业务控件已移除，不再设置
                     
                     # 修复公司密码字段
-                    password = str(row[col_idx['company_password']]) if row[col_idx['company_password']] else ''
+                    password = self.db_manager.decrypt_data(row[col_idx['company_password']]) or ''
                     self.company_password.setEchoMode(QLineEdit.Normal)
                     self.company_password.setText(password)
                     
@@ -498,7 +500,7 @@ class BusinessEditDialog(QDialog):
                 'other_business': '',
                 'proxy_start_date': self.proxy_start_date.date().toString('yyyy-MM-dd'),
                 'proxy_end_date': self.proxy_end_date.date().toString('yyyy-MM-dd'),
-                'company_password': self.company_password.text().strip(),
+                'company_password': self.db_manager.encrypt_data(self.company_password.text().strip()),
                 'public_info': self.public_info.toPlainText().strip(),
                 'remarks': self.remarks.toPlainText().strip(),
                 'create_time': now.strftime('%Y-%m-%d %H:%M:%S'),
@@ -901,9 +903,11 @@ class BusinessWindow(QWidget):
             new_value = widget.get_selected_items()
         else:
             new_value = widget.text()
-        
         # 更新数据库
         try:
+            if field_key == 'company_password':
+                # 数据库和列表项中只保存密文
+                new_value = self.db_manager.encrypt_data(new_value)
             with self.db_manager.conn:
                 cursor = self.db_manager.conn.cursor()
                 cursor.execute(f'UPDATE business SET {field_key} = ? WHERE id = ?', (new_value, self.current_biz_id))
@@ -938,7 +942,7 @@ class BusinessWindow(QWidget):
             'company_name': self.edit_widgets['company_name'].text(),
             'business_name': self.edit_widgets['business_name'].text(),
             'business_type': self.edit_widgets['business_type'].get_selected_items(),
-            'company_password': self.edit_widgets['company_password'].text(),
+            'company_password': self.db_manager.encrypt_data(self.edit_widgets['company_password'].text()),
             'public_info': self.edit_widgets['public_info'].toPlainText(),
                 'remarks': self.edit_widgets['remarks'].toPlainText(),
                 'proxy_start_date': self.edit_widgets['proxy_start_date'].date().toString('yyyy-MM-dd'),
@@ -1091,148 +1095,37 @@ class BusinessWindow(QWidget):
 
 
     def _import_business(self):
-        """从Excel文件导入业务数据(增量导入)"""
+        """从Excel/CSV文件导入业务数据(增量导入，后台分块执行)"""
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             '选择业务数据文件',
             '',
-            'Excel文件 (*.xlsx)'
+            FILE_DIALOG_FILTER
         )
         
         if not file_path:
             return
             
-        try:
-            # 初始化导入器
-            importer = BaseImporterExporter()
-            importer._required_columns = ['公司名称', '业务名称']
-            importer._column_mapping = {
-                '公司名称': 'company_name',
-                '业务名称': 'business_name',
-                '业务类型': 'business_type',
-                '二级业务': 'secondary_business',
-                '公司密码': 'company_password',
-                '公开信息': 'public_info',
-                '备注': 'remarks',
-                '代理记账': 'proxy_accounting',
-                '工商代办': 'business_agent',
-                '代理记账时间段': 'proxy_period',
-                '记账周期': 'proxy_period'
-            }
-            
-            # 获取现有数据用于去重
-            with self.db_manager.conn:
-                cursor = self.db_manager.conn.cursor()
-                cursor.execute('SELECT company_name, business_name FROM business')
-                existing_business = [{'company_name': row[0], 'business_name': row[1]} 
-                                  for row in cursor.fetchall()]
-                importer.cache_existing_data(
-                    existing_business,
-                    key_columns=['company_name', 'business_name']
-                )
-            
-            # 从Excel导入数据
-            imported_data = importer.import_from_excel(
-                file_path=file_path,
-                sheet_name='业务数据',
-                key_columns=['company_name', 'business_name'],
-                skip_duplicates=True
-            )
-            
-            if not imported_data:
-                QMessageBox.information(self, '导入完成', '没有可导入的数据')
-                return
-                
-            # 准备导入数据
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            records_to_insert = []
-            for row in imported_data:
-                # 处理代理记账时间段
-                proxy_period = row.get('proxy_period', '')
-                start_date, end_date = '', ''
-                if proxy_period:
-                    if '至' in proxy_period:
-                        parts = proxy_period.split('至')
-                        start_date = parts[0].strip()
-                        end_date = parts[1].strip() if len(parts) > 1 else ''
-                    else:
-                        start_date = proxy_period.strip()
-                
-                # 处理业务类型
-                b_type = row.get('business_type', '')
-                if not b_type:
-                    if row.get('proxy_accounting'):
-                        b_type = '代理记账'
-                    elif row.get('business_agent'):
-                        b_type = '工商代办'
-                
-                records_to_insert.append((
-                    row.get('company_name', ''),
-                    row.get('business_name', ''),
-                    b_type,
-                    row.get('secondary_business', ''),
-                    row.get('company_password', ''),
-                    row.get('public_info', ''),
-                    row.get('remarks', ''),
-                    1 if row.get('proxy_accounting', False) else 0,
-                    1 if row.get('business_agent', False) else 0,
-                    start_date,
-                    end_date,
-                    now,
-                    'active'
-                ))
-            
-            # 执行批量导入
-            with self.db_manager.conn:
-                cursor = self.db_manager.conn.cursor()
-                cursor.executemany('''
-                    INSERT OR IGNORE INTO business (
-                        company_name, business_name, business_type, secondary_business,
-                        company_password, public_info, remarks,
-                        proxy_accounting, business_agent,
-                        proxy_start_date, proxy_end_date,
-                        create_time, status
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', records_to_insert)
-                
-                inserted_count = cursor.rowcount
-                total_count = len(imported_data)
-                skipped_count = total_count - inserted_count
-                
-            # 刷新界面和数据
-            self._load_business()
-            
-            # 显示导入结果
-            QMessageBox.information(
-                self,
-                '导入完成',
-                f'成功导入 {inserted_count} 条业务记录\n'
-                f'跳过 {skipped_count} 条重复记录\n'
-                f'共处理 {total_count} 条记录'
-            )
-            
-            # 刷新首页统计数据
-            if hasattr(self.parent(), 'refresh_stats'):
-                self.parent().refresh_stats()
+        from core.import_pipeline import BUSINESS_IMPORT
+        from dialogs.import_progress import run_import
+        result = run_import(self, self.db_manager, BUSINESS_IMPORT, file_path)
+        if result is None or not (result.inserted or result.updated):
+            return
             
-        except ImportExportError as e:
-            QMessageBox.critical(self, '导入错误', str(e))
-        except Exception as e:
-            QMessageBox.critical(
-                self,
-                '导入失败',
-                f'导入过程中发生错误:\n{str(e)}\n'
-                '请检查文件格式是否正确'
-            )
+        # 刷新界面和数据
+        self._load_business()
+        
+        # 刷新首页统计数据
+        if hasattr(self.parent(), 'refresh_stats'):
+            self.parent().refresh_stats()
 
     def _export_business(self):
-        """导出业务数据为Excel格式"""
+        """导出列表当前筛选出的业务数据 (Excel 或 CSV/TSV，按扩展名选择)"""
         file_path, _ = QFileDialog.getSaveFileName(
             self,
             '导出业务数据',
             f'业务数据_{datetime.now().strftime("%Y%m%d")}.xlsx',
-            'Excel文件 (*.xlsx)'
+            FILE_DIALOG_FILTER
         )
         
         if not file_path:
@@ -1243,17 +1136,12 @@ class BusinessWindow(QWidget):
             if not self.db_manager or not self.db_manager.conn:
                 raise Exception("数据库连接未初始化")
                 
+            # 与列表页使用同一筛选和排序
+            query = compile_spec(self._filter_spec())
+            
             # 从数据库获取数据
             with self.db_manager.conn:
                 cursor = self.db_manager.conn.cursor()
-                
-                # 先检查数据量
-                cursor.execute('SELECT COUNT(*) FROM business')
-                total_count = cursor.fetchone()[0]
-                
-                if total_count == 0:
-                    QMessageBox.warning(self, '警告', '业务表中没有数据可导出')
-                    return
                     
                 # 获取完整的表结构信息
                 cursor.execute("PRAGMA table_info(business)")
@@ -1275,66 +1163,8 @@ class BusinessWindow(QWidget):
                 if not select_columns:
                     raise Exception("没有可导出的有效列")
                     
-                query = f"SELECT {','.join(select_columns)} FROM business ORDER BY create_time DESC"
-                logger.debug(f"Executing query: {query}")
-                cursor.execute(query)
-                
-                rows = cursor.fetchall()
-                if not rows:
-                    raise Exception("数据库查询返回空结果")
-                
-                # 转换为字典列表格式，处理NULL值
-                data = []
-                for row in rows:
-                    row_data = {}
-                    for idx, col in enumerate(select_columns):
-                        # 将None转换为空字符串
-                        row_data[col] = '' if row[idx] is None else row[idx]
-                    data.append(row_data)
-                
-                logger.info(f"Retrieved {len(data)} records")
-                
-                # 验证数据转换
-                if len(data) != total_count:
-                    raise Exception(f"数据转换不一致: 预期{total_count}条, 实际{len(data)}条")
-                
-                # 处理数据转换
-                export_data = []
-                for item in data:
-                    # 确保所有字段都有值
-                    row = {
-                        '公司名称': item.get('company_name', ''),
-                        '业务名称': item.get('business_name', ''),
-                        '业务类型': item.get('business_type', ''),
-                        '二级业务': item.get('secondary_business', ''),
-                        '公司密码': item.get('company_password', ''),
-                        '公开信息': item.get('public_info', ''),
-                        '备注': item.get('remarks', ''),
-                        '代理记账': '是' if item.get('proxy_accounting', 0) else '否',
-                        '工商代办': '是' if item.get('business_agent', 0) else '否'
-                    }
-                    
-                    # 处理代理记账时间段
-                    start = item.get('proxy_start_date', '')
-                    end = item.get('proxy_end_date', '')
-                    if start and end:
-                        row['记账周期'] = f"{start} 至 {end}"
-                    elif start:
-                        row['记账周期'] = start
-                    elif end:
-                        row['记账周期'] = f"至 {end}"
-                    else:
-                        row['记账周期'] = ""
-                    
-                    export_data.append(row)
+                cursor = query.iter_rows(self.db_manager.conn, select_columns)
                 
-                logger.info(f"Preparing to export {len(export_data)} records")
-                
-                # 使用BaseImporterExporter导出
-                exporter = BaseImporterExporter()
-                if not hasattr(exporter, 'export_to_excel'):
-                    raise Exception("BaseImporterExporter缺少export_to_excel方法")
-                    
                 # 定义表头顺序
                 headers = [
                     '公司名称', '业务名称', '业务类型', '二级业务',
@@ -1342,16 +1172,67 @@ class BusinessWindow(QWidget):
                     '代理记账', '工商代办', '记账周期'
                 ]
                 
-                # 验证数据
-                for i, item in enumerate(export_data):
-                    if not item['公司名称'] or not item['业务名称']:
-                        logger.warning(f"Warning: Record {i+1} missing company name or business name")
+                password_idx = select_columns.index('company_password') if 'company_password' in select_columns else None
+                
+                def iter_rows():
+                    """分块读取游标，每块的公司密码批量解密"""
+                    while True:
+                        chunk = cursor.fetchmany(500)
+                        if not chunk:
+                            return
+                        if password_idx is not None:
+                            passwords = self.db_manager.decrypt_many([row[password_idx] for row in chunk])
+                            chunk = [row[:password_idx] + (password,) + row[password_idx + 1:]
+                                     for row, password in zip(chunk, passwords)]
+                        yield from chunk
                 
-                exporter.export_to_excel(
-                    data=export_data,
+                def iter_export_rows():
+                    """逐行转换游标结果，处理NULL值和记账周期"""
+                    for i, row in enumerate(iter_rows(), 1):
+                        item = {col: ('' if value is None else value) for col, value in zip(select_columns, row)}
+                        
+                        if not item.get('company_name') or not item.get('business_name'):
+                            logger.warning(f"Warning: Record {i} missing company name or business name")
+                        
+                        # 处理代理记账时间段
+                        start = item.get('proxy_start_date', '')
+                        end = item.get('proxy_end_date', '')
+                        if start and end:
+                            period = f"{start} 至 {end}"
+                        elif start:
+                            period = start
+                        elif end:
+                            period = f"至 {end}"
+                        else:
+                            period = ""
+                        
+                        yield (
+                            item.get('company_name', ''),
+                            item.get('business_name', ''),
+                            item.get('business_type', ''),
+                            item.get('secondary_business', ''),
+                            item.get('company_password', ''),
+                            item.get('public_info', ''),
+                            item.get('remarks', ''),
+                            '是' if item.get('proxy_accounting', 0) else '否',
+                            '是' if item.get('business_agent', 0) else '否',
+                            period
+                        )
+                
+                # 先取第一行判断是否有数据，没有数据时不创建文件
+                rows = iter_export_rows()
+                first = next(rows, None)
+                if first is None:
+                    QMessageBox.information(self, '提示', '没有符合当前筛选条件的业务可导出')
+                    return
+                
+                # 直接从游标流式写入，不在内存中构建完整数据
+                exporter = BaseImporterExporter()
+                exported_count = exporter.export_rows(
+                    chain([first], rows),
                     file_path=file_path,
-                    sheet_name='业务数据',
-                    headers=headers
+                    headers=headers,
+                    sheet_name='业务数据'
                 )
                 
                 # 验证文件是否创建成功
@@ -1360,14 +1241,14 @@ class BusinessWindow(QWidget):
                     raise Exception("导出文件创建失败")
                     
                 file_size = os.path.getsize(file_path)
-                if file_size < 1024:  # 小于1KB可能是空文件
-                    raise Exception("导出文件可能为空")
+                if file_size == 0:
+                    raise Exception("导出文件为空")
                 
                 QMessageBox.information(
                     self, 
                     '导出成功', 
                     f'业务数据已成功导出到:\n{file_path}\n'
-                    f'共导出 {len(data)} 条记录\n'
+                    f'共导出 {exported_count} 条记录\n'
                     f'文件大小: {file_size/1024:.1f}KB'
                 )
                 
@@ -1482,7 +1363,8 @@ class BusinessWindow(QWidget):
         self.edit_widgets['business_type'].refresh()
         self.edit_widgets['business_type'].set_selected_items(b_type)
         
-        self.edit_widgets['company_password'].setText(str(data['company_password']))
+        # 只在显示详情时解密 (列表和卡片中保存的是密文)
+        self.edit_widgets['company_password'].setText(self.db_manager.decrypt_data(data['company_password']) or '')
         self.edit_widgets['public_info'].setPlainText(str(data['public_info']))
         self.edit_widgets['remarks'].setPlainText(str(data['remarks']))
         
@@ -1525,69 +1407,36 @@ class BusinessWindow(QWidget):
         except Exception as e:
             logger.error(f"Schema check failed: {e}")
 
-    def _fetch_data_worker(self, search_text, sort_option, limit, offset):
+    def _fetch_data_worker(self, spec, limit, offset):
         """Worker function to fetch data in background"""
         try:
+            query = compile_spec(spec)
             conn = self.db_manager.create_new_connection()
-            cursor = conn.cursor()
-            
-            where_clauses = ["is_deleted = 0"]
-            params = []
-            
-            if search_text:
-                where_clauses.append("(company_name LIKE ? OR business_name LIKE ?)")
-                params.extend([f'%{search_text}%', f'%{search_text}%'])
-            
-            where_sql = " AND ".join(where_clauses)
-            
-            # Count total
-            count_sql = f"SELECT COUNT(*) FROM business WHERE {where_sql}"
-            cursor.execute(count_sql, params)
-            total = cursor.fetchone()[0]
-            
-            # Determine Order
-            order_by = "create_time DESC"
-            if sort_option == '创建时间 (新→旧)':
-                order_by = "create_time DESC"
-            elif sort_option == '创建时间 (旧→新)':
-                order_by = "create_time ASC"
-            elif sort_option == '公司名称 (A→Z)':
-                order_by = "company_name ASC"
-            elif sort_option == '公司名称 (Z→A)':
-                order_by = "company_name DESC"
-            
-            # Fetch data
-            data_sql = f"""
-                SELECT 
-                    id, company_name, business_name, business_type, secondary_business,
-                    company_password, public_info, remarks,
-                    deal_business, proxy_start_date, proxy_end_date,
-                    proxy_accounting, business_agent, other_business
-                FROM business
-                WHERE {where_sql}
-                ORDER BY {order_by}
-                LIMIT ? OFFSET ?
-            """
-            cursor.execute(data_sql, params + [limit, offset])
-            rows = cursor.fetchall()
-            
-            conn.close()
-            return rows, total
+            try:
+                return query.page(conn, limit, offset), query.count(conn)
+            finally:
+                conn.close()
         except Exception as e:
             logger.error(f"Fetch data error: {e}")
             return [], 0
 
+    def _filter_spec(self):
+        """当前列表筛选条件 (列表和导出共用)"""
+        return FilterSpec.of(
+            'business',
+            sort=self.sort_combo.currentText(),
+            search=self.search_input.text().strip(),
+        )
+
     def _load_business(self):
         """从数据库异步加载业务数据"""
         self.prev_btn.setEnabled(False)
         self.next_btn.setEnabled(False)
         self.list_widget.clear()
         
-        search_text = self.search_input.text().strip()
-        sort_option = self.sort_combo.currentText()
         offset = (self.page - 1) * self.page_size
         
-        worker = Worker(self._fetch_data_worker, search_text, sort_option, self.page_size, offset)
+        worker = Worker(self._fetch_data_worker, self._filter_spec(), self.page_size, offset)
         worker.signals.result.connect(self._on_load_success)
         worker.signals.error.connect(self._on_load_error)
         self.threadpool.start(worker)
@@ -4,23 +4,24 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QComboBox, QDateEdit, QDoubleSpinBox, QFrame, 
                              QAbstractItemView, QCheckBox, QGridLayout, QMenu,
                              QTabWidget, QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog,
-                             QInputDialog, QGroupBox, QScrollArea, QSizePolicy)
+                             QInputDialog, QGroupBox, QScrollArea, QSizePolicy, QProgressDialog)
 from PyQt5.QtCore import Qt, QDate, QSize, pyqtSignal
 from PyQt5.QtGui import QIcon, QDesktopServices, QIntValidator
 from PyQt5.QtCore import QUrl
-try:
-    from docxtpl import DocxTemplate
-except ImportError:
-    DocxTemplate = None
 import os
-import shutil
+import threading
 from datetime import datetime
 from core.logger import logger
 from core.utils import get_app_path
 from core.async_utils import Worker, QThreadPool
+from core.attachment_store import IngestCancelled
+from core.thumbnails import file_type as thumbnail_file_type, content_key as thumbnail_content_key
+from modules.attachment_thumbnails import ThumbnailDelegate, thumbnail_loader, THUMBNAIL_ROLE
+from core.query_builder import FilterSpec, compile_spec
 from modules.common_widgets import SingleSelectionWidget, ModernDateEdit
 from modules.base_card import BaseCardWidget
 from core.constants import CONTRACT_STATUS_MAP
+from core.lazy_imports import docx_template
 
 
 class ContractCardWidget(BaseCardWidget):
@@ -479,13 +480,17 @@ class ContractDetailDialog(QDialog):
         
         # 附件列表
         self.attach_list = QTableWidget()
-        self.attach_list.setColumnCount(4)
-        self.attach_list.setHorizontalHeaderLabels(["文件名", "大小", "上传时间", "操作"])
-        self.attach_list.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
-        self.attach_list.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        self.attach_list.setColumnCount(5)
+        self.attach_list.setHorizontalHeaderLabels(["预览", "文件名", "大小", "上传时间", "操作"])
+        self.attach_list.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.attach_list.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
         self.attach_list.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.attach_list.horizontalHeader().setSectionResizeMode(3, QHeaderView.Fixed)
-        self.attach_list.setColumnWidth(3, 180)
+        self.attach_list.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        self.attach_list.horizontalHeader().setSectionResizeMode(4, QHeaderView.Fixed)
+        self.attach_list.setColumnWidth(4, 180)
+        # PDF/图片缩略图：滚动到可见时才在后台生成
+        self.attach_list.setItemDelegateForColumn(
+            0, ThumbnailDelegate(thumbnail_loader(self.db_manager), parent=self.attach_list))
         self.attach_list.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
         self.attach_list.setSelectionMode(QAbstractItemView.NoSelection)
         self.attach_list.setEditTriggers(QAbstractItemView.NoEditTriggers)
@@ -501,15 +506,27 @@ class ContractDetailDialog(QDialog):
             row_idx = self.attach_list.rowCount()
             self.attach_list.insertRow(row_idx)
             
+            sha256 = row[6] if len(row) > 6 else None
+            
+            # 预览 (缓存键按内容哈希，旧附件按路径和修改时间)
+            preview = QTableWidgetItem()
+            filetype = thumbnail_file_type(row[2])
+            try:
+                key = thumbnail_content_key(row[3], sha256) if filetype else None
+            except OSError:
+                filetype = key = None  # 文件已丢失
+            preview.setData(THUMBNAIL_ROLE, {'key': key, 'path': row[3], 'filetype': filetype, 'name': row[2]})
+            self.attach_list.setItem(row_idx, 0, preview)
+            
             # 文件名
-            self.attach_list.setItem(row_idx, 0, QTableWidgetItem(row[2]))
+            self.attach_list.setItem(row_idx, 1, QTableWidgetItem(row[2]))
             
             # 大小
             size_kb = row[5] / 1024 if row[5] else 0
-            self.attach_list.setItem(row_idx, 1, QTableWidgetItem(f"{size_kb:.1f} KB"))
+            self.attach_list.setItem(row_idx, 2, QTableWidgetItem(f"{size_kb:.1f} KB"))
             
             # 上传时间
-            self.attach_list.setItem(row_idx, 2, QTableWidgetItem(row[4]))
+            self.attach_list.setItem(row_idx, 3, QTableWidgetItem(row[4]))
             
             # 操作
             action_widget = QWidget()
@@ -518,15 +535,15 @@ class ContractDetailDialog(QDialog):
             
             open_btn = QPushButton("查看")
             open_btn.setProperty("class", "small-btn")
-            open_btn.clicked.connect(lambda _, p=row[3]: self._open_attachment(p))
+            open_btn.clicked.connect(lambda _, p=row[3], h=sha256, n=row[2]: self._open_attachment(p, h, n))
             action_layout.addWidget(open_btn)
             
             del_btn = QPushButton("删除")
             del_btn.setProperty("class", "danger small-btn")
-            del_btn.clicked.connect(lambda _, id=row[0], p=row[3]: self._delete_attachment(id, p))
+            del_btn.clicked.connect(lambda _, id=row[0], p=row[3], h=sha256: self._delete_attachment(id, p, h))
             action_layout.addWidget(del_btn)
             
-            self.attach_list.setCellWidget(row_idx, 3, action_widget)
+            self.attach_list.setCellWidget(row_idx, 4, action_widget)
 
     def _generate_contract_doc(self):
         """生成合同文档"""
@@ -534,6 +551,7 @@ class ContractDetailDialog(QDialog):
             QMessageBox.warning(self, "提示", "请先保存合同基本信息")
             return
 
+        DocxTemplate = docx_template()
         if DocxTemplate is None:
             QMessageBox.critical(self, "错误", "缺少 docxtpl 库，无法生成合同。请安装: pip install docxtpl")
             return
@@ -669,47 +687,64 @@ class ContractDetailDialog(QDialog):
             QMessageBox.critical(self, "错误", f"生成失败: {str(e)}")
 
     def _upload_attachment(self):
+        """上传附件：在线程池中计算哈希并存入附件存储 (内容相同的文件只存一份)"""
         file_path, _ = QFileDialog.getOpenFileName(self, "选择文件")
         if not file_path:
             return
-            
-        try:
-            # 准备目标路径
-            file_name = os.path.basename(file_path)
-            # 使用 contract_attachments 目录
-            target_dir = os.path.join(get_app_path('data'), 'contract_attachments')
-            if not os.path.exists(target_dir):
-                os.makedirs(target_dir)
-                
-            # 生成唯一文件名防止覆盖
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            target_name = f"{timestamp}_{file_name}"
-            target_path = os.path.join(target_dir, target_name)
-            
-            # 复制文件
-            shutil.copy2(file_path, target_path)
-            
-            # 记录到数据库
-            file_size = os.path.getsize(target_path)
+        
+        file_name = os.path.basename(file_path)
+        store = self.db_manager.attachment_store
+        cancelled = threading.Event()
+        
+        progress = QProgressDialog(f'正在保存附件 {file_name}...', '取消', 0, 100, self)
+        progress.setWindowTitle('上传附件')
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+        progress.canceled.connect(cancelled.set)
+        
+        def on_result(result):
+            progress.close()
+            sha256, file_size, blob_path, _ = result
+            # 导入期间同一文件可能因删除其它附件被清理，记录前再确认一次
+            if not os.path.exists(blob_path):
+                QMessageBox.warning(self, "错误", "附件保存后被清理，请重新上传")
+                return
             data = {
                 'contract_id': self.data['id'],
                 'file_name': file_name,
-                'file_path': target_path,
-                'file_size': file_size
+                'file_path': blob_path,
+                'file_size': file_size,
+                'sha256': sha256
             }
-            
             if self.db_manager.add_contract_attachment(data):
                 self._load_attachments()
                 self._trigger_global_refresh()
             else:
+                self.db_manager.collect_attachment_blobs()
                 QMessageBox.warning(self, "错误", "保存附件记录失败")
-                
-        except Exception as e:
-            logger.error(f"Upload attachment failed: {e}")
-            QMessageBox.critical(self, "错误", f"上传失败: {str(e)}")
+        
+        def on_error(error):
+            progress.close()
+            if error[0] is IngestCancelled:
+                return
+            logger.error(f"Upload attachment failed: {error[1]}")
+            QMessageBox.critical(self, "错误", f"上传失败: {error[1]}")
+        
+        worker = Worker(store.ingest, file_path, is_cancelled=cancelled.is_set)
+        worker.kwargs['progress_callback'] = worker.signals.progress.emit
+        worker.signals.progress.connect(progress.setValue)
+        worker.signals.result.connect(on_result)
+        worker.signals.error.connect(on_error)
+        QThreadPool.globalInstance().start(worker)
 
-    def _open_attachment(self, path):
+    def _open_attachment(self, path, sha256=None, file_name=None):
         try:
+            if sha256:
+                # 存储中的文件没有扩展名，以原文件名链接到临时目录后打开
+                if not os.path.exists(self.db_manager.attachment_store.blob_path(sha256)):
+                    QMessageBox.warning(self, "错误", "文件不存在，可能已被删除")
+                    return
+                path = self.db_manager.attachment_store.open_path(sha256, file_name)
             if os.path.exists(path):
                 QDesktopServices.openUrl(QUrl.fromLocalFile(path))
             else:
@@ -717,18 +752,20 @@ class ContractDetailDialog(QDialog):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"打开文件失败: {str(e)}")
 
-    def _delete_attachment(self, attach_id, path):
+    def _delete_attachment(self, attach_id, path, sha256=None):
         reply = QMessageBox.question(self, "确认", "确定要删除此附件吗？", QMessageBox.Yes | QMessageBox.No)
         if reply != QMessageBox.Yes:
             return
             
+        # 存储中的文件按引用计数在删除记录后清理
         if self.db_manager.delete_contract_attachment(attach_id):
-            # 尝试删除物理文件
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-            except Exception as e:
-                logger.error(f"Failed to delete file {path}: {e}")
+            if not sha256:
+                # 旧版本按路径保存的附件：删除物理文件
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except Exception as e:
+                    logger.error(f"Failed to delete file {path}: {e}")
             
             self._load_attachments()
             self._trigger_global_refresh()
@@ -1180,94 +1217,34 @@ class ContractWindow(QWidget):
         
         self.setLayout(main_layout)
         
-    def _fetch_data_worker(self, search_text, type_filter, category_filter_id, status_filter, sort_option, limit, offset):
+    def _fetch_data_worker(self, spec, limit, offset):
         """Background worker to fetch data and count"""
+        query = compile_spec(spec)
         conn = self.db_manager.create_new_connection()
         try:
-            cursor = conn.cursor()
-            
-            where_clauses = ["c.is_deleted = 0"]
-            params = []
-            
-            if search_text:
-                where_clauses.append("(c.title LIKE ? OR c.contract_number LIKE ? OR c.party_a LIKE ? OR c.party_b LIKE ?)")
-                p = f"%{search_text}%"
-                params.extend([p, p, p, p])
-            
-            if type_filter != "所有类型":
-                t = 'incoming' if type_filter == "收款合同" else 'outgoing'
-                where_clauses.append("c.contract_type = ?")
-                params.append(t)
-            
-            if category_filter_id is not None:
-                # Support both legacy category_id and new category_ids
-                # For category_ids (text), we check if it contains the ID
-                # We wrap with commas to ensure exact match (e.g. ",1," matches ",1,2," but not ",11,")
-                # SQLite concatenation is ||
-                where_clauses.append("(c.category_id = ? OR (',' || IFNULL(c.category_ids, '') || ',') LIKE ?)")
-                params.append(category_filter_id)
-                params.append(f"%,{category_filter_id},%")
-            
-            if status_filter != "所有状态":
-                status_map = {
-                    "草稿": "draft",
-                    "执行中": "active",
-                    "已完成": "completed",
-                    "已过期": "expired",
-                    "已终止": "terminated"
-                }
-                s = status_map.get(status_filter)
-                if s:
-                    where_clauses.append("c.status = ?")
-                    params.append(s)
-            
-            where_sql = " AND ".join(where_clauses)
-            
-            # Count
-            count_sql = f"SELECT COUNT(*) FROM contracts c WHERE {where_sql}"
-            cursor.execute(count_sql, params)
-            total = cursor.fetchone()[0]
+            total = query.count(conn)
             
             # Fetch Category Map (small enough to fetch every time or could be cached if static, but safer here)
-            cat_map = {}
-            cursor.execute("SELECT id, name FROM contract_categories")
-            for r in cursor.fetchall():
-                cat_map[str(r[0])] = r[1]
-
-            # Determine Order
-            order_by = "c.created_at DESC"
-            if sort_option == '创建时间 (新→旧)':
-                order_by = "c.created_at DESC"
-            elif sort_option == '创建时间 (旧→新)':
-                order_by = "c.created_at ASC"
-            elif sort_option == '合同名称 (A→Z)':
-                order_by = "c.title ASC"
-            elif sort_option == '合同名称 (Z→A)':
-                order_by = "c.title DESC"
-            elif sort_option == '金额 (高→低)':
-                order_by = "c.amount DESC"
-            elif sort_option == '金额 (低→高)':
-                order_by = "c.amount ASC"
-                
-            # Data
-            # Note: We don't join contract_categories here because we handle it via cat_map for both legacy and new fields
-            sql = f"""
-                SELECT c.id, c.contract_number, c.title, c.contract_type, 
-                       c.party_a, c.party_b, c.signing_date, c.expiration_date, 
-                       c.amount, c.status, c.remarks, c.category_id,
-                       c.category_ids
-                FROM contracts c
-                WHERE {where_sql}
-                ORDER BY {order_by}
-                LIMIT ? OFFSET ?
-            """
-            cursor.execute(sql, params + [limit, offset])
-            rows = cursor.fetchall()
+            # Note: We don't join contract_categories because we handle it via cat_map for both legacy and new fields
+            cat_map = {str(r[0]): r[1] for r in conn.execute("SELECT id, name FROM contract_categories")}
             
+            rows = query.page(conn, limit, offset)
             return rows, total, cat_map
         finally:
             conn.close()
 
+    def _filter_spec(self):
+        """当前列表筛选条件"""
+        category_filter = self.category_filter.currentText()
+        return FilterSpec.of(
+            'contracts',
+            sort=self.sort_combo.currentText(),
+            search=self.search_input.text().strip(),
+            type=self.type_filter.currentText(),
+            category=self._category_id_by_name.get(category_filter) if category_filter != "所有分类" else None,
+            status=self.status_filter.currentText(),
+        )
+
     def _load_contracts(self):
         """Async load contracts with pagination"""
         # UI state
@@ -1276,17 +1253,10 @@ class ContractWindow(QWidget):
         self.list_widget.clear()
         self._cards = []
         
-        # Parameters
-        search_text = self.search_input.text().strip()
-        type_filter = self.type_filter.currentText()
-        category_filter = self.category_filter.currentText()
-        category_filter_id = self._category_id_by_name.get(category_filter) if category_filter != "所有分类" else None
-        status_filter = self.status_filter.currentText()
-        sort_option = self.sort_combo.currentText()
         offset = (self.page - 1) * self.page_size
         
         # Start worker
-        worker = Worker(self._fetch_data_worker, search_text, type_filter, category_filter_id, status_filter, sort_option, self.page_size, offset)
+        worker = Worker(self._fetch_data_worker, self._filter_spec(), self.page_size, offset)
         worker.signals.result.connect(self._on_load_success)
         worker.signals.error.connect(self._on_load_error)
         self.threadpool.start(worker)
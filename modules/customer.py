@@ -8,10 +8,12 @@ from PyQt5.QtCore import Qt, QSettings, QSize
 from PyQt5.QtGui import QIcon, QIntValidator
 import sqlite3
 import math
+from itertools import chain
 from core.logger import logger
 from datetime import datetime
-from core.import_export import BaseImporterExporter, ImportExportError
+from core.import_export import BaseImporterExporter, ImportExportError, FILE_DIALOG_FILTER
 from core.async_utils import Worker, QThreadPool
+from core.query_builder import FilterSpec, compile_spec
 from modules.base_card import BaseCardWidget
 from core.constants import CUSTOMER_STATUS_COLORS
 
@@ -527,60 +529,24 @@ class CustomerWindow(QWidget):
             
             self.list_widget.setItemWidget(item, card)
 
-    def _fetch_data_worker(self, search_text, status_filter, sort_option, limit, offset):
+    def _fetch_data_worker(self, spec, limit, offset):
         """Background worker to fetch data and count"""
+        query = compile_spec(spec)
         conn = self.db_manager.create_new_connection()
         try:
-            cursor = conn.cursor()
-            
-            # Base query
-            where_clauses = ["is_deleted = 0"]
-            params = []
-            
-            if search_text:
-                where_clauses.append("(company_name LIKE ? OR contact_person LIKE ? OR phone LIKE ?)")
-                search_param = f"%{search_text}%"
-                params.extend([search_param, search_param, search_param])
-                
-            if status_filter and status_filter != '所有状态':
-                where_clauses.append("status = ?")
-                params.append(status_filter)
-                
-            where_sql = " AND ".join(where_clauses)
-            
-            # Count
-            count_sql = f"SELECT COUNT(*) FROM customers WHERE {where_sql}"
-            cursor.execute(count_sql, params)
-            total = cursor.fetchone()[0]
-            
-            # Determine Order
-            order_by = "id DESC" # Default fallback
-            if sort_option == '创建时间 (新→旧)':
-                order_by = "id DESC"
-            elif sort_option == '创建时间 (旧→新)':
-                order_by = "id ASC"
-            elif sort_option == '公司名称 (A→Z)':
-                order_by = "company_name ASC"
-            elif sort_option == '公司名称 (Z→A)':
-                order_by = "company_name DESC"
-            elif sort_option == '默认排序':
-                order_by = "company_name ASC" # Original default was ORDER BY company_name
-
-            # Data
-            data_sql = f"""
-                SELECT id, company_name, contact_person, phone, status, notes, position, mobile, email 
-                FROM customers 
-                WHERE {where_sql} 
-                ORDER BY {order_by} 
-                LIMIT ? OFFSET ?
-            """
-            cursor.execute(data_sql, params + [limit, offset])
-            rows = cursor.fetchall()
-            
-            return rows, total
+            return query.page(conn, limit, offset), query.count(conn)
         finally:
             conn.close()
 
+    def _filter_spec(self):
+        """当前列表筛选条件 (列表和导出共用)"""
+        return FilterSpec.of(
+            'customers',
+            sort=self.sort_combo.currentText(),
+            search=self.search_input.text().strip(),
+            status=self.status_filter.currentText(),
+        )
+
     def _load_customers(self):
         """Async load customers with pagination"""
         # UI state
@@ -588,14 +554,10 @@ class CustomerWindow(QWidget):
         self.next_btn.setEnabled(False)
         self.list_widget.clear()
         
-        # Parameters
-        search_text = self.search_input.text().strip()
-        status_filter = self.status_filter.currentText()
-        sort_option = self.sort_combo.currentText()
         offset = (self.page - 1) * self.page_size
         
         # Start worker
-        worker = Worker(self._fetch_data_worker, search_text, status_filter, sort_option, self.page_size, offset)
+        worker = Worker(self._fetch_data_worker, self._filter_spec(), self.page_size, offset)
         worker.signals.result.connect(self._on_load_success)
         worker.signals.error.connect(self._on_load_error)
         self.threadpool.start(worker)
@@ -758,7 +720,6 @@ class CustomerWindow(QWidget):
             with self.db_manager.conn:
                 cursor = self.db_manager.conn.cursor()
                 # 使用软删除
-                from datetime import datetime
                 now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 cursor.executemany('UPDATE customers SET is_deleted = 1, deleted_at = ? WHERE id = ?', [(now, cid) for cid in ids])
             self._load_customers()
@@ -982,148 +943,46 @@ class CustomerWindow(QWidget):
         if reply == QMessageBox.Yes:
             with self.db_manager.conn:
                 cursor = self.db_manager.conn.cursor()
-                from datetime import datetime
                 now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 cursor.execute('UPDATE customers SET is_deleted = 1, deleted_at = ? WHERE company_name = ?', (now, company_name))
                 
             self._load_customers()
             
     def _import_customers(self):
-        """从Excel文件导入客户数据(增量导入)"""
+        """从Excel/CSV文件导入客户数据(增量导入，后台分块执行)"""
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             '选择客户数据文件',
             '',
-            'Excel文件 (*.xlsx)'
+            FILE_DIALOG_FILTER
         )
         
         if not file_path:
             return
             
-        try:
-            # 初始化导入器
-            importer = BaseImporterExporter()
-            importer._required_columns = ['公司名称']
-            importer._column_mapping = {
-                '公司名称': 'company_name',
-                '联系人': 'contact_person',
-                '电话': 'phone',
-                '状态': 'status',
-                '备注': 'notes'
-            }
-            
-            # 获取现有数据用于去重
-            with self.db_manager.conn:
-                cursor = self.db_manager.conn.cursor()
-                cursor.execute('SELECT company_name FROM customers')
-                existing_companies = [row[0] for row in cursor.fetchall()]
-                importer.cache_existing_data(
-                    [{'company_name': name} for name in existing_companies],
-                    key_columns=['company_name']
-                )
-            
-            # 从Excel导入数据
-            imported_data = importer.import_from_excel(
-                file_path=file_path,
-                sheet_name='客户数据',
-                key_columns=['company_name'],
-                skip_duplicates=True
-            )
-            
-            if not imported_data:
-                QMessageBox.information(self, '导入完成', '没有可导入的数据')
-                return
-                
-            # 准备导入数据
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            records_to_insert = []
-            for row in imported_data:
-                records_to_insert.append((
-                    row.get('company_name', ''),
-                    row.get('contact_person', ''),
-                    row.get('phone', ''),
-                    row.get('status', 'active'),
-                    row.get('notes', ''),
-                    now
-                ))
-            
-            # 执行批量导入
-            try:
-                with self.db_manager.conn:
-                    # 验证数据库连接
-                    if not self.db_manager.conn:
-                        raise Exception("数据库连接无效")
-                    
-                    # 验证表结构
-                    cursor = self.db_manager.conn.cursor()
-                    cursor.execute("PRAGMA table_info(customers)")
-                    table_columns = [col[1] for col in cursor.fetchall()]
-                    required_columns = ['company_name', 'contact_person', 'phone', 'status', 'notes', 'created_at']
-                    missing_columns = [col for col in required_columns if col not in table_columns]
-                    if missing_columns:
-                        raise Exception(f"表结构不完整，缺少列: {', '.join(missing_columns)}")
-                    
-                    # 执行导入
-                    cursor.executemany('''
-                        INSERT OR IGNORE INTO customers 
-                        (company_name, contact_person, phone, status, notes, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', records_to_insert)
-                    
-                    inserted_count = cursor.rowcount
-                    total_count = len(imported_data)
-                    skipped_count = total_count - inserted_count
-                    
-                    # 验证导入结果
-                    if inserted_count > 0:
-                        cursor.execute('SELECT COUNT(*) FROM customers')
-                        new_count = cursor.fetchone()[0]
-                        logger.info(f"Total records after import: {new_count}")
-                    
-                # 刷新界面和数据
-                self._load_customers()
-                
-                # 显示导入结果
-                QMessageBox.information(
-                    self,
-                    '导入完成',
-                    f'成功导入 {inserted_count} 条客户记录\n'
-                    f'跳过 {skipped_count} 条重复记录\n'
-                    f'共处理 {total_count} 条记录'
-                )
-                
-                # 刷新首页统计数据
-                try:
-                    if hasattr(self.parent(), 'refresh_stats'):
-                        self.parent().refresh_stats()
-                except Exception as e:
-                    logger.error(f"Error refreshing stats: {str(e)}")
-                
-            except sqlite3.Error as e:
-                error_msg = f"数据库错误: {str(e)}"
-                if "UNIQUE constraint failed" in str(e):
-                    error_msg += "\n可能原因: 导入数据中包含重复的公司名称"
-                QMessageBox.critical(self, '导入错误', error_msg)
-                import traceback
-                logger.error(f"Import error details:\n{traceback.format_exc()}")
+        from core.import_pipeline import CUSTOMER_IMPORT
+        from dialogs.import_progress import run_import
+        result = run_import(self, self.db_manager, CUSTOMER_IMPORT, file_path)
+        if result is None or not (result.inserted or result.updated):
+            return
             
-        except ImportExportError as e:
-            QMessageBox.critical(self, '导入错误', str(e))
+        # 刷新界面和数据
+        self._load_customers()
+        
+        # 刷新首页统计数据
+        try:
+            if hasattr(self.parent(), 'refresh_stats'):
+                self.parent().refresh_stats()
         except Exception as e:
-            QMessageBox.critical(
-                self,
-                '导入失败',
-                f'导入过程中发生错误:\n{str(e)}\n'
-                '请检查文件格式是否正确'
-            )
+            logger.error(f"Error refreshing stats: {str(e)}")
             
     def _export_customers(self):
-        """导出客户数据为Excel格式"""
+        """导出列表当前筛选出的客户数据 (Excel 或 CSV/TSV，按扩展名选择)"""
         file_path, _ = QFileDialog.getSaveFileName(
             self,
             '导出客户数据',
             'customers.xlsx',
-            'Excel文件 (*.xlsx)'
+            FILE_DIALOG_FILTER
         )
         
         if not file_path:
@@ -1134,15 +993,12 @@ class CustomerWindow(QWidget):
             if not self.db_manager or not self.db_manager.conn:
                 raise Exception("数据库连接未初始化")
                 
+            # 与列表页使用同一筛选和排序
+            query = compile_spec(self._filter_spec())
+            
             # 从数据库获取数据
             with self.db_manager.conn:
                 cursor = self.db_manager.conn.cursor()
-                cursor.execute('SELECT COUNT(*) FROM customers')
-                total_count = cursor.fetchone()[0]
-                
-                if total_count == 0:
-                    QMessageBox.warning(self, '警告', '客户表中没有数据可导出')
-                    return
                     
                 # 获取完整的表结构信息
                 cursor.execute("PRAGMA table_info(customers)")
@@ -1161,47 +1017,33 @@ class CustomerWindow(QWidget):
                 if not select_columns:
                     raise Exception("没有可导出的有效列")
                     
-                query = f"SELECT {','.join(select_columns)} FROM customers ORDER BY company_name"
-                logger.debug(f"Executing query: {query}")
-                cursor.execute(query)
-                
-                rows = cursor.fetchall()
-                if not rows:
-                    raise Exception("数据库查询返回空结果")
-                
-                # 转换为字典列表格式，处理NULL值
-                export_data = []
-                for row in rows:
-                    row_data = {}
-                    for idx, col in enumerate(select_columns):
-                        # 将None转换为空字符串
-                        row_data[col] = '' if row[idx] is None else row[idx]
-                    export_data.append(row_data)
+                # 导出列 (表头, 数据库字段)
+                export_columns = [
+                    ('公司名称', 'company_name'),
+                    ('联系人', 'contact_person'),
+                    ('电话', 'phone'),
+                    ('状态', 'status'),
+                    ('备注', 'notes'),
+                    ('创建时间', 'created_at')
+                ]
+                # 不存在的列输出空值
+                select_exprs = [col if col in select_columns else "''" for _, col in export_columns]
                 
-                logger.info(f"Retrieved {len(export_data)} records")
+                rows = query.iter_rows(self.db_manager.conn, select_exprs)
                 
-                # 准备最终导出数据
-                final_data = []
-                for item in export_data:
-                    final_data.append({
-                        '公司名称': item.get('company_name', ''),
-                        '联系人': item.get('contact_person', ''),
-                        '电话': item.get('phone', ''),
-                        '状态': item.get('status', ''),
-                        '备注': item.get('notes', ''),
-                        '创建时间': item.get('created_at', '')
-                    })
+                # 先取第一行判断是否有数据，没有数据时不创建文件
+                first = next(rows, None)
+                if first is None:
+                    QMessageBox.information(self, '提示', '没有符合当前筛选条件的客户可导出')
+                    return
                 
-                # 使用BaseImporterExporter导出
+                # 直接从游标流式写入，不在内存中构建完整数据
                 exporter = BaseImporterExporter()
-                if not hasattr(exporter, 'export_to_excel'):
-                    raise Exception("BaseImporterExporter缺少export_to_excel方法")
-                    
-                exporter.export_to_excel(
-                    data=final_data,
+                exported_count = exporter.export_rows(
+                    chain([first], rows),
                     file_path=file_path,
-                    sheet_name='客户数据',
-                    headers=['公司名称', '联系人', '电话', '状态', '备注', '创建时间']
+                    headers=[header for header, _ in export_columns],
+                    sheet_name='客户数据'
                 )
                 
                 # 验证文件是否创建成功
@@ -1210,14 +1052,14 @@ class CustomerWindow(QWidget):
                     raise Exception("导出文件创建失败")
                     
                 file_size = os.path.getsize(file_path)
-                if file_size < 1024:  # 小于1KB可能是空文件
-                    raise Exception("导出文件可能为空")
+                if file_size == 0:
+                    raise Exception("导出文件为空")
                 
                 QMessageBox.information(
                     self, 
                     '导出成功', 
                     f'客户数据已成功导出到:\n{file_path}\n'
-                    f'共导出 {len(final_data)} 条记录\n'
+                    f'共导出 {exported_count} 条记录\n'
                     f'文件大小: {file_size/1024:.1f}KB'
                 )
             
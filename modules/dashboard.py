@@ -3,11 +3,14 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QCheckBox, QTextEdit, QFrame, QInputDialog, 
                              QDateEdit, QSizePolicy, QScrollArea,
                              QSpinBox, QListWidget, QListWidgetItem, QMenu, QTabWidget)
-from PyQt5.QtChart import (QChart, QChartView, QLineSeries, QSplineSeries,
-                          QValueAxis, QBarCategoryAxis, QPieSeries, QPieSlice)
-from PyQt5.QtCore import Qt, QDate, QSettings, QMargins, QSize
+from PyQt5.QtCore import Qt, QDate, QSettings, QMargins, QSize, QPointF
 from PyQt5.QtGui import QPainter, QColor, QFont
+import os
 from core.logger import logger
+from core.lazy_imports import qtchart
+from core.constants import CHART_ANIMATION_POINT_LIMIT
+from core.timeline import startup_timeline
+from modules.dashboard_panels import PanelListView, ReminderDelegate, ReceivableDelegate, ROW_ROLE
 
 class DashboardWindow(QWidget):
     def __init__(self, main_window=None):
@@ -22,6 +25,17 @@ class DashboardWindow(QWidget):
         # 初始化设置
         self.settings = QSettings("CustomerManagement", "Dashboard")
         
+        # 图表持久对象与数据指纹 (用于增量更新)
+        self._trend_series = []
+        self._trend_axis_x = None
+        self._trend_axis_y = None
+        self._trend_data_hash = None
+        self._pie_data_hash = None
+        self._chart_theme = None
+        
+        # 已忽略的提醒 (延迟从设置读取)
+        self._ignored_reminders = None
+        
         # 主布局
         self.dashboard_layout = QVBoxLayout()
         self.dashboard_layout.setContentsMargins(10, 10, 10, 10)
@@ -37,9 +51,21 @@ class DashboardWindow(QWidget):
         # 3. 底部功能区域
         self._create_function_area()
         
+        # 待办/便签在其它页面修改后同步刷新 (使用共享缓存，不重新读取数据库)
+        if main_window:
+            self.db_manager.todo_store.changed.connect(self._on_store_changed)
+        
         # 初始化数据
         self.update_data()
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not getattr(self, '_first_painted', False):
+            self._first_painted = True
+            startup_timeline.mark("首页首次绘制")
+            if os.environ.get('CRM_DUMP_STARTUP_TIMELINE'):
+                startup_timeline.dump()
+
     def _update_day_combo(self, year_combo, month_combo, day_combo):
         """更新日下拉框的选项"""
         current_day = day_combo.currentText()
@@ -255,13 +281,15 @@ class DashboardWindow(QWidget):
         header_layout.addWidget(self.year_combo)
         trends_layout.addLayout(header_layout)
         
+        QtChart = qtchart()
+        
         # 创建趋势图表
-        self.monthly_chart = QChart()
+        self.monthly_chart = QtChart.QChart()
         # 主题设置将在 update_chart 中处理
-        self.monthly_chart.setAnimationOptions(QChart.SeriesAnimations)
+        self.monthly_chart.setAnimationOptions(QtChart.QChart.SeriesAnimations)
         self.monthly_chart.setMargins(QMargins(45, 10, 20, 10))
         
-        chart_view = QChartView(self.monthly_chart)
+        chart_view = QtChart.QChartView(self.monthly_chart)
         chart_view.setRenderHint(QPainter.Antialiasing)
         trends_layout.addWidget(chart_view)
         
@@ -272,11 +300,11 @@ class DashboardWindow(QWidget):
         dist_layout = QVBoxLayout(self.distribution_tab)
         
         # 创建饼图
-        self.pie_chart = QChart()
-        self.pie_chart.setAnimationOptions(QChart.SeriesAnimations)
+        self.pie_chart = QtChart.QChart()
+        self.pie_chart.setAnimationOptions(QtChart.QChart.SeriesAnimations)
         self.pie_chart.legend().setAlignment(Qt.AlignRight)
         
-        pie_view = QChartView(self.pie_chart)
+        pie_view = QtChart.QChartView(self.pie_chart)
         pie_view.setRenderHint(QPainter.Antialiasing)
         dist_layout.addWidget(pie_view)
         
@@ -316,24 +344,11 @@ class DashboardWindow(QWidget):
         
         reminder_layout.addLayout(reminder_header)
         
-        # 提醒列表区域 (使用 ScrollArea + VBoxLayout 替代 QListWidget 以获得更好的控制权)
-        self.reminder_scroll = QScrollArea()
-        self.reminder_scroll.setWidgetResizable(True)
-        self.reminder_scroll.setFrameShape(QFrame.NoFrame)
-        self.reminder_scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        
-        self.reminder_container = QWidget()
-        self.reminder_layout = QVBoxLayout(self.reminder_container)
-        self.reminder_layout.setContentsMargins(0, 0, 0, 0)
-        self.reminder_layout.setSpacing(0) # 紧凑布局
-        
-        self.reminder_scroll.setWidget(self.reminder_container)
-        
-        # 设置透明背景，适配深色模式
-        self.reminder_scroll.setStyleSheet("background: transparent;")
-        self.reminder_container.setStyleSheet("background: transparent;")
-        
-        reminder_layout.addWidget(self.reminder_scroll)
+        # 提醒列表区域 (模型 + 委托绘制，数千条也无需逐行创建控件)
+        self.reminder_view = PanelListView(ReminderDelegate())
+        self.reminder_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.reminder_view.customContextMenuRequested.connect(self._show_reminder_context_menu)
+        reminder_layout.addWidget(self.reminder_view)
         
         # 提示标签
         tip_label = QLabel("右键点击条目可忽略提醒")
@@ -355,21 +370,11 @@ class DashboardWindow(QWidget):
         receivable_header.addStretch()
         receivable_layout.addLayout(receivable_header)
         
-        self.receivable_scroll = QScrollArea()
-        self.receivable_scroll.setWidgetResizable(True)
-        self.receivable_scroll.setFrameShape(QFrame.NoFrame)
-        self.receivable_scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        
-        self.receivable_container = QWidget()
-        self.receivable_items_layout = QVBoxLayout(self.receivable_container)
-        self.receivable_items_layout.setContentsMargins(0, 0, 0, 0)
-        self.receivable_items_layout.setSpacing(0)
-        
-        self.receivable_scroll.setWidget(self.receivable_container)
-        self.receivable_scroll.setStyleSheet("background: transparent;")
-        self.receivable_container.setStyleSheet("background: transparent;")
-        
-        receivable_layout.addWidget(self.receivable_scroll)
+        self.receivable_view = PanelListView(ReceivableDelegate())
+        self.receivable_view.setCursor(Qt.PointingHandCursor)
+        self.receivable_view.setToolTip("双击查看详情")
+        self.receivable_view.doubleClicked.connect(self._open_receivable)
+        receivable_layout.addWidget(self.receivable_view)
         
         right_layout.addWidget(receivable_frame)
         
@@ -463,253 +468,124 @@ class DashboardWindow(QWidget):
     def _load_reminders(self):
         """加载到期提醒 (代理记账 + 合同)"""
         try:
-            # 清空现有列表
-            while self.reminder_layout.count():
-                item = self.reminder_layout.takeAt(0)
-                widget = item.widget()
-                if widget:
-                    widget.deleteLater()
-            
             days = self.reminder_days.value()
+            ignored = self._get_ignored_reminders()
             
-            # 1. 获取代理记账到期
-            expiring_businesses = self.db_manager.get_proxy_accounting_expiring(days)
-            ignored_business_ids = self.settings.value("ignored_reminders", [], type=list)
-            ignored_business_ids = [int(i) for i in ignored_business_ids]
+            # 1. 代理记账到期 / 2. 合同到期，item format: (id, name, date)
+            sources = (
+                ('business', '记账', self.db_manager.get_proxy_accounting_expiring(days)),
+                ('contract', '合同', self.db_manager.get_contracts_expiring(days)),
+            )
             
-            # 2. 获取合同到期
-            expiring_contracts = self.db_manager.get_contracts_expiring(days)
-            ignored_contract_ids = self.settings.value("ignored_contract_reminders", [], type=list)
-            ignored_contract_ids = [int(i) for i in ignored_contract_ids]
-            
-            # 合并列表
-            # item format: (id, name, date, type, raw_data)
+            today = QDate.currentDate()
             all_reminders = []
-            
-            for biz in expiring_businesses:
-                if biz[0] not in ignored_business_ids:
+            for item_type, type_name, rows in sources:
+                ignored_ids = ignored[item_type]
+                for item_id, name, date_text in rows:
+                    if item_id in ignored_ids:
+                        continue
+                    days_left = today.daysTo(QDate.fromString(date_text, "yyyy-MM-dd"))
+                    if days_left < 0:
+                        status, level = "已过期", 'danger'
+                    elif days_left == 0:
+                        status, level = "今天到期", 'danger'
+                    else:
+                        status = f"还有 {days_left} 天"
+                        level = 'warning' if days_left <= 7 else 'muted'
                     all_reminders.append({
-                        'id': biz[0],
-                        'name': biz[1],
-                        'date': biz[2],
-                        'type': 'business',
-                        'type_name': '记账'
-                    })
-                    
-            for contract in expiring_contracts:
-                if contract[0] not in ignored_contract_ids:
-                    all_reminders.append({
-                        'id': contract[0],
-                        'name': contract[1],
-                        'date': contract[2],
-                        'type': 'contract',
-                        'type_name': '合同'
+                        'id': item_id,
+                        'name': name,
+                        'date': date_text,
+                        'type': item_type,
+                        'type_name': type_name,
+                        'status': status,
+                        'level': level
                     })
             
             # 按日期排序
             all_reminders.sort(key=lambda x: x['date'])
             
-            if not all_reminders:
-                empty_label = QLabel("暂无即将到期的项目")
-                empty_label.setAlignment(Qt.AlignCenter)
-                # 仅设置 padding，颜色留给 QSS
-                empty_label.setStyleSheet("padding: 20px;")
-                self.reminder_layout.addWidget(empty_label)
-                self.reminder_layout.addStretch()
-                return
-                
-            today = QDate.currentDate()
-            
-            for item in all_reminders:
-                end_date = QDate.fromString(item['date'], "yyyy-MM-dd")
-                days_left = today.daysTo(end_date)
-                
-                if days_left < 0:
-                    status_text = "已过期"
-                    color_code = "#F56C6C" # Red
-                elif days_left == 0:
-                    status_text = "今天到期"
-                    color_code = "#F56C6C" # Red
-                else:
-                    status_text = f"还有 {days_left} 天"
-                    color_code = "#E6A23C" if days_left <= 7 else "#909399" # Orange or Gray
-                
-                # 创建行容器
-                row_widget = QWidget()
-                row_layout = QHBoxLayout(row_widget)
-                row_layout.setContentsMargins(10, 8, 10, 8)
-                
-                # 类型标签
-                type_label = QLabel(f"[{item['type_name']}]")
-                type_label.setStyleSheet("color: #409eff; font-weight: bold;")
-                row_layout.addWidget(type_label)
-                
-                # 内容标签
-                content_label = QLabel(
-                    f"{item['name']} - {item['date']} "
-                    f"<font color='{color_code}'><b>({status_text})</b></font>"
-                )
-                content_label.setTextFormat(Qt.RichText)
-                content_label.setStyleSheet("background: transparent; font-size: 13px;")
-                
-                row_layout.addWidget(content_label)
-                row_layout.addStretch() 
-                
-                # 设置行样式
-                settings = QSettings("CustomerManagement", "Settings")
-                is_dark = (settings.value("theme", "浅色") == "深色")
-                hover_bg = "rgba(255, 255, 255, 0.1)" if is_dark else "#f5f7fa"
-                border_color = "#444444" if is_dark else "#ebeef5"
-                
-                row_widget.setObjectName("reminderRow")
-                row_widget.setStyleSheet(f"""
-                    #reminderRow {{
-                        border-bottom: 1px solid {border_color};
-                    }}
-                    #reminderRow:hover {{
-                        background-color: {hover_bg};
-                    }}
-                """)
-                
-                # 启用右键菜单
-                row_widget.setContextMenuPolicy(Qt.CustomContextMenu)
-                row_widget.customContextMenuRequested.connect(
-                    lambda pos, w=row_widget, i=item: self._show_reminder_context_menu(pos, w, i)
-                )
-                
-                self.reminder_layout.addWidget(row_widget)
-            
-            # 添加底部弹簧
-            self.reminder_layout.addStretch()
+            self.reminder_view.set_theme(self._current_theme())
+            self.reminder_view.set_rows(all_reminders, "暂无即将到期的项目")
                 
         except Exception as e:
             logger.error(f"Failed to load reminders: {e}")
-            while self.reminder_layout.count():
-                item = self.reminder_layout.takeAt(0)
-                if item.widget(): item.widget().deleteLater()
-            err_label = QLabel("加载失败")
-            err_label.setStyleSheet("color: #F56C6C; padding: 20px;")
-            self.reminder_layout.addWidget(err_label)
-            self.reminder_layout.addStretch()
+            self.reminder_view.set_rows([], "加载失败", QColor("#F56C6C"))
 
-    def _show_reminder_context_menu(self, position, widget, item):
+    def _show_reminder_context_menu(self, position):
         """显示提醒列表右键菜单"""
+        item = self.reminder_view.row_at(position)
+        if item is None:
+            return
         menu = QMenu()
         ignore_action = menu.addAction("忽略此提醒")
         
         # 将局部坐标转换为全局坐标
-        global_pos = widget.mapToGlobal(position)
+        global_pos = self.reminder_view.viewport().mapToGlobal(position)
         action = menu.exec_(global_pos)
         
         if action == ignore_action:
             self._ignore_reminder(item['id'], item['type'])
     
     def _load_receivables(self):
+        """加载近期应收账款 (已逾期及未来7天内)"""
         try:
-            while self.receivable_items_layout.count():
-                item = self.receivable_items_layout.takeAt(0)
-                w = item.widget()
-                if w:
-                    w.deleteLater()
-            today = QDate.currentDate().toString('yyyy-MM-dd')
             next7 = QDate.currentDate().addDays(7).toString('yyyy-MM-dd')
-            rows = []
-            try:
-                with self.db_manager.conn:
-                    c = self.db_manager.conn.cursor()
-                    c.execute('''
-                        SELECT id, company_name, pending_amount, pending_date
-                        FROM finance
-                        WHERE pending_amount > 0 AND pending_date IS NOT NULL AND pending_date != ''
-                        ORDER BY pending_date ASC
-                    ''')
-                    rows = c.fetchall()
-            except Exception:
-                rows = []
-            items = []
-            for r in rows:
-                rid, name, amt, pdate = r
-                if pdate < today or (pdate >= today and pdate <= next7):
-                    items.append({'id': rid, 'name': name or '', 'amount': float(amt or 0), 'date': pdate})
-            if not items:
-                empty = QLabel("暂无近期应收账款")
-                empty.setAlignment(Qt.AlignCenter)
-                empty.setStyleSheet("color: #909399; padding: 12px;")
-                self.receivable_items_layout.addWidget(empty)
-                self.receivable_items_layout.addStretch()
-                return
-            settings = QSettings("CustomerManagement", "Settings")
-            is_dark = (settings.value("theme", "浅色") == "深色")
-            hover_bg = "rgba(255, 255, 255, 0.1)" if is_dark else "#f5f7fa"
-            border_color = "#444444" if is_dark else "#ebeef5"
-            for it in items:
-                w = QWidget()
-                w.setObjectName("receivableRow")
-                lay = QHBoxLayout(w)
-                lay.setContentsMargins(12, 8, 12, 8)
-                lay.setSpacing(10)
-                name_label = QLabel(it['name'])
-                name_label.setStyleSheet("background: transparent; font-size: 13px;")
-                amt_label = QLabel(f"¥{it['amount']:.2f}")
-                amt_label.setStyleSheet("font-weight: bold;")
-                date_label = QLabel(it['date'])
-                overdue = it['date'] < today
-                if overdue:
-                    date_label.setStyleSheet("color: #f56c6c;")
-                    amt_label.setStyleSheet("font-weight: bold; color: #f56c6c;")
-                else:
-                    date_label.setStyleSheet("color: #e6a23c;")
-                    amt_label.setStyleSheet("font-weight: bold; color: #e6a23c;")
-                lay.addWidget(name_label, 1)
-                lay.addWidget(date_label)
-                lay.addWidget(amt_label)
-                w.setStyleSheet(f"""
-                    #receivableRow {{
-                        border-bottom: 1px solid {border_color};
-                    }}
-                    #receivableRow:hover {{
-                        background-color: {hover_bg};
-                    }}
-                """)
-                
-                # 双击跳转到财务记录
-                def make_jump_handler(company_name):
-                    def handler(event):
-                        if self.main_window:
-                            self.main_window.switch_to_finance()
-                            self.main_window.btn_finance.setChecked(True)
-                            if hasattr(self.main_window, 'finance'):
-                                self.main_window.finance.search_and_select(company_name)
-                    return handler
-                
-                w.mouseDoubleClickEvent = make_jump_handler(it['name'])
-                w.setCursor(Qt.PointingHandCursor)
-                w.setToolTip("双击查看详情")
-                
-                self.receivable_items_layout.addWidget(w)
-            self.receivable_items_layout.addStretch()
+            rows = self.db_manager.get_pending_receivables(next7)
+            today = QDate.currentDate().toString('yyyy-MM-dd')
+            items = [{
+                'id': rid,
+                'name': name or '',
+                'amount': float(amt or 0),
+                'date': pdate,
+                'level': 'danger' if pdate < today else 'warning'
+            } for rid, name, amt, pdate in rows]
+            
+            self.receivable_view.set_theme(self._current_theme())
+            self.receivable_view.set_rows(items, "暂无近期应收账款")
         except Exception as e:
-            while self.receivable_items_layout.count():
-                item = self.receivable_items_layout.takeAt(0)
-                if item.widget(): item.widget().deleteLater()
-            err = QLabel("加载失败")
-            err.setStyleSheet("color: #F56C6C; padding: 12px;")
-            self.receivable_items_layout.addWidget(err)
-            self.receivable_items_layout.addStretch()
+            logger.error(f"Failed to load receivables: {e}")
+            self.receivable_view.set_rows([], "加载失败", QColor("#F56C6C"))
+
+    def _open_receivable(self, index):
+        """双击跳转到财务记录"""
+        item = index.data(ROW_ROLE)
+        if item and self.main_window:
+            self.main_window.switch_to_finance()
+            self.main_window.btn_finance.setChecked(True)
+            if hasattr(self.main_window, 'finance'):
+                self.main_window.finance.search_and_select(item['name'])
+
+    def _current_theme(self):
+        settings = QSettings("CustomerManagement", "Settings")
+        return settings.value("theme", "浅色", type=str)
+
+    def _get_ignored_reminders(self):
+        """已忽略的提醒 ID 集合 {类型: set(id)}，首次使用时从设置读取"""
+        if self._ignored_reminders is None:
+            self._ignored_reminders = {
+                item_type: {int(i) for i in self.settings.value(key, [], type=list)}
+                for item_type, key in (
+                    ('business', "ignored_reminders"),
+                    ('contract', "ignored_contract_reminders")
+                )
+            }
+        return self._ignored_reminders
             
     def _ignore_reminder(self, item_id, item_type):
         """忽略特定提醒"""
         try:
             key = "ignored_reminders" if item_type == "business" else "ignored_contract_reminders"
-            ignored_ids = self.settings.value(key, [], type=list)
-            ignored_ids = [int(i) for i in ignored_ids]
+            ignored_ids = self._get_ignored_reminders()[item_type]
             
             if item_id not in ignored_ids:
-                ignored_ids.append(item_id)
-                self.settings.setValue(key, ignored_ids)
+                ignored_ids.add(item_id)
+                self.settings.setValue(key, sorted(ignored_ids))
                 
-            # 刷新列表
-            self._load_reminders()
+            # 只移除对应行，无需重新查询
+            self.reminder_view.model().remove_where(
+                lambda row: row['id'] == item_id and row['type'] == item_type
+            )
             
         except Exception as e:
             QMessageBox.warning(self, "错误", f"操作失败: {str(e)}")
@@ -780,9 +656,50 @@ class DashboardWindow(QWidget):
         except Exception as e:
             QMessageBox.critical(self, '错误', f'获取统计数据失败: {str(e)}')
 
+    def _ensure_trend_series(self):
+        """首次使用时创建持久的折线和坐标轴，之后只原地更新数据点"""
+        if self._trend_series:
+            return
+        QtChart = qtchart()
+        
+        # 收入(蓝) / 支出(红) / 利润(绿)
+        for name in ("收入", "支出", "利润"):
+            series = QtChart.QSplineSeries()
+            series.setName(name)
+            self.monthly_chart.addSeries(series)
+            self._trend_series.append(series)
+        self._apply_trend_series_style()
+        
+        self._trend_axis_x = QtChart.QBarCategoryAxis()
+        self.monthly_chart.addAxis(self._trend_axis_x, Qt.AlignBottom)
+        self._trend_axis_y = QtChart.QValueAxis()
+        self._trend_axis_y.setTitleText("金额 (元)")
+        self.monthly_chart.addAxis(self._trend_axis_y, Qt.AlignLeft)
+        for series in self._trend_series:
+            series.attachAxis(self._trend_axis_x)
+            series.attachAxis(self._trend_axis_y)
+        
+        # 显示图例
+        self.monthly_chart.legend().setVisible(True)
+        self.monthly_chart.legend().setAlignment(Qt.AlignBottom)
+        
+        # 新建的坐标轴需要重新应用主题颜色
+        self._chart_theme = None
+        
+    def _apply_trend_series_style(self):
+        """设置折线颜色和线宽 (切换图表主题后需重新设置)"""
+        for series, color in zip(self._trend_series, ("#409eff", "#f56c6c", "#67c23a")):
+            series.setColor(QColor(color))
+            pen = series.pen()
+            pen.setWidth(3)
+            series.setPen(pen)
+
     def update_chart(self):
         """更新月度收支趋势图表"""
         try:
+            QChart = qtchart().QChart
+            self._ensure_trend_series()
+            
             # 更新图表主题
             self._update_chart_theme()
             
@@ -791,78 +708,45 @@ class DashboardWindow(QWidget):
             expense_data = self.db_manager.get_monthly_expense_by_year(year)
             profit_data = self.db_manager.get_monthly_profit_by_year(year)
             
-            self.monthly_chart.removeAllSeries()
-            
-            # 移除所有坐标轴，防止重复添加导致文字重叠
-            for axis in self.monthly_chart.axes():
-                self.monthly_chart.removeAxis(axis)
+            # 数据未变化时跳过重绘
+            data_hash = hash((
+                tuple(income_data.items()),
+                tuple(expense_data.items()),
+                tuple(profit_data.items())
+            ))
+            if data_hash == self._trend_data_hash:
+                return
+            self._trend_data_hash = data_hash
             
             if not income_data:  # 处理空数据情况
+                for series in self._trend_series:
+                    series.clear()
                 self.monthly_chart.setTitle("无数据")
                 return
                 
-            # 创建收入折线 (蓝色)
-            income_series = QSplineSeries()
-            income_series.setName("收入")
-            income_series.setColor(QColor("#409eff")) 
-            pen = income_series.pen()
-            pen.setWidth(3)
-            income_series.setPen(pen)
-            
-            # 创建支出折线 (红色)
-            expense_series = QSplineSeries()
-            expense_series.setName("支出")
-            expense_series.setColor(QColor("#f56c6c"))
-            pen = expense_series.pen()
-            pen.setWidth(3)
-            expense_series.setPen(pen)
-            
-            # 创建利润折线 (绿色)
-            profit_series = QSplineSeries()
-            profit_series.setName("利润")
-            profit_series.setColor(QColor("#67c23a"))
-            pen = profit_series.pen()
-            pen.setWidth(3)
-            profit_series.setPen(pen)
-            
-            months = []
-            for i, (month, amount) in enumerate(income_data.items()):
-                income_series.append(i, amount)
-                expense_series.append(i, expense_data.get(month, 0))
-                profit_series.append(i, profit_data.get(month, 0))
-                months.append(month)
-            
-            # 添加系列到图表
-            self.monthly_chart.addSeries(income_series)
-            self.monthly_chart.addSeries(expense_series)
-            self.monthly_chart.addSeries(profit_series)
-            
-            # 计算最大值以设置Y轴范围
-            max_val = 0
-            all_values = list(income_data.values()) + list(expense_data.values()) + list(profit_data.values())
-            if all_values:
-                max_val = max(all_values)
-            
-            # 设置X轴
-            axisX = QBarCategoryAxis()
-            axisX.append(months)
-            self.monthly_chart.addAxis(axisX, Qt.AlignBottom)
-            income_series.attachAxis(axisX)
-            expense_series.attachAxis(axisX)
-            profit_series.attachAxis(axisX)
-            
-            # 设置Y轴
-            axisY = QValueAxis()
-            axisY.setTitleText("金额 (元)")
-            axisY.setRange(0, max_val * 1.2 if max_val > 0 else 100) # 增加20%的空间
-            self.monthly_chart.addAxis(axisY, Qt.AlignLeft)
-            income_series.attachAxis(axisY)
-            expense_series.attachAxis(axisY)
-            profit_series.attachAxis(axisY)
-            
-            # 显示图例
-            self.monthly_chart.legend().setVisible(True)
-            self.monthly_chart.legend().setAlignment(Qt.AlignBottom)
+            months = list(income_data.keys())
+            columns = (
+                list(income_data.values()),
+                [expense_data.get(month, 0) for month in months],
+                [profit_data.get(month, 0) for month in months],
+            )
+            
+            # 数据点较多时关闭动画
+            point_count = len(months) * len(columns)
+            self.monthly_chart.setAnimationOptions(
+                QChart.NoAnimation if point_count > CHART_ANIMATION_POINT_LIMIT else QChart.SeriesAnimations
+            )
+            
+            # 每条折线一次性替换全部数据点
+            for series, values in zip(self._trend_series, columns):
+                series.replace([QPointF(i, value) for i, value in enumerate(values)])
+            
+            if self._trend_axis_x.categories() != months:
+                self._trend_axis_x.setCategories(months)
+            
+            # 计算最大值以设置Y轴范围 (增加20%的空间)
+            max_val = max(max(values) for values in columns)
+            self._trend_axis_y.setRange(0, max_val * 1.2 if max_val > 0 else 100)
             
             self.monthly_chart.setTitle("")  # 清除无数据提示
             
@@ -875,16 +759,22 @@ class DashboardWindow(QWidget):
             # 更新主题
             self._update_chart_theme()
             
+            distribution = self.db_manager.get_business_distribution()
+            
+            # 数据未变化时跳过重建
+            data_hash = hash(tuple(distribution.items()))
+            if data_hash == self._pie_data_hash:
+                return
+            self._pie_data_hash = data_hash
+            
             self.pie_chart.removeAllSeries()
             self.pie_chart.setTitle("")
             
-            distribution = self.db_manager.get_business_distribution()
-            
             if not distribution:
                 self.pie_chart.setTitle("暂无业务数据")
                 return
                 
-            series = QPieSeries()
+            series = qtchart().QPieSeries()
             
             # 计算总数以显示百分比
             total = sum(distribution.values())
@@ -914,6 +804,12 @@ class DashboardWindow(QWidget):
         settings = QSettings("CustomerManagement", "Settings")
         theme = settings.value("theme", "浅色", type=str)
         
+        # setTheme 会重置系列样式，只在主题变化时执行
+        if theme == self._chart_theme:
+            return
+        self._chart_theme = theme
+        
+        QChart = qtchart().QChart
         charts = [self.monthly_chart, self.pie_chart]
         
         for chart in charts:
@@ -938,8 +834,16 @@ class DashboardWindow(QWidget):
                     axis.setTitleBrush(QColor("#303133"))
                     
                 chart.legend().setLabelColor(QColor("#303133"))
+                
+        self._apply_trend_series_style()
 
 
+    def _on_store_changed(self, kind):
+        if kind == 'todos':
+            self._load_todos()
+        else:
+            self._load_notes()
+
     def _load_todos(self):
         """加载待办事项"""
         try:
@@ -969,8 +873,13 @@ class DashboardWindow(QWidget):
                 checkbox.stateChanged.connect(lambda state, id=todo['id']: 
                     self._update_todo_status(id, state == Qt.Checked))
                 
-                # 文本标签
-                label = QLabel(todo['text'])
+                # 文本标签 (有截止日期时附在后面)
+                text = todo['text']
+                overdue = False
+                if todo.get('due'):
+                    text = f"{text}  (截止 {todo['due']})"
+                    overdue = not todo['completed'] and todo['due'] < QDate.currentDate().toString('yyyy-MM-dd')
+                label = QLabel(text)
                 label.setWordWrap(True)
                 label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
                 # 设置最小高度确保文字不被截断
@@ -981,6 +890,8 @@ class DashboardWindow(QWidget):
                         text-decoration: line-through; 
                         color: #909399;
                     """)
+                elif overdue:
+                    label.setStyleSheet("color: #f56c6c;")
                 else:
                     label.setProperty("class", "todo-text")
                     # color: #303133; 移至QSS
@@ -1033,9 +944,8 @@ class DashboardWindow(QWidget):
         
         if reply == QMessageBox.Yes:
             try:
-                for todo_id in list(self.selected_todos):
-                    self.db_manager.delete_todo(todo_id)
-                self._load_todos()  # 刷新列表
+                # 存储发出 changed 信号后刷新列表
+                self.db_manager.todo_store.delete(self.selected_todos)
             except Exception as e:
                 QMessageBox.critical(self, '错误', f'删除待办事项失败: {str(e)}')
 
@@ -1051,7 +961,6 @@ class DashboardWindow(QWidget):
         if reply == QMessageBox.Yes:
             try:
                 self.db_manager.delete_todo(todo_id)
-                self._load_todos()  # 刷新列表
             except Exception as e:
                 QMessageBox.critical(self, '错误', f'删除待办事项失败: {str(e)}')
 
@@ -1061,7 +970,6 @@ class DashboardWindow(QWidget):
         if ok and text:
             try:
                 self.db_manager.add_todo(text)
-                self._load_todos()
             except Exception as e:
                 QMessageBox.critical(self, '错误', f'添加待办事项失败: {str(e)}')
 
@@ -1069,7 +977,6 @@ class DashboardWindow(QWidget):
         """更新待办事项状态"""
         try:
             self.db_manager.update_todo_status(todo_id, completed)
-            self._load_todos()
         except Exception as e:
             QMessageBox.critical(self, '错误', f'更新待办事项状态失败: {str(e)}')
 
@@ -1077,7 +984,9 @@ class DashboardWindow(QWidget):
         """加载便签内容"""
         try:
             notes = self.db_manager.get_notes()
-            self.notes_edit.setPlainText(notes)
+            # 未保存的修改不被覆盖
+            if notes != self.notes_edit.toPlainText() and not self.notes_edit.document().isModified():
+                self.notes_edit.setPlainText(notes)
         except Exception as e:
             QMessageBox.critical(self, '错误', f'加载便签失败: {str(e)}')
 
@@ -1086,6 +995,7 @@ class DashboardWindow(QWidget):
         try:
             notes = self.notes_edit.toPlainText()
             self.db_manager.save_notes(notes)
+            self.notes_edit.document().setModified(False)
             QMessageBox.information(self, '成功', '便签已保存')
         except Exception as e:
             QMessageBox.critical(self, '错误', f'保存便签失败: {str(e)}')
@@ -0,0 +1,192 @@
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QStyle, QFrame, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRect
+from PyQt5.QtGui import QColor, QFont, QPainter, QFontMetrics
+
+# 行数据角色：返回整行字典
+ROW_ROLE = Qt.UserRole + 1
+
+# 主题调色板缓存 {主题名: {用途: QColor}}
+_PALETTES = {}
+
+
+def panel_palette(theme):
+    """获取面板配色 (按主题缓存，只创建一次)"""
+    palette = _PALETTES.get(theme)
+    if palette is None:
+        is_dark = (theme == "深色")
+        palette = {
+            'text': QColor("#e0e0e0" if is_dark else "#303133"),
+            'hover': QColor(255, 255, 255, 26) if is_dark else QColor("#f5f7fa"),
+            'border': QColor("#444444" if is_dark else "#ebeef5"),
+            'placeholder': QColor("#909399"),
+            'tag': QColor("#409eff"),
+            'danger': QColor("#F56C6C"),
+            'warning': QColor("#E6A23C"),
+            'muted': QColor("#909399"),
+        }
+        _PALETTES[theme] = palette
+    return palette
+
+
+class PanelListModel(QAbstractListModel):
+    """首页面板的轻量列表模型，每行是一个字典"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == ROW_ROLE:
+            return row
+        if role == Qt.DisplayRole:
+            return row.get('name', '')
+        if role == Qt.ToolTipRole:
+            return row.get('tooltip')
+        return None
+
+    def set_rows(self, rows):
+        """整体替换数据 (一次 reset，不逐行重建控件)"""
+        self.beginResetModel()
+        self._rows = list(rows)
+        self.endResetModel()
+
+    def remove_where(self, predicate):
+        """删除满足条件的行"""
+        for i in range(len(self._rows) - 1, -1, -1):
+            if predicate(self._rows[i]):
+                self.beginRemoveRows(QModelIndex(), i, i)
+                del self._rows[i]
+                self.endRemoveRows()
+
+
+class PanelRowDelegate(QStyledItemDelegate):
+    """面板行绘制基类：负责悬停背景和底部分隔线"""
+
+    PADDING_H = 10
+    PADDING_V = 8
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.palette = panel_palette("浅色")
+        self.font = QFont()
+        self.font.setPixelSize(13)
+        self.bold_font = QFont(self.font)
+        self.bold_font.setBold(True)
+        self._row_height = QFontMetrics(self.bold_font).height() + self.PADDING_V * 2
+
+    def set_theme(self, theme):
+        self.palette = panel_palette(theme)
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self._row_height)
+
+    def paint(self, painter, option, index):
+        row = index.data(ROW_ROLE)
+        if row is None:
+            return
+        painter.save()
+        rect = option.rect
+        if option.state & QStyle.State_MouseOver:
+            painter.fillRect(rect, self.palette['hover'])
+        painter.setPen(self.palette['border'])
+        painter.drawLine(rect.left(), rect.bottom(), rect.right(), rect.bottom())
+        content = rect.adjusted(self.PADDING_H, 0, -self.PADDING_H, 0)
+        self.paint_row(painter, content, row)
+        painter.restore()
+
+    def paint_row(self, painter, rect, row):
+        """绘制一行的内容 (子类实现)；rect 已扣除左右内边距，painter 状态由 paint 保存和恢复"""
+
+    def _draw_text(self, painter, rect, text, color, font, align=Qt.AlignLeft):
+        """在 rect 中绘制单行文本，返回所占宽度"""
+        painter.setFont(font)
+        painter.setPen(color)
+        metrics = QFontMetrics(font)
+        elided = metrics.elidedText(text, Qt.ElideRight, rect.width())
+        painter.drawText(rect, align | Qt.AlignVCenter, elided)
+        return metrics.horizontalAdvance(elided)
+
+
+class ReminderDelegate(PanelRowDelegate):
+    """到期提醒：[类型] 名称 - 日期 (状态)"""
+
+    def paint_row(self, painter, rect, row):
+        x = rect.left()
+        x += self._draw_text(painter, QRect(x, rect.top(), rect.width(), rect.height()),
+                             f"[{row['type_name']}]", self.palette['tag'], self.bold_font) + 6
+        status = f"({row['status']})"
+        status_width = QFontMetrics(self.bold_font).horizontalAdvance(status)
+        text_rect = QRect(x, rect.top(), max(0, rect.right() - x - status_width - 4), rect.height())
+        x += self._draw_text(painter, text_rect, f"{row['name']} - {row['date']}",
+                             self.palette['text'], self.font) + 4
+        self._draw_text(painter, QRect(x, rect.top(), max(0, rect.right() - x), rect.height()),
+                        status, self.palette[row['level']], self.bold_font)
+
+
+class ReceivableDelegate(PanelRowDelegate):
+    """应收账款：名称 ...... 日期  金额"""
+
+    def paint_row(self, painter, rect, row):
+        color = self.palette[row['level']]
+        amount = f"¥{row['amount']:.2f}"
+        metrics = QFontMetrics(self.bold_font)
+        amount_width = metrics.horizontalAdvance(amount)
+        date_width = QFontMetrics(self.font).horizontalAdvance(row['date'])
+        right = rect.right()
+        self._draw_text(painter, QRect(right - amount_width, rect.top(), amount_width + 1, rect.height()),
+                        amount, color, self.bold_font, Qt.AlignRight)
+        right -= amount_width + 10
+        self._draw_text(painter, QRect(right - date_width, rect.top(), date_width + 1, rect.height()),
+                        row['date'], color, self.font, Qt.AlignRight)
+        right -= date_width + 10
+        self._draw_text(painter, QRect(rect.left(), rect.top(), max(0, right - rect.left()), rect.height()),
+                        row['name'], self.palette['text'], self.font)
+
+
+class PanelListView(QListView):
+    """首页面板列表视图，无数据时居中显示占位文字"""
+
+    def __init__(self, delegate, parent=None):
+        super().__init__(parent)
+        self.placeholder = ""
+        self.placeholder_color = None
+        self.setModel(PanelListModel(self))
+        self.setItemDelegate(delegate)
+        self.setFrameShape(QFrame.NoFrame)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setUniformItemSizes(True)
+        self.setMouseTracking(True)
+        # 设置透明背景，适配深色模式
+        self.setStyleSheet("QListView { background: transparent; }")
+
+    def set_theme(self, theme):
+        self.itemDelegate().set_theme(theme)
+        self.viewport().update()
+
+    def set_rows(self, rows, placeholder="", placeholder_color=None):
+        self.placeholder = placeholder
+        self.placeholder_color = placeholder_color
+        self.model().set_rows(rows)
+        self.viewport().update()
+
+    def row_at(self, pos):
+        index = self.indexAt(pos)
+        return index.data(ROW_ROLE) if index.isValid() else None
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.model().rowCount() == 0 and self.placeholder:
+            painter = QPainter(self.viewport())
+            palette = self.itemDelegate().palette
+            painter.setPen(self.placeholder_color or palette['placeholder'])
+            rect = self.viewport().rect().adjusted(0, 12, 0, 0)
+            painter.drawText(rect, Qt.AlignHCenter | Qt.AlignTop, self.placeholder)
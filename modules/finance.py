@@ -5,7 +5,6 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QScrollArea, QFrame, QAbstractItemView, QCheckBox, QWidget,
                              QGridLayout, QMenu, QGroupBox, QButtonGroup, QSizePolicy)
 from PyQt5.QtCore import Qt, QDate, QSize
-from PyQt5.QtChart import QChart, QChartView, QBarSeries, QBarSet, QBarCategoryAxis, QValueAxis
 from PyQt5.QtGui import QPainter, QFont, QColor, QIntValidator
 import sqlite3
 from datetime import datetime
@@ -13,7 +12,9 @@ from core.logger import logger
 from core.async_utils import Worker, QThreadPool
 from modules.common_widgets import CustomerSelectionCombo, SingleSelectionWidget, ModernDateEdit
 from modules.base_card import BaseCardWidget
-from core.constants import FINANCE_TAG_COLORS
+from core.constants import FINANCE_TAG_COLORS, CHART_ANIMATION_POINT_LIMIT
+from core.lazy_imports import qtchart
+from core.query_builder import FilterSpec, compile_spec
 
 class FinanceCardWidget(BaseCardWidget):
     """财务卡片控件"""
@@ -495,15 +496,37 @@ class FinanceEditDialog(QDialog):
         except sqlite3.Error as e:
             QMessageBox.warning(self, '错误', f'保存失败: {str(e)}')
 
+def get_monthly_stats(db_manager, filters=None):
+    """按月汇总收入/支出/利润
+
+    filters 为筛选对话框的 get_filters() 结果 (company/start_date/end_date)，
+    与导出使用同一查询定义，统计范围和导出范围一致。
+    """
+    query = compile_spec(FilterSpec.of('finance', **(filters or {})))
+    cursor = query.grouped(
+        db_manager.conn,
+        "strftime('%Y-%m', due_date)",
+        'SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END)',
+        'SUM(CASE WHEN cost > 0 THEN cost ELSE 0 END)',
+        'SUM(profit)',
+    )
+    return {
+        month: {'income': income or 0, 'expense': expense or 0, 'profit': profit or 0}
+        for month, income, expense, profit in cursor
+    }
+
+
 class FinanceFilterDialog(QDialog):
     """财务数据筛选对话框"""
-    def __init__(self, db_manager, parent=None, title='筛选选项', confirm_text='确定', hint_text=None):
+    def __init__(self, db_manager, parent=None, title='筛选选项', confirm_text='确定', hint_text=None,
+                 view_option=False):
         super().__init__(parent)
         self.db_manager = db_manager
         self.setWindowTitle(title)
         self.confirm_text = confirm_text
         self.hint_text = hint_text or "提示: 项目名称留空且不勾选日期筛选，将统计所有数据"
-        self.setFixedSize(400, 320)
+        self.view_option = view_option
+        self.setFixedSize(400, 350 if view_option else 320)
         self._init_ui()
 
     def _init_ui(self):
@@ -547,6 +570,13 @@ class FinanceFilterDialog(QDialog):
         filter_layout.addRow(self.date_check)
         filter_layout.addRow("日期范围:", date_layout)
         
+        # 3. 叠加列表页当前的搜索/年月/状态筛选
+        self.view_check = None
+        if self.view_option:
+            self.view_check = QCheckBox("同时应用列表当前的筛选条件")
+            self.view_check.setChecked(True)
+            filter_layout.addRow(self.view_check)
+        
         filter_group.setLayout(filter_layout)
         
         layout.addWidget(filter_group)
@@ -591,6 +621,10 @@ class FinanceFilterDialog(QDialog):
             
         return filters
 
+    def use_current_view(self):
+        """是否叠加列表当前的筛选条件"""
+        return self.view_check is not None and self.view_check.isChecked()
+
 class FinanceStatsWindow(QDialog):
     """财务统计窗口"""
     def __init__(self, db_manager, parent=None):
@@ -674,16 +708,47 @@ class FinanceStatsWindow(QDialog):
         chart_layout = QVBoxLayout(chart_container)
         chart_layout.setContentsMargins(10, 10, 10, 10)
         
-        self.chart = QChart()
-        self.chart.setAnimationOptions(QChart.SeriesAnimations)
+        QtChart = qtchart()
+        self.chart = QtChart.QChart()
+        self.chart.setAnimationOptions(QtChart.QChart.SeriesAnimations)
         self.chart.setBackgroundVisible(False)
         self.chart.setPlotAreaBackgroundVisible(False)
         self.chart.setTitle("月度财务统计")
         self.chart.setTitleFont(QFont("Microsoft YaHei", 12, QFont.Bold))
 
-        self.chart_view = QChartView(self.chart)
+        self.chart_view = QtChart.QChartView(self.chart)
         self.chart_view.setRenderHint(QPainter.Antialiasing)
         
+        # 系列和坐标轴只创建一次，刷新时原地替换柱状数据
+        self.bar_series = QtChart.QBarSeries()
+        self.income_set = QtChart.QBarSet('收入')
+        self.expense_set = QtChart.QBarSet('支出')
+        self.profit_set = QtChart.QBarSet('利润')
+        self.bar_series.append(self.income_set)
+        self.bar_series.append(self.expense_set)
+        self.bar_series.append(self.profit_set)
+        self.chart.addSeries(self.bar_series)
+        
+        axis_font = QFont()
+        axis_font.setPointSize(9)
+        self.axis_x = QtChart.QBarCategoryAxis()
+        self.axis_x.setLabelsFont(axis_font)
+        self.chart.addAxis(self.axis_x, Qt.AlignBottom)
+        self.bar_series.attachAxis(self.axis_x)
+        
+        self.axis_y = QtChart.QValueAxis()
+        self.axis_y.setLabelFormat('%.0f')
+        self.axis_y.setTitleText('金额（元）')
+        self.axis_y.setLabelsFont(axis_font)
+        self.chart.addAxis(self.axis_y, Qt.AlignLeft)
+        self.bar_series.attachAxis(self.axis_y)
+        
+        legend_font = QFont()
+        legend_font.setPointSize(9)
+        self.chart.legend().setFont(legend_font)
+        self.chart.legend().setAlignment(Qt.AlignTop)
+        self._chart_data_hash = None
+        
         chart_layout.addWidget(self.chart_view)
         main_layout.addWidget(chart_container)
 
@@ -732,102 +797,49 @@ class FinanceStatsWindow(QDialog):
 
         monthly_stats = self._get_monthly_stats(filters)
         
-        # Clear chart
-        self.chart.removeAllSeries()
-        for axis in self.chart.axes():
-            self.chart.removeAxis(axis)
-
-        if not monthly_stats:
-             # Handle empty data?
-             return
-
-        series = QBarSeries()
-        income_set = QBarSet('收入')
-        expense_set = QBarSet('支出')
-        profit_set = QBarSet('利润')
-        
-        categories = []
-        
         # Sort by month
         sorted_months = sorted(monthly_stats.keys())
-        for month in sorted_months:
-            stats = monthly_stats[month]
-            categories.append(month)
-            income_set.append(stats['income'])
-            expense_set.append(stats['expense'])
-            profit_set.append(stats['profit'])
-            
-        series.append(income_set)
-        series.append(expense_set)
-        series.append(profit_set)
-        self.chart.addSeries(series)
-        
-        axisX = QBarCategoryAxis()
-        axisX.append(categories)
-        axis_font = QFont()
-        axis_font.setPointSize(9)
-        axisX.setLabelsFont(axis_font)
-        self.chart.addAxis(axisX, Qt.AlignBottom)
-        series.attachAxis(axisX)
+        columns = (
+            [monthly_stats[month]['income'] for month in sorted_months],
+            [monthly_stats[month]['expense'] for month in sorted_months],
+            [monthly_stats[month]['profit'] for month in sorted_months],
+        )
         
-        axisY = QValueAxis()
-        axisY.setLabelFormat('%.0f')
-        axisY.setTitleText('金额（元）')
-        axisY.setLabelsFont(axis_font)
-        self.chart.addAxis(axisY, Qt.AlignLeft)
-        series.attachAxis(axisY)
+        # 数据未变化时跳过重绘
+        data_hash = hash((tuple(sorted_months),) + tuple(tuple(values) for values in columns))
+        if data_hash == self._chart_data_hash:
+            return
+        self._chart_data_hash = data_hash
         
-        legend_font = QFont()
-        legend_font.setPointSize(9)
-        self.chart.legend().setFont(legend_font)
-        self.chart.legend().setAlignment(Qt.AlignTop)
-
-    def _get_monthly_stats(self, filters=None):
-        """获取月度财务统计数据 (Copied logic to be self-contained)"""
-        monthly_stats = {}
-        filters = filters or {}
+        # 柱子较多时关闭动画 (多年数据逐柱动画非常耗时)
+        QChart = qtchart().QChart
+        bar_count = len(sorted_months) * len(columns)
+        self.chart.setAnimationOptions(
+            QChart.NoAnimation if bar_count > CHART_ANIMATION_POINT_LIMIT else QChart.SeriesAnimations
+        )
         
-        with self.db_manager.conn:
-            cursor = self.db_manager.conn.cursor()
-            
-            query = '''
-                SELECT strftime('%Y-%m', due_date) as month,
-                       SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) as income,
-                       SUM(CASE WHEN cost > 0 THEN cost ELSE 0 END) as expense,
-                       SUM(profit) as profit
-                FROM finance
-                WHERE is_deleted = 0
-            '''
-            params = []
-            
-            if 'company' in filters:
-                query += " AND company_name LIKE ?"
-                params.append(f"%{filters['company']}%")
-                
-            if 'start_date' in filters:
-                query += " AND due_date >= ?"
-                params.append(filters['start_date'])
-                
-            if 'end_date' in filters:
-                query += " AND due_date <= ?"
-                params.append(filters['end_date'])
-                
-            query += '''
-                GROUP BY month
-                ORDER BY month
-            '''
+        # 批量替换数据，期间暂停视图刷新
+        self.chart_view.setUpdatesEnabled(False)
+        try:
+            for bar_set, values in zip((self.income_set, self.expense_set, self.profit_set), columns):
+                if bar_set.count():
+                    bar_set.remove(0, bar_set.count())
+                if values:
+                    bar_set.append(values)
             
-            cursor.execute(query, params)
+            if self.axis_x.categories() != sorted_months:
+                self.axis_x.setCategories(sorted_months)
             
-            for row in cursor.fetchall():
-                month, income, expense, profit = row
-                monthly_stats[month] = {
-                    'income': income or 0,
-                    'expense': expense or 0,
-                    'profit': profit or 0
-                }
-                
-        return monthly_stats
+            all_values = [value for values in columns for value in values]
+            if all_values:
+                self.axis_y.setRange(min(0, min(all_values)), max(0, max(all_values)) or 100)
+                self.axis_y.applyNiceNumbers()
+        finally:
+            self.chart_view.setUpdatesEnabled(True)
+
+    def _get_monthly_stats(self, filters=None):
+        """获取月度财务统计数据"""
+        return get_monthly_stats(self.db_manager, filters)
 
 class FinanceWindow(QWidget):
     def __init__(self, db_manager, parent=None):
@@ -1115,93 +1127,37 @@ class FinanceWindow(QWidget):
         
         self.setLayout(main_layout)
         
-    def _fetch_data_worker(self, search_text, year_filter, month_filter, status_filter, only_debtors, sort_option, limit, offset):
+    def _fetch_data_worker(self, spec, limit, offset):
         """Background worker to fetch data and count"""
+        query = compile_spec(spec)
         conn = self.db_manager.create_new_connection()
         try:
-            cursor = conn.cursor()
-            
-            where_clauses = ["is_deleted = 0"]
-            params = []
-            
-            # Search
-            if search_text:
-                where_clauses.append("(company_name LIKE ? OR CAST(amount AS TEXT) LIKE ? OR due_date LIKE ? OR notes LIKE ?)")
-                p = f"%{search_text}%"
-                params.extend([p, p, p, p])
-            
-            # Year/Month
-            if year_filter != '所有年份':
-                where_clauses.append("strftime('%Y', due_date) = ?")
-                params.append(year_filter)
-                if month_filter != '所有月份':
-                    where_clauses.append("strftime('%m', due_date) = ?")
-                    params.append(month_filter)
-            
-            # Status & Debtors
-            today = datetime.now().strftime('%Y-%m-%d')
-            
-            if status_filter == '待收款':
-                where_clauses.append("pending_amount > 0 AND (pending_date IS NULL OR pending_date = '' OR pending_date >= ?)")
-                params.append(today)
-            elif status_filter == '已逾期':
-                where_clauses.append("pending_amount > 0 AND pending_date < ? AND pending_date != ''")
-                params.append(today)
-            elif status_filter == '已结清':
-                where_clauses.append("pending_amount <= 0")
-            
-            if only_debtors:
-                where_clauses.append("pending_amount > 0")
-                
-            where_sql = " AND ".join(where_clauses)
-            
-            # Count
-            count_sql = f"SELECT COUNT(*) FROM finance WHERE {where_sql}"
-            cursor.execute(count_sql, params)
-            total = cursor.fetchone()[0]
-            
-            # Stats (Total Profit & Pending for current filter)
-            stats_sql = f"""
-                SELECT SUM(profit), SUM(pending_amount)
-                FROM finance
-                WHERE {where_sql}
-            """
-            cursor.execute(stats_sql, params)
-            stats_row = cursor.fetchone()
-            total_profit = stats_row[0] or 0.0
-            total_pending = stats_row[1] or 0.0
-            
-            # Determine Order
-            order_by = "due_date DESC"
-            if sort_option == '日期 (新→旧)':
-                order_by = "due_date DESC"
-            elif sort_option == '日期 (旧→新)':
-                order_by = "due_date ASC"
-            elif sort_option == '金额 (高→低)':
-                order_by = "amount DESC"
-            elif sort_option == '金额 (低→高)':
-                order_by = "amount ASC"
-
-            # Data
-            sql = f"""
-                SELECT id, company_name, amount, 
-                       cost, profit, due_date, notes,
-                       pending_amount, pending_date,
-                       payment_method, contract_status,
-                       project_status, invoice_status
-                FROM finance
-                WHERE {where_sql}
-                ORDER BY {order_by}
-                LIMIT ? OFFSET ?
-            """
-            cursor.execute(sql, params + [limit, offset])
-            rows = cursor.fetchall()
-            
-            return rows, total, total_profit, total_pending
-            
+            # 列表、计数和统计共用同一个 WHERE 子句
+            total = query.count(conn)
+            total_profit, total_pending = query.aggregate(conn, 'SUM(profit)', 'SUM(pending_amount)')
+            rows = query.page(conn, limit, offset)
+            return rows, total, total_profit or 0.0, total_pending or 0.0
         finally:
             conn.close()
 
+    def _filter_spec(self):
+        """当前列表筛选条件"""
+        year = self.year_filter.currentText()
+        month = self.month_filter.currentText()
+        if year == '所有年份':
+            year = month = None
+        elif month == '所有月份':
+            month = None
+        return FilterSpec.of(
+            'finance',
+            sort=self.sort_combo.currentText(),
+            search=self.search_input.text().strip(),
+            year=year,
+            month=month,
+            status=self.status_filter.currentText(),
+            debtors=self.debtors_toggle.isChecked(),
+        )
+
     def _load_finance(self):
         """Async load finance data"""
         self.prev_btn.setEnabled(False)
@@ -1209,17 +1165,9 @@ class FinanceWindow(QWidget):
         self.list_widget.clear()
         self._cards = []
         
-        # Get filter params
-        search_text = self.search_input.text().strip()
-        year_filter = self.year_filter.currentText()
-        month_filter = self.month_filter.currentText()
-        status_filter = self.status_filter.currentText()
-        sort_option = self.sort_combo.currentText()
-        only_debtors = self.debtors_toggle.isChecked()
-        
         offset = (self.page - 1) * self.page_size
         
-        worker = Worker(self._fetch_data_worker, search_text, year_filter, month_filter, status_filter, only_debtors, sort_option, self.page_size, offset)
+        worker = Worker(self._fetch_data_worker, self._filter_spec(), self.page_size, offset)
         worker.signals.result.connect(self._on_load_success)
         worker.signals.error.connect(self._on_load_error)
         self.threadpool.start(worker)
@@ -1417,7 +1365,6 @@ class FinanceWindow(QWidget):
             if reply == QMessageBox.Yes:
                 with self.db_manager.conn:
                     cursor = self.db_manager.conn.cursor()
-                    from datetime import datetime
                     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     cursor.execute('UPDATE finance SET is_deleted = 1, deleted_at = ? WHERE id = ?', (now, fin_id))
                     
@@ -1434,68 +1381,28 @@ class FinanceWindow(QWidget):
         
     def _get_monthly_stats(self, filters=None):
         """获取月度财务统计数据"""
-        monthly_stats = {}
-        filters = filters or {}
-        
-        with self.db_manager.conn:
-            cursor = self.db_manager.conn.cursor()
-            
-            query = '''
-                SELECT strftime('%Y-%m', due_date) as month,
-                       SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) as income,
-                       SUM(CASE WHEN cost > 0 THEN cost ELSE 0 END) as expense,
-                       SUM(profit) as profit
-                FROM finance
-                WHERE is_deleted = 0
-            '''
-            params = []
-            
-            if 'company' in filters:
-                query += " AND company_name LIKE ?"
-                params.append(f"%{filters['company']}%")
-                
-            if 'start_date' in filters:
-                query += " AND due_date >= ?"
-                params.append(filters['start_date'])
-                
-            if 'end_date' in filters:
-                query += " AND due_date <= ?"
-                params.append(filters['end_date'])
-                
-            query += '''
-                GROUP BY month
-                ORDER BY month
-            '''
-            
-            cursor.execute(query, params)
-            
-            for row in cursor.fetchall():
-                month, income, expense, profit = row
-                monthly_stats[month] = {
-                    'income': income or 0,
-                    'expense': expense or 0,
-                    'profit': profit or 0
-                }
-                
-        return monthly_stats
+        return get_monthly_stats(self.db_manager, filters)
         
     def _export_finance(self):
-        """导出财务数据为Excel格式"""
+        """导出财务数据 (Excel 或 CSV/TSV，按扩展名选择)"""
         # 1. 弹出筛选对话框
         dialog = FinanceFilterDialog(
             self.db_manager, 
             self, 
             title='导出选项', 
             confirm_text='导出',
-            hint_text='提示: 项目名称留空且不勾选日期筛选，将导出所有数据'
+            hint_text='提示: 项目名称留空且不勾选日期筛选，将导出列表当前显示的全部数据',
+            view_option=True
         )
         if dialog.exec_() != QDialog.Accepted:
             return
             
         filters = dialog.get_filters()
+        spec = self._filter_spec() if dialog.use_current_view() else FilterSpec.of('finance')
+        query = compile_spec(spec.with_filters(**filters))
         
         from PyQt5.QtWidgets import QFileDialog
-        from datetime import datetime
+        from core.import_export import FILE_DIALOG_FILTER
         
         # 生成默认文件名
         filename_parts = ['财务数据']
@@ -1512,7 +1419,7 @@ class FinanceWindow(QWidget):
             self,
             '导出财务数据',
             default_filename,
-            'Excel文件 (*.xlsx)'
+            FILE_DIALOG_FILTER
         )
         
         if not file_path:
@@ -1523,106 +1430,45 @@ class FinanceWindow(QWidget):
             if not self.db_manager or not self.db_manager.conn:
                 raise Exception("数据库连接未初始化")
                 
-            # 从数据库获取数据
+            # 从数据库获取数据 (与列表页使用同一查询定义和排序)
             with self.db_manager.conn:
-                cursor = self.db_manager.conn.cursor()
-                
-                # 构建查询语句
-                query = '''
-                    SELECT 
-                        company_name, amount, cost, 
-                        profit, due_date, notes,
-                        pending_amount, pending_date
-                    FROM finance
-                    WHERE is_deleted = 0
-                '''
-                params = []
-                
-                # 应用筛选条件
-                if 'company' in filters:
-                    query += " AND company_name LIKE ?"
-                    params.append(f"%{filters['company']}%")
-                    
-                if 'start_date' in filters:
-                    query += " AND due_date >= ?"
-                    params.append(filters['start_date'])
-                    
-                if 'end_date' in filters:
-                    query += " AND due_date <= ?"
-                    params.append(filters['end_date'])
-                    
-                query += " ORDER BY due_date DESC"
-                
-                # 检查数据量
-                count_query = f"SELECT COUNT(*) FROM ({query})"
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()[0]
-                
+                total_count = query.count(self.db_manager.conn)
                 if total_count == 0:
                     QMessageBox.warning(self, '警告', '没有符合筛选条件的数据可导出')
                     return
                     
-                # 执行查询
-                logger.info(f"Exporting finance data with filters: {filters}")
-                cursor.execute(query, params)
-                
-                rows = cursor.fetchall()
-                logger.info(f"Found {len(rows)} records")
+                logger.info(f"Exporting finance data with filters: {spec.with_filters(**filters)}")
+                cursor = query.iter_rows(self.db_manager.conn, [
+                    'company_name', 'amount', 'cost', 'profit', 'due_date', 'notes',
+                    'pending_amount', 'pending_date'
+                ])
                 
-                # 定义表头和数据库字段映射
-                columns = ['company_name', 'amount', 'cost', 'profit', 'due_date', 'notes', 'pending_amount', 'pending_date']
                 headers = ['项目名称', '金额', '成本', '利润', '项目日期', '备注', '待收金额', '待收日期']
-                data = []
                 
-                # 严格验证和转换每条记录
-                for i, row in enumerate(rows, 1):
-                    try:
-                        # 验证字段数量
-                        if len(row) != len(columns):
-                            raise ValueError(f"记录字段数不匹配，预期{len(columns)}，实际{len(row)}")
-                            
-                        # 创建数据字典，确保键与表头对应
-                        row_dict = {
-                            'company_name': str(row[0]) if row[0] is not None else '',
-                            'amount': float(row[1]) if row[1] is not None else 0.0,
-                            'cost': float(row[2]) if row[2] is not None else 0.0,
-                            'profit': float(row[3]) if row[3] is not None else 0.0,
-                            'due_date': str(row[4]) if row[4] is not None else '',
-                            'notes': str(row[5]) if row[5] is not None else '',
-                            'pending_amount': float(row[6]) if row[6] is not None else 0.0,
-                            'pending_date': str(row[7]) if row[7] is not None else ''
-                        }
-                        
-                        # 转换为导出所需的格式
-                        export_row = {
-                            headers[0]: row_dict['company_name'],
-                            headers[1]: str(row_dict['amount']),
-                            headers[2]: str(row_dict['cost']),
-                            headers[3]: str(row_dict['profit']),
-                            headers[4]: row_dict['due_date'],
-                            headers[5]: row_dict['notes'],
-                            headers[6]: str(row_dict['pending_amount']),
-                            headers[7]: row_dict['pending_date']
-                        }
-                        
-                        data.append(export_row)
-                        
-                    except Exception as e:
-                        logger.error(f"\n!!! Error converting record {i}: {str(e)}")
-                        raise ValueError(f"数据处理失败: {str(e)}")
+                def iter_export_rows():
+                    """逐行转换游标结果: 文本字段 NULL 转空串，金额字段转为数值字符串"""
+                    for company_name, amount, cost, profit, due_date, notes, pending_amount, pending_date in cursor:
+                        yield (
+                            str(company_name) if company_name is not None else '',
+                            str(float(amount or 0.0)),
+                            str(float(cost or 0.0)),
+                            str(float(profit or 0.0)),
+                            str(due_date) if due_date is not None else '',
+                            str(notes) if notes is not None else '',
+                            str(float(pending_amount or 0.0)),
+                            str(pending_date) if pending_date is not None else ''
+                        )
                 
-                # 使用BaseImporterExporter导出
-                from core.import_export import BaseImporterExporter, ImportExportError
+                # 直接从游标流式写入，不在内存中构建完整数据
+                from core.import_export import BaseImporterExporter
                 exporter = BaseImporterExporter()
-                if not hasattr(exporter, 'export_to_excel'):
-                    raise Exception("BaseImporterExporter缺少export_to_excel方法")
-                    
-                exporter.export_to_excel(
-                    data=data,
+                exported_count = exporter.export_rows(
+                    iter_export_rows(),
                     file_path=file_path,
-                    sheet_name='财务数据',
-                    headers=headers
+                    headers=headers,
+                    sheet_name='财务数据'
                 )
+                logger.info(f"Exported {exported_count} records")
                 
                 # 验证文件是否创建成功
                 import os
@@ -1630,14 +1476,14 @@ class FinanceWindow(QWidget):
                     raise Exception("导出文件创建失败")
                     
                 file_size = os.path.getsize(file_path)
-                if file_size < 1024:  # 小于1KB可能是空文件
-                    raise Exception("导出文件可能为空")
+                if file_size == 0:
+                    raise Exception("导出文件为空")
                 
                 QMessageBox.information(
                     self, 
                     '导出成功', 
                     f'财务数据已成功导出到:\n{file_path}\n'
-                    f'共导出 {len(data)} 条记录\n'
+                    f'共导出 {exported_count} 条记录\n'
                     f'文件大小: {file_size/1024:.1f}KB'
                 )
                 
@@ -1654,114 +1500,28 @@ class FinanceWindow(QWidget):
             )
             
     def _import_finance(self):
-        """从Excel文件导入财务数据"""
-        from PyQt5.QtWidgets import QFileDialog, QMessageBox
-        from core.import_export import BaseImporterExporter
-        from datetime import datetime
-        from core.import_export import ImportExportError
+        """从Excel/CSV文件导入财务数据(增量导入，后台分块执行)"""
+        from PyQt5.QtWidgets import QFileDialog
+        from core.import_export import FILE_DIALOG_FILTER
+        from core.import_pipeline import FINANCE_IMPORT
+        from dialogs.import_progress import run_import
         
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             '选择财务数据文件',
             '',
-            'Excel文件 (*.xlsx)'
+            FILE_DIALOG_FILTER
         )
         
         if not file_path:
             return
             
-        try:
-            # 初始化导入器
-            importer = BaseImporterExporter()
-            importer._required_columns = ['项目名称', '金额']
-            importer._column_mapping = {
-                '项目名称': 'company_name',
-                '金额': 'amount',
-                '成本': 'cost',
-                '项目日期': 'due_date',
-                '备注': 'notes',
-                '待收金额': 'pending_amount',
-                '待收日期': 'pending_date'
-            }
-            
-            # 获取现有数据用于去重
-            with self.db_manager.conn:
-                cursor = self.db_manager.conn.cursor()
-                cursor.execute('SELECT company_name, due_date FROM finance')
-                existing_finance = [{'company_name': row[0], 'due_date': row[1]} 
-                                  for row in cursor.fetchall()]
-                importer.cache_existing_data(
-                    existing_finance,
-                    key_columns=['company_name', 'due_date']
-                )
-            
-            # 从Excel导入数据
-            imported_data = importer.import_from_excel(
-                file_path=file_path,
-                sheet_name='财务数据',
-                key_columns=['company_name', 'due_date'],
-                skip_duplicates=True
-            )
-            
-            if not imported_data:
-                QMessageBox.information(self, '导入完成', '没有可导入的数据')
-                return
-                
-            # 准备导入数据
-            records_to_insert = []
-            for row in imported_data:
-                # 计算利润
-                amount = float(row.get('amount', 0))
-                cost = float(row.get('cost', 0))
-                profit = amount - cost
-                
-                records_to_insert.append((
-                    row.get('company_name', ''),
-                    amount,
-                    cost,
-                    profit,
-                    row.get('due_date', ''),
-                    row.get('notes', ''),
-                    float(row.get('pending_amount', 0)),
-                    row.get('pending_date', '')
-                ))
-            
-            # 执行批量导入
-            with self.db_manager.conn:
-                cursor = self.db_manager.conn.cursor()
-                cursor.executemany('''
-                    INSERT OR IGNORE INTO finance (
-                        company_name, amount, cost, profit, 
-                        due_date, notes, pending_amount, pending_date
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', records_to_insert)
-                
-                inserted_count = cursor.rowcount
-                total_count = len(imported_data)
-                skipped_count = total_count - inserted_count
-                
-            # 刷新界面和数据
-            self._load_finance()
-            
-            # 显示导入结果
-            QMessageBox.information(
-                self,
-                '导入完成',
-                f'成功导入 {inserted_count} 条财务记录\n'
-                f'跳过 {skipped_count} 条重复记录\n'
-                f'共处理 {total_count} 条记录'
-            )
+        result = run_import(self, self.db_manager, FINANCE_IMPORT, file_path)
+        if result is None or not (result.inserted or result.updated):
+            return
             
-        except ImportExportError as e:
-            QMessageBox.critical(self, '导入错误', str(e))
-        except Exception as e:
-            QMessageBox.critical(
-                self,
-                '导入失败',
-                f'导入过程中发生错误:\n{str(e)}\n'
-                '请检查文件格式是否正确'
-            )
+        # 刷新界面和数据
+        self._load_finance()
     
     def _select_all_rows(self):
         for card in getattr(self, '_cards', []):
@@ -1790,7 +1550,6 @@ class FinanceWindow(QWidget):
             with self.db_manager.conn:
                 cursor = self.db_manager.conn.cursor()
                 # 使用 executemany 进行批量删除
-                from datetime import datetime
                 now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 cursor.executemany('UPDATE finance SET is_deleted = 1, deleted_at = ? WHERE id = ?', [(now, i) for i in ids])
                 
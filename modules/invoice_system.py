@@ -1,7 +1,8 @@
 import os
-import math
 import json
-import fitz  # PyMuPDF
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, 
     QFrame, QSplitter, QGroupBox, QRadioButton, QComboBox, 
@@ -9,13 +10,216 @@ from PyQt5.QtWidgets import (
     QGridLayout, QSizePolicy, QFileDialog, QMessageBox, QProgressDialog,
     QAbstractItemView, QScrollArea
 )
-from PyQt5.QtCore import Qt, QSize, QUrl, QStandardPaths, pyqtSignal, QRectF
-from PyQt5.QtGui import QIcon, QColor, QPalette, QPainter, QImage, QDesktopServices, QPixmap
+from PyQt5.QtCore import (
+    Qt, QSize, QUrl, QStandardPaths, pyqtSignal, QRectF, QTimer, QThreadPool,
+    QSettings, QBuffer, QIODevice
+)
+from PyQt5.QtGui import QIcon, QColor, QPalette, QPainter, QImage, QDesktopServices, QPixmap, QImageReader
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog
 from core.logger import logger
+from core.lazy_imports import fitz
+from core.async_utils import Worker
+from core.thumbnails import RENDER_LOCK, ThumbnailCache, content_key
+from core.invoice_layout import LayoutSpec, ExportCancelled, PAPER_SIZES, export_pdf
 
 CONFIG_FILE = "invoice_config.json"
 
+# 预览比例 (约 144 DPI)
+PREVIEW_SCALE = 3.78 * 1.5
+# 单元格内边距(像素)
+CELL_PADDING = 10
+
+
+class PreviewRequest(NamedTuple):
+    """一次预览渲染所需的全部参数 (在 GUI 线程中从控件读取，交给工作线程)"""
+    generation: int
+    files: Tuple[str, ...]
+    page_width: int
+    page_height: int
+    margins: Tuple[float, float, float, float]  # 左、上、右、下 (像素)
+    rows: int
+    cols: int
+    first_page: int
+    total_pages: int
+    cut_lines: bool
+
+
+class PreviewTileCache:
+    """预览图块缓存 (线程安全)
+
+    图块按单元格实际需要的尺寸直接渲染 (PDF 按矢量缩放，图片读取时缩小)，
+    内存中按 (文件, 单元格宽, 单元格高) 做 LRU，总字节数超过上限时淘汰最久未用的；
+    可选的磁盘缓存以 PNG 保存渲染结果，键为文件路径、修改时间和大小，
+    文件被修改后自动失效，重新打开窗口或内存淘汰后不必再次渲染。
+
+    Args:
+        max_bytes: 内存上限 (字节)
+        disk_cache: core.thumbnails.ThumbnailCache，None 表示不使用磁盘缓存
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024, disk_cache=None):
+        self.max_bytes = max_bytes
+        self.disk_cache = disk_cache
+        self._tiles = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = dict(hits=0, disk_hits=0, renders=0, evictions=0)
+
+    def clear(self):
+        """清空内存缓存 (磁盘缓存保留)"""
+        with self._lock:
+            self._tiles.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """缓存统计: 图块数、内存字节数、上限、命中/磁盘命中/渲染/淘汰次数"""
+        with self._lock:
+            return dict(self._stats, tiles=len(self._tiles), bytes=self._bytes, max_bytes=self.max_bytes)
+
+    def tile(self, file_path, width, height):
+        """按单元格尺寸 (等比缩放后不超过 width x height) 的图像，无法读取时返回 None"""
+        key = (file_path, width, height)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self._stats['hits'] += 1
+                return tile
+        tile = self._load(file_path, width, height)
+        if tile is None or tile.isNull():
+            return None
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self._bytes -= old.sizeInBytes()
+            self._tiles[key] = tile
+            self._bytes += tile.sizeInBytes()
+            while self._bytes > self.max_bytes and len(self._tiles) > 1:
+                _, evicted = self._tiles.popitem(last=False)
+                self._bytes -= evicted.sizeInBytes()
+                self._stats['evictions'] += 1
+        return tile
+
+    def _load(self, file_path, width, height):
+        size = f"{width}x{height}"
+        disk_key = None
+        try:
+            if self.disk_cache is not None:
+                disk_key = content_key(file_path)
+                data = self.disk_cache.get(disk_key, size)
+                if data is not None:
+                    image = QImage.fromData(data, 'PNG')
+                    if not image.isNull():
+                        with self._lock:
+                            self._stats['disk_hits'] += 1
+                        return image
+            image = self._render(file_path, width, height)
+        except Exception as e:
+            logger.error(f"Error loading image {file_path}: {e}")
+            return None
+        if image is None or image.isNull():
+            return None
+        with self._lock:
+            self._stats['renders'] += 1
+        if disk_key is not None:
+            try:
+                buffer = QBuffer()
+                buffer.open(QIODevice.WriteOnly)
+                image.save(buffer, 'PNG')
+                self.disk_cache.put(disk_key, size, bytes(buffer.data()))
+            except OSError as e:
+                logger.warning(f"[发票预览] 写入磁盘缓存失败: {e}")
+        return image
+
+    @staticmethod
+    def _render(file_path, width, height):
+        if file_path.lower().endswith('.pdf'):
+            pymupdf = fitz()
+            # PyMuPDF 不支持多线程同时操作，与缩略图渲染共用锁
+            with RENDER_LOCK:
+                doc = pymupdf.open(file_path)
+                try:
+                    if len(doc) == 0:
+                        return None
+                    page = doc.load_page(0)
+                    scale = min(width / max(page.rect.width, 1), height / max(page.rect.height, 1))
+                    pix = page.get_pixmap(matrix=pymupdf.Matrix(scale, scale), alpha=False)
+                    return QImage(pix.samples, pix.width, pix.height, pix.stride,
+                                  QImage.Format_RGB888).copy()
+                finally:
+                    doc.close()
+        reader = QImageReader(file_path)
+        reader.setAutoTransform(True)
+        source_size = reader.size()
+        target = source_size.scaled(width, height, Qt.KeepAspectRatio) if source_size.isValid() else None
+        if target is not None and target.width() < source_size.width():
+            # 解码时直接缩小 (JPEG 等格式可以少解码大部分像素)
+            reader.setScaledSize(target)
+        image = reader.read()
+        if image.isNull():
+            return None
+        if image.size() != target:
+            image = image.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return image
+
+
+def compose_preview(request, cache, is_stale):
+    """在工作线程中合成双页预览画布，请求已过时则中途放弃并返回 None"""
+    gap_px = 40  # 页面间距
+    header_px = 60  # "第 X 页" 标题高度
+    page_w, page_h = request.page_width, request.page_height
+    rows, cols = request.rows, request.cols
+    items_per_page = rows * cols
+    files = request.files
+
+    canvas = QImage(page_w * 2 + gap_px * 3, page_h + gap_px * 2 + header_px, QImage.Format_RGB888)
+    canvas.fill(QColor("#525659"))
+    painter = QPainter(canvas)
+    try:
+        painter.setRenderHint(QPainter.Antialiasing)
+        font = painter.font()
+        font.setPixelSize(24)
+        font.setBold(True)
+        painter.setFont(font)
+
+        m_left, m_top, m_right, m_bottom = request.margins
+        for offset in range(2):
+            p_idx = request.first_page + offset
+            if p_idx >= request.total_pages:
+                break
+            x_off = gap_px + offset * (page_w + gap_px)
+            y_off = gap_px + header_px
+
+            painter.setPen(Qt.white)
+            painter.drawText(QRectF(x_off, gap_px, page_w, header_px), Qt.AlignCenter, f"第 {p_idx + 1} 页")
+            painter.fillRect(QRectF(x_off, y_off, page_w, page_h), Qt.white)
+
+            content = QRectF(x_off + m_left, y_off + m_top, page_w - m_left - m_right, page_h - m_top - m_bottom)
+            cell_width = content.width() / cols
+            cell_height = content.height() / rows
+            target_w = int(cell_width - CELL_PADDING * 2)
+            target_h = int(cell_height - CELL_PADDING * 2)
+
+            start = p_idx * items_per_page
+            for i in range(start, min(start + items_per_page, len(files))):
+                if is_stale():
+                    return None
+                index = i % items_per_page
+                x = content.x() + (index % cols) * cell_width
+                y = content.y() + (index // cols) * cell_height
+                if target_w > 0 and target_h > 0:
+                    tile = cache.tile(files[i], target_w, target_h)
+                    if tile is not None:
+                        draw_x = x + CELL_PADDING + (target_w - tile.width()) / 2
+                        draw_y = y + CELL_PADDING + (target_h - tile.height()) / 2
+                        painter.drawImage(int(draw_x), int(draw_y), tile)
+                if request.cut_lines:
+                    painter.setPen(Qt.DashLine)
+                    painter.drawRect(int(x), int(y), int(cell_width), int(cell_height))
+    finally:
+        painter.end()
+    return request.generation, canvas
+
 class DropLabel(QLabel):
     """支持拖拽的标签"""
     file_dropped = pyqtSignal(list)
@@ -134,11 +338,24 @@ class FileDropListWidget(QListWidget):
 
 class InvoiceSystemWindow(QWidget):
     """发票系统主窗口"""
+
+    # 预览防抖间隔
+    PREVIEW_DEBOUNCE_MS = 60
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.current_preview_page = 0
         self.total_preview_pages = 0
-        self.image_cache = {} # Cache for rendered file thumbnails (file_path -> QImage)
+        # 预览在单线程池中合成：控件连续变化时先防抖，新请求使旧请求作废
+        self.preview_cache = self._create_preview_cache()
+        self._preview_generation = 0
+        self._preview_pool = QThreadPool(self)
+        self._preview_pool.setMaxThreadCount(1)
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(self.PREVIEW_DEBOUNCE_MS)
+        self._preview_timer.timeout.connect(self._start_preview_render)
+        self._pending_preview = None
         self._init_ui()
         self._load_config()
         
@@ -159,6 +376,23 @@ class InvoiceSystemWindow(QWidget):
         else:
             QMessageBox.information(self, "提示", "仅支持添加图片或PDF文件")
 
+    @staticmethod
+    def _create_preview_cache():
+        """按配置创建预览缓存
+
+        配置(QSettings "CustomerManagement/Settings"):
+            invoice_cache_mb: 内存缓存上限(MB)，默认 128
+            invoice_disk_cache_mb: 磁盘缓存上限(MB)，默认 256，0 表示不使用磁盘缓存
+        """
+        settings = QSettings("CustomerManagement", "Settings")
+        memory_mb = settings.value("invoice_cache_mb", 128, type=int)
+        disk_mb = settings.value("invoice_disk_cache_mb", 256, type=int)
+        disk_cache = None
+        if disk_mb > 0:
+            root = os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), 'invoice_previews')
+            disk_cache = ThumbnailCache(root, disk_mb * 1024 * 1024)
+        return PreviewTileCache(memory_mb * 1024 * 1024, disk_cache)
+
     def _init_ui(self):
         # 主布局
         main_layout = QVBoxLayout(self)
@@ -238,6 +472,10 @@ class InvoiceSystemWindow(QWidget):
         right_header_label = QLabel("预览 合并预览")
         right_header_label.setStyleSheet("font-weight: bold;")
         right_header.addWidget(right_header_label)
+
+        self.label_cache_stats = QLabel()
+        self.label_cache_stats.setStyleSheet("color: #909399; margin-left: 10px;")
+        right_header.addWidget(self.label_cache_stats)
         
         right_header.addStretch()
         
@@ -424,9 +662,17 @@ class InvoiceSystemWindow(QWidget):
         self.combo_line_style.currentIndexChanged.connect(self._update_preview)
         other_layout.addWidget(self.combo_line_style, 2, 2)
         
+        # 拆分导出
+        other_layout.addWidget(QLabel("拆分导出"), 3, 0)
+        self.spin_split = QSpinBox()
+        self.spin_split.setRange(0, 9999)
+        self.spin_split.setSuffix(" 页/文件")
+        self.spin_split.setSpecialValueText("不拆分")
+        other_layout.addWidget(self.spin_split, 3, 1, 1, 2)
+
         # 重置配置按钮
         self.btn_reset = QPushButton("重置配置")
-        other_layout.addWidget(self.btn_reset, 3, 0, 1, 3)
+        other_layout.addWidget(self.btn_reset, 4, 0, 1, 3)
         
         options_layout.addWidget(other_group)
         
@@ -459,12 +705,13 @@ class InvoiceSystemWindow(QWidget):
         else:
             self.file_list.hide()
             self.drop_area_label.show()
+            self._cancel_preview()
             self.preview_area.update_image(None)
             self.label_page_info.setText("0 / 0")
 
     def _clear_files(self):
         self.file_list.clear()
-        self.image_cache.clear() # Clear cache
+        self.preview_cache.clear()
         self._update_file_count()
         self._update_preview()
         
@@ -482,6 +729,7 @@ class InvoiceSystemWindow(QWidget):
         self.switch_cut.setChecked(True)
         self.check_binding_hole.setChecked(False)
         self.check_binding_line.setChecked(False)
+        self.spin_split.setValue(0)
         self._reset_page_and_update()
 
     def _save_config(self):
@@ -512,7 +760,8 @@ class InvoiceSystemWindow(QWidget):
                 "hole_count_idx": self.combo_hole_count.currentIndex(),
                 "binding_line": self.check_binding_line.isChecked(),
                 "line_pos_idx": self.combo_line_pos.currentIndex(),
-                "line_style_idx": self.combo_line_style.currentIndex()
+                "line_style_idx": self.combo_line_style.currentIndex(),
+                "split_pages": self.spin_split.value()
             }
         }
         
@@ -564,6 +813,7 @@ class InvoiceSystemWindow(QWidget):
                 self.check_binding_line.setChecked(o.get("binding_line", False))
                 self.combo_line_pos.setCurrentIndex(o.get("line_pos_idx", 0))
                 self.combo_line_style.setCurrentIndex(o.get("line_style_idx", 0))
+                self.spin_split.setValue(o.get("split_pages", 0))
                 
             # Trigger update
             self._update_preview()
@@ -571,89 +821,32 @@ class InvoiceSystemWindow(QWidget):
         except Exception as e:
             logger.error(f"Error loading config: {e}")
 
-    def _get_layout_config(self):
-        """获取布局配置"""
+    def _layout_spec(self):
+        """由当前控件生成拼版参数 (预览和导出共用)"""
         if self.rb_2_per_page.isChecked():
-            return 2, 1 # rows, cols
+            layout = '2_per_page'
         elif self.rb_3_per_page.isChecked():
-            return 3, 1
+            layout = '3_per_page'
         elif self.rb_4_per_page.isChecked():
-            return 2, 2
+            layout = '4_per_page'
         elif self.rb_6_per_page.isChecked():
-            return 3, 2
+            layout = '6_per_page'
         else: # 高铁票或默认
-            return 2, 2 # 默认4张一页
-
-    def _get_file_image(self, file_path):
-        """获取文件图像(带缓存)"""
-        # Check cache
-        if file_path in self.image_cache:
-            return self.image_cache[file_path]
-            
-        img = None
-        try:
-            if file_path.lower().endswith('.pdf'):
-                # Render PDF first page
-                doc = fitz.open(file_path)
-                if len(doc) > 0:
-                    page = doc.load_page(0)
-                    pix = page.get_pixmap(dpi=150)
-                    img = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888).copy()
-                doc.close()
-            else:
-                img = QImage(file_path)
-        except Exception as e:
-            logger.error(f"Error loading image {file_path}: {e}")
-            return None
-            
-        if img:
-            self.image_cache[file_path] = img
-            
-        return img
+            layout = 'hsr'
+        size_text = self.combo_size.currentText()
+        return LayoutSpec(
+            paper=size_text if size_text in PAPER_SIZES else 'custom',
+            width_mm=self.spin_width.value(),
+            height_mm=self.spin_height.value(),
+            landscape=self.combo_orient.currentText() == "横向",
+            margins_mm=(self.margin_left.value(), self.margin_top.value(),
+                        self.margin_right.value(), self.margin_bottom.value()),
+            layout=layout,
+            merge=self.switch_merge.isChecked(),
+            cut_lines=self.switch_cut.isChecked(),
+            split_pages=self.spin_split.value(),
+        )
 
-    def _render_page_content(self, painter, rect, files, start_index, end_index, rows, cols):
-        """渲染页面内容的通用逻辑"""
-        items_per_page = rows * cols
-        
-        cell_width = rect.width() / cols
-        cell_height = rect.height() / rows
-        
-        for i in range(start_index, end_index):
-            page_index = i % items_per_page
-            row = page_index // cols
-            col = page_index % cols
-            
-            x = rect.x() + col * cell_width
-            y = rect.y() + row * cell_height
-            
-            file_path = files[i]
-            
-            # 使用带缓存的加载方法
-            img = self._get_file_image(file_path)
-                
-            if img and not img.isNull():
-                # 保持比例缩放以适应单元格，预留 padding
-                padding = 10
-                target_w = int(cell_width - padding * 2)
-                target_h = int(cell_height - padding * 2)
-                
-                if target_w > 0 and target_h > 0:
-                    scaled_img = img.scaled(
-                        target_w, target_h,
-                        Qt.KeepAspectRatio, Qt.SmoothTransformation
-                    )
-                    
-                    # 居中绘制
-                    draw_x = x + padding + (target_w - scaled_img.width()) / 2
-                    draw_y = y + padding + (target_h - scaled_img.height()) / 2
-                    
-                    painter.drawImage(int(draw_x), int(draw_y), scaled_img)
-            
-            # 绘制边框或裁剪线
-            if self.switch_cut.isChecked():
-                painter.setPen(Qt.DashLine)
-                painter.drawRect(int(x), int(y), int(cell_width), int(cell_height))
-    
     def _prev_page(self):
         if self.current_preview_page > 0:
             self.current_preview_page = max(0, self.current_preview_page - 2)
@@ -673,30 +866,17 @@ class InvoiceSystemWindow(QWidget):
     def _update_preview(self):
         """更新实时预览 (双页模式)"""
         if self.file_list.count() == 0:
+            self._cancel_preview()
             self.preview_area.update_image(None)
             self.label_page_info.setText("0 / 0")
             return
 
         # 1. Calculate Single Page Dimensions (Pixels)
-        width_mm = 210
-        height_mm = 297
-        
-        size_text = self.combo_size.currentText()
-        if size_text == "A4":
-            width_mm, height_mm = 210, 297
-        elif size_text == "A5":
-            width_mm, height_mm = 148, 210
-        elif size_text == "Letter":
-            width_mm, height_mm = 216, 279
-        else: # Custom
-            width_mm = self.spin_width.value()
-            height_mm = self.spin_height.value()
-            
-        if self.combo_orient.currentText() == "横向":
-            width_mm, height_mm = height_mm, width_mm
+        spec = self._layout_spec()
+        width_mm, height_mm = spec.page_size_mm()
             
         # Preview Scale
-        scale_factor = 3.78 * 1.5 # ~144 DPI
+        scale_factor = PREVIEW_SCALE
         
         page_px_width = int(width_mm * scale_factor)
         page_px_height = int(height_mm * scale_factor)
@@ -706,12 +886,8 @@ class InvoiceSystemWindow(QWidget):
         for i in range(self.file_list.count()):
             files.append(self.file_list.item(i).text())
             
-        rows, cols = self._get_layout_config()
-        if not self.switch_merge.isChecked():
-             rows, cols = 1, 1
-        items_per_page = rows * cols
-        
-        self.total_preview_pages = math.ceil(len(files) / items_per_page)
+        rows, cols = spec.grid()
+        self.total_preview_pages = spec.page_count(len(files))
         
         # Ensure current_preview_page is even (0, 2, 4...)
         if self.current_preview_page % 2 != 0:
@@ -734,190 +910,109 @@ class InvoiceSystemWindow(QWidget):
             self.btn_prev_page.setEnabled(self.current_preview_page > 0)
             self.btn_next_page.setEnabled(self.current_preview_page + 2 < self.total_preview_pages)
 
-        # 3. Create Canvas for 2 Pages
-        gap_px = 40 # Gap between pages
-        header_px = 60 # Space for "Page X" text
-        
-        canvas_width = page_px_width * 2 + gap_px * 3 # gap-page-gap-page-gap
-        canvas_height = page_px_height + gap_px * 2 + header_px 
-        
-        canvas_img = QImage(canvas_width, canvas_height, QImage.Format_RGB888)
-        canvas_img.fill(QColor("#525659")) # Match background
-        
-        painter = QPainter(canvas_img)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # Font for labels
-        font = painter.font()
-        font.setPixelSize(24)
-        font.setBold(True)
-        painter.setFont(font)
-        
-        # Render Loop
-        for offset in range(2):
-            p_idx = self.current_preview_page + offset
-            if p_idx >= self.total_preview_pages:
-                break
-                
-            # Calculate position
-            x_off = gap_px + offset * (page_px_width + gap_px)
-            y_off = gap_px + header_px
-            
-            # Draw "Page X" Label
-            label_rect = QRectF(x_off, gap_px, page_px_width, header_px)
-            painter.setPen(Qt.white)
-            painter.drawText(label_rect, Qt.AlignCenter, f"第 {p_idx + 1} 页")
-            
-            # Draw Paper Background
-            paper_rect = QRectF(x_off, y_off, page_px_width, page_px_height)
-            painter.fillRect(paper_rect, Qt.white)
-            
-            # Render Content
-            # Margins
-            m_left = self.margin_left.value() * scale_factor
-            m_top = self.margin_top.value() * scale_factor
-            m_right = self.margin_right.value() * scale_factor
-            m_bottom = self.margin_bottom.value() * scale_factor
-            
-            content_rect = QRectF(
-                x_off + m_left, y_off + m_top,
-                page_px_width - m_left - m_right,
-                page_px_height - m_top - m_bottom
-            )
-            
-            start_idx = p_idx * items_per_page
-            end_idx = min((p_idx + 1) * items_per_page, len(files))
-            
-            self._render_page_content(painter, content_rect, files, start_idx, end_idx, rows, cols)
-            
-        painter.end()
-        self.preview_area.update_image(canvas_img)
+        # 3. 合成在工作线程中进行 (防抖后启动)
+        self._pending_preview = dict(
+            files=tuple(files),
+            page_width=page_px_width,
+            page_height=page_px_height,
+            margins=tuple(m * scale_factor for m in spec.margins_mm),
+            rows=rows,
+            cols=cols,
+            first_page=self.current_preview_page,
+            total_pages=self.total_preview_pages,
+            cut_lines=spec.cut_lines,
+        )
+        # 已排队的旧请求作废
+        self._preview_generation += 1
+        self._preview_timer.start()
+
+    def _cancel_preview(self):
+        """作废排队中和正在进行的预览渲染"""
+        self._preview_timer.stop()
+        self._pending_preview = None
+        self._preview_generation += 1
+
+    def _start_preview_render(self):
+        if self._pending_preview is None:
+            return
+        self._preview_generation += 1
+        request = PreviewRequest(generation=self._preview_generation, **self._pending_preview)
+        self._pending_preview = None
+        # 丢弃尚未开始的旧任务；正在执行的任务检查到过时后提前结束
+        self._preview_pool.clear()
+        worker = Worker(compose_preview, request, self.preview_cache,
+                        lambda generation=request.generation: generation != self._preview_generation)
+        worker.signals.result.connect(self._on_preview_rendered)
+        worker.signals.error.connect(lambda error: logger.error(f"预览渲染失败: {error[1]}"))
+        self._preview_pool.start(worker)
+
+    def _on_preview_rendered(self, result):
+        if result is None:
+            return
+        generation, canvas = result
+        if generation == self._preview_generation:
+            self.preview_area.update_image(canvas)
+        self._update_cache_stats()
+
+    def _update_cache_stats(self):
+        stats = self.preview_cache.stats()
+        lookups = stats['hits'] + stats['disk_hits'] + stats['renders']
+        hit_rate = (stats['hits'] + stats['disk_hits']) * 100 / lookups if lookups else 0
+        self.label_cache_stats.setText(
+            f"缓存 {stats['tiles']} 张 / {stats['bytes'] / 1024 / 1024:.1f} MB · 命中 {hit_rate:.0f}%"
+        )
+        self.label_cache_stats.setToolTip(
+            f"内存上限: {stats['max_bytes'] / 1024 / 1024:.0f} MB\n"
+            f"内存命中: {stats['hits']}\n"
+            f"磁盘命中: {stats['disk_hits']}\n"
+            f"渲染: {stats['renders']}\n"
+            f"淘汰: {stats['evictions']}"
+        )
 
     def _handle_export(self):
-        """处理合并导出"""
+        """处理合并导出 (在线程池中进行，可取消)"""
+        files = tuple(self.file_list.item(i).text() for i in range(self.file_list.count()))
+        if not files:
+            QMessageBox.warning(self, "提示", "没有文件")
+            return
         file_path, _ = QFileDialog.getSaveFileName(self, "导出合并PDF", "output.pdf", "PDF Files (*.pdf)")
-        if file_path:
-            # Use Fast PyMuPDF export
-            success, msg = self._fast_export_pdf(file_path)
-            if success:
-                QMessageBox.information(self, "成功", "导出成功")
-                # Open folder?
-                # QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.dirname(file_path)))
-            else:
-                QMessageBox.critical(self, "错误", f"导出失败: {msg}")
-
-    def _fast_export_pdf(self, output_path):
-        """使用 PyMuPDF 快速合并导出"""
-        try:
-            files = []
-            for i in range(self.file_list.count()):
-                files.append(self.file_list.item(i).text())
-                
-            if not files:
-                return False, "没有文件"
-            
-            # Get Dimensions in Points (1 mm = 2.83465 pt)
-            MM_TO_PT = 2.83465
-            
-            width_mm = 210
-            height_mm = 297
-            
-            size_text = self.combo_size.currentText()
-            if size_text == "A4":
-                width_mm, height_mm = 210, 297
-            elif size_text == "A5":
-                width_mm, height_mm = 148, 210
-            elif size_text == "Letter":
-                width_mm, height_mm = 216, 279
-            else: # Custom
-                width_mm = self.spin_width.value()
-                height_mm = self.spin_height.value()
-                
-            if self.combo_orient.currentText() == "横向":
-                width_mm, height_mm = height_mm, width_mm
-                
-            page_width = width_mm * MM_TO_PT
-            page_height = height_mm * MM_TO_PT
-            
-            # Layout
-            rows, cols = self._get_layout_config()
-            if not self.switch_merge.isChecked():
-                rows, cols = 1, 1
-            
-            items_per_page = rows * cols
-            total_pages = math.ceil(len(files) / items_per_page)
-            
-            # Margins
-            m_left = self.margin_left.value() * MM_TO_PT
-            m_top = self.margin_top.value() * MM_TO_PT
-            m_right = self.margin_right.value() * MM_TO_PT
-            m_bottom = self.margin_bottom.value() * MM_TO_PT
-            
-            # Content Area
-            content_rect = fitz.Rect(
-                m_left, m_top,
-                page_width - m_right,
-                page_height - m_bottom
-            )
-            
-            cell_width = content_rect.width / cols
-            cell_height = content_rect.height / rows
-            
-            doc = fitz.open()
-            
-            for p in range(total_pages):
-                page = doc.new_page(width=page_width, height=page_height)
-                
-                start_idx = p * items_per_page
-                end_idx = min((p + 1) * items_per_page, len(files))
-                
-                for i in range(start_idx, end_idx):
-                    file_path = files[i]
-                    page_index = i % items_per_page
-                    row = page_index // cols
-                    col = page_index % cols
-                    
-                    x = content_rect.x0 + col * cell_width
-                    y = content_rect.y0 + row * cell_height
-                    
-                    # Target Rect for content (with padding logic same as preview)
-                    padding = 10 * MM_TO_PT / 3.78 # Approximate padding scaling or keep consistent? 
-                    # Actually preview used 10 pixels padding. 
-                    # Let's use a small padding in points, e.g. 5 pt
-                    padding = 5 
-                    
-                    target_rect = fitz.Rect(
-                        x + padding, y + padding,
-                        x + cell_width - padding,
-                        y + cell_height - padding
-                    )
-                    
-                    try:
-                        if file_path.lower().endswith('.pdf'):
-                            src_doc = fitz.open(file_path)
-                            if len(src_doc) > 0:
-                                # show_pdf_page keeps vector data!
-                                page.show_pdf_page(target_rect, src_doc, 0)
-                            src_doc.close()
-                        else:
-                            # Insert Image
-                            page.insert_image(target_rect, filename=file_path, keep_proportion=True)
-                    except Exception as e:
-                        logger.error(f"Error inserting {file_path}: {e}")
-                        
-                    # Draw Cut Lines (if enabled)
-                    if self.switch_cut.isChecked():
-                        # Draw dashed rect around cell
-                        shape = page.new_shape()
-                        shape.draw_rect(fitz.Rect(x, y, x + cell_width, y + cell_height))
-                        shape.finish(color=(0, 0, 0), dashes=[3]) # Black dashed
-                        shape.commit()
-
-            doc.save(output_path)
-            doc.close()
-            return True, "Success"
-            
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            return False, str(e)
+        if not file_path:
+            return
+
+        cancelled = threading.Event()
+        progress = QProgressDialog(f"正在导出 {len(files)} 个文件...", "取消", 0, 100, self)
+        progress.setWindowTitle("合并导出")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+        progress.canceled.connect(cancelled.set)
+        self.btn_export.setEnabled(False)
+
+        def on_result(report):
+            progress.close()
+            message = f"导出成功，共 {len(report['outputs'])} 个文件" if len(report['outputs']) > 1 else "导出成功"
+            errors = report['errors']
+            if not errors:
+                QMessageBox.information(self, "成功", message)
+                return
+            # 无法读取或插入的文件对应单元格留空，列出前几个让用户核对
+            names = "\n".join(os.path.basename(e['file']) for e in errors[:5])
+            more = f"\n... 等 {len(errors)} 个" if len(errors) > 5 else ""
+            QMessageBox.warning(self, "部分文件未导出",
+                                f"{message}，但有 {len(errors)} 个文件无法读取，对应位置留空:\n{names}{more}")
+
+        def on_error(error):
+            progress.close()
+            if error[0] is ExportCancelled:
+                return
+            logger.error(f"Invoice export failed: {error[1]}")
+            QMessageBox.critical(self, "错误", f"导出失败: {error[1]}")
+
+        # PyMuPDF 不支持多线程同时操作，按页与预览渲染共用锁
+        worker = Worker(export_pdf, self._layout_spec(), files, file_path,
+                        is_cancelled=cancelled.is_set, lock=RENDER_LOCK)
+        worker.kwargs['progress_callback'] = worker.signals.progress.emit
+        worker.signals.progress.connect(progress.setValue)
+        worker.signals.result.connect(on_result)
+        worker.signals.error.connect(on_error)
+        worker.signals.finished.connect(lambda: self.btn_export.setEnabled(True))
+        QThreadPool.globalInstance().start(worker)
@@ -1,18 +1,16 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                             QPushButton, QTextEdit, QMessageBox, QFrame)
 from PyQt5.QtCore import Qt
-import json
-import os
-import sys
-from utils.paths import get_app_path
 
 class NotesWindow(QWidget):
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
-        self.notes_file = get_app_path('notes.json')
+        # 与首页共用的便签存储
+        self.store = parent.app.db_manager.todo_store
         self.init_ui()
         self.load_notes()
+        self.store.changed.connect(self._on_store_changed)
         
     def init_ui(self):
         """初始化便签界面"""
@@ -54,21 +52,23 @@ class NotesWindow(QWidget):
         self.setLayout(main_layout)
     
     def load_notes(self):
-        """从文件加载便签内容"""
-        if os.path.exists(self.notes_file):
-            try:
-                with open(self.notes_file, 'r', encoding='utf-8') as f:
-                    notes = json.load(f)
-                    self.notes_edit.setPlainText(notes.get('content', ''))
-            except Exception as e:
-                QMessageBox.warning(self, "错误", f"加载便签失败: {str(e)}")
+        """从共享存储加载便签内容"""
+        try:
+            self.notes_edit.setPlainText(self.store.notes())
+        except Exception as e:
+            QMessageBox.warning(self, "错误", f"加载便签失败: {str(e)}")
+    
+    def _on_store_changed(self, kind):
+        # 首页保存了便签：本页没有未保存的修改时同步显示
+        if kind == 'notes' and not self.notes_edit.document().isModified():
+            self.load_notes()
     
     def save_notes(self):
-        """保存便签到文件"""
+        """保存便签"""
         content = self.notes_edit.toPlainText()
         try:
-            with open(self.notes_file, 'w', encoding='utf-8') as f:
-                json.dump({'content': content}, f, ensure_ascii=False, indent=2)
+            self.store.save_notes(content)
+            self.notes_edit.document().setModified(False)
             QMessageBox.information(self, "成功", "便签已保存!")
         except Exception as e:
             QMessageBox.warning(self, "错误", f"保存便签失败: {str(e)}")
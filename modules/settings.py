@@ -1,33 +1,17 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QFormLayout, QLineEdit, QComboBox,
                              QMessageBox, QFileDialog, QGroupBox, QCheckBox, QFrame,
-                             QDialog, QScrollArea, QGridLayout)
+                             QDialog, QScrollArea, QGridLayout, QSpinBox)
 from PyQt5.QtWidgets import QProgressDialog
-from PyQt5.QtCore import Qt, QSettings, QThread, pyqtSignal
-from core.backup import BackupManager
+from PyQt5.QtCore import Qt, QSettings, QThreadPool
+from core.backup import BackupManager, COMPRESSION_LEVELS
+from core.async_utils import Worker
 from utils.paths import get_app_path
 from core.logger import logger
 from core.version import VERSION
 import hashlib
 import os
 import binascii
-class RestoreWorker(QThread):
-    success = pyqtSignal()
-    error = pyqtSignal(str)
-    def __init__(self, backup_manager, file_path, parent=None):
-        super().__init__(parent)
-        self.backup_manager = backup_manager
-        self.file_path = file_path
-    def run(self):
-        try:
-            result = self.backup_manager.restore_backup(self.file_path)
-            if result:
-                self.success.emit()
-            else:
-                self.error.emit("恢复未成功")
-        except Exception as e:
-            self.error.emit(str(e))
-
 class ChangeUsernameDialog(QDialog):
     """修改用户名对话框"""
     def __init__(self, auth_manager, current_user, parent=None):
@@ -100,10 +84,28 @@ class SettingsWindow(QWidget):
         dont_ask_close = self.settings.value("dont_ask_close", False, type=bool)
         self.close_to_tray_check.setChecked(close_to_tray)
         self.dont_ask_close_check.setChecked(dont_ask_close)
+        
+        # 加载预热设置
+        self.prewarm_check.setChecked(self.settings.value("prewarm_enabled", True, type=bool))
+        
+        # 加载导入设置
+        self.import_staging_check.setChecked(self.settings.value("import_staging_mode", True, type=bool))
             
         # 加载自动备份设置
         auto_backup = self.settings.value("auto_backup", True, type=bool)
         self.auto_backup_check.setChecked(auto_backup)
+        self.vacuum_backup_check.setChecked(self.settings.value("backup_vacuum_into", False, type=bool))
+        self.incremental_backup_check.setChecked(self.settings.value("backup_incremental", False, type=bool))
+        self.schedule_backup_check.setChecked(self.settings.value("backup_schedule_enabled", False, type=bool))
+        self.schedule_input.setText(self.settings.value("backup_schedule", "0 12 * * *", type=str))
+        self.schedule_input.setEnabled(self.schedule_backup_check.isChecked())
+        codec = self.settings.value("backup_codec", "deflate", type=str)
+        index = self.backup_codec_combo.findData(codec)
+        self.backup_codec_combo.setCurrentIndex(max(0, index))
+        self._on_backup_codec_changed()
+        level = self.settings.value("backup_level", 0, type=int)
+        if level:
+            self.backup_level_spin.setValue(level)
         
         # 加载备份路径
         backup_path = self.settings.value("backup_path", "", type=str)
@@ -188,6 +190,21 @@ class SettingsWindow(QWidget):
         
         form_layout.addRow(close_group)
         
+        # 启动性能设置
+        perf_group = QGroupBox("启动性能")
+        perf_layout = QVBoxLayout(perf_group)
+        self.prewarm_check = QCheckBox('登录后空闲时预加载常用模块')
+        perf_layout.addWidget(self.prewarm_check)
+        form_layout.addRow(perf_group)
+        
+        # 导入设置
+        import_group = QGroupBox("数据导入")
+        import_layout = QVBoxLayout(import_group)
+        self.import_staging_check = QCheckBox('导入前预览新增/重复/冲突统计')
+        self.import_staging_check.setToolTip('关闭后直接分块写入，支持中断后继续导入')
+        import_layout.addWidget(self.import_staging_check)
+        form_layout.addRow(import_group)
+        
         system_layout.addLayout(form_layout)
         left_column.addWidget(system_card)
 
@@ -243,6 +260,11 @@ class SettingsWindow(QWidget):
         version_label.setStyleSheet("font-size: 14px; color: #606266;")
         about_layout.addWidget(version_label)
         
+        timeline_btn = QPushButton('查看启动耗时')
+        timeline_btn.setFixedWidth(120)
+        timeline_btn.clicked.connect(self._show_startup_timeline)
+        about_layout.addWidget(timeline_btn)
+        
         left_column.addWidget(about_card)
         
         # --- 数据库工具卡片 (右侧) ---
@@ -260,10 +282,12 @@ class SettingsWindow(QWidget):
             "自动备份：启用后，系统在每次关闭时自动备份到“备份位置”。\n"
             "手动备份：点击“立即备份数据库”，将当前数据打包到“备份位置”。\n"
             "从备份恢复（两种方式）：\n"
-            "  1）在本页面点击“从备份恢复”，选择备份ZIP，恢复完成后程序会自动退出，请重新启动。\n"
+            "  1）在本页面点击“从备份恢复”，选择备份ZIP，校验通过后自动替换并重新加载数据，无需重启。\n"
             "  2）手动解压备份文件（如：backup_20260127_162851.zip），将其中的\n"
             "     app_data.db、app_data.db-wal、app_data.db-shm（三个核心文件）覆盖到 data 目录；\n"
-            "     若压缩包包含 business.db，可一并覆盖。随后重新启动程序。"
+            "     若压缩包包含 business.db，可一并覆盖。随后重新启动程序。\n"
+            "公司密码等敏感字段加密保存，密钥为 data 目录下的 field.key（不包含在备份中），\n"
+            "请用下方“导出密钥”单独保存一份；更换电脑恢复备份后用“导入密钥”导入，否则这些字段无法解密。"
         )
         usage_label.setWordWrap(True)
         usage_layout.addWidget(usage_label)
@@ -276,6 +300,40 @@ class SettingsWindow(QWidget):
         self.auto_backup_check = QCheckBox('启用关闭系统时自动保存数据库')
         backup_layout.addWidget(self.auto_backup_check)
         
+        self.vacuum_backup_check = QCheckBox('备份时整理压缩数据库 (VACUUM INTO，备份文件更小但耗时更长)')
+        backup_layout.addWidget(self.vacuum_backup_check)
+        
+        self.incremental_backup_check = QCheckBox('增量备份 (只保存变化的数据块，适合频繁备份)')
+        self.incremental_backup_check.setToolTip('增量备份保存在备份目录的 snapshots 和 chunks 子目录中，不使用压缩方式和 VACUUM INTO 设置')
+        backup_layout.addWidget(self.incremental_backup_check)
+        
+        schedule_layout = QHBoxLayout()
+        self.schedule_backup_check = QCheckBox('定时备份')
+        self.schedule_backup_check.setToolTip('到达时间后等待程序空闲再备份，程序未运行时错过的备份会在下次启动后补做')
+        schedule_layout.addWidget(self.schedule_backup_check)
+        self.schedule_input = QLineEdit()
+        self.schedule_input.setPlaceholderText('分 时 日 月 周，如 0 12 * * * (每天12点)')
+        self.schedule_input.setToolTip('cron 格式: 分 时 日 月 周\n例: 0 12 * * * 每天12:00；0 */4 * * 1-5 工作日每4小时；30 18 * * 5 每周五18:30')
+        self.schedule_backup_check.toggled.connect(self.schedule_input.setEnabled)
+        schedule_layout.addWidget(self.schedule_input)
+        backup_layout.addLayout(schedule_layout)
+        
+        codec_layout = QHBoxLayout()
+        codec_layout.addWidget(QLabel("压缩方式:"))
+        self.backup_codec_combo = QComboBox()
+        self.backup_codec_combo.addItem('Deflate (默认，速度快)', 'deflate')
+        self.backup_codec_combo.addItem('BZip2 (体积较小)', 'bzip2')
+        self.backup_codec_combo.addItem('LZMA (体积最小，最慢)', 'lzma')
+        self.backup_codec_combo.addItem('不压缩', 'stored')
+        self.backup_codec_combo.currentIndexChanged.connect(self._on_backup_codec_changed)
+        codec_layout.addWidget(self.backup_codec_combo)
+        codec_layout.addWidget(QLabel("级别:"))
+        self.backup_level_spin = QSpinBox()
+        self.backup_level_spin.setRange(1, 9)
+        codec_layout.addWidget(self.backup_level_spin)
+        codec_layout.addStretch()
+        backup_layout.addLayout(codec_layout)
+        
         path_layout = QHBoxLayout()
         path_layout.addWidget(QLabel("备份位置:"))
         self.backup_path_input = QLineEdit()
@@ -306,6 +364,52 @@ class SettingsWindow(QWidget):
         manual_layout.addWidget(restore_btn)
         
         db_layout.addWidget(manual_group)
+
+        # 字段加密密钥 (不随备份保存，需单独导出)
+        key_group = QGroupBox("加密密钥")
+        key_layout = QHBoxLayout(key_group)
+        self.key_status_label = QLabel()
+        self.key_status_label.setWordWrap(True)
+        key_layout.addWidget(self.key_status_label, 1)
+        export_key_btn = QPushButton('导出密钥')
+        export_key_btn.clicked.connect(self._export_field_key)
+        key_layout.addWidget(export_key_btn)
+        import_key_btn = QPushButton('导入密钥')
+        import_key_btn.setProperty("class", "warning")
+        import_key_btn.clicked.connect(self._import_field_key)
+        key_layout.addWidget(import_key_btn)
+        db_layout.addWidget(key_group)
+        self._refresh_key_status()
+        
+        # 数据库维护状态
+        maintenance_group = QGroupBox("数据库维护")
+        maintenance_layout = QFormLayout(maintenance_group)
+        self.maintenance_last_label = QLabel()
+        maintenance_layout.addRow('上次检查:', self.maintenance_last_label)
+        self.maintenance_result_label = QLabel()
+        self.maintenance_result_label.setWordWrap(True)
+        maintenance_layout.addRow('检查结果:', self.maintenance_result_label)
+        self.maintenance_size_label = QLabel()
+        maintenance_layout.addRow('数据库/WAL:', self.maintenance_size_label)
+        self.maintenance_free_label = QLabel()
+        self.maintenance_free_label.setToolTip('永久删除记录后留下的空闲页，空闲时自动归还给磁盘')
+        maintenance_layout.addRow('可回收空间:', self.maintenance_free_label)
+        
+        maintenance_btns = QHBoxLayout()
+        refresh_status_btn = QPushButton('刷新')
+        refresh_status_btn.clicked.connect(self._refresh_maintenance_status)
+        maintenance_btns.addWidget(refresh_status_btn)
+        self.check_now_btn = QPushButton('立即检查')
+        self.check_now_btn.setToolTip('逐表执行完整性检查 (quick_check)，检查期间可正常使用')
+        self.check_now_btn.clicked.connect(self._check_database_now)
+        maintenance_btns.addWidget(self.check_now_btn)
+        maintenance_btns.addStretch()
+        maintenance_layout.addRow('', maintenance_btns)
+        db_layout.addWidget(maintenance_group)
+        
+        maintenance = getattr(self.main_window, 'maintenance', None)
+        if maintenance:
+            maintenance.status_changed.connect(self._refresh_maintenance_status)
         right_column.addWidget(db_card)
         
         # 左右列底部填充，确保顶部对齐
@@ -350,6 +454,44 @@ class SettingsWindow(QWidget):
         
         main_layout.addWidget(bottom_bar)
         
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._refresh_maintenance_status()
+
+    def _refresh_maintenance_status(self):
+        """刷新数据库维护状态"""
+        maintenance = getattr(self.main_window, 'maintenance', None)
+        if maintenance is None or self.main_window.app.db_manager.conn is None:
+            return
+        status = maintenance.status()
+        last_check = status['last_check']
+        self.maintenance_last_label.setText(last_check.strftime('%Y-%m-%d %H:%M') if last_check else '尚未检查')
+        if status['checking']:
+            result = f"正在检查 ({status['checked']}/{status['total']} 个表)"
+        elif not status['last_result']:
+            result = '-'
+        elif status['last_result'] == 'ok':
+            result = '正常'
+        else:
+            result = f"发现问题: {status['last_result']}"
+        self.maintenance_result_label.setText(result)
+        self.maintenance_size_label.setText(
+            f"{status['db_size'] / 1024 / 1024:.1f} MB / {status['wal_size'] / 1024 / 1024:.1f} MB"
+        )
+        vacuum_mode = '' if status['auto_vacuum'] == 2 else ' (空闲时启用增量回收)'
+        self.maintenance_free_label.setText(f"{status['free_size'] / 1024 / 1024:.1f} MB{vacuum_mode}")
+        self.check_now_btn.setEnabled(not status['checking'])
+
+    def _check_database_now(self):
+        """立即开始完整性检查"""
+        self.main_window.maintenance.check_now()
+        self._refresh_maintenance_status()
+
+    def _show_startup_timeline(self):
+        """显示启动时间线"""
+        from core.timeline import startup_timeline
+        QMessageBox.information(self, '启动耗时', startup_timeline.dump())
+
     def _select_backup_path(self):
         """选择备份路径"""
         directory = QFileDialog.getExistingDirectory(
@@ -360,40 +502,112 @@ class SettingsWindow(QWidget):
         if directory:
             self.backup_path_input.setText(directory)
 
+    def _on_backup_codec_changed(self):
+        """切换压缩方式时恢复该方式的默认级别 (只有 deflate/bzip2 支持压缩级别)"""
+        codec = self.backup_codec_combo.currentData()
+        self.backup_level_spin.setEnabled(codec in COMPRESSION_LEVELS)
+        if codec in COMPRESSION_LEVELS:
+            self.backup_level_spin.setValue(COMPRESSION_LEVELS[codec])
+
     def _backup_database(self):
-        """手动备份数据库"""
-        try:
-            # 获取当前设置的备份路径
-            custom_path = self.backup_path_input.text().strip()
-            
-            # 如果路径为空，使用默认路径
-            if not custom_path:
-                custom_path = None
-                
-            backup_path = self.backup_manager.create_backup(backup_dir=custom_path)
-            
+        """手动备份数据库 (后台执行，使用界面上当前选择的压缩方式)"""
+        # 获取当前设置的备份路径，为空时使用默认路径
+        custom_path = self.backup_path_input.text().strip() or None
+        codec = self.backup_codec_combo.currentData()
+        level = self.backup_level_spin.value() if codec in COMPRESSION_LEVELS else None
+        
+        progress = QProgressDialog('正在备份数据库...', None, 0, 100, self)
+        progress.setWindowTitle('备份')
+        progress.setCancelButton(None)
+        progress.setWindowModality(Qt.ApplicationModal)
+        progress.setMinimumDuration(0)
+        progress.show()
+        
+        worker = Worker(
+            self.backup_manager.create_backup,
+            backup_dir=custom_path,
+            vacuum=self.vacuum_backup_check.isChecked(),
+            codec=codec,
+            level=level,
+            incremental=self.incremental_backup_check.isChecked(),
+        )
+        worker.kwargs['progress_callback'] = worker.signals.progress.emit
+        
+        def on_success(backup_path):
+            progress.close()
             QMessageBox.information(
                 self, 
                 '备份成功', 
                 f'数据库已成功备份到:\n{backup_path}'
             )
-        except Exception as e:
+            
+        def on_error(error):
+            progress.close()
             QMessageBox.critical(
                 self, 
                 '备份失败', 
-                f'备份过程中发生错误:\n{str(e)}'
+                f'备份过程中发生错误:\n{error[1]}'
             )
             
+        worker.signals.progress.connect(progress.setValue)
+        worker.signals.result.connect(on_success)
+        worker.signals.error.connect(on_error)
+        QThreadPool.globalInstance().start(worker)
+            
+    def _refresh_key_status(self):
+        cipher = self.db_manager.field_cipher
+        try:
+            missing = cipher.key_missing
+        except Exception as e:
+            logger.warning(f"检查加密密钥失败: {e}")
+            missing = False
+        if missing:
+            self.key_status_label.setText("密钥缺失：已加密的字段无法显示和修改，请导入原来的 field.key")
+            self.key_status_label.setStyleSheet("color: #F56C6C;")
+        else:
+            self.key_status_label.setText("导出的密钥请与备份分开妥善保管")
+            self.key_status_label.setStyleSheet("color: #606266;")
+
+    def _export_field_key(self):
+        """导出字段加密密钥"""
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出加密密钥", "field.key", "Key Files (*.key)")
+        if not file_path:
+            return
+        try:
+            self.db_manager.field_cipher.export_key(file_path)
+            QMessageBox.information(self, "成功", f"密钥已导出到:\n{file_path}\n\n持有密钥和备份即可读取加密字段，请妥善保管")
+        except Exception as e:
+            logger.error(f"导出加密密钥失败: {e}")
+            QMessageBox.critical(self, "错误", f"导出失败: {e}")
+
+    def _import_field_key(self):
+        """导入字段加密密钥 (替换当前密钥)"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "导入加密密钥", "", "Key Files (*.key);;All Files (*)")
+        if not file_path:
+            return
+        cipher = self.db_manager.field_cipher
+        if os.path.exists(cipher.key_path):
+            reply = QMessageBox.question(
+                self, "确认", "当前已有密钥，导入后将替换它。\n用当前密钥加密的数据需要当前密钥才能解密，确定继续吗？",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                return
+        try:
+            cipher.import_key(file_path)
+            QMessageBox.information(self, "成功", "密钥已导入，重新打开业务详情即可看到解密后的内容")
+        except Exception as e:
+            logger.error(f"导入加密密钥失败: {e}")
+            QMessageBox.critical(self, "错误", f"导入失败: {e}")
+        self._refresh_key_status()
+
     def _restore_database(self):
         """从备份恢复数据库"""
-        import sys
-        import time
-        
         file_path, _ = QFileDialog.getOpenFileName(
             self, 
             '选择备份文件', 
             self.backup_path_input.text(), 
-            '备份文件 (*.zip)'
+            '备份文件 (*.zip);;增量快照 (snapshot_*.json)'
         )
         
         if not file_path:
@@ -402,41 +616,15 @@ class SettingsWindow(QWidget):
         reply = QMessageBox.question(
             self,
             '确认恢复',
-            '恢复操作将覆盖当前数据库，应用程序将需要重启。\n是否继续?',
+            '恢复操作将覆盖当前数据库，校验通过后自动重新加载数据。\n是否继续?',
             QMessageBox.Yes | QMessageBox.No
         )
         
         if reply == QMessageBox.No:
             return
             
-        if self.db_manager:
-            self.db_manager.close()
-            time.sleep(1)
-        progress = QProgressDialog('正在恢复，请稍候...', None, 0, 0, self)
-        progress.setWindowTitle('正在恢复')
-        progress.setCancelButton(None)
-        progress.setWindowModality(Qt.ApplicationModal)
-        progress.show()
-        def on_success():
-            progress.close()
-            QMessageBox.information(
-                self,
-                '恢复成功',
-                '数据库已从备份成功恢复。\n应用程序将立即关闭，请手动重新启动以加载新数据。'
-            )
-            sys.exit(0)
-        def on_error(msg):
-            progress.close()
-            QMessageBox.critical(
-                self, 
-                '恢复失败', 
-                f'恢复过程中发生错误:\n{msg}\n\n由于数据库连接已关闭，应用程序即将退出。'
-            )
-            sys.exit(1)
-        self._restore_worker = RestoreWorker(self.backup_manager, file_path, self)
-        self._restore_worker.success.connect(on_success)
-        self._restore_worker.error.connect(on_error)
-        self._restore_worker.start()
+        from dialogs.backup_restore import run_restore
+        run_restore(self, self.main_window, file_path)
             
     def _change_username(self):
         """修改用户名"""
@@ -524,6 +712,15 @@ class SettingsWindow(QWidget):
             
     def _save_settings(self):
         """保存系统设置"""
+        from core.backup_scheduler import CronSchedule
+        schedule = self.schedule_input.text().strip()
+        if self.schedule_backup_check.isChecked():
+            try:
+                CronSchedule(schedule)
+            except ValueError as e:
+                QMessageBox.warning(self, '时间表无效', f'定时备份时间表格式错误:\n{e}')
+                return
+        
         theme = self.theme_combo.currentText()
         auto_backup = self.auto_backup_check.isChecked()
         backup_path = self.backup_path_input.text()
@@ -534,10 +731,23 @@ class SettingsWindow(QWidget):
         self.settings.setValue("theme", theme)
         self.settings.setValue("auto_backup", auto_backup)
         self.settings.setValue("backup_path", backup_path)
+        self.settings.setValue("backup_vacuum_into", self.vacuum_backup_check.isChecked())
+        self.settings.setValue("backup_incremental", self.incremental_backup_check.isChecked())
+        self.settings.setValue("backup_schedule_enabled", self.schedule_backup_check.isChecked())
+        self.settings.setValue("backup_schedule", schedule)
+        codec = self.backup_codec_combo.currentData()
+        self.settings.setValue("backup_codec", codec)
+        self.settings.setValue("backup_level", self.backup_level_spin.value() if codec in COMPRESSION_LEVELS else 0)
         self.settings.setValue("close_to_tray", close_to_tray)
         self.settings.setValue("dont_ask_close", dont_ask_close)
+        self.settings.setValue("prewarm_enabled", self.prewarm_check.isChecked())
+        self.settings.setValue("import_staging_mode", self.import_staging_check.isChecked())
         self.settings.sync() # 确保立即写入
         
+        # 重新加载定时备份
+        if hasattr(self.main_window, 'backup_scheduler'):
+            self.main_window.backup_scheduler.start()
+        
         QMessageBox.information(
             self, 
             '设置已保存', 
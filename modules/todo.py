@@ -1,19 +1,18 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                            QPushButton, QListWidget, QLineEdit, 
-                            QMessageBox, QFrame)
-from PyQt5.QtCore import Qt
-import json
-import os
-import sys
-from utils.paths import get_app_path
+                            QPushButton, QListWidget, QListWidgetItem, QLineEdit, 
+                            QMessageBox, QFrame, QCheckBox, QDateEdit)
+from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtGui import QColor
 
 class TodoWindow(QWidget):
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
-        self.todo_file = get_app_path('todo_list.json')
+        # 与首页共用的待办存储
+        self.store = parent.app.db_manager.todo_store
         self.init_ui()
         self.load_todos()
+        self.store.changed.connect(self._on_store_changed)
         
     def init_ui(self):
         """初始化待办事项界面"""
@@ -33,14 +32,26 @@ class TodoWindow(QWidget):
         
         # 待办事项列表
         self.todo_list = QListWidget()
+        self.todo_list.itemChanged.connect(self._on_item_changed)
         card_layout.addWidget(self.todo_list)
         
         # 添加待办事项区域
         add_layout = QHBoxLayout()
         self.new_todo = QLineEdit()
         self.new_todo.setPlaceholderText("输入新的待办事项...")
+        self.new_todo.returnPressed.connect(self.add_todo)
         add_layout.addWidget(self.new_todo)
         
+        # 可选的截止日期
+        self.due_check = QCheckBox("截止日期")
+        add_layout.addWidget(self.due_check)
+        self.due_edit = QDateEdit(QDate.currentDate())
+        self.due_edit.setCalendarPopup(True)
+        self.due_edit.setDisplayFormat('yyyy-MM-dd')
+        self.due_edit.setEnabled(False)
+        self.due_check.toggled.connect(self.due_edit.setEnabled)
+        add_layout.addWidget(self.due_edit)
+        
         add_btn = QPushButton("添加")
         add_btn.setProperty("class", "primary")
         add_btn.clicked.connect(self.add_todo)
@@ -49,6 +60,14 @@ class TodoWindow(QWidget):
         
         # 操作按钮区域
         btn_layout = QHBoxLayout()
+        
+        up_btn = QPushButton("上移")
+        up_btn.clicked.connect(lambda: self.move_todo(-1))
+        btn_layout.addWidget(up_btn)
+        
+        down_btn = QPushButton("下移")
+        down_btn.clicked.connect(lambda: self.move_todo(1))
+        btn_layout.addWidget(down_btn)
         btn_layout.addStretch()
         
         delete_btn = QPushButton("删除选中")
@@ -70,21 +89,34 @@ class TodoWindow(QWidget):
         """添加待办事项"""
         text = self.new_todo.text().strip()
         if text:
-            self.todo_list.addItem(text)
+            due = self.due_edit.date().toString('yyyy-MM-dd') if self.due_check.isChecked() else None
+            try:
+                self.store.add(text, due)
+            except Exception as e:
+                QMessageBox.warning(self, "错误", f"添加待办事项失败: {str(e)}")
+                return
             self.new_todo.clear()
-            self.save_todos()
         else:
             QMessageBox.warning(self, "警告", "待办事项不能为空!")
     
+    def _selected_id(self):
+        current_item = self.todo_list.currentItem()
+        return current_item.data(Qt.UserRole) if current_item else None
+    
     def delete_todo(self):
         """删除选中的待办事项"""
-        current_item = self.todo_list.currentItem()
-        if current_item:
-            self.todo_list.takeItem(self.todo_list.row(current_item))
-            self.save_todos()
+        todo_id = self._selected_id()
+        if todo_id is not None:
+            self.store.delete([todo_id])
         else:
             QMessageBox.warning(self, "警告", "请先选择要删除的待办事项!")
     
+    def move_todo(self, offset):
+        """调整选中事项的顺序"""
+        todo_id = self._selected_id()
+        if todo_id is not None and self.store.move(todo_id, offset):
+            self._select(todo_id)
+    
     def clear_todos(self):
         """清空所有待办事项"""
         reply = QMessageBox.question(
@@ -95,28 +127,50 @@ class TodoWindow(QWidget):
         )
         
         if reply == QMessageBox.Yes:
-            self.todo_list.clear()
-            self.save_todos()
+            self.store.clear()
     
-    def load_todos(self):
-        """从文件加载待办事项"""
-        if os.path.exists(self.todo_file):
-            try:
-                with open(self.todo_file, 'r', encoding='utf-8') as f:
-                    todos = json.load(f)
-                    for todo in todos:
-                        self.todo_list.addItem(todo)
-            except Exception as e:
-                QMessageBox.warning(self, "错误", f"加载待办事项失败: {str(e)}")
+    def _on_store_changed(self, kind):
+        if kind == 'todos':
+            selected = self._selected_id()
+            self.load_todos()
+            if selected is not None:
+                self._select(selected)
     
-    def save_todos(self):
-        """保存待办事项到文件"""
-        todos = []
+    def _select(self, todo_id):
         for i in range(self.todo_list.count()):
-            todos.append(self.todo_list.item(i).text())
-            
+            if self.todo_list.item(i).data(Qt.UserRole) == todo_id:
+                self.todo_list.setCurrentRow(i)
+                return
+    
+    def load_todos(self):
+        """从共享存储加载待办事项 (勾选表示已完成)"""
+        today = QDate.currentDate().toString('yyyy-MM-dd')
+        self.todo_list.blockSignals(True)
         try:
-            with open(self.todo_file, 'w', encoding='utf-8') as f:
-                json.dump(todos, f, ensure_ascii=False, indent=2)
+            self.todo_list.clear()
+            for todo in self.store.todos():
+                text = todo['text']
+                if todo['due']:
+                    text = f"{text}  (截止 {todo['due']})"
+                item = QListWidgetItem(text)
+                item.setData(Qt.UserRole, todo['id'])
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Checked if todo['completed'] else Qt.Unchecked)
+                if todo['completed']:
+                    font = item.font()
+                    font.setStrikeOut(True)
+                    item.setFont(font)
+                    item.setForeground(QColor('#909399'))
+                elif todo['due'] and todo['due'] < today:
+                    item.setForeground(QColor('#f56c6c'))
+                self.todo_list.addItem(item)
         except Exception as e:
-            QMessageBox.warning(self, "错误", f"保存待办事项失败: {str(e)}")
\ No newline at end of file
+            QMessageBox.warning(self, "错误", f"加载待办事项失败: {str(e)}")
+        finally:
+            self.todo_list.blockSignals(False)
+    
+    def _on_item_changed(self, item):
+        """勾选/取消勾选时更新完成状态"""
+        todo_id = item.data(Qt.UserRole)
+        if todo_id is not None:
+            self.store.set_completed(todo_id, item.checkState() == Qt.Checked)
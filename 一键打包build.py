@@ -50,9 +50,12 @@ def build():
 
     # Hidden imports - Critical for dynamic imports
     hidden_imports = [
+        # 重依赖通过 core/lazy_imports.py 动态导入，必须显式声明
         'fitz',
         'openpyxl',
+        'openpyxl.styles',
         'docxtpl',
+        'PyQt5.QtChart',
         'sqlite3',
         'json',
         'ctypes',
@@ -119,7 +122,8 @@ def build():
             dst = os.path.join(dist_dir, 'data', f)
             
             if os.path.isfile(src):
-                if f.endswith('.db') or f.endswith('.db-wal') or f.endswith('.db-shm'):
+                # field.key 为敏感字段的加密密钥 (core/field_crypto.py)，缺少时已加密的数据无法解密
+                if f.endswith('.db') or f.endswith('.db-wal') or f.endswith('.db-shm') or f == 'field.key':
                     shutil.copy2(src, dst)
                     print(f"- Copied {src}")
             elif os.path.isdir(src):